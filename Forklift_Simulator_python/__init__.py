@@ -6,5 +6,13 @@
 # distribution of this software and related documentation without an express
 # license agreement from NVIDIA CORPORATION is strictly prohibited.
 #
-# from .extension import *
-from .simulator_extension import *
\ No newline at end of file
+import sys
+
+# Imported first, such that (when FORKLIFT_SIM_PROFILE_STARTUP=1) the import of everything else is measured
+from .logic.profiling.startup_profiler import startup_profiler
+
+# The extension is only exposed when running inside a Kit app. This allows the logic modules (such as the
+# headless batch runner) to be imported from a standalone python process before the SimulationApp is started
+if "omni.ext" in sys.modules:
+    # from .extension import *
+    from .simulator_extension import *
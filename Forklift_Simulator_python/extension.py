@@ -24,6 +24,7 @@ from omni.kit.menu.utils import add_menu_items, remove_menu_items
 from omni.usd import StageEventType
 
 from .global_variables import EXTENSION_DESCRIPTION, EXTENSION_TITLE
+from .logic.interface.simulation_interface import SimInterface
 from .ui_builder import UIBuilder
 
 """
@@ -147,7 +148,8 @@ class Extension(omni.ext.IExt):
         self.ui_builder.on_timeline_event(event)
 
     def _on_physics_step(self, step):
-        self.ui_builder.on_physics_step(step)
+        with SimInterface().step_timing.measure("UIBuilder.on_physics_step"):
+            self.ui_builder.on_physics_step(step)
 
     def _on_stage_event(self, event):
         if event.type == int(StageEventType.OPENED) or event.type == int(StageEventType.CLOSED):
@@ -9,7 +9,7 @@
 import os 
 from pathlib import Path 
 
-import omni.isaac.core.utils.nucleus as nucleus
+from .logic.assets.asset_catalog import AssetCatalog
 
 EXTENSION_TITLE = "Forklift Simulator"
 WINDOW_TITLE = "Forklift Simulator"
@@ -27,10 +27,98 @@ ROOT = str(EXTENSION_FOLDER_PATH.parent.resolve())
 ASSET_PATH = ROOT + "/assets"
 ROBOT_ASSETS = ASSET_PATH + "/Robots"
 
-SIMULATION_ENVIRONMENTS = {}
+# Local directory where resolved asset paths (and other caches) are persisted between runs
+CACHE_PATH = os.environ.get("FORKLIFT_SIM_CACHE_PATH", str(Path.home() / ".cache" / "forklift_simulator"))
 
-# Setup the default simulation environments path
-NVIDIA_ASSETS_PATH = str(nucleus.get_assets_root_path())
+# Local mirrors of the NVidia assets root, used when the Nucleus server is slow or unreachable
+LOCAL_ASSET_MIRRORS = [ASSET_PATH + "/Mirror"] + [
+    mirror for mirror in os.environ.get("FORKLIFT_SIM_ASSET_MIRRORS", "").split(os.pathsep) if mirror
+]
+
+# Maximum time (in seconds) to wait for the Nucleus server when resolving the assets root
+ASSET_ROOT_TIMEOUT = 5.0
+
+# The assets root is only resolved on first use (importing this module does not perform any I/O)
+ASSET_CATALOG = AssetCatalog(CACHE_PATH, local_mirrors=LOCAL_ASSET_MIRRORS, timeout=ASSET_ROOT_TIMEOUT)
+
+# Local content-addressed mirror of the USD assets (environments and robots) and its maximum size in bytes
+USE_ASSET_CACHE = os.environ.get("FORKLIFT_SIM_ASSET_CACHE", "1") != "0"
+ASSET_CACHE_PATH = CACHE_PATH + "/usd_assets"
+ASSET_CACHE_MAX_SIZE = 20 * 1024**3
+
+# Pre-cooking of the collision data of the environments after they are loaded, the folder of its manifest and the minimum
+# size (in MB) of the PhysX local mesh cache that keeps the cooked data on disk
+USE_PHYSICS_COOKING_CACHE = os.environ.get("FORKLIFT_SIM_COOKING_CACHE", "1") != "0"
+PHYSICS_COOKING_CACHE_PATH = CACHE_PATH + "/physics_cooking"
+PHYSICS_COOKING_CACHE_SIZE_MB = 4096
+
+# Folder of the 2D maps (occupancy grids and obstacle bounds) extracted from the environments, the cell size (in meters)
+# of the finest grid, the number of coarser grids and the height band (in meters) of the geometry that blocks a vehicle
+ENVIRONMENT_MAPS_PATH = CACHE_PATH + "/environment_maps"
+ENVIRONMENT_MAP_RESOLUTION = 0.05
+ENVIRONMENT_MAP_LEVELS = 4
+ENVIRONMENT_MAP_HEIGHT_RANGE = (0.05, 2.5)
+
+# Free margin (in meters) required around the footprint of a vehicle when it is spawned, and height (in meters) above the
+# floor of the vehicles placed automatically
+SPAWN_CLEARANCE = 0.3
+SPAWN_HEIGHT = 0.1
+
+# Folder of the roadmaps (lattice graphs of the free floor) built from the environment maps, the distance (in meters)
+# between neighbor nodes and the free margin (in meters) required around the footprints of the fleet on the nodes and
+# edges (the free half width around them is the reach of the largest footprint plus this margin, see footprint_reach)
+ROADMAPS_PATH = CACHE_PATH + "/roadmaps"
+ROADMAP_SPACING = 1.0
+ROADMAP_CLEARANCE = 0.6
+
+# Fleet planner: distance (in meters) kept between the footprints of the vehicles on top of their size (it covers the
+# tracking error, see vehicle_separation), number of steps planned against the other vehicles, cruise speed (in m/s) of
+# the plans and period (in seconds of simulated time) at which the fleet is replanned
+PLANNER_TRACKING_MARGIN = 1.0
+PLANNER_WINDOW = 16
+PLANNER_CRUISE_SPEED = 1.5
+PLANNER_REPLAN_PERIOD = 1.0
+
+# Number of most used environments opened in the background at startup (0 disables pre-warming), and the maximum number
+# of environments whose layers are kept in memory for instant scene switching
+ENVIRONMENT_PREWARM_COUNT = int(os.environ.get("FORKLIFT_SIM_PREWARM", "0"))
+ENVIRONMENT_POOL_SIZE = max(ENVIRONMENT_PREWARM_COUNT, int(os.environ.get("FORKLIFT_SIM_ENVIRONMENT_POOL_SIZE", "2")))
+
+# Rate (in Hz) at which the streaming backends publish the state of the fleet (independent of the physics rate), and the
+# prefix of the namespace of each vehicle (e.g. /forklift_3/odom)
+STREAMING_PUBLISH_RATE = 30.0
+STREAMING_NAMESPACE = "forklift"
+
+# Folder of the fleet recordings, and number of physics steps per (compressed) chunk of a recording
+RECORDINGS_PATH = CACHE_PATH + "/recordings"
+RECORDING_CHUNK_STEPS = 256
+
+# Maximum number of vehicles sampled by the telemetry, rate (in Hz) at which its plots are refreshed and length (in
+# seconds) of the plotted window
+TELEMETRY_MAX_VEHICLES = 4
+TELEMETRY_UI_RATE = 10.0
+TELEMETRY_WINDOW = 30.0
+
+# Whether the physics steps, their subscribers and the rendered frames are timed, and period (in seconds) of the dumps of
+# the timings to STEP_TIMING_PATH (0 to disable the dumps)
+STEP_TIMING_ENABLED = os.environ.get("FORKLIFT_SIM_STEP_TIMING", "1") != "0"
+STEP_TIMING_PATH = CACHE_PATH + "/step_timing"
+STEP_TIMING_DUMP_INTERVAL = float(os.environ.get("FORKLIFT_SIM_STEP_TIMING_DUMP", "0"))
+
+# Adaptive rate control: whether it is enabled at startup, the real time factor to hold and the bounds of the rendering
+# period (the physics step is only adapted when bounds are given to SimInterface.enable_adaptive_rate)
+ADAPTIVE_RATE_ENABLED = os.environ.get("FORKLIFT_SIM_ADAPTIVE_RATE", "0") != "0"
+ADAPTIVE_RATE_TARGET = 1.0
+ADAPTIVE_RENDERING_DT_RANGE = (1.0 / 60.0, 1.0 / 10.0)
+
+# World backend of the headless runners ("isaac" for the full physics world, "lite" for the NumPy kinematic surrogate),
+# the folder of the occupancy maps of the environments used by the lite backend and its world settings (the kinematic
+# model is accurate with much larger steps than the physics)
+SIMULATION_BACKEND = os.environ.get("FORKLIFT_SIM_BACKEND", "isaac")
+LITE_MAPS_PATH = os.environ.get("FORKLIFT_SIM_LITE_MAPS", ASSET_PATH + "/Maps")
+LITE_WORLD_SETTINGS = {"physics_dt": 1.0 / 20.0, "stage_units_in_meters": 1.0, "rendering_dt": 1.0 / 20.0}
+
+# Setup the default simulation environments path (relative to the NVidia assets root)
 ISAAC_SIM_ENVIRONMENTS = "/Isaac/Environments"
 NVIDIA_SIMULATION_ENVIRONMENTS = {
     "Default Environment": "Grid/default_environment.usd",
@@ -50,14 +138,14 @@ NVIDIA_SIMULATION_ENVIRONMENTS = {
 }
 NVIDIA_ROBOTS = "/Isaac/Robots"
 #TODO: Fix paths
-ROBOTS = {
+ROBOTS = ASSET_CATALOG.mapping({
     "Rack": ROBOT_ASSETS + "/RackForklift/forklift.usd",
     "Reach": ROBOT_ASSETS + "/ReachForklift/forklift.usd",
-    "SingleRearWheel": NVIDIA_ASSETS_PATH + NVIDIA_ROBOTS + "/Forklift/forklift_b.usd",
-}
+    "SingleRearWheel": NVIDIA_ROBOTS.lstrip("/") + "/Forklift/forklift_b.usd",
+})
 
-# Add the Isaac Sim assets to the list
-for asset in NVIDIA_SIMULATION_ENVIRONMENTS:
-    SIMULATION_ENVIRONMENTS[asset] = (
-        NVIDIA_ASSETS_PATH + ISAAC_SIM_ENVIRONMENTS + "/" + NVIDIA_SIMULATION_ENVIRONMENTS[asset]
-    )
\ No newline at end of file
+# Add the Isaac Sim assets to the list (resolved lazily against the assets root when accessed)
+SIMULATION_ENVIRONMENTS = ASSET_CATALOG.mapping({
+    asset: ISAAC_SIM_ENVIRONMENTS.lstrip("/") + "/" + NVIDIA_SIMULATION_ENVIRONMENTS[asset]
+    for asset in NVIDIA_SIMULATION_ENVIRONMENTS
+})
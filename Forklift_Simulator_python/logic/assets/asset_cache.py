@@ -0,0 +1,429 @@
+"""
+| File: asset_cache.py
+| Author: Akhilesh Bhat
+| Description: Definition of the AssetCache class that mirrors remote USD assets (and everything they depend on) into a
+                 local content-addressed directory, with size-bounded LRU eviction and hash validation
+"""
+
+__all__ = ["AssetCache"]
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+from typing import Dict, Optional, Set
+
+from pxr import Ar, Sdf, UsdUtils
+
+logger = logging.getLogger(__name__)
+
+
+def _log(level: str, message: str):
+    """
+    Logs through carb like the rest of the extension, or through logging when the cache is used outside of Kit
+    """
+    # Imported here, as the cache is also used without a running Kit app (e.g. by the headless runner), where carb is
+    # not available
+    try:
+        import carb
+    except ImportError:
+        logger.log(logging.WARNING if level == "warn" else logging.INFO, message)
+        return
+
+    if level == "warn":
+        carb.log_warn(message)
+    else:
+        carb.log_info(message)
+
+
+class AssetCache:
+    """
+    Local mirror of (potentially remote) USD assets. Every file is stored under the sha256 of its content, and USD layers
+    are rewritten such that their sublayers, references, payloads and asset attributes point to the local copies. Once an
+    asset is mirrored, loading it again only costs local disk I/O.
+    """
+
+    # Extensions of the files that are parsed as USD layers (and have their dependencies mirrored as well)
+    LAYER_EXTENSIONS = {".usd", ".usda", ".usdc"}
+
+    # Name of the json file (inside the cache directory) that maps source urls to the content-addressed objects
+    INDEX_FILE = "index.json"
+
+    def __init__(self, cache_dir: str, max_size: int = 20 * 1024**3, max_age: float = 24.0 * 3600.0):
+        """
+        Args:
+            cache_dir (str): The directory where the mirrored assets are stored.
+            max_size (int): Maximum size (in bytes) of the cache before the least recently used assets are evicted. Defaults to 20GB.
+            max_age (float): Time (in seconds) after which the source of a mirrored asset is checked for changes. Defaults to 24h.
+        """
+        self._cache_dir = cache_dir
+        self._objects_dir = os.path.join(cache_dir, "objects")
+        self._max_size = max_size
+        self._max_age = max_age
+
+        # Index of source url -> {"hash", "path", "size", "version", "deps", "fetched", "last_access"}
+        self._index: Optional[Dict[str, Dict]] = None
+
+        # Hashes of the objects already validated in this process (avoid re-hashing big files on every load)
+        self._validated: Set[str] = set()
+
+        # Lock for safe multi-threading
+        self._lock = threading.RLock()
+
+    @property
+    def cache_dir(self) -> str:
+        """
+        Returns:
+            str: The directory where the mirrored assets are stored
+        """
+        return self._cache_dir
+
+    @property
+    def size(self) -> int:
+        """
+        Returns:
+            int: The total size (in bytes) of the objects currently stored in the cache
+        """
+        with self._lock:
+            return sum(entry["size"] for entry in self._unique_objects().values())
+
+    def localize(self, url: str) -> str:
+        """
+        Method that returns the path of a local copy of the given asset, mirroring it (and all of its dependencies)
+        into the cache if needed.
+
+        Args:
+            url (str): The path or url of the asset to mirror.
+
+        Returns:
+            str: The local path of the mirrored asset
+        """
+        with self._lock:
+            local_path = self._localize(url, in_progress=set())
+            self._save_index()
+            self._evict(keep=url)
+
+        return local_path
+
+    def contains(self, url: str) -> bool:
+        """
+        Returns:
+            bool: True if the asset (and every dependency) is mirrored and valid in the cache
+        """
+        with self._lock:
+            return self._is_complete(url, set())
+
+    def content_hash(self, url: str) -> Optional[str]:
+        """
+        Returns:
+            str: A hash of the content of the asset and of all its dependencies (None if it is not mirrored in the cache)
+        """
+        with self._lock:
+            if not self._is_complete(url, set()):
+                return None
+
+            paths: Set[str] = set()
+            self._collect_paths(url, paths, set())
+            hashes = sorted(os.path.basename(path) for path in paths)
+
+        return hashlib.sha256("\n".join(hashes).encode("utf-8")).hexdigest()
+
+    def clear(self):
+        """
+        Method that removes every mirrored asset from the cache.
+        """
+        with self._lock:
+            shutil.rmtree(self._objects_dir, ignore_errors=True)
+            self._index = {}
+            self._validated.clear()
+            self._save_index()
+
+    """
+    ---------------------------------------------------------------------
+    Auxiliary methods
+    ---------------------------------------------------------------------
+    """
+
+    def _localize(self, url: str, in_progress: Set[str]) -> str:
+
+        index = self._load_index()
+
+        # Cache hit: the object and all of its dependencies are still valid
+        if self._is_complete(url, set()) and not self._is_stale(url, set()):
+            self._touch(url, set())
+            return index[url]["path"]
+
+        # Cyclic dependency: keep the original path, the cycle is resolved by USD itself
+        if url in in_progress:
+            return url
+
+        in_progress.add(url)
+        try:
+            extension = os.path.splitext(url.split("?")[0])[1].lower()
+            if extension in AssetCache.LAYER_EXTENSIONS:
+                entry = self._mirror_layer(url, extension, in_progress)
+            else:
+                entry = self._mirror_file(url, extension)
+        finally:
+            in_progress.discard(url)
+
+        index[url] = entry
+        _log("info", "Mirrored {} into the local asset cache ({} bytes)".format(url, entry["size"]))
+        return entry["path"]
+
+    def _mirror_layer(self, url: str, extension: str, in_progress: Set[str]) -> Dict:
+
+        source = Sdf.Layer.FindOrOpen(url)
+        if source is None:
+            raise FileNotFoundError("Could not open the USD layer " + url)
+
+        # Work on an in-memory copy, such that the original layer (which may be in use by the stage) is left untouched
+        layer = Sdf.Layer.CreateAnonymous(extension)
+        layer.TransferContent(source)
+
+        dependencies = []
+
+        def localize_dependency(asset_path: str) -> str:
+
+            if not asset_path:
+                return asset_path
+
+            # Asset paths that are resolved through search paths (such as core MDL materials) are left untouched, but a
+            # bare file name next to the layer is anchored to it like any relative path
+            dependency_url = source.ComputeAbsolutePath(asset_path)
+            if "/" not in asset_path and "\\" not in asset_path and not Ar.GetResolver().Resolve(dependency_url):
+                return asset_path
+
+            # (the mirrored layer lives in the cache, so a dependency that could not be mirrored keeps its absolute path)
+            try:
+                local_path = self._localize(dependency_url, in_progress)
+            except Exception as e:
+                _log("warn", "Could not mirror {} (referenced by {}): {}".format(dependency_url, url, e))
+                return dependency_url
+
+            if local_path != dependency_url:
+                dependencies.append(dependency_url)
+            return local_path
+
+        UsdUtils.ModifyAssetPaths(layer, localize_dependency)
+
+        with tempfile.NamedTemporaryFile(suffix=extension, dir=self._tmp_dir(), delete=False) as tmp:
+            tmp_path = tmp.name
+        layer.Export(tmp_path)
+
+        entry = self._store(tmp_path, extension, self._source_version(url))
+        entry["deps"] = dependencies
+        return entry
+
+    def _mirror_file(self, url: str, extension: str) -> Dict:
+
+        with tempfile.NamedTemporaryFile(suffix=extension, dir=self._tmp_dir(), delete=False) as tmp:
+            tmp_path = tmp.name
+            tmp.write(AssetCache._read_source(url))
+
+        entry = self._store(tmp_path, extension, self._source_version(url))
+        entry["deps"] = []
+        return entry
+
+    def _store(self, tmp_path: str, extension: str, version: str) -> Dict:
+        """
+        Moves a temporary file into its content-addressed location and returns its index entry
+        """
+        digest = AssetCache._hash_file(tmp_path)
+        object_path = self._object_path(digest, extension)
+
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        if os.path.isfile(object_path):
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, object_path)
+
+        self._validated.add(digest)
+        now = time.time()
+
+        return {
+            "hash": digest,
+            "path": object_path,
+            "size": os.path.getsize(object_path),
+            "version": version,
+            "fetched": now,
+            "last_access": now,
+        }
+
+    def _is_complete(self, url: str, visited: Set[str]) -> bool:
+        """
+        Checks whether an asset and all of its dependencies are stored in the cache and match their hash
+        """
+        if url in visited:
+            return True
+        visited.add(url)
+
+        entry = self._load_index().get(url)
+        if entry is None or not os.path.isfile(entry["path"]):
+            return False
+
+        # Validate the content of the object only once per process
+        if entry["hash"] not in self._validated:
+            if AssetCache._hash_file(entry["path"]) != entry["hash"]:
+                _log("warn", "Corrupted object {} in the asset cache, mirroring it again".format(entry["path"]))
+                os.remove(entry["path"])
+                return False
+            self._validated.add(entry["hash"])
+
+        return all(self._is_complete(dependency, visited) for dependency in entry["deps"])
+
+    def _is_stale(self, url: str, visited: Set[str]) -> bool:
+        """
+        Checks whether the source of an asset, or of one of its dependencies, changed since it was mirrored
+        """
+        if url in visited:
+            return False
+        visited.add(url)
+
+        entry = self._load_index()[url]
+        if time.time() - entry["fetched"] >= self._max_age:
+            # The entry is old enough to be checked against the source again
+            version = self._source_version(url)
+            if version is not None and version != entry["version"]:
+                return True
+            if version is not None:
+                entry["fetched"] = time.time()
+
+        # (a layer whose dependency changed is mirrored again, as the dependency gets a new content-addressed path)
+        return any(self._is_stale(dependency, visited) for dependency in entry["deps"])
+
+    def _touch(self, url: str, visited: Set[str]):
+        if url in visited:
+            return
+        visited.add(url)
+
+        entry = self._load_index().get(url)
+        if entry is not None:
+            entry["last_access"] = time.time()
+            for dependency in entry["deps"]:
+                self._touch(dependency, visited)
+
+    def _collect_paths(self, url: str, paths: Set[str], visited: Set[str]):
+        if url in visited:
+            return
+        visited.add(url)
+
+        entry = self._load_index().get(url)
+        if entry is not None:
+            paths.add(entry["path"])
+            for dependency in entry["deps"]:
+                self._collect_paths(dependency, paths, visited)
+
+    def _unique_objects(self) -> Dict[str, Dict]:
+        # Several urls may share the same content (and therefore the same object)
+        objects = {}
+        for entry in self._load_index().values():
+            previous = objects.get(entry["path"])
+            if previous is None or previous["last_access"] < entry["last_access"]:
+                objects[entry["path"]] = entry
+        return objects
+
+    def _evict(self, keep: str):
+        """
+        Removes the least recently used objects until the cache fits in its maximum size. Parents are always touched
+        together with their dependencies, so a layer is never kept while the objects it points to are evicted first.
+        The asset that was just requested (and its dependencies) is never evicted.
+        """
+        protected = set()
+        self._collect_paths(keep, protected, set())
+
+        objects = {path: entry for path, entry in self._unique_objects().items() if path not in protected}
+        total_size = self.size
+        if total_size <= self._max_size:
+            return
+
+        evicted = set()
+        for path, entry in sorted(objects.items(), key=lambda item: item[1]["last_access"]):
+            if total_size <= self._max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total_size -= entry["size"]
+            evicted.add(path)
+
+        index = self._load_index()
+        for url in [url for url, entry in index.items() if entry["path"] in evicted]:
+            del index[url]
+
+        _log("info", "Evicted {} objects from the asset cache".format(len(evicted)))
+        self._save_index()
+
+    def _object_path(self, digest: str, extension: str) -> str:
+        return os.path.join(self._objects_dir, digest[:2], digest + extension)
+
+    def _tmp_dir(self) -> str:
+        tmp_dir = os.path.join(self._cache_dir, "tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        return tmp_dir
+
+    def _load_index(self) -> Dict[str, Dict]:
+        if self._index is None:
+            try:
+                with open(os.path.join(self._cache_dir, AssetCache.INDEX_FILE), "r") as f:
+                    self._index = json.load(f)
+            except (OSError, ValueError):
+                self._index = {}
+        return self._index
+
+    def _save_index(self):
+        try:
+            os.makedirs(self._cache_dir, exist_ok=True)
+            index_path = os.path.join(self._cache_dir, AssetCache.INDEX_FILE)
+            tmp_path = index_path + "." + str(os.getpid()) + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self._index, f)
+            os.replace(tmp_path, index_path)
+        except OSError as e:
+            _log("warn", "Could not save the asset cache index: " + str(e))
+
+    @staticmethod
+    def _hash_file(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def _read_source(url: str) -> bytes:
+        if "://" not in url:
+            with open(url, "rb") as f:
+                return f.read()
+
+        # The omniverse client is only available inside Isaac Sim
+        import omni.client
+
+        result, _, content = omni.client.read_file(url)
+        if result != omni.client.Result.OK:
+            raise FileNotFoundError("Could not read " + url + ": " + str(result))
+        return memoryview(content).tobytes()
+
+    @staticmethod
+    def _source_version(url: str) -> Optional[str]:
+        """
+        Returns an identifier of the current version of the source (modification time and size), or None if unknown
+        """
+        try:
+            if "://" not in url:
+                stat = os.stat(url)
+                return str(stat.st_mtime_ns) + ":" + str(stat.st_size)
+
+            import omni.client
+
+            result, entry = omni.client.stat(url)
+            if result != omni.client.Result.OK:
+                return None
+            return str(entry.modified_time) + ":" + str(entry.size)
+        except Exception:
+            return None
@@ -0,0 +1,380 @@
+"""
+| File: asset_catalog.py
+| Author: Akhilesh Bhat
+| Description: Definition of the AssetCatalog class that lazily resolves the NVidia Nucleus assets root (with a timeout
+                 and a persistent on-disk cache) and of the LazyAssetMapping used to expose the environments and robots
+"""
+
+__all__ = ["AssetCatalog", "LazyAssetMapping"]
+
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from collections.abc import Mapping
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _log(level: str, message: str):
+    """
+    Logs through carb like the rest of the extension, or through logging when the catalog is used outside of Kit
+    """
+    # Imported here, as the catalog is also used without a running Kit app (e.g. by the headless runner), where carb is
+    # not available
+    try:
+        import carb
+    except ImportError:
+        logger.log(logging.WARNING if level == "warn" else logging.INFO, message)
+        return
+
+    if level == "warn":
+        carb.log_warn(message)
+    else:
+        carb.log_info(message)
+
+
+class AssetCatalog:
+    """
+    Lazily resolves the Nucleus assets root path and the location of individual assets. Nothing is resolved
+    when the object is created - the root is only queried on first use, in a background thread bounded by a
+    timeout, and the result is persisted on disk so that subsequent runs do not need to talk to Nucleus at all.
+    When the root cannot be resolved (or an asset does not exist on the server) the local mirrors are used instead.
+    The lookups block (up to the timeout) on a cache miss: from the UI, use resolve_async and exists_async instead.
+    """
+
+    # Name of the json file (inside the cache directory) where the resolved paths are persisted
+    CACHE_FILE = "asset_catalog.json"
+
+    def __init__(
+        self,
+        cache_dir: str,
+        local_mirrors: Iterable[str] = (),
+        timeout: float = 5.0,
+        cache_ttl: float = 24.0 * 3600.0,
+        negative_cache_ttl: float = 300.0,
+    ):
+        """
+        Args:
+            cache_dir (str): The directory where the persistent cache of resolved paths is stored.
+            local_mirrors (Iterable[str]): Local directories that mirror the layout of the Nucleus assets root.
+            timeout (float): Maximum time (in seconds) to wait for Nucleus when resolving the assets root. Defaults to 5.0.
+            cache_ttl (float): Time (in seconds) a successful lookup remains valid on disk. Defaults to 24h.
+            negative_cache_ttl (float): Time (in seconds) a failed lookup remains valid on disk. Defaults to 300.0.
+        """
+        self._cache_dir = cache_dir
+        self._local_mirrors: List[str] = list(local_mirrors)
+        self._timeout = timeout
+        self._cache_ttl = cache_ttl
+        self._negative_cache_ttl = negative_cache_ttl
+
+        # In-memory view of the persistent cache (only loaded from disk on first use)
+        self._cache: Optional[Dict] = None
+        self._root_resolved = False
+        self._assets_root: Optional[str] = None
+
+        # Lock for safe multi-threading (the UI and the simulation may both query assets)
+        self._lock = threading.RLock()
+
+    @property
+    def cache_path(self) -> str:
+        """
+        Returns:
+            str: The full path of the json file used to persist the resolved paths
+        """
+        return os.path.join(self._cache_dir, AssetCatalog.CACHE_FILE)
+
+    @property
+    def local_mirrors(self) -> List[str]:
+        """
+        Returns:
+            list: The local directories that mirror the Nucleus assets root
+        """
+        return self._local_mirrors
+
+    @property
+    def assets_root(self) -> Optional[str]:
+        """The Nucleus assets root path. Resolved (at most once per process) the first time it is accessed.
+
+        Returns:
+            str: The assets root path or None if it could not be resolved within the timeout
+        """
+        if self._root_resolved:
+            return self._assets_root
+
+        with self._lock:
+            if not self._root_resolved:
+                self._assets_root = self._resolve_assets_root()
+                self._root_resolved = True
+
+        return self._assets_root
+
+    def resolve(self, asset_path: str) -> str:
+        """
+        Method that returns the full path of an asset. Absolute paths and urls are returned unchanged, while paths
+        relative to the assets root are checked against the server (using the cached result when available)
+        and fall back to the first local mirror that contains the asset.
+
+        Args:
+            asset_path (str): An absolute path/url or a path relative to the Nucleus assets root.
+
+        Returns:
+            str: The path from where the asset should be loaded
+        """
+
+        if AssetCatalog.is_absolute(asset_path):
+            return asset_path
+
+        # Try the Nucleus server first
+        root = self.assets_root
+        if root is not None:
+            url = root + "/" + asset_path
+            if self.exists(url):
+                return url
+
+        # Otherwise try the local mirrors
+        for mirror in self._local_mirrors:
+            local_path = os.path.join(mirror, asset_path)
+            if os.path.isfile(local_path):
+                return local_path
+
+        # Nothing better is known, keep the remote url (if any) so that the error surfaces when loading
+        if root is not None:
+            return root + "/" + asset_path
+
+        raise FileNotFoundError("Could not resolve the asset " + asset_path + " (no assets root and no local mirror)")
+
+    async def resolve_async(self, asset_path: str) -> str:
+        """
+        Method that resolves an asset (see resolve) in a worker thread, such that the Kit main loop (and the UI) keeps
+        running while Nucleus is queried. Once resolved, the answer is cached and resolve returns it right away.
+
+        Args:
+            asset_path (str): An absolute path/url or a path relative to the Nucleus assets root.
+
+        Returns:
+            str: The path from where the asset should be loaded
+        """
+        return await asyncio.get_event_loop().run_in_executor(None, self.resolve, asset_path)
+
+    async def exists_async(self, url: str) -> bool:
+        """
+        Method that checks whether an asset exists (see exists) in a worker thread, without blocking the Kit main loop.
+
+        Args:
+            url (str): The full path or url of the asset.
+
+        Returns:
+            bool: True if the asset exists
+        """
+        return await asyncio.get_event_loop().run_in_executor(None, self.exists, url)
+
+    def exists(self, url: str) -> bool:
+        """
+        Method that checks whether an asset exists, caching the answer in memory and on disk. On a cache miss it blocks
+        up to the timeout while Nucleus is queried (see exists_async).
+
+        Args:
+            url (str): The full path or url of the asset.
+
+        Returns:
+            bool: True if the asset exists
+        """
+
+        if not AssetCatalog.is_remote(url):
+            return os.path.isfile(url)
+
+        cached = self._get_cached("exists", url)
+        if cached is not None:
+            return cached
+
+        result = self._call_with_timeout(self._nucleus_is_file, url)
+        self._set_cached("exists", url, bool(result), success=result is not None)
+        return bool(result)
+
+    def invalidate(self):
+        """
+        Method that drops every cached entry (both in memory and on disk), forcing a new lookup on next use.
+        """
+        with self._lock:
+            self._cache = {"root": {}, "exists": {}}
+            self._root_resolved = False
+            self._assets_root = None
+            self._save_cache()
+
+    def mapping(self, assets: Dict[str, str]) -> "LazyAssetMapping":
+        """
+        Args:
+            assets (dict): A dictionary of asset names to absolute or root relative paths.
+
+        Returns:
+            LazyAssetMapping: A read-only mapping that resolves the paths through this catalog on access
+        """
+        return LazyAssetMapping(self, assets)
+
+    @staticmethod
+    def is_remote(path: str) -> bool:
+        """
+        Returns:
+            bool: True if the path is an url (omniverse://, http://, etc.)
+        """
+        return "://" in path
+
+    @staticmethod
+    def is_absolute(path: str) -> bool:
+        """
+        Returns:
+            bool: True if the path is an url or an absolute path in the local filesystem
+        """
+        return AssetCatalog.is_remote(path) or os.path.isabs(path)
+
+    """
+    ---------------------------------------------------------------------
+    Auxiliary methods
+    ---------------------------------------------------------------------
+    """
+
+    def _resolve_assets_root(self) -> Optional[str]:
+
+        # Check if we already know the answer from a previous run
+        cached = self._get_cached("root", "assets_root")
+        if cached is not None:
+            return cached or None
+
+        start = time.monotonic()
+        root = self._call_with_timeout(self._nucleus_assets_root)
+
+        if root is None:
+            _log(
+                "warn",
+                "Could not resolve the Nucleus assets root within {:.1f}s, using the local mirrors instead".format(
+                    self._timeout
+                ),
+            )
+            self._set_cached("root", "assets_root", "", success=False)
+            return None
+
+        _log("info", "Resolved the Nucleus assets root {} in {:.3f}s".format(root, time.monotonic() - start))
+        self._set_cached("root", "assets_root", str(root), success=True)
+        return str(root)
+
+    def _call_with_timeout(self, function, *args):
+        """
+        Runs a (potentially blocking) Nucleus query in a daemon thread, giving up after the configured timeout.
+        The thread is left to finish on its own, so a hanging server never blocks the caller nor the app shutdown.
+        """
+        result = [None]
+
+        def target():
+            try:
+                result[0] = function(*args)
+            except Exception as e:
+                _log("warn", "Nucleus query failed: " + str(e))
+
+        worker = threading.Thread(target=target, name="AssetCatalogQuery", daemon=True)
+        worker.start()
+        worker.join(self._timeout)
+
+        return None if worker.is_alive() else result[0]
+
+    @staticmethod
+    def _nucleus_assets_root():
+        # Imported here, as the Nucleus client is only available inside Isaac Sim and importing it is expensive
+        import omni.isaac.core.utils.nucleus as nucleus
+
+        return nucleus.get_assets_root_path()
+
+    @staticmethod
+    def _nucleus_is_file(url: str) -> bool:
+        import omni.isaac.core.utils.nucleus as nucleus
+
+        return nucleus.is_file(url)
+
+    def _load_cache(self) -> Dict:
+        if self._cache is None:
+            try:
+                with open(self.cache_path, "r") as f:
+                    self._cache = json.load(f)
+            except (OSError, ValueError):
+                self._cache = {}
+
+            self._cache.setdefault("root", {})
+            self._cache.setdefault("exists", {})
+
+        return self._cache
+
+    def _save_cache(self):
+        try:
+            os.makedirs(self._cache_dir, exist_ok=True)
+
+            # Write to a temporary file first, so that concurrent readers never see a partial file
+            tmp_path = self.cache_path + "." + str(os.getpid()) + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self._cache, f, indent=2)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            _log("warn", "Could not save the asset catalog cache: " + str(e))
+
+    def _get_cached(self, section: str, key: str):
+        with self._lock:
+            entry = self._load_cache()[section].get(key)
+
+        if entry is None or entry.get("expires", 0.0) < time.time():
+            return None
+
+        return entry["value"]
+
+    def _set_cached(self, section: str, key: str, value, success: bool):
+        ttl = self._cache_ttl if success else self._negative_cache_ttl
+
+        with self._lock:
+            self._load_cache()[section][key] = {"value": value, "expires": time.time() + ttl}
+            self._save_cache()
+
+
+class LazyAssetMapping(Mapping):
+    """
+    Read-only dictionary of asset names to asset paths. The names are known upfront (so the UI can list them
+    without any I/O), while the paths are only resolved through the AssetCatalog when they are accessed.
+    """
+
+    def __init__(self, catalog: AssetCatalog, assets: Dict[str, str]):
+        """
+        Args:
+            catalog (AssetCatalog): The catalog used to resolve the asset paths.
+            assets (dict): A dictionary of asset names to absolute or root relative paths.
+        """
+        self._catalog = catalog
+        self._assets = dict(assets)
+
+    def __getitem__(self, name: str) -> str:
+        return self._catalog.resolve(self._assets[name])
+
+    def __iter__(self):
+        return iter(self._assets)
+
+    def __len__(self) -> int:
+        return len(self._assets)
+
+    def __contains__(self, name) -> bool:
+        return name in self._assets
+
+    async def resolve_async(self, name: str) -> str:
+        """
+        Returns:
+            str: The path of the asset, resolved without blocking the Kit main loop (see AssetCatalog.resolve_async)
+        """
+        return await self._catalog.resolve_async(self._assets[name])
+
+    def unresolved(self, name: str) -> str:
+        """
+        Returns:
+            str: The path of the asset as it was registered (before being resolved)
+        """
+        return self._assets[name]
+
+    def __repr__(self) -> str:
+        return "LazyAssetMapping(" + repr(self._assets) + ")"
@@ -0,0 +1,255 @@
+"""
+| File: cooking_cache.py
+| Author: Akhilesh Bhat
+| Description: Definition of the CookingCache class that keeps the PhysX cooked collision data of the static environments
+                 on disk across loads (and sessions), and pre-cooks an environment right after it is loaded
+"""
+
+__all__ = ["CookingCache"]
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _log(level: str, message: str):
+    """
+    Logs through carb like the rest of the extension, or through logging when the cache is used outside of Kit
+    """
+    # Imported here, as the cache is also used without a running Kit app (e.g. to read its manifest), where carb is
+    # not available
+    try:
+        import carb
+    except ImportError:
+        logger.log(logging.WARNING if level == "warn" else logging.INFO, message)
+        return
+
+    if level == "warn":
+        carb.log_warn(message)
+    else:
+        carb.log_info(message)
+
+
+class CookingCache:
+    """
+    Cooking the collision meshes of a large environment (convex decompositions, triangle meshes, SDFs) is what makes the
+    first play after a load slow. PhysX can keep the cooked data in its local (on disk) mesh cache, keyed by the mesh
+    content and the cooking parameters: this class makes sure that cache is enabled and large enough, pre-cooks every
+    environment once right after it is loaded (instead of on the first play), and keeps a manifest of the environments
+    already cooked, keyed by the hash of the asset (and all its dependencies) and the physics settings. Loading such an
+    environment again only reads the cooked data back from the disk, so it is not pre-cooked again.
+    """
+
+    # Name of the json file (inside the cache directory) with the environments already cooked
+    MANIFEST_FILE = "cooking_manifest.json"
+
+    # Settings of omni.physx that control its persistent local mesh cache
+    USE_LOCAL_MESH_CACHE = "/persistent/physics/useLocalMeshCache"
+    LOCAL_MESH_CACHE_SIZE_MB = "/persistent/physics/localMeshCacheSizeMB"
+
+    def __init__(self, cache_dir: str, size_mb: int = 4096, asset_cache=None):
+        """
+        Args:
+            cache_dir (str): The directory where the manifest is stored.
+            size_mb (int): The minimum size (in MB) of the PhysX local mesh cache. Defaults to 4096.
+            asset_cache (AssetCache): The local mirror of the assets, used to hash an environment without reading it
+                again (the environment file is hashed otherwise).
+        """
+        self._cache_dir = cache_dir
+        self._size_mb = size_mb
+        self._asset_cache = asset_cache
+        self._manifest: Optional[Dict[str, Dict]] = None
+        self._configured = False
+
+        self._hits = 0
+        self._misses = 0
+
+        # Lock for safe multi-threading
+        self._lock = threading.Lock()
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns:
+            dict: The number of loads that found the environment already cooked (hits) and that cooked it (misses)
+        """
+        return {"hits": self._hits, "misses": self._misses, "environments": len(self._load_manifest())}
+
+    def configure(self):
+        """
+        Method that enables the PhysX local mesh cache (with at least size_mb of space). Called once, before cooking.
+        """
+        if self._configured:
+            return
+        self._configured = True
+
+        import carb.settings
+
+        settings = carb.settings.get_settings()
+        settings.set_bool(CookingCache.USE_LOCAL_MESH_CACHE, True)
+        if (settings.get_as_int(CookingCache.LOCAL_MESH_CACHE_SIZE_MB) or 0) < self._size_mb:
+            settings.set_int(CookingCache.LOCAL_MESH_CACHE_SIZE_MB, self._size_mb)
+
+    def key(self, usd_path: str, physics_settings: Dict) -> str:
+        """
+        Args:
+            usd_path (str): The path or url of the environment.
+            physics_settings (dict): The settings the collision data depends on (e.g. the world settings).
+
+        Returns:
+            str: The key of the cooked environment (changes when the asset, any of its dependencies or the settings do)
+        """
+        asset_hash = self._asset_cache.content_hash(usd_path) if self._asset_cache is not None else None
+        if asset_hash is None:
+            asset_hash = CookingCache._hash_source(usd_path)
+
+        settings = json.dumps(physics_settings, sort_keys=True, default=str)
+        return hashlib.sha256((asset_hash + "\n" + settings).encode("utf-8")).hexdigest()
+
+    def is_cooked(self, key: str) -> bool:
+        with self._lock:
+            return key in self._load_manifest()
+
+    async def precook_async(self, stage, usd_path: str, root_path: str, physics_settings: Dict, playing: bool = False) -> Dict:
+        """
+        Method that cooks the static collision geometry of an environment that was just loaded (unless it was already
+        cooked with the same settings), yielding to the Kit main loop while the cooking tasks run.
+
+        Args:
+            stage (Usd.Stage): The stage the environment was loaded in.
+            usd_path (str): The path or url of the environment.
+            root_path (str): The path of the prim the environment was loaded under.
+            physics_settings (dict): The settings the collision data depends on.
+            playing (bool): Whether the simulation is running (the physics is then already parsing the new prims).
+
+        Returns:
+            dict: {"cached": bool, "colliders": int, "cook_time": float} for the environment
+        """
+        self.configure()
+        physics_settings = dict(physics_settings, physx=CookingCache._physx_version())
+        key = self.key(usd_path, physics_settings)
+
+        with self._lock:
+            entry = self._load_manifest().get(key)
+        if entry is not None:
+            self._hits += 1
+            _log("info", "Collision data of {} already cooked ({} static colliders)".format(usd_path, entry["colliders"]))
+            return dict(entry, cached=True)
+
+        self._misses += 1
+        colliders = CookingCache.count_static_colliders(stage, root_path)
+        start = time.perf_counter()
+
+        if colliders > 0:
+            from omni.physx import get_physx_cooking_interface, get_physx_interface
+            import omni.kit.app
+
+            # Parsing the stage creates the collision objects, cooking the meshes missing from the local mesh cache
+            if not playing:
+                get_physx_interface().force_load_physics_from_usd()
+
+            cooking = get_physx_cooking_interface()
+            if hasattr(cooking, "get_num_collision_tasks"):
+                while cooking.get_num_collision_tasks() > 0:
+                    await omni.kit.app.get_app().next_update_async()
+            else:
+                cooking.wait_for_cooking_to_finish()
+
+        entry = {
+            "usd_path": usd_path,
+            "colliders": colliders,
+            "cook_time": time.perf_counter() - start,
+            "cooked": time.time(),
+        }
+        with self._lock:
+            self._load_manifest()[key] = entry
+            self._save_manifest()
+
+        _log("info", "Cooked {} static colliders of {} in {:.2f}s".format(colliders, usd_path, entry["cook_time"]))
+        return dict(entry, cached=False)
+
+    def clear(self):
+        """
+        Method that forgets every cooked environment (they are cooked again on their next load)
+        """
+        with self._lock:
+            self._manifest = {}
+            self._save_manifest()
+
+    @staticmethod
+    def count_static_colliders(stage, root_path: str) -> int:
+        """
+        Returns:
+            int: The number of prims under root_path with a collision API that are not part of a rigid body
+        """
+        from pxr import Usd, UsdPhysics
+
+        root = stage.GetPrimAtPath(root_path)
+        if not root:
+            return 0
+
+        count = 0
+        iterator = iter(Usd.PrimRange(root, Usd.TraverseInstanceProxies()))
+        for prim in iterator:
+            # Everything below a rigid body moves with it (dynamic colliders are cooked when the vehicles spawn)
+            if prim.HasAPI(UsdPhysics.RigidBodyAPI) or prim.HasAPI(UsdPhysics.ArticulationRootAPI):
+                iterator.PruneChildren()
+                continue
+            if prim.HasAPI(UsdPhysics.CollisionAPI):
+                count += 1
+
+        return count
+
+    """
+    ---------------------------------------------------------------------
+    Auxiliary methods
+    ---------------------------------------------------------------------
+    """
+
+    def _load_manifest(self) -> Dict[str, Dict]:
+        if self._manifest is None:
+            try:
+                with open(os.path.join(self._cache_dir, CookingCache.MANIFEST_FILE)) as f:
+                    self._manifest = json.load(f)
+            except (OSError, ValueError):
+                self._manifest = {}
+        return self._manifest
+
+    def _save_manifest(self):
+        try:
+            os.makedirs(self._cache_dir, exist_ok=True)
+            manifest_path = os.path.join(self._cache_dir, CookingCache.MANIFEST_FILE)
+            tmp_path = manifest_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self._manifest, f)
+            os.replace(tmp_path, manifest_path)
+        except OSError as e:
+            _log("warn", "Could not save the cooking manifest: " + str(e))
+
+    @staticmethod
+    def _hash_source(usd_path: str) -> str:
+        # Local files are hashed by content, remote ones by path (their content is hashed once mirrored in the asset cache)
+        if "://" in usd_path or not os.path.isfile(usd_path):
+            return hashlib.sha256(usd_path.encode("utf-8")).hexdigest()
+
+        digest = hashlib.sha256()
+        with open(usd_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def _physx_version() -> str:
+        # Cooked data is only valid for the PhysX version that produced it
+        try:
+            import omni.kit.app
+
+            return omni.kit.app.get_app().get_extension_manager().get_enabled_extension_id("omni.physx") or ""
+        except Exception:
+            return ""
@@ -0,0 +1,286 @@
+"""
+| File: environment_pool.py
+| Author: Akhilesh Bhat
+| Description: Definition of the EnvironmentPool class that keeps the layers of the most used environments resident in
+                 memory (bounded LRU), pre-warming them in the background, such that switching scenes does not re-open them
+"""
+
+__all__ = ["EnvironmentPool", "open_layer_tree"]
+
+import os
+import json
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from pxr import Sdf
+
+logger = logging.getLogger(__name__)
+
+
+def _log(level: str, message: str):
+    """
+    Logs through carb like the rest of the extension, or through logging when the pool is used outside of Kit
+    """
+    # Imported here, as the pool is also used without a running Kit app (e.g. by the headless runner), where carb is
+    # not available
+    try:
+        import carb
+    except ImportError:
+        logger.log(logging.WARNING if level == "warn" else logging.INFO, message)
+        return
+
+    if level == "warn":
+        carb.log_warn(message)
+    else:
+        carb.log_info(message)
+
+
+def open_layer_tree(usd_path: str, max_layers: int = 2048) -> List[Sdf.Layer]:
+    """
+    Opens a layer and every layer it depends on (sublayers, references and payloads). Safe to run in a worker thread:
+    the layers stay in the layer registry as long as they are referenced, so composing them later on the main thread
+    does not need to read (or download) anything.
+    """
+    layers = []
+    visited = set()
+    queue = [usd_path]
+
+    while queue and len(layers) < max_layers:
+        path = queue.pop()
+        if path in visited:
+            continue
+        visited.add(path)
+
+        layer = Sdf.Layer.FindOrOpen(path)
+        if layer is None:
+            continue
+        layers.append(layer)
+
+        for dependency in layer.GetCompositionAssetDependencies():
+            queue.append(layer.ComputeAbsolutePath(dependency))
+
+    return layers
+
+
+class EnvironmentPool:
+    """
+    Bounded LRU of "warm" environments: for each one, the local path it is loaded from (after going through the asset
+    cache) and its opened layers, which are held such that they stay in the layer registry. Loading a warm environment
+    only authors a reference/payload to layers that are already in memory.
+
+    The pool also counts how often every environment is loaded (persisted across runs), so the most used ones can be
+    pre-warmed in the background at startup, and keeps hit/miss statistics.
+    """
+
+    # Name of the json file that stores the number of times each environment was loaded
+    USAGE_FILE = "environment_usage.json"
+
+    def __init__(self, asset_cache=None, capacity: int = 4, cache_dir: Optional[str] = None):
+        """
+        Args:
+            asset_cache (AssetCache): The local mirror of the USD assets (None to open the assets directly).
+            capacity (int): Maximum number of environments kept warm (0 to disable the pool). Defaults to 4.
+            cache_dir (str): The directory where the usage counts are persisted (None to keep them in memory only).
+        """
+        self._asset_cache = asset_cache
+        self._capacity = max(0, capacity)
+        self._cache_dir = cache_dir
+
+        # Source url -> (local path, opened layers), in least to most recently used order
+        self._warm: "OrderedDict[str, tuple]" = OrderedDict()
+
+        # Source url -> number of times the environment was loaded
+        self._usage: Optional[Dict[str, int]] = None
+
+        self._hits = 0
+        self._misses = 0
+
+        self._thread: Optional[threading.Thread] = None
+        self._cancelled = threading.Event()
+
+        # Lock for safe multi-threading
+        self._lock = threading.RLock()
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    @property
+    def warm_environments(self) -> List[str]:
+        """
+        Returns:
+            list: The urls of the warm environments, from least to most recently used
+        """
+        with self._lock:
+            return list(self._warm.keys())
+
+    @property
+    def stats(self) -> Dict:
+        """
+        Returns:
+            dict: The number of hits, misses and warm environments, and the hit rate of the pool
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups > 0 else 0.0,
+                "warm": len(self._warm),
+                "capacity": self._capacity,
+            }
+
+    def acquire(self, url: str) -> Optional[str]:
+        """
+        Method called when an environment is about to be loaded. Counts the use of the environment and the pool hit/miss.
+
+        Args:
+            url (str): The url of the environment.
+
+        Returns:
+            str: The local path to load the environment from if it is warm, None otherwise
+        """
+        with self._lock:
+            usage = self._load_usage()
+            usage[url] = usage.get(url, 0) + 1
+            self._save_usage()
+
+            entry = self._warm.get(url)
+            if entry is None:
+                self._misses += 1
+                _log("info", "Environment pool miss for {} ({} hits, {} misses)".format(url, self._hits, self._misses))
+                return None
+
+            self._warm.move_to_end(url)
+            self._hits += 1
+            _log("info", "Environment pool hit for {} ({} hits, {} misses)".format(url, self._hits, self._misses))
+            return entry[0]
+
+    def add(self, url: str, local_path: str, layers: Sequence[Sdf.Layer]):
+        """
+        Method that keeps the layers of an environment that was just opened (evicting the least recently used one if
+        the pool is full).
+
+        Args:
+            url (str): The url of the environment.
+            local_path (str): The path the environment is loaded from.
+            layers (list): The opened layers of the environment.
+        """
+        if self._capacity == 0:
+            return
+
+        with self._lock:
+            self._warm[url] = (local_path, list(layers))
+            self._warm.move_to_end(url)
+
+            while len(self._warm) > self._capacity:
+                evicted, _ = self._warm.popitem(last=False)
+                _log("info", "Evicted {} from the environment pool".format(evicted))
+
+    def warm(self, url: str) -> str:
+        """
+        Method that opens an environment (and every layer it depends on) into the pool. Safe to call from a worker thread.
+
+        Args:
+            url (str): The url of the environment.
+
+        Returns:
+            str: The local path the environment is loaded from
+        """
+        with self._lock:
+            entry = self._warm.get(url)
+            if entry is not None:
+                return entry[0]
+
+        local_path = url
+        if self._asset_cache is not None:
+            try:
+                local_path = self._asset_cache.localize(url)
+            except Exception as e:
+                _log("warn", "Could not mirror {} into the asset cache, opening it directly: {}".format(url, e))
+
+        self.add(url, local_path, open_layer_tree(local_path))
+        return local_path
+
+    def most_used(self, candidates: Sequence[str], count: int) -> List[str]:
+        """
+        Args:
+            candidates (list): The urls of the environments to choose from.
+            count (int): The number of environments to return.
+
+        Returns:
+            list: The count most loaded environments among the candidates (ties keep the order of the candidates)
+        """
+        with self._lock:
+            usage = self._load_usage()
+            ranked = sorted(candidates, key=lambda url: -usage.get(url, 0))
+        return ranked[:count]
+
+    def prewarm(self, candidates: Iterable[str], count: Optional[int] = None):
+        """
+        Method that warms the most used environments in a background thread.
+
+        Args:
+            candidates (Iterable): The urls of the environments that may be warmed (e.g. the values of
+                SIMULATION_ENVIRONMENTS). Only iterated in the background thread, so resolving them does not block.
+            count (int): The number of environments to warm. Defaults to the capacity of the pool.
+        """
+        count = self._capacity if count is None else min(count, self._capacity)
+        if count == 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+
+        self._cancelled.clear()
+        self._thread = threading.Thread(
+            target=self._prewarm, args=(candidates, count), name="environment-prewarm", daemon=True
+        )
+        self._thread.start()
+
+    def cancel(self):
+        """
+        Method that stops pre-warming after the environment currently being opened
+        """
+        self._cancelled.set()
+
+    def clear(self):
+        """
+        Method that releases every warm environment
+        """
+        self.cancel()
+        with self._lock:
+            self._warm.clear()
+
+    def _prewarm(self, candidates: Iterable[str], count: int):
+        for url in self.most_used(list(candidates), count):
+            if self._cancelled.is_set():
+                return
+            try:
+                self.warm(url)
+                _log("info", "Pre-warmed the environment " + url)
+            except Exception as e:
+                _log("warn", "Could not pre-warm the environment {}: {}".format(url, e))
+
+    def _load_usage(self) -> Dict[str, int]:
+        if self._usage is None:
+            self._usage = {}
+            if self._cache_dir is not None:
+                try:
+                    with open(os.path.join(self._cache_dir, EnvironmentPool.USAGE_FILE), "r") as f:
+                        self._usage = json.load(f)
+                except (OSError, ValueError):
+                    pass
+        return self._usage
+
+    def _save_usage(self):
+        if self._cache_dir is None:
+            return
+        try:
+            os.makedirs(self._cache_dir, exist_ok=True)
+            usage_path = os.path.join(self._cache_dir, EnvironmentPool.USAGE_FILE)
+            tmp_path = usage_path + "." + str(os.getpid()) + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self._usage, f)
+            os.replace(tmp_path, usage_path)
+        except OSError as e:
+            _log("warn", "Could not save the environment usage counts: " + str(e))
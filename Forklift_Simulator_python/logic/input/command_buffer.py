@@ -0,0 +1,272 @@
+"""
+| File: command_buffer.py
+| Author: Akhilesh Bhat
+| Description: Definition of the InputSource (a single-producer command buffer guarded by a sequence counter instead of a
+                 lock) and of the InputPipeline that merges every source into the fleet commands on each physics step
+"""
+
+__all__ = ["InputSource", "InputPipeline"]
+
+import time
+import logging
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from Forklift_Simulator_python.logic.vehicles.fleet_state import FleetState
+
+logger = logging.getLogger(__name__)
+
+
+class InputSource:
+    """
+    Latest [speed, steering, fork] commands written by one producer (keyboard, joystick, network, scripted replay, ...)
+    for any number of vehicles. The producer writes in place and bumps a sequence counter before and after every write
+    (seqlock): the physics step copies the buffer and only keeps the copy if the counter was even and did not change in
+    the meantime. Neither side ever waits: a write that overlaps a read is simply picked up on the next step.
+
+    Only one thread may write to a given source. Commands are indexed by slot and tagged with the fleet version they
+    refer to, so commands written for a previous composition of the fleet are ignored.
+    """
+
+    # Columns of the command buffer
+    SPEED, STEERING, FORK = 0, 1, 2
+
+    def __init__(self, name: str, state: FleetState, priority: int = 0, timeout: Optional[float] = None, capacity: int = 64):
+        """
+        Args:
+            name (str): The name of the source (used in the latency statistics).
+            state (FleetState): The fleet the commands refer to.
+            priority (int): Sources with a higher priority override the commands of the others. Defaults to 0.
+            timeout (float): Time (in seconds) after the last write after which the speed and fork commands of the source
+                are zeroed (dead man's switch). None to hold the last commands forever. Defaults to None.
+            capacity (int): The number of vehicles to allocate space for upfront. Defaults to 64.
+        """
+        self.name = name
+        self.priority = priority
+        self.timeout = timeout
+        self._state = state
+
+        # Producer side
+        self._seq = 0
+        self._commands = np.zeros((capacity, 3))
+        self._mask = np.zeros(capacity, dtype=bool)
+        self._version = None
+        self._stamp = 0.0
+
+        # Consumer side: last consistent copy of the buffer
+        self._read_seq = 0
+        self._read_commands = np.zeros((capacity, 3))
+        self._read_mask = np.zeros(capacity, dtype=bool)
+        self._read_version = None
+        self._read_stamp = 0.0
+        self._stopped = False
+
+        # Latency between the time of the input and the physics step that applied it
+        self._latency_count = 0
+        self._latency_sum = 0.0
+        self._latency_max = 0.0
+        self._latency_last = 0.0
+        self._torn_reads = 0
+
+    def write(self, slots, speed=None, steering=None, fork=None, timestamp: Optional[float] = None):
+        """
+        Method that writes the latest commands of some vehicles (called from the producer thread only).
+
+        Args:
+            slots: The slots of the vehicles (int, array or slice).
+            speed: The forward speed commands (in m/s). None keeps the value previously written by this source.
+            steering: The steering angle commands (in radians). None keeps the value previously written by this source.
+            fork: The fork lift velocity commands (in m/s). None keeps the value previously written by this source.
+            timestamp (float): The time.perf_counter() value at which the input happened. Defaults to now.
+        """
+        count = self._state.count
+        version = self._state.version
+
+        self._seq += 1
+
+        if count > len(self._commands):
+            self._grow(max(count, 2 * len(self._commands)))
+
+        # Commands written for another composition of the fleet are dropped
+        if version != self._version:
+            self._mask[:] = False
+            self._version = version
+
+        if speed is not None:
+            self._commands[slots, InputSource.SPEED] = speed
+        if steering is not None:
+            self._commands[slots, InputSource.STEERING] = steering
+        if fork is not None:
+            self._commands[slots, InputSource.FORK] = fork
+        self._mask[slots] = True
+        self._stamp = time.perf_counter() if timestamp is None else timestamp
+
+        self._seq += 1
+
+    def release(self, slots=None):
+        """
+        Method that stops commanding some vehicles (all of them if slots is None), leaving them to the other sources.
+        """
+        self._seq += 1
+        self._mask[slice(None) if slots is None else slots] = False
+        self._stamp = time.perf_counter()
+        self._seq += 1
+
+    def latency_stats(self) -> Dict:
+        """
+        Returns:
+            dict: The number of inputs applied and the mean, max and last latency (in seconds) between the time of the
+                input and the physics step that applied it
+        """
+        return {
+            "count": self._latency_count,
+            "mean": self._latency_sum / self._latency_count if self._latency_count > 0 else 0.0,
+            "max": self._latency_max,
+            "last": self._latency_last,
+            "torn_reads": self._torn_reads,
+        }
+
+    def _grow(self, capacity: int):
+        # Only the producer reallocates (the consumer holds a reference to the old arrays until its next read)
+        commands = np.zeros((capacity, 3))
+        mask = np.zeros(capacity, dtype=bool)
+        commands[: len(self._commands)] = self._commands
+        mask[: len(self._mask)] = self._mask
+        self._commands, self._mask = commands, mask
+
+    def _read(self, count: int, now: float):
+        seq = self._seq
+        if seq == self._read_seq or seq & 1:
+            return
+
+        commands, mask = self._commands, self._mask
+        if len(self._read_commands) < len(commands):
+            self._read_commands = np.zeros_like(commands)
+            self._read_mask = np.zeros_like(mask)
+
+        n = min(count, len(commands))
+        np.copyto(self._read_commands[:n], commands[:n])
+        np.copyto(self._read_mask[:n], mask[:n])
+        self._read_mask[n:count] = False
+        version, stamp = self._version, self._stamp
+
+        # The producer wrote while we were copying: skip the source on this step (the fleet keeps its current commands)
+        if self._seq != seq:
+            self._torn_reads += 1
+            self._read_mask[:count] = False
+            self._read_version = None
+            return
+
+        self._read_seq = seq
+        self._read_version = version
+        self._read_stamp = stamp
+        self._stopped = False
+
+        latency = now - stamp
+        self._latency_count += 1
+        self._latency_sum += latency
+        self._latency_max = max(self._latency_max, latency)
+        self._latency_last = latency
+
+    def _apply(self, state: FleetState, now: float):
+        count = state.count
+        self._read(count, now)
+
+        if self._read_version != state.version:
+            return
+
+        mask = self._read_mask[:count]
+        commands = self._read_commands
+
+        # Dead man's switch: stop the vehicles of a source that went silent (once, then leave them to the other sources)
+        if self.timeout is not None and now - self._read_stamp > self.timeout:
+            if not self._stopped:
+                np.copyto(state.speed_commands, 0.0, where=mask)
+                np.copyto(state.fork_commands, 0.0, where=mask)
+                self._stopped = True
+            return
+
+        np.copyto(state.speed_commands, commands[:count, InputSource.SPEED], where=mask)
+        np.copyto(state.steering_commands, commands[:count, InputSource.STEERING], where=mask)
+        np.copyto(state.fork_commands, commands[:count, InputSource.FORK], where=mask)
+
+
+class InputPipeline:
+    """
+    Merges the commands of every InputSource into the FleetState. Meant to be registered as a pre-step callback of the
+    FleetStepper: each physics step reads every source in O(fleet size), without locks and without allocating, whatever
+    the rate (or jitter) of the producers.
+    """
+
+    def __init__(self, state: FleetState, vehicle_manager=None):
+        """
+        Args:
+            state (FleetState): The fleet whose commands are written.
+            vehicle_manager (VehicleManager): The registry of the vehicles (used to find the slot of a vehicle id).
+        """
+        self._state = state
+        self._vehicle_manager = vehicle_manager
+
+        # Sources sorted by increasing priority (the last one applied wins)
+        self._sources: List[InputSource] = []
+
+    @property
+    def state(self) -> FleetState:
+        return self._state
+
+    @property
+    def sources(self) -> List[InputSource]:
+        return self._sources
+
+    def add_source(self, name: str, priority: int = 0, timeout: Optional[float] = None) -> InputSource:
+        """
+        Method that creates a new command source.
+
+        Args:
+            name (str): The name of the source.
+            priority (int): Sources with a higher priority override the others. Defaults to 0.
+            timeout (float): Dead man's switch timeout (in seconds), None to hold the commands. Defaults to None.
+
+        Returns:
+            InputSource: The source, to be written by a single producer
+        """
+        source = InputSource(name, self._state, priority, timeout, capacity=max(64, self._state.count))
+
+        # Replace the list instead of mutating it, such that a step in progress keeps iterating over the old one
+        self._sources = sorted(self._sources + [source], key=lambda s: s.priority)
+        return source
+
+    def remove_source(self, source: InputSource):
+        """
+        Method that removes a source (the vehicles keep the last commands it applied).
+        """
+        self._sources = [s for s in self._sources if s is not source]
+
+    def slot_of(self, vehicle_id: int) -> Optional[int]:
+        """
+        Args:
+            vehicle_id (int): The id of the vehicle.
+
+        Returns:
+            int: The current slot of the vehicle (None if there is no such vehicle)
+        """
+        try:
+            return self._vehicle_manager.get_record_by_id(vehicle_id).slot
+        except (AttributeError, KeyError):
+            return None
+
+    def apply(self, state: FleetState, dt: float):
+        """
+        Method that writes the latest commands of every source into the fleet state (FleetStepper pre-step callback).
+        """
+        now = time.perf_counter()
+        for source in self._sources:
+            source._apply(state, now)
+
+    def latency_stats(self) -> Dict[str, Dict]:
+        """
+        Returns:
+            dict: A dictionary of source name -> latency statistics (see InputSource.latency_stats)
+        """
+        return {source.name: source.latency_stats() for source in self._sources}
@@ -0,0 +1,236 @@
+"""
+| File: input_devices.py
+| Author: Akhilesh Bhat
+| Description: Definition of the producers of the InputPipeline: KeyboardInput (carb input events), GamepadInput (polled
+                 on every app update) and ScriptedInput (replays a list of timed commands from a thread)
+"""
+
+__all__ = ["KeyboardInput", "GamepadInput", "ScriptedInput"]
+
+import time
+import threading
+from typing import List, Sequence
+
+# Omniverse general API
+import carb
+import carb.input
+import omni.kit.app
+import omni.appwindow
+
+from Forklift_Simulator_python.logic.input.command_buffer import InputPipeline
+
+
+class _DeviceInput:
+    """
+    Base class of the inputs that drive a single vehicle (selected by its id) with a maximum speed, steering angle and
+    fork velocity
+    """
+
+    def __init__(
+        self,
+        pipeline: InputPipeline,
+        name: str,
+        vehicle_id: int,
+        max_speed: float,
+        max_steering: float,
+        fork_speed: float,
+        timeout=None,
+    ):
+        self._pipeline = pipeline
+        self._source = pipeline.add_source(name, priority=1, timeout=timeout)
+        self.vehicle_id = vehicle_id
+        self.max_speed = max_speed
+        self.max_steering = max_steering
+        self.fork_speed = fork_speed
+
+    @property
+    def source(self):
+        return self._source
+
+    def _write(self, speed: float, steering: float, fork: float):
+        slot = self._pipeline.slot_of(self.vehicle_id)
+        if slot is not None:
+            self._source.write(slot, speed, steering, fork)
+
+    def destroy(self):
+        """
+        Method that stops listening to the device and removes its source from the pipeline
+        """
+        self._pipeline.remove_source(self._source)
+
+
+class KeyboardInput(_DeviceInput):
+    """
+    Drives a vehicle with the keyboard: W/S (or the up/down arrows) for the speed, A/D (or the left/right arrows) for the
+    steering and R/F for the forks. Commands are written on every key event (on the main thread), not on every step.
+    """
+
+    _KEYS = {
+        "forward": (carb.input.KeyboardInput.W, carb.input.KeyboardInput.UP),
+        "backward": (carb.input.KeyboardInput.S, carb.input.KeyboardInput.DOWN),
+        "left": (carb.input.KeyboardInput.A, carb.input.KeyboardInput.LEFT),
+        "right": (carb.input.KeyboardInput.D, carb.input.KeyboardInput.RIGHT),
+        "lift": (carb.input.KeyboardInput.R,),
+        "lower": (carb.input.KeyboardInput.F,),
+    }
+
+    def __init__(
+        self,
+        pipeline: InputPipeline,
+        vehicle_id: int = 0,
+        max_speed: float = 1.5,
+        max_steering: float = 0.8,
+        fork_speed: float = 0.2,
+    ):
+        """
+        Args:
+            pipeline (InputPipeline): The pipeline the commands are written to.
+            vehicle_id (int): The id of the vehicle to drive. Defaults to 0.
+            max_speed (float): The speed (in m/s) while a speed key is pressed. Defaults to 1.5.
+            max_steering (float): The steering angle (in radians) while a steering key is pressed. Defaults to 0.8.
+            fork_speed (float): The fork velocity (in m/s) while a fork key is pressed. Defaults to 0.2.
+        """
+        super().__init__(pipeline, "keyboard", vehicle_id, max_speed, max_steering, fork_speed)
+
+        self._pressed = set()
+        self._input = carb.input.acquire_input_interface()
+        self._keyboard = omni.appwindow.get_default_app_window().get_keyboard()
+        self._subscription = self._input.subscribe_to_keyboard_events(self._keyboard, self._on_keyboard_event)
+
+    def _on_keyboard_event(self, event, *args, **kwargs) -> bool:
+        if event.type == carb.input.KeyboardEventType.KEY_PRESS:
+            self._pressed.add(event.input)
+        elif event.type == carb.input.KeyboardEventType.KEY_RELEASE:
+            self._pressed.discard(event.input)
+        else:
+            return True
+
+        def axis(positive: str, negative: str) -> float:
+            return float(any(k in self._pressed for k in KeyboardInput._KEYS[positive])) - float(
+                any(k in self._pressed for k in KeyboardInput._KEYS[negative])
+            )
+
+        self._write(
+            self.max_speed * axis("forward", "backward"),
+            self.max_steering * axis("left", "right"),
+            self.fork_speed * axis("lift", "lower"),
+        )
+        return True
+
+    def destroy(self):
+        if self._subscription is not None:
+            self._input.unsubscribe_to_keyboard_events(self._keyboard, self._subscription)
+            self._subscription = None
+        super().destroy()
+
+
+class GamepadInput(_DeviceInput):
+    """
+    Drives a vehicle with a gamepad: left stick for the speed, right stick for the steering and the triggers for the
+    forks. The gamepad is polled on every app update (its events only fire when a value changes, so a stick held still
+    would look silent), and the pipeline zeroes the commands if the updates stop.
+    """
+
+    # Axes below this value are considered zero
+    DEAD_ZONE = 0.1
+
+    def __init__(
+        self,
+        pipeline: InputPipeline,
+        vehicle_id: int = 0,
+        max_speed: float = 2.0,
+        max_steering: float = 0.8,
+        fork_speed: float = 0.2,
+        gamepad_index: int = 0,
+    ):
+        """
+        Args:
+            pipeline (InputPipeline): The pipeline the commands are written to.
+            vehicle_id (int): The id of the vehicle to drive. Defaults to 0.
+            max_speed (float): The speed (in m/s) with the stick fully deflected. Defaults to 2.0.
+            max_steering (float): The steering angle (in radians) with the stick fully deflected. Defaults to 0.8.
+            fork_speed (float): The fork velocity (in m/s) with a trigger fully pressed. Defaults to 0.2.
+            gamepad_index (int): The index of the gamepad in the app window. Defaults to 0.
+        """
+        super().__init__(pipeline, "gamepad", vehicle_id, max_speed, max_steering, fork_speed, timeout=0.5)
+
+        self._input = carb.input.acquire_input_interface()
+        self._gamepad = omni.appwindow.get_default_app_window().get_gamepad(gamepad_index)
+        self._update_sub = None
+
+        if self._gamepad is None:
+            carb.log_warn("No gamepad found, the gamepad input is disabled")
+        else:
+            self._update_sub = (
+                omni.kit.app.get_app()
+                .get_update_event_stream()
+                .create_subscription_to_pop(self._on_update, name="forklift_simulator_gamepad_poll")
+            )
+
+    def _on_update(self, event):
+
+        def axis(positive, negative) -> float:
+            values = [self._input.get_gamepad_value(self._gamepad, key) for key in (positive, negative)]
+            positive_value, negative_value = [value if abs(value) > GamepadInput.DEAD_ZONE else 0.0 for value in values]
+            return positive_value - negative_value
+
+        pad = carb.input.GamepadInput
+        self._write(
+            self.max_speed * axis(pad.LEFT_STICK_UP, pad.LEFT_STICK_DOWN),
+            self.max_steering * axis(pad.RIGHT_STICK_LEFT, pad.RIGHT_STICK_RIGHT),
+            self.fork_speed * axis(pad.RIGHT_TRIGGER, pad.LEFT_TRIGGER),
+        )
+
+    def destroy(self):
+        self._update_sub = None
+        super().destroy()
+
+
+class ScriptedInput:
+    """
+    Replays a list of timed commands from a background thread (in real time), e.g. to reproduce a recorded drive
+    """
+
+    def __init__(self, pipeline: InputPipeline, commands: Sequence[Sequence[float]], name: str = "scripted"):
+        """
+        Args:
+            pipeline (InputPipeline): The pipeline the commands are written to.
+            commands (list): A list of (time, vehicle_id, speed, steering, fork) tuples, sorted by time (in seconds from
+                the start of the replay).
+            name (str): The name of the source. Defaults to "scripted".
+        """
+        self._pipeline = pipeline
+        self._source = pipeline.add_source(name)
+        self._commands: List = list(commands)
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def source(self):
+        return self._source
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._replay, name="scripted-input", daemon=True)
+        self._thread.start()
+
+    def destroy(self):
+        """
+        Method that stops the replay and removes its source from the pipeline
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._pipeline.remove_source(self._source)
+
+    def _replay(self):
+        start = time.perf_counter()
+        for t, vehicle_id, speed, steering, fork in self._commands:
+            # Sleep until the command is due (waking up early if the replay is stopped)
+            if self._stop.wait(max(0.0, start + t - time.perf_counter())):
+                return
+
+            slot = self._pipeline.slot_of(int(vehicle_id))
+            if slot is not None:
+                self._source.write(slot, speed, steering, fork, timestamp=start + t)
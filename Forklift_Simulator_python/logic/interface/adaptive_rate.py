@@ -0,0 +1,146 @@
+"""
+| File: adaptive_rate.py
+| Author: Akhilesh Bhat
+| Description: Definition of the AdaptiveRateController that adjusts the rendering period (and optionally the physics
+                 step) within bounds to hold a target real time factor
+"""
+
+__all__ = ["AdaptiveRateController"]
+
+import time
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveRateController:
+    """
+    Holds a target real time factor by trading rendering for physics. Every physics step simulates physics_dt seconds and
+    every frame rendering_dt seconds (rendering_dt / physics_dt physics substeps per frame), so when the physics cost grows
+    (e.g. with a large fleet) rendering less often gives more wall time to the physics. The controller:
+
+    1. raises rendering_dt (more substeps per frame) while the real time factor is below the target, up to its maximum
+    2. then, if a physics_dt range is given, raises physics_dt (fewer substeps per simulated second), up to its maximum
+    3. undoes these adjustments in the reverse order while the real time factor is above the target
+
+    Above its minimum, the rendering period is a multiple of the physics step. The controller waits for a new real time
+    factor measurement after every adjustment, and every adjustment is logged and kept in a history.
+    """
+
+    def __init__(
+        self,
+        step_timing,
+        apply_fn: Callable,
+        target: float = 1.0,
+        rendering_dt_range: Tuple[float, float] = (1.0 / 60.0, 1.0 / 10.0),
+        physics_dt_range: Optional[Tuple[float, float]] = None,
+        tolerance: float = 0.1,
+        factor: float = 1.25,
+    ):
+        """
+        Args:
+            step_timing (StepTiming): The timing of the simulation loop (provides the real time factor and the rates).
+            apply_fn (Callable): Function called with (physics_dt=..., rendering_dt=...) that applies new rates.
+            target (float): The real time factor to hold. Defaults to 1.0.
+            rendering_dt_range (tuple): The minimum and maximum rendering period (in seconds). Defaults to 1/60 - 1/10.
+            physics_dt_range (tuple): The minimum and maximum physics step (in seconds), None to never change the physics
+                step. Defaults to None.
+            tolerance (float): Relative deviation from the target tolerated before adjusting. Defaults to 0.1.
+            factor (float): Multiplicative change of a rate per adjustment. Defaults to 1.25.
+        """
+        self._step_timing = step_timing
+        self._apply_fn = apply_fn
+        self.target = target
+        self.rendering_dt_range = rendering_dt_range
+        self.physics_dt_range = physics_dt_range
+        self.tolerance = tolerance
+        self.factor = factor
+
+        self.enabled = True
+        self._last_measurement = step_timing.histograms()["real_time_factor"].count
+        self._history: List[Dict] = []
+
+    @property
+    def history(self) -> List[Dict]:
+        """
+        Returns:
+            list: Every adjustment made ({"time", "real_time_factor", "physics_dt", "rendering_dt"} before/after)
+        """
+        return self._history
+
+    def update(self):
+        """
+        Method that adjusts the rates if a new real time factor was measured since the last adjustment (to be called
+        once per frame, it is a no-op most of the time)
+        """
+        if not self.enabled:
+            return
+
+        measurements = self._step_timing.histograms()["real_time_factor"].count
+        if measurements == self._last_measurement:
+            return
+        self._last_measurement = measurements
+
+        rtf = self._step_timing.real_time_factor
+        physics_dt = self._step_timing.physics_dt
+        rendering_dt = self._step_timing.rendering_dt
+
+        if rtf < self.target * (1.0 - self.tolerance):
+            new_physics_dt, new_rendering_dt = self._slower_rates(physics_dt, rendering_dt)
+        elif rtf > self.target * (1.0 + self.tolerance):
+            new_physics_dt, new_rendering_dt = self._faster_rates(physics_dt, rendering_dt)
+        else:
+            return
+
+        new_rendering_dt = self._snap(new_physics_dt, new_rendering_dt)
+        if abs(new_physics_dt - physics_dt) < 1e-9 and abs(new_rendering_dt - rendering_dt) < 1e-9:
+            return
+
+        self._history.append(
+            {
+                "time": time.time(),
+                "real_time_factor": rtf,
+                "physics_dt": [physics_dt, new_physics_dt],
+                "rendering_dt": [rendering_dt, new_rendering_dt],
+            }
+        )
+        logger.info(
+            "Real time factor %.2f (target %.2f): physics_dt %.5f -> %.5f s, rendering_dt %.5f -> %.5f s",
+            rtf,
+            self.target,
+            physics_dt,
+            new_physics_dt,
+            rendering_dt,
+            new_rendering_dt,
+        )
+        self._apply_fn(physics_dt=new_physics_dt, rendering_dt=new_rendering_dt)
+
+    def _slower_rates(self, physics_dt: float, rendering_dt: float):
+        # Behind real time: render less often first, then simulate with larger physics steps
+        max_rendering_dt = self.rendering_dt_range[1]
+        if rendering_dt < max_rendering_dt - 1e-9:
+            return physics_dt, min(rendering_dt * self.factor, max_rendering_dt)
+
+        if self.physics_dt_range is not None and physics_dt < self.physics_dt_range[1] - 1e-9:
+            return min(physics_dt * self.factor, self.physics_dt_range[1]), rendering_dt
+
+        return physics_dt, rendering_dt
+
+    def _faster_rates(self, physics_dt: float, rendering_dt: float):
+        # Ahead of real time: restore the physics accuracy first, then the rendering rate
+        if self.physics_dt_range is not None and physics_dt > self.physics_dt_range[0] + 1e-9:
+            return max(physics_dt / self.factor, self.physics_dt_range[0]), rendering_dt
+
+        min_rendering_dt = self.rendering_dt_range[0]
+        if rendering_dt > min_rendering_dt + 1e-9:
+            return physics_dt, max(rendering_dt / self.factor, min_rendering_dt)
+
+        return physics_dt, rendering_dt
+
+    def _snap(self, physics_dt: float, rendering_dt: float) -> float:
+        # Whole number of physics steps per frame above the nominal (minimum) rendering period, within the bounds
+        low, high = self.rendering_dt_range
+        if rendering_dt <= low + 1e-9:
+            return low
+        return min(max(max(1, round(rendering_dt / physics_dt)) * physics_dt, low), high)
@@ -0,0 +1,166 @@
+"""
+| File: environment_loader.py
+| Author: Akhilesh Bhat
+| Description: Definition of the EnvironmentLoader class that loads an environment incrementally (fetching and reading
+                 its layers in the background and loading its payloads a few per frame), with progress and cancellation
+"""
+
+__all__ = ["EnvironmentLoader"]
+
+import time
+import asyncio
+from typing import Callable, List, Optional
+
+# Omniverse/USD API
+import carb
+import omni.kit.app
+from pxr import Sdf, Usd
+
+from Forklift_Simulator_python.logic.assets.environment_pool import open_layer_tree
+
+
+class EnvironmentLoader:
+    """
+    Loads environments without freezing the Kit main loop. The asset is mirrored into the local cache and its layers are
+    read in a worker thread, then the environment is authored as a payload and loaded on the main thread, together with
+    any nested payloads, a few at a time (yielding a frame in between). Starting a new load cancels the previous one.
+    Environments that are warm in the EnvironmentPool skip the fetching and reading phases altogether.
+    """
+
+    # Number of payloads loaded per frame
+    PAYLOADS_PER_FRAME = 8
+
+    def __init__(self, asset_cache=None, environment_pool=None):
+        """
+        Args:
+            asset_cache (AssetCache): The local mirror of the USD assets (None to load the assets directly).
+            environment_pool (EnvironmentPool): The pool of warm environments (None to always open them from scratch).
+        """
+        self._asset_cache = asset_cache
+        self._environment_pool = environment_pool
+        self._task: Optional[asyncio.Task] = None
+
+        # Layers kept alive while the environment is being composed
+        self._held_layers: List[Sdf.Layer] = []
+
+    @property
+    def is_loading(self) -> bool:
+        """
+        Returns:
+            bool: True if an environment is currently being loaded
+        """
+        return self._task is not None and not self._task.done()
+
+    def cancel(self):
+        """
+        Method that cancels the environment currently being loaded (if any). The partially loaded environment is removed.
+        """
+        if self.is_loading:
+            self._task.cancel()
+
+    async def load_async(self, stage: Usd.Stage, usd_path: str, stage_prefix: str, on_progress: Callable = None):
+        """
+        Method that loads an environment incrementally.
+
+        Args:
+            stage (Usd.Stage): The stage where the environment is loaded.
+            usd_path (str): The path where the USD file describing the environment is located.
+            stage_prefix (str): The path of the environment in the stage.
+            on_progress (Callable): Function called with (phase, fraction, elapsed_time) as the load progresses.
+        """
+
+        # Loading a new environment cancels the previous one
+        current_task = asyncio.current_task()
+        if self.is_loading and self._task is not current_task:
+            self._task.cancel()
+        self._task = current_task
+
+        start = time.monotonic()
+
+        def report(phase: str, fraction: float):
+            if on_progress is not None:
+                on_progress(phase, fraction, time.monotonic() - start)
+
+        if stage.GetPrimAtPath(stage_prefix):
+            raise Exception("A primitive already exists at the specified path")
+
+        loop = asyncio.get_event_loop()
+
+        source_url = usd_path
+        warm_path = self._environment_pool.acquire(source_url) if self._environment_pool is not None else None
+
+        try:
+            if warm_path is not None:
+                # The environment layers are already in memory, only the reference to them has to be authored
+                usd_path = warm_path
+            else:
+                # Fetch the asset (and everything it depends on) into the local cache, in the background
+                report("Fetching", 0.0)
+                if self._asset_cache is not None:
+                    try:
+                        usd_path = await loop.run_in_executor(None, self._asset_cache.localize, usd_path)
+                    except Exception as e:
+                        carb.log_warn(
+                            "Could not mirror " + usd_path + " into the asset cache, loading it directly: " + str(e)
+                        )
+
+                # Read every layer in the background, such that composing them does not block on I/O
+                report("Reading layers", 0.25)
+                self._held_layers = await loop.run_in_executor(None, open_layer_tree, usd_path)
+
+                # Keep the layers warm, such that loading this environment again is instant
+                if self._environment_pool is not None:
+                    self._environment_pool.add(source_url, usd_path, self._held_layers)
+
+            # Author the environment as an (unloaded) payload and load it, then its nested payloads, a few per frame
+            report("Composing", 0.5)
+            rules = stage.GetLoadRules()
+            rules.AddRule(stage_prefix, Usd.StageLoadRules.NoneRule)
+            stage.SetLoadRules(rules)
+
+            prim = stage.DefinePrim(stage_prefix)
+            if not prim.GetPayloads().AddPayload(usd_path):
+                raise Exception("The usd asset" + usd_path + "is not loaded at stage path " + stage_prefix)
+
+            await self._load_payloads_async(stage, stage_prefix, report)
+
+            report("Loaded", 1.0)
+            carb.log_info(
+                "Loaded the environment " + usd_path + " in " + "{:.2f}".format(time.monotonic() - start) + "s"
+            )
+
+        except asyncio.CancelledError:
+            if stage.GetPrimAtPath(stage_prefix):
+                stage.RemovePrim(stage_prefix)
+            report("Cancelled", 0.0)
+            carb.log_info("Loading of the environment " + usd_path + " was cancelled")
+            raise
+
+        finally:
+            self._held_layers = []
+            if self._task is current_task:
+                self._task = None
+
+    async def _load_payloads_async(self, stage: Usd.Stage, stage_prefix: str, report: Callable):
+        app = omni.kit.app.get_app()
+
+        pending = [Sdf.Path(stage_prefix)]
+        loaded = 0
+
+        while pending:
+            batch = pending[: EnvironmentLoader.PAYLOADS_PER_FRAME]
+            pending = pending[EnvironmentLoader.PAYLOADS_PER_FRAME :]
+
+            stage.LoadAndUnload(set(batch), set(), Usd.LoadWithoutDescendants)
+            loaded += len(batch)
+
+            # The payloads that were just loaded may expose other (still unloaded) payloads
+            for path in batch:
+                for prim in Usd.PrimRange(stage.GetPrimAtPath(path), Usd.PrimAllPrimsPredicate):
+                    if prim.GetPath() != path and prim.HasAuthoredPayloads() and not prim.IsLoaded():
+                        pending.append(prim.GetPath())
+
+            report("Loading payloads", 0.5 + 0.5 * loaded / (loaded + len(pending)))
+
+            # Give the main loop a chance to render and process events
+            await app.next_update_async()
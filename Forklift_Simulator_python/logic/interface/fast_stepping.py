@@ -0,0 +1,143 @@
+"""
+| File: fast_stepping.py
+| Author: Akhilesh Bhat
+| Description: Definition of the FastStepper that steps the physics as fast as possible (decoupled from the wall clock),
+                 rendering only every N steps or when a frame is requested (e.g. by a camera sensor)
+"""
+
+__all__ = ["FastStepper"]
+
+import time
+import logging
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class FastStepper:
+    """
+    Steps a world synchronously, as fast as the CPU allows: every step advances the simulation by physics_dt, whatever
+    the wall time it took. A frame is rendered only every render_interval steps, or on the step that follows a call to
+    request_render (whose callback is invoked once that frame is rendered, e.g. to read a camera).
+
+    Note that world.step(render=True) runs a whole app update, which advances the physics by rendering_dt instead of
+    physics_dt: the step function should step the physics alone and render separately (see SimInterface.run_fast),
+    and the simulated time is measured with time_fn when it is given.
+    """
+
+    def __init__(self, step_fn: Callable, physics_dt: float, render_interval: int = 0, time_fn: Optional[Callable] = None):
+        """
+        Args:
+            step_fn (Callable): Function called with (render: bool) that advances the world by one physics step (e.g.
+                world.step(render=False), followed by world.render() if render is True).
+            physics_dt (float): The time (in seconds) advanced by each step.
+            render_interval (int): Render every n steps (0 to only render on request). Defaults to 0.
+            time_fn (Callable): Function that returns the current simulated time (e.g. lambda: world.current_time),
+                used to measure the simulated durations. Defaults to None (each step counts as physics_dt).
+        """
+        self._step_fn = step_fn
+        self._time_fn = time_fn
+        self.physics_dt = physics_dt
+        self.render_interval = render_interval
+
+        self._render_callbacks: List[Optional[Callable]] = []
+        self._stop = False
+        self._running = False
+
+        self._total_steps = 0
+        self._rendered_frames = 0
+
+    @property
+    def is_running(self) -> bool:
+        return self._running
+
+    @property
+    def total_steps(self) -> int:
+        return self._total_steps
+
+    @property
+    def rendered_frames(self) -> int:
+        return self._rendered_frames
+
+    def request_render(self, callback: Optional[Callable] = None):
+        """
+        Method that renders a frame on the next step.
+
+        Args:
+            callback (Callable): Function called (without arguments) once the frame is rendered.
+        """
+        self._render_callbacks.append(callback)
+
+    def stop(self):
+        """
+        Method that stops run after the current step (e.g. from a physics callback)
+        """
+        self._stop = True
+
+    def run(self, steps: Optional[int] = None, duration: Optional[float] = None, until: Optional[Callable] = None) -> Dict:
+        """
+        Method that steps the world until a number of steps, a simulated duration, a condition or a call to stop.
+
+        Args:
+            steps (int): The number of steps.
+            duration (float): The simulated time (in seconds), used if steps is None.
+            until (Callable): Function called (without arguments) after every step, that returns True to stop.
+
+        Returns:
+            dict: The number of steps and rendered frames, the wall-clock and simulated durations, the steps per second
+                and the real time factor
+        """
+        if steps is None and duration is not None and self._time_fn is None:
+            steps = int(round(duration / self.physics_dt))
+        if steps is None and duration is None and until is None:
+            raise ValueError("A number of steps, a duration or a stop condition is required")
+
+        # With a clock, a duration is stepped until the simulated time reached it (minus half a step of rounding)
+        end_time = None
+        if steps is None and duration is not None:
+            end_time = duration - 0.5 * self.physics_dt
+
+        self._stop = False
+        self._running = True
+        count, rendered = 0, 0
+        start = time.perf_counter()
+        start_time = self._time_fn() if self._time_fn is not None else 0.0
+
+        try:
+            while not self._stop and (steps is None or count < steps):
+                if end_time is not None and self._time_fn() - start_time >= end_time:
+                    break
+
+                count += 1
+                callbacks = self._render_callbacks
+                render = bool(callbacks) or (self.render_interval > 0 and count % self.render_interval == 0)
+                if callbacks:
+                    self._render_callbacks = []
+
+                self._step_fn(render)
+                rendered += int(render)
+
+                for callback in callbacks:
+                    if callback is not None:
+                        callback()
+
+                if until is not None and until():
+                    break
+        finally:
+            self._running = False
+            self._total_steps += count
+            self._rendered_frames += rendered
+
+        wall_time = time.perf_counter() - start
+        if self._time_fn is not None:
+            simulated_time = self._time_fn() - start_time
+        else:
+            simulated_time = count * self.physics_dt
+        return {
+            "steps": count,
+            "rendered_frames": rendered,
+            "wall_time": wall_time,
+            "simulated_time": simulated_time,
+            "steps_per_second": count / wall_time if wall_time > 0 else 0.0,
+            "real_time_factor": simulated_time / wall_time if wall_time > 0 else 0.0,
+        }
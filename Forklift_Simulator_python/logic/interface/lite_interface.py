@@ -0,0 +1,634 @@
+"""
+| File: lite_interface.py
+| Author: Akhilesh Bhat
+| Description: Definition of the LiteSimInterface, a surrogate of the SimInterface that simulates the fleet with the
+                 NumPy forklift kinematics over a 2D occupancy map of the environment (no Isaac Sim required), and of the
+                 LiteWorld and KinematicFleetView it is built on
+"""
+
+__all__ = ["LiteWorld", "KinematicFleetView", "LiteSimInterface"]
+
+import os
+import math
+import logging
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from Forklift_Simulator_python.logic.maps.occupancy_map import OccupancyMap
+from Forklift_Simulator_python.logic.maps.environment_map import EnvironmentMap, environment_slug
+from Forklift_Simulator_python.logic.maps.spawn_placer import SpawnPlacer, fleet_poses
+from Forklift_Simulator_python.logic.planning.roadmap import Roadmap, RoadmapCache
+from Forklift_Simulator_python.logic.planning.fleet_planner import FleetPlanner, vehicle_separation
+from Forklift_Simulator_python.logic.planning.fleet_navigator import FleetNavigator
+from Forklift_Simulator_python.logic.vehicles.fleet_state import FleetState, FleetStepper
+from Forklift_Simulator_python.logic.vehicles.forklift_kinematics import ForkliftKinematics
+from Forklift_Simulator_python.logic.vehicles.vehicle_configs import footprint_reach, vehicle_config
+from Forklift_Simulator_python.global_variables import (
+    ENVIRONMENT_MAPS_PATH,
+    LITE_MAPS_PATH,
+    LITE_WORLD_SETTINGS,
+    PLANNER_CRUISE_SPEED,
+    PLANNER_REPLAN_PERIOD,
+    PLANNER_TRACKING_MARGIN,
+    PLANNER_WINDOW,
+    ROADMAP_CLEARANCE,
+    ROADMAP_SPACING,
+    ROADMAPS_PATH,
+    ROBOTS,
+    SPAWN_CLEARANCE,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class LiteWorld:
+    """
+    Stand-in for the omni.isaac.core World used by the LiteSimInterface: it keeps the simulation time and the physics
+    callbacks (called with the step size, in registration order, before the vehicles are advanced on every step), and
+    only advances while playing. Rendering requests are ignored.
+    """
+
+    def __init__(self, physics_dt: float, rendering_dt: float, stage_units_in_meters: float = 1.0, integrate: Callable = None, on_reset: Callable = None):
+        """
+        Args:
+            physics_dt (float): The time (in seconds) advanced by each step.
+            rendering_dt (float): The rendering period (in seconds), only reported.
+            stage_units_in_meters (float): The stage units, only reported. Defaults to 1.0.
+            integrate (Callable): Function called with (dt) that advances the vehicles, after the physics callbacks.
+            on_reset (Callable): Function called (without arguments) when the world is reset.
+        """
+        self._physics_dt = physics_dt
+        self._rendering_dt = rendering_dt
+        self._stage_units_in_meters = stage_units_in_meters
+        self._integrate = integrate
+        self._on_reset = on_reset
+
+        self._physics_callbacks: Dict[str, Callable] = {}
+        self._playing = False
+        self._time = 0.0
+        self._steps = 0
+
+    @property
+    def current_time(self) -> float:
+        return self._time
+
+    @property
+    def current_time_step_index(self) -> int:
+        return self._steps
+
+    def get_physics_dt(self) -> float:
+        return self._physics_dt
+
+    def get_rendering_dt(self) -> float:
+        return self._rendering_dt
+
+    def set_simulation_dt(self, physics_dt: float = None, rendering_dt: float = None):
+        if physics_dt is not None:
+            self._physics_dt = physics_dt
+        if rendering_dt is not None:
+            self._rendering_dt = rendering_dt
+
+    def is_playing(self) -> bool:
+        return self._playing
+
+    def play(self):
+        self._playing = True
+
+    def pause(self):
+        self._playing = False
+
+    def stop(self):
+        self._playing = False
+
+    def reset(self):
+        """
+        Method that moves the vehicles back to their spawn poses, rewinds the time and plays
+        """
+        self._time = 0.0
+        self._steps = 0
+        if self._on_reset is not None:
+            self._on_reset()
+        self._playing = True
+
+    def step(self, render: bool = False):
+        """
+        Method that advances the simulation by a single physics step (if playing).
+
+        Args:
+            render (bool): Ignored (there is nothing to render). Defaults to False.
+        """
+        if not self._playing:
+            return
+
+        dt = self._physics_dt
+        for callback in list(self._physics_callbacks.values()):
+            callback(dt)
+
+        if self._integrate is not None:
+            self._integrate(dt)
+
+        self._time += dt
+        self._steps += 1
+
+    def add_physics_callback(self, callback_name: str, callback_fn: Callable):
+        self._physics_callbacks[callback_name] = callback_fn
+
+    def remove_physics_callback(self, callback_name: str):
+        self._physics_callbacks.pop(callback_name, None)
+
+    def physics_callback_exists(self, callback_name: str) -> bool:
+        return callback_name in self._physics_callbacks
+
+    def clear_all_callbacks(self):
+        self._physics_callbacks = {}
+
+
+class KinematicFleetView:
+    """
+    Batched fleet view (see FleetStepper) over the rows of a ForkliftKinematics model. The rows of the model are the
+    slots of the fleet, so the commands and states are copied without any reordering.
+    """
+
+    def __init__(self, kinematics: ForkliftKinematics, rows: np.ndarray):
+        """
+        Args:
+            kinematics (ForkliftKinematics): The model simulating the fleet.
+            rows (np.ndarray): The rows (fleet slots) of the vehicles of this view.
+        """
+        self._kinematics = kinematics
+        self._rows = rows
+
+    def is_valid(self) -> bool:
+        return True
+
+    def apply_commands(self, state: FleetState, slots):
+        self._kinematics.set_commands(
+            slots,
+            speed=state.speed_commands[slots],
+            steering=state.steering_commands[slots],
+            lift=state.fork_commands[slots],
+        )
+
+    def read_state(self, state: FleetState, slots):
+        self._kinematics.write_fleet(state, slots, rows=slots)
+
+    def capture(self) -> Dict:
+        return {"kinematics": self._kinematics.capture(self._rows)}
+
+    def restore(self, physics_state: Dict):
+        if "kinematics" in physics_state:
+            self._kinematics.restore(physics_state["kinematics"], self._rows)
+            return
+
+        # Teleport: only the poses (and the forward speeds) are given
+        positions = np.asarray(physics_state["positions"])
+        w, x, y, z = np.asarray(physics_state["orientations"]).T
+        heading = np.arctan2(2.0 * (w * z + x * y), 1.0 - 2.0 * (y * y + z * z))
+        self._kinematics.x[self._rows] = positions[:, 0]
+        self._kinematics.y[self._rows] = positions[:, 1]
+        self._kinematics.heading[self._rows] = heading
+
+        velocities = physics_state.get("velocities")
+        if velocities is not None:
+            velocities = np.asarray(velocities)
+            forward = velocities[:, 0] * np.cos(heading) + velocities[:, 1] * np.sin(heading)
+            self._kinematics.speed[self._rows] = forward / np.maximum(np.cos(self._kinematics.steering[self._rows]), 1e-3)
+
+
+class LiteSimInterface:
+    """
+    Surrogate of the SimInterface for CPU-only rollouts (planner evaluation, CI): the same world, environment, spawning
+    and fleet methods, but the vehicles are simulated with the ForkliftKinematics model and the environment is a 2D
+    occupancy map. A vehicle whose axle or rear wheel would enter an occupied cell is stopped where it is (and the
+    collision is counted); the vehicles do not collide with each other. Unlike the SimInterface, it is not a singleton,
+    so several lite simulations can run side by side.
+
+    The occupancy map of an environment is read from LITE_MAPS_PATH/<environment>.npz (or .yaml, a ROS map_server map),
+    with the environment name in lower case and spaces replaced by underscores, or else from the maps the SimInterface
+    extracted from the environments (in ENVIRONMENT_MAPS_PATH). An environment without a map is an empty floor.
+    """
+
+    def __init__(self, world_settings: Optional[Dict] = None, maps_path: str = LITE_MAPS_PATH):
+        """
+        Args:
+            world_settings (dict): The physics_dt, rendering_dt and stage_units_in_meters of the world. Defaults to
+                LITE_WORLD_SETTINGS.
+            maps_path (str): The folder of the occupancy maps of the environments. Defaults to LITE_MAPS_PATH.
+        """
+        self._world_settings = dict(LITE_WORLD_SETTINGS, **(world_settings or {}))
+        self._maps_path = maps_path
+        self._world: Optional[LiteWorld] = None
+
+        # Fleet state (same layout as in the SimInterface) and the model that simulates it, row i being slot i
+        self._fleet_state = FleetState()
+        self._kinematics = ForkliftKinematics()
+        self._fleet_stepper = FleetStepper(self._fleet_state, self._view_factory)
+
+        # Id, spawn pose ([x, y, heading]) and number of collisions of the vehicle in each slot
+        self._vehicle_ids: List[int] = []
+        self._spawn_poses = np.zeros((0, 3))
+        self._collisions = np.zeros(0, dtype=np.int64)
+
+        self._environment: Optional[str] = None
+        self._environment_map = EnvironmentMap(OccupancyMap.empty())
+        self._check_collisions = False
+
+        # Roadmaps of the environments (cached on disk) and the navigator of the fleet, created on first use
+        self._roadmaps = RoadmapCache(ROADMAPS_PATH, ROADMAP_SPACING)
+        self._fleet_navigator: Optional[FleetNavigator] = None
+
+    @property
+    def world(self) -> LiteWorld:
+        return self._world
+
+    @property
+    def fleet_state(self) -> FleetState:
+        return self._fleet_state
+
+    @property
+    def fleet_stepper(self) -> FleetStepper:
+        return self._fleet_stepper
+
+    @property
+    def kinematics(self) -> ForkliftKinematics:
+        """ The model that simulates the fleet (e.g. to command the reach, shift and tilt axes)
+
+        Returns:
+            ForkliftKinematics: The kinematic model instance
+        """
+        return self._kinematics
+
+    @property
+    def occupancy_map(self) -> OccupancyMap:
+        return self._environment_map.occupancy
+
+    @property
+    def environment_map(self) -> EnvironmentMap:
+        return self._environment_map
+
+    @property
+    def environment(self) -> Optional[str]:
+        return self._environment
+
+    @property
+    def roadmaps(self) -> RoadmapCache:
+        return self._roadmaps
+
+    @property
+    def roadmap(self) -> Roadmap:
+        """ The roadmap of the current environment (built from its map on first use, then read from ROADMAPS_PATH), with
+        room around its nodes and edges for the footprints of the models of the fleet
+
+        Returns:
+            Roadmap: The roadmap of the environment
+        """
+        environment = self._environment
+        if environment is not None and os.path.isfile(environment):
+            environment = os.path.splitext(os.path.basename(environment))[0]
+        radius = footprint_reach(self._fleet_models()) + ROADMAP_CLEARANCE
+        return self._roadmaps.get(environment, self._environment_map, radius)
+
+    @property
+    def collisions(self) -> np.ndarray:
+        """
+        Returns:
+            np.ndarray: The number of steps each vehicle was stopped by an obstacle (indexed by fleet slot)
+        """
+        return self._collisions
+
+    @property
+    def world_settings(self) -> dict:
+        return dict(self._world_settings)
+
+    def initialize_world(self):
+        """ Method that initializes the world object
+        """
+        self._world = LiteWorld(
+            self._world_settings["physics_dt"],
+            self._world_settings["rendering_dt"],
+            self._world_settings["stage_units_in_meters"],
+            integrate=self._integrate,
+            on_reset=self._reset_vehicles,
+        )
+        self.register_physics_callbacks()
+
+    def register_physics_callbacks(self):
+        """ Method that registers the callbacks invoked on every physics step
+        """
+        self._fleet_stepper.invalidate()
+        self._world.add_physics_callback("fleet_step", self._fleet_stepper.step)
+
+    def set_world_settings(self, physics_dt=None, stage_units_in_meters=None, rendering_dt=None):
+        """ Method that changes the physics step, the stage units and the rendering period of the world
+        """
+        for name, value in (
+            ("physics_dt", physics_dt),
+            ("stage_units_in_meters", stage_units_in_meters),
+            ("rendering_dt", rendering_dt),
+        ):
+            if value is not None:
+                self._world_settings[name] = value
+
+        if self._world is not None:
+            self._world.set_simulation_dt(physics_dt=physics_dt, rendering_dt=rendering_dt)
+
+    def load_environment(self, environment: str, force_clear: bool = False):
+        """ Method that loads the occupancy map of an environment.
+
+        Args:
+            environment (str): The key of the environment in SIMULATION_ENVIRONMENTS, or the path of an occupancy map.
+            force_clear (bool): Whether to reset and stop the world before loading the environment. Defaults to False.
+        """
+        if force_clear:
+            self._world.reset()
+            self._world.stop()
+
+        if self._environment is not None:
+            raise Exception("A primitive already exists at the specified path")
+
+        map_path = environment if os.path.isfile(environment) else self.map_path(environment)
+        if map_path is not None:
+            self._environment_map = EnvironmentMap.from_file(map_path)
+        else:
+            logger.warning("No occupancy map for the environment %s, simulating an empty floor", environment)
+            self._environment_map = EnvironmentMap(OccupancyMap.empty())
+
+        # The navigator plans over the roadmap of the previous environment
+        self.remove_fleet_navigator()
+
+        occupancy = self._environment_map.occupancy
+        self._check_collisions = bool(occupancy.grid.any()) or occupancy.outside_occupied
+        self._environment = environment
+        logger.info("A new environment has been loaded successfully")
+
+    def map_path(self, environment: str) -> Optional[str]:
+        """
+        Returns:
+            str: The path of the occupancy map of an environment (None if there is none)
+        """
+        name = environment_slug(environment)
+        for path in (
+            os.path.join(self._maps_path, name + ".npz"),
+            os.path.join(self._maps_path, name + ".yaml"),
+            os.path.join(ENVIRONMENT_MAPS_PATH, name + ".npz"),
+        ):
+            if os.path.isfile(path):
+                return path
+        return None
+
+    def spawn_vehicle(self, vehicle_model: str, stage_prefix: str, vehicle_id: int = None, position=(0.0, 0.0, 0.0), orientation=(1.0, 0.0, 0.0, 0.0)) -> int:
+        """ Method that spawns a single vehicle.
+
+        Args:
+            vehicle_model (str): The key of the vehicle in ROBOTS.
+            stage_prefix (str): The (unique) name of the vehicle.
+            vehicle_id (int): The id of the vehicle. Defaults to the first unused id.
+            position (list): The [x, y, z] position of the vehicle (in meters).
+            orientation (list): The [qw, qx, qy, qz] orientation of the vehicle (only the yaw is used).
+
+        Returns:
+            int: The fleet slot of the vehicle
+        """
+        if vehicle_id is None:
+            vehicle_id = max(self._vehicle_ids, default=-1) + 1
+
+        w, x, y, z = orientation
+        heading = math.atan2(2.0 * (w * z + x * y), 1.0 - 2.0 * (y * y + z * z))
+        return self._spawn(vehicle_model, [stage_prefix], [position], [heading], [vehicle_id])[0]
+
+    def spawn_fleet(self, model: str, positions, euler_angles=None, orientations=None, stage_prefix: str = None, vehicle_ids=None) -> List[int]:
+        """ Method that spawns many vehicles of the same model at once (same arguments as SimInterface.spawn_fleet; only
+        the yaw of the orientations is used).
+
+        Returns:
+            list: The fleet slots of the vehicles
+        """
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+        count = len(positions)
+
+        if orientations is not None:
+            w, x, y, z = np.asarray(orientations, dtype=np.float64).reshape(-1, 4).T
+            headings = np.arctan2(2.0 * (w * z + x * y), 1.0 - 2.0 * (y * y + z * z))
+        elif euler_angles is not None:
+            headings = np.radians(np.asarray(euler_angles, dtype=np.float64).reshape(-1, 3)[:, 2])
+        else:
+            headings = np.zeros(count)
+
+        if len(headings) != count:
+            raise ValueError("Got " + str(count) + " positions but " + str(len(headings)) + " orientations")
+
+        if vehicle_ids is None:
+            first_id = max(self._vehicle_ids, default=-1) + 1
+            vehicle_ids = range(first_id, first_id + count)
+
+        stage_prefix = stage_prefix or "/World/fleet/" + model.lower()
+        stage_prefixes = [stage_prefix + "_" + str(vehicle_id) for vehicle_id in vehicle_ids]
+        return self._spawn(model, stage_prefixes, positions, headings, list(vehicle_ids))
+
+    def spawn_placer(self, model: str, clearance: float = SPAWN_CLEARANCE, free_radius: float = 0.0) -> SpawnPlacer:
+        """ Method that returns the placer that checks the spawn poses of a vehicle model against the environment and
+        the vehicles already spawned
+
+        Args:
+            model (str): The name of the vehicle model (the key in ROBOTS).
+            clearance (float): The free margin (in meters) required around the vehicle. Defaults to SPAWN_CLEARANCE.
+            free_radius (float): The half width (in meters) of the square around the pose that must be free too.
+                Defaults to 0.0.
+
+        Returns:
+            SpawnPlacer: The spawn placer of the vehicle model
+        """
+        return SpawnPlacer(self._environment_map, vehicle_config(model), clearance, fleet_poses(self._fleet_state), free_radius)
+
+    def place_fleet(self, model: str, count: int, region=None, heading: Optional[float] = 0.0, seed: Optional[int] = None, stage_prefix: str = None):
+        """ Method that spawns count vehicles of the same model on free, well spaced poses (see SpawnPlacer.sample). They
+        are spaced by the separation of the fleet planner, so the navigator can plan every one of them from the start
+
+        Args:
+            model (str): The name of the vehicle model (the key in ROBOTS).
+            count (int): The number of vehicles.
+            region: The [min_x, min_y, max_x, max_y] area (in meters) where the vehicles are placed. Defaults to the
+                whole environment.
+            heading (float): The heading (in radians) of every vehicle, or None for random headings. Defaults to 0.0.
+            seed (int): The seed of the placement. Defaults to None.
+            stage_prefix (str): The prefix of the names of the vehicles. Defaults to None.
+
+        Returns:
+            list: The fleet slots of the vehicles (fewer than count if the region is full)
+        """
+        # The vehicles start on the free floor of the roadmap, spaced as the planner separates them
+        placer = self.spawn_placer(model, free_radius=footprint_reach(self._fleet_models([model])) + ROADMAP_CLEARANCE)
+        spacing = max(placer.spacing, self._separation([model]) + 2.0 * abs(placer.center_offset))
+        poses = placer.sample(count, region, heading, spacing=spacing, seed=seed)
+        positions = np.column_stack((poses[:, :2], np.zeros(len(poses))))
+        euler_angles = np.column_stack((np.zeros((len(poses), 2)), np.degrees(poses[:, 2])))
+        return self.spawn_fleet(model, positions, euler_angles=euler_angles, stage_prefix=stage_prefix)
+
+    def fleet_navigator(self) -> FleetNavigator:
+        """ Method that returns the navigator that drives the vehicles to their goals over the roadmap of the current
+        environment (created and registered as a pre-step callback of the fleet on the first call)
+
+        Returns:
+            FleetNavigator: The navigator of the fleet
+        """
+        if self._fleet_navigator is None:
+            roadmap = self.roadmap
+            planner = FleetPlanner(
+                roadmap,
+                self._separation(),
+                PLANNER_WINDOW,
+                step_time=roadmap.spacing * math.sqrt(2.0) / PLANNER_CRUISE_SPEED,
+            )
+            # (the lite world is not real time: the plans are computed in the steps, so the rollouts are deterministic)
+            self._fleet_navigator = FleetNavigator(
+                planner, PLANNER_REPLAN_PERIOD, asynchronous=False, environment_map=self._environment_map
+            )
+            self._fleet_stepper.add_pre_step_callback(self._fleet_navigator)
+        return self._fleet_navigator
+
+    def remove_fleet_navigator(self):
+        """ Method that stops driving the fleet to the goals (the navigator is discarded with its goals)
+        """
+        if self._fleet_navigator is not None:
+            self._fleet_stepper.remove_pre_step_callback(self._fleet_navigator)
+            self._fleet_navigator = None
+
+    def remove_vehicle(self, stage_prefix: str):
+        """ Method that removes a vehicle (the last vehicle is moved into its slot, as in the VehicleManager)
+        """
+        slot = self._fleet_state.stage_prefixes.index(stage_prefix)
+        last = self._fleet_state.count - 1
+
+        self._fleet_state.remove(slot)
+        self._kinematics.remove(slot)
+
+        self._vehicle_ids[slot] = self._vehicle_ids[last]
+        self._vehicle_ids.pop()
+        self._spawn_poses[slot] = self._spawn_poses[last]
+        self._spawn_poses = self._spawn_poses[:last]
+        self._collisions[slot] = self._collisions[last]
+        self._collisions = self._collisions[:last]
+
+    def get_vehicle_states(self) -> Dict[str, Dict]:
+        """
+        Returns:
+            dict: A dictionary of stage prefix -> {"position": [x, y, z], "orientation": [qw, qx, qy, qz]}
+        """
+        fleet = self._fleet_state
+        return {
+            stage_prefix: {"position": fleet.positions[slot].tolist(), "orientation": fleet.orientations[slot].tolist()}
+            for slot, stage_prefix in enumerate(fleet.stage_prefixes)
+        }
+
+    def clear_scene(self):
+        """
+        Method that when invoked will clear all vehicles and the environment, leaving only an empty world
+        """
+        if self._world is not None:
+            self._world.stop()
+            self._world.clear_all_callbacks()
+
+        self.remove_fleet_navigator()
+        self._fleet_state.clear()
+        self._kinematics.clear()
+        self._vehicle_ids = []
+        self._spawn_poses = np.zeros((0, 3))
+        self._collisions = np.zeros(0, dtype=np.int64)
+
+        self._environment = None
+        self._environment_map = EnvironmentMap(OccupancyMap.empty())
+        self._check_collisions = False
+
+        if self._world is not None:
+            self._world.reset()
+            self._world.stop()
+            self.register_physics_callbacks()
+        logger.info("Current scene and its vehicles has been deleted")
+
+    """
+    ---------------------------------------------------------------------
+    Auxiliary methods
+    ---------------------------------------------------------------------
+    """
+
+    def _fleet_models(self, models=()) -> set:
+        # The models of the fleet (and the given ones), or every model while the fleet is empty
+        models = set(self._fleet_state.models) | set(models)
+        return models or set(ROBOTS)
+
+    def _separation(self, models=()) -> float:
+        # The separation the planner of the fleet keeps (or will keep) between the vehicles
+        if self._fleet_navigator is not None:
+            return self._fleet_navigator.planner.separation
+        return vehicle_separation(self._fleet_models(models), ROADMAP_SPACING, PLANNER_TRACKING_MARGIN)
+
+    def _view_factory(self, model: str, stage_prefixes: List[str]) -> KinematicFleetView:
+        index = {stage_prefix: slot for slot, stage_prefix in enumerate(self._fleet_state.stage_prefixes)}
+        return KinematicFleetView(self._kinematics, np.array([index[name] for name in stage_prefixes], dtype=np.int64))
+
+    def _spawn(self, model: str, stage_prefixes: List[str], positions, headings, vehicle_ids: List[int]) -> List[int]:
+        if model not in ROBOTS:
+            raise KeyError("Unknown vehicle model " + model)
+
+        existing = set(self._fleet_state.stage_prefixes)
+        for stage_prefix in stage_prefixes:
+            if stage_prefix in existing:
+                raise RuntimeError("A primitive already exists at the specified path")
+
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+        poses = np.column_stack((positions[:, :2], headings))
+        slots = self._kinematics.add_many(vehicle_config(model), poses)
+        for stage_prefix, position, heading in zip(stage_prefixes, positions, poses[:, 2]):
+            self._fleet_state.add(stage_prefix, model, position, [math.cos(heading / 2.0), 0.0, 0.0, math.sin(heading / 2.0)])
+
+        self._vehicle_ids.extend(int(vehicle_id) for vehicle_id in vehicle_ids)
+        self._spawn_poses = np.vstack((self._spawn_poses, poses))
+        self._collisions = np.concatenate((self._collisions, np.zeros(len(poses), dtype=np.int64)))
+
+        return slots.tolist()
+
+    def _integrate(self, dt: float):
+        # (the fleet state is written after the vehicles moved, as the FleetStepper reads it in its physics callback,
+        # before them: the state and get_vehicle_states are then those of the end of the step)
+        kinematics = self._kinematics
+        if kinematics.count == 0:
+            return
+
+        if not self._check_collisions:
+            kinematics.step(dt)
+            kinematics.write_fleet(self._fleet_state)
+            return
+
+        x, y, heading, wheelbase = kinematics.x, kinematics.y, kinematics.heading, kinematics.wheelbase
+        previous_x, previous_y, previous_heading = x.copy(), y.copy(), heading.copy()
+        kinematics.step(dt)
+
+        # Check the middle of the fixed axle and the rear wheel of every vehicle against the map
+        points = np.empty((2 * kinematics.count, 2))
+        points[0::2, 0], points[0::2, 1] = x, y
+        points[1::2, 0] = x - wheelbase * np.cos(heading)
+        points[1::2, 1] = y - wheelbase * np.sin(heading)
+        blocked = self._environment_map.occupancy.is_occupied(points).reshape(-1, 2).any(axis=1)
+
+        if blocked.any():
+            x[blocked], y[blocked], heading[blocked] = previous_x[blocked], previous_y[blocked], previous_heading[blocked]
+            kinematics.speed[blocked] = 0.0
+            self._collisions[blocked] += 1
+        kinematics.write_fleet(self._fleet_state)
+
+    def _reset_vehicles(self):
+        # Back to the spawn poses, at rest with the forks down (the commands are kept, as in the physics world)
+        kinematics = self._kinematics
+        count = kinematics.count
+        if count == 0:
+            return
+
+        kinematics.x[:], kinematics.y[:], kinematics.heading[:] = self._spawn_poses.T
+        kinematics.speed[:] = 0.0
+        kinematics.steering[:] = 0.0
+        for axis in ForkliftKinematics.AXES:
+            getattr(kinematics, axis)[:] = getattr(kinematics, axis + "_min")
+        self._collisions[:] = 0
+
+        kinematics.write_fleet(self._fleet_state)
@@ -0,0 +1,150 @@
+"""
+| File: scene_snapshot.py
+| Author: Akhilesh Bhat
+| Description: Definition of the SceneSnapshot class that captures the loaded environment and the state of every spawned
+                 vehicle, such that a scene can be restored in milliseconds instead of being cleared and reloaded
+"""
+
+__all__ = ["SceneSnapshot"]
+
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+import carb
+from pxr import Sdf
+
+from Forklift_Simulator_python.logic.vehicles.fleet_state import FleetState
+
+
+class SceneSnapshot:
+    """
+    In-memory snapshot of a scene: a copy of the root layer of the stage (the loaded environment and the vehicle prims),
+    the vehicle registry, the fleet state arrays and, while the simulation is playing, the full physics state of the fleet.
+
+    Restoring a snapshot only resets the dynamic state when the same vehicles are still in the scene. The stage itself is
+    only rolled back (from the in-memory layer, without reading anything from disk) when vehicles were added or removed
+    since the snapshot was taken, or when explicitly requested.
+    """
+
+    def __init__(
+        self,
+        layer: Sdf.Layer,
+        vehicles: List[tuple],
+        fleet_arrays: Dict[str, np.ndarray],
+        physics_state: Optional[List],
+    ):
+        """
+        Args:
+            layer (Sdf.Layer): An anonymous copy of the root layer of the stage.
+            vehicles (list): A list of (stage_prefix, vehicle_id, model) tuples, in slot order.
+            fleet_arrays (dict): A copy of the FleetState arrays.
+            physics_state (list): The physics state returned by FleetStepper.capture_physics_state (None if not playing).
+        """
+        self._layer = layer
+        self._vehicles = vehicles
+        self._fleet_arrays = fleet_arrays
+        self._physics_state = physics_state
+        self._timestamp = time.time()
+
+    @property
+    def vehicles(self) -> List[tuple]:
+        return self._vehicles
+
+    @property
+    def timestamp(self) -> float:
+        return self._timestamp
+
+    @classmethod
+    def capture(cls, sim_interface) -> "SceneSnapshot":
+        """
+        Method that takes a snapshot of the current scene.
+
+        Args:
+            sim_interface (SimInterface): The simulation interface.
+
+        Returns:
+            SceneSnapshot: The snapshot of the scene
+        """
+        start = time.perf_counter()
+
+        world = sim_interface.world
+        layer = Sdf.Layer.CreateAnonymous("scene_snapshot")
+        layer.TransferContent(world.stage.GetRootLayer())
+
+        vehicles = [
+            (record.stage_prefix, record.vehicle_id, record.model) for record in sim_interface.vehicle_manager.records
+        ]
+
+        fleet_state = sim_interface.fleet_state
+        fleet_arrays = {name: np.array(getattr(fleet_state, name)) for name in FleetState.FIELDS}
+
+        physics_state = sim_interface.fleet_stepper.capture_physics_state() if world.is_playing() else None
+
+        carb.log_info("Captured a snapshot of the scene in {:.1f}ms".format(1000.0 * (time.perf_counter() - start)))
+        return cls(layer, vehicles, fleet_arrays, physics_state)
+
+    def restore(self, sim_interface, restore_stage: bool = False):
+        """
+        Method that restores the scene to the state of the snapshot.
+
+        Args:
+            sim_interface (SimInterface): The simulation interface.
+            restore_stage (bool): Whether to roll back the stage even if the same vehicles are still in the scene
+                (e.g. to undo changes to the environment itself). Defaults to False.
+        """
+        start = time.perf_counter()
+
+        world = sim_interface.world
+        vehicle_manager = sim_interface.vehicle_manager
+
+        current_vehicles = [(record.stage_prefix, record.vehicle_id, record.model) for record in vehicle_manager.records]
+        structural_change = restore_stage or current_vehicles != self._vehicles
+
+        if structural_change:
+            self._restore_stage(sim_interface)
+
+        # Reset the dynamic state of the fleet
+        fleet_state = sim_interface.fleet_state
+        for name, array in self._fleet_arrays.items():
+            getattr(fleet_state, name)[:] = array
+
+        # Move the vehicles to that state (the next read_state would overwrite the fleet state otherwise): the whole
+        # physics state when it was captured for the same fleet, else the poses and velocities of the fleet state, or
+        # only the poses of the prims when the simulation is stopped (e.g. after a stage roll back)
+        if self._physics_state is not None and world.is_playing() and not structural_change:
+            sim_interface.fleet_stepper.restore_physics_state(self._physics_state)
+        elif world.is_playing():
+            sim_interface.fleet_stepper.teleport()
+        else:
+            for record in vehicle_manager.records:
+                record.vehicle.prim.set_world_pose(
+                    fleet_state.positions[record.slot], fleet_state.orientations[record.slot]
+                )
+
+        carb.log_info(
+            "Restored the scene snapshot ({}) in {:.1f}ms".format(
+                "stage and state" if structural_change else "state only", 1000.0 * (time.perf_counter() - start)
+            )
+        )
+
+    def _restore_stage(self, sim_interface):
+        # Imported here, as the vehicles depend on the SimInterface
+        from Forklift_Simulator_python.logic.vehicles.vehicle import Vehicle
+
+        world = sim_interface.world
+
+        # The physics has to be restarted when the stage structure changes
+        world.stop()
+
+        with Sdf.ChangeBlock():
+            world.stage.GetRootLayer().TransferContent(self._layer)
+
+        # Re-create the registry of vehicles (their prims were restored together with the stage)
+        vehicle_manager = sim_interface.vehicle_manager
+        vehicle_manager.remove_all_vehicles()
+        for stage_prefix, vehicle_id, model in self._vehicles:
+            Vehicle(stage_prefix, "", vehicle_id, model=model, spawn=False)
+
+        sim_interface.fleet_stepper.invalidate()
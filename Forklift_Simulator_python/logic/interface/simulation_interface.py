@@ -7,19 +7,73 @@
 __all__ = ["SimInterface"]
 
 import gc
-import yaml
 import os
+import math
+import time
 import asyncio
 from threading import Lock
+from typing import Optional
+
+import numpy as np
 
 # NVidia API imports
 import carb
+import omni.kit.app
 from omni.isaac.core.world import World
-from omni.isaac.core.utils.stage import clear_stage
-import omni.isaac.core.utils.nucleus as nucleus
-
-# from scripts.logic.vehicle_manager import VehicleManager
-from Forklift_Simulator_python.global_variables import DEFAULT_WORLD_SETTINGS, SIMULATION_ENVIRONMENTS
+from omni.isaac.core.utils.stage import clear_stage, set_stage_units
+
+from Forklift_Simulator_python.logic.vehicle_manager import VehicleManager
+from Forklift_Simulator_python.logic.vehicles.fleet_state import FleetState, FleetStepper
+from Forklift_Simulator_python.logic.vehicles.articulation_fleet_view import articulation_fleet_view_factory
+from Forklift_Simulator_python.logic.vehicles.vehicle_configs import footprint_reach
+from Forklift_Simulator_python.logic.input.command_buffer import InputPipeline
+from Forklift_Simulator_python.logic.assets.asset_cache import AssetCache
+from Forklift_Simulator_python.logic.assets.cooking_cache import CookingCache
+from Forklift_Simulator_python.logic.assets.environment_pool import EnvironmentPool
+from Forklift_Simulator_python.logic.interface.environment_loader import EnvironmentLoader
+from Forklift_Simulator_python.logic.maps.environment_map import EnvironmentMapCache, environment_key
+from Forklift_Simulator_python.logic.planning.roadmap import RoadmapCache
+from Forklift_Simulator_python.logic.interface.fast_stepping import FastStepper
+from Forklift_Simulator_python.logic.telemetry.fleet_telemetry import FleetTelemetry
+from Forklift_Simulator_python.logic.profiling.step_timing import StepTiming
+from Forklift_Simulator_python.global_variables import (
+    ADAPTIVE_RATE_ENABLED,
+    ADAPTIVE_RATE_TARGET,
+    ADAPTIVE_RENDERING_DT_RANGE,
+    ASSET_CACHE_MAX_SIZE,
+    ASSET_CACHE_PATH,
+    ASSET_CATALOG,
+    CACHE_PATH,
+    DEFAULT_WORLD_SETTINGS,
+    ENVIRONMENT_MAP_HEIGHT_RANGE,
+    ENVIRONMENT_MAP_LEVELS,
+    ENVIRONMENT_MAP_RESOLUTION,
+    ENVIRONMENT_MAPS_PATH,
+    ENVIRONMENT_POOL_SIZE,
+    ENVIRONMENT_PREWARM_COUNT,
+    ISAAC_SIM_ENVIRONMENTS,
+    PHYSICS_COOKING_CACHE_PATH,
+    PHYSICS_COOKING_CACHE_SIZE_MB,
+    PLANNER_CRUISE_SPEED,
+    PLANNER_REPLAN_PERIOD,
+    PLANNER_TRACKING_MARGIN,
+    PLANNER_WINDOW,
+    RECORDING_CHUNK_STEPS,
+    RECORDINGS_PATH,
+    ROADMAP_CLEARANCE,
+    ROADMAP_SPACING,
+    ROADMAPS_PATH,
+    ROBOTS,
+    SIMULATION_ENVIRONMENTS,
+    SPAWN_CLEARANCE,
+    SPAWN_HEIGHT,
+    STEP_TIMING_DUMP_INTERVAL,
+    STEP_TIMING_ENABLED,
+    STEP_TIMING_PATH,
+    TELEMETRY_MAX_VEHICLES,
+    USE_ASSET_CACHE,
+    USE_PHYSICS_COOKING_CACHE,
+)
 
 class SimInterface:
     """
@@ -48,12 +102,185 @@ class SimInterface:
 
         # Get a handle to the vehicle manager instance which will manage which vehicles
         # are spawned in the world to be controlled and simulated
-        # self._vehicle_manager = VehicleManager()
+        self._vehicle_manager = VehicleManager()
+
+        # State of the whole fleet in contiguous arrays, updated with batched reads/writes on every physics step
+        self._fleet_state = FleetState()
+        self._fleet_state.bind(self._vehicle_manager)
+        self._fleet_stepper = FleetStepper(self._fleet_state, articulation_fleet_view_factory)
+
+        # Merges the commands of every input (keyboard, gamepad, network, ...) into the fleet before each physics step
+        self._input_pipeline = InputPipeline(self._fleet_state, self._vehicle_manager)
+        self._fleet_stepper.add_pre_step_callback(self._input_pipeline.apply)
 
-        # Initialize the world with the default simulation settings
-        self._world_settings = DEFAULT_WORLD_SETTINGS
+        # History of the fork height and speed of a few selected vehicles (and of the step time), for the live plots
+        self._telemetry = FleetTelemetry(self._vehicle_manager, max_vehicles=TELEMETRY_MAX_VEHICLES)
+        self._fleet_stepper.add_pre_step_callback(self._telemetry.on_physics_step)
+
+        # Initialize the world with the default simulation settings (copied, such that changing them leaves the defaults)
+        self._world_settings = dict(DEFAULT_WORLD_SETTINGS)
         self._world = None
 
+        # Wall time of the physics steps, of their subscribers and of the rendered frames (timed once per app update)
+        self._step_timing = StepTiming(self._world_settings["physics_dt"], self._world_settings["rendering_dt"])
+        self._step_timing.enabled = STEP_TIMING_ENABLED
+        self._fleet_stepper.timing = self._step_timing
+        if STEP_TIMING_DUMP_INTERVAL > 0:
+            self._step_timing.start_periodic_dump(STEP_TIMING_PATH, STEP_TIMING_DUMP_INTERVAL)
+
+        # Adjusts the rendering period (and optionally the physics step) to hold a real time factor, if enabled
+        self._rate_controller = None
+        if ADAPTIVE_RATE_ENABLED:
+            self.enable_adaptive_rate()
+
+        # Steps the world as fast as possible (rendering every N steps or on request), for training and data generation
+        self._fast_stepper = FastStepper(
+            self._step_physics, self._world_settings["physics_dt"], time_fn=lambda: self._world.current_time
+        )
+
+        # Called once per app update (frame), to time the frames and adapt the rates
+        self._app_update_sub = (
+            omni.kit.app.get_app().get_update_event_stream().create_subscription_to_pop(self._on_app_update)
+        )
+
+        # Local mirror of the USD assets, such that reloading a scene does not fetch it from Nucleus again
+        self._asset_cache = AssetCache(ASSET_CACHE_PATH, max_size=ASSET_CACHE_MAX_SIZE) if USE_ASSET_CACHE else None
+
+        # Layers of the most used environments kept in memory, such that switching scenes does not open them again
+        self._environment_pool = EnvironmentPool(self._asset_cache, capacity=ENVIRONMENT_POOL_SIZE, cache_dir=CACHE_PATH)
+
+        # Loads the environments incrementally (without blocking the Kit main loop)
+        self._environment_loader = EnvironmentLoader(self._asset_cache, self._environment_pool)
+
+        # Cooked collision data of the environments kept on disk, such that loading an environment again does not cook it
+        self._cooking_cache = None
+        if USE_PHYSICS_COOKING_CACHE:
+            self._cooking_cache = CookingCache(
+                PHYSICS_COOKING_CACHE_PATH, size_mb=PHYSICS_COOKING_CACHE_SIZE_MB, asset_cache=self._asset_cache
+            )
+            self._cooking_cache.configure()
+
+        # 2D maps of the environments (occupancy grids and obstacle bounds), extracted once and kept on disk
+        self._environment_maps = EnvironmentMapCache(
+            ENVIRONMENT_MAPS_PATH,
+            resolution=ENVIRONMENT_MAP_RESOLUTION,
+            height_range=ENVIRONMENT_MAP_HEIGHT_RANGE,
+            levels=ENVIRONMENT_MAP_LEVELS,
+            asset_cache=self._asset_cache,
+        )
+        self._environment_path = None
+
+        # Roadmaps of the environments (lattice graphs of their free floor, kept on disk) and the navigator that drives
+        # the fleet over them, created on first use
+        self._roadmaps = RoadmapCache(ROADMAPS_PATH, ROADMAP_SPACING)
+        self._fleet_navigator = None
+
+        # Backend that streams the fleet state (and receives commands) over the network, and local input device, if any
+        self._streaming_backend = None
+        self._input_device = None
+
+        # Recorder of the fleet state and commands, and replayer driving the fleet from a recording, if any
+        self._recorder = None
+        self._replayer = None
+
+    @property
+    def fleet_state(self):
+        """ The state and commands of every vehicle in the simulation, in contiguous arrays
+
+        Returns:
+            FleetState: The fleet state instance
+        """
+        return self._fleet_state
+
+    @property
+    def fleet_stepper(self):
+        """ The object that updates the whole fleet on every physics step
+
+        Returns:
+            FleetStepper: The fleet stepper instance
+        """
+        return self._fleet_stepper
+
+    @property
+    def asset_cache(self):
+        """ The local mirror of the USD assets (None if the asset cache is disabled)
+
+        Returns:
+            AssetCache: The asset cache instance
+        """
+        return self._asset_cache
+
+    @property
+    def cooking_cache(self):
+        """ The cache of the cooked collision data of the environments (None if it is disabled)
+
+        Returns:
+            CookingCache: The cooking cache instance
+        """
+        return self._cooking_cache
+
+    @property
+    def environment_maps(self):
+        """The cache of the 2D maps of the environments
+
+        Returns:
+            EnvironmentMapCache: The environment map cache instance
+        """
+        return self._environment_maps
+
+    @property
+    def environment_map(self):
+        """The 2D map of the environment currently loaded (extracted from the stage the first time it is requested)
+
+        Returns:
+            EnvironmentMap: The map of the environment, or None if no environment is loaded
+        """
+        if self._environment_path is None:
+            return None
+        return self._environment_maps.get(
+            environment_key(self._environment_path), self._world.stage, "/World/layout", usd_path=self._environment_path
+        )
+
+    @property
+    def roadmaps(self):
+        """The cache of the roadmaps of the environments
+
+        Returns:
+            RoadmapCache: The roadmap cache instance
+        """
+        return self._roadmaps
+
+    @property
+    def roadmap(self):
+        """The roadmap of the environment currently loaded (built from its map the first time it is requested), with room
+        around its nodes and edges for the footprints of the models of the fleet
+
+        Returns:
+            Roadmap: The roadmap of the environment, or None if no environment is loaded
+        """
+        if self._environment_path is None:
+            return None
+        radius = footprint_reach(self._fleet_models()) + ROADMAP_CLEARANCE
+        return self._roadmaps.get(environment_key(self._environment_path), self.environment_map, radius)
+
+    @property
+    def environment_pool(self):
+        """ The pool of environments kept in memory (and its hit/miss statistics)
+
+        Returns:
+            EnvironmentPool: The environment pool
+        """
+        return self._environment_pool
+
+    def prewarm_environments(self, count: int = ENVIRONMENT_PREWARM_COUNT):
+        """ Method that opens the most used simulation environments in the background, such that loading them from
+        the scene dropdown only has to author a reference to layers that are already in memory
+
+        Args:
+            count (int): The number of environments to pre-warm. Defaults to ENVIRONMENT_PREWARM_COUNT.
+        """
+        self._environment_pool.prewarm(SIMULATION_ENVIRONMENTS.values(), count)
+
     @property
     def world(self):
         """ The current omni.isaac.core.world World instance
@@ -63,52 +290,354 @@ class SimInterface:
         """
         return self._world
     
-    # @property
-    # def vehicle_manager(self):
-    #     """ The instance of the VehicleManager
-
-    #     Returns:
-    #         VehicleManager: The current instance of the VehicleManager
-    #     """
-    #     return self._vehicle_manager
+    @property
+    def vehicle_manager(self):
+        """ The instance of the VehicleManager
+
+        Returns:
+            VehicleManager: The current instance of the VehicleManager
+        """
+        return self._vehicle_manager
     
     def initialize_world(self):
         """ Method that initializes the world object
         """
 
         self._world = World(**self._world_settings)
+        self.register_physics_callbacks()
 
-    # def get_vehicle(self, stage_prefix: str):
-    #     """ Method that returns the vehicle object given its stage_prefix
+    def register_physics_callbacks(self):
+        """ Method that registers the callbacks invoked on every physics step (the world drops them when cleared)
+        """
+
+        # Start timing the physics step before any other callback runs
+        self._world.add_physics_callback("step_timing", self._step_timing.on_physics_step)
+
+        # Update the state and apply the commands of the whole fleet at once
+        self._fleet_stepper.invalidate()
+        self._world.add_physics_callback("fleet_step", self._step_timing.wrap("fleet_step", self._fleet_stepper.step))
+
+    def get_vehicle(self, stage_prefix: str):
+        """ Method that returns the vehicle object given its stage_prefix
 
-    #     Args:
-    #         stage_prefix (str): The name the vehicle will present in the simulator when spawned
+        Args:
+            stage_prefix (str): The name the vehicle will present in the simulator when spawned
 
-    #     Returns:
-    #         Vehicle: Returns a vehicle object that was spawned with the given stage_prefix
-    #     """
-    #     return self._vehicle_manager.vehicles[stage_prefix]
+        Returns:
+            Vehicle: Returns a vehicle object that was spawned with the given stage_prefix
+        """
+        return self._vehicle_manager.get_vehicle(stage_prefix)
     
-    # def get_all_vehicles(self):
-    #     """ Method that returns a list of all vehicles that are considered active in the simulator
+    def get_all_vehicles(self):
+        """ Method that returns a list of all vehicles that are considered active in the simulator
         
-    #     Returns:
-    #         list: A list of all vehicles that are currently instantiated
-    #     """
-    #     return self._vehicle_manager.vehicles
+        Returns:
+            dict: A dictionary of stage prefix -> vehicle with all vehicles that are currently instantiated
+        """
+        return self._vehicle_manager.vehicles
     
+    def spawn_fleet(self, model: str, positions, euler_angles=None, orientations=None, stage_prefix: str = None, vehicle_ids=None):
+        """ Method that spawns many vehicles of the same model at once (as references sharing their meshes through instancing,
+        authored in a single change block). See FleetSpawner.spawn for the description of the arguments.
+
+        Returns:
+            list: The spawned vehicles
+        """
+        # Imported here, as the vehicles themselves depend on the SimInterface
+        from Forklift_Simulator_python.logic.vehicles.fleet_spawner import FleetSpawner
+
+        return FleetSpawner().spawn(model, positions, euler_angles, orientations, stage_prefix, vehicle_ids)
+
+    def spawn_placer(self, model: str, clearance: float = SPAWN_CLEARANCE, free_radius: float = 0.0) -> "SpawnPlacer":
+        """ Method that returns the placer that checks the spawn poses of a vehicle model against the environment and
+        the vehicles already spawned
+
+        Args:
+            model (str): The name of the vehicle model (the key in ROBOTS).
+            clearance (float): The free margin (in meters) required around the vehicle. Defaults to SPAWN_CLEARANCE.
+            free_radius (float): The half width (in meters) of the square around the pose that must be free too.
+                Defaults to 0.0.
+
+        Returns:
+            SpawnPlacer: The spawn placer of the vehicle model
+        """
+        # Imported here, as the spawn placement is not needed to start the extension
+        from Forklift_Simulator_python.logic.maps.environment_map import EnvironmentMap
+        from Forklift_Simulator_python.logic.maps.occupancy_map import OccupancyMap
+        from Forklift_Simulator_python.logic.maps.spawn_placer import SpawnPlacer, fleet_poses
+        from Forklift_Simulator_python.logic.vehicles.vehicle_configs import vehicle_config
+
+        # Without an environment, only the other vehicles are checked
+        environment_map = self.environment_map or EnvironmentMap(OccupancyMap.empty())
+        return SpawnPlacer(environment_map, vehicle_config(model), clearance, fleet_poses(self._fleet_state), free_radius)
+
+    def place_fleet(self, model: str, count: int, region=None, heading: Optional[float] = 0.0, seed: Optional[int] = None, stage_prefix: str = None):
+        """ Method that spawns count vehicles of the same model on free, well spaced poses (see SpawnPlacer.sample). They
+        are spaced by the separation of the fleet planner, so the navigator can plan every one of them from the start
+
+        Args:
+            model (str): The name of the vehicle model (the key in ROBOTS).
+            count (int): The number of vehicles.
+            region: The [min_x, min_y, max_x, max_y] area (in meters) where the vehicles are placed. Defaults to the
+                whole environment.
+            heading (float): The heading (in radians) of every vehicle, or None for random headings. Defaults to 0.0.
+            seed (int): The seed of the placement. Defaults to None.
+            stage_prefix (str): The prefix of the names of the vehicles. Defaults to None.
+
+        Returns:
+            list: The spawned vehicles (fewer than count if the region is full)
+        """
+        # The vehicles start on the free floor of the roadmap, spaced as the planner separates them
+        placer = self.spawn_placer(model, free_radius=footprint_reach(self._fleet_models([model])) + ROADMAP_CLEARANCE)
+        spacing = max(placer.spacing, self._separation([model]) + 2.0 * abs(placer.center_offset))
+        poses = placer.sample(count, region, heading, spacing=spacing, seed=seed)
+        positions = np.column_stack((poses[:, :2], np.full(len(poses), SPAWN_HEIGHT)))
+        euler_angles = np.column_stack((np.zeros((len(poses), 2)), np.degrees(poses[:, 2])))
+        return self.spawn_fleet(model, positions, euler_angles=euler_angles, stage_prefix=stage_prefix)
+
+    def fleet_navigator(self) -> "FleetNavigator":
+        """ Method that returns the navigator that drives the vehicles to their goals over the roadmap of the current
+        environment (created and registered as a pre-step callback of the fleet on the first call)
+
+        Returns:
+            FleetNavigator: The navigator of the fleet
+        """
+        if self._fleet_navigator is None:
+            roadmap = self.roadmap
+            if roadmap is None:
+                raise Exception("No environment is loaded")
+
+            # Imported here, as the planner is not needed to start the extension
+            from Forklift_Simulator_python.logic.planning.fleet_planner import FleetPlanner
+            from Forklift_Simulator_python.logic.planning.fleet_navigator import FleetNavigator
+
+            planner = FleetPlanner(
+                roadmap,
+                self._separation(),
+                PLANNER_WINDOW,
+                step_time=roadmap.spacing * math.sqrt(2.0) / PLANNER_CRUISE_SPEED,
+            )
+            self._fleet_navigator = FleetNavigator(planner, PLANNER_REPLAN_PERIOD, environment_map=self.environment_map)
+            self._fleet_stepper.add_pre_step_callback(self._fleet_navigator)
+        return self._fleet_navigator
+
+    def remove_fleet_navigator(self):
+        """ Method that stops driving the fleet to the goals (the navigator is discarded with its goals)
+        """
+        if self._fleet_navigator is not None:
+            self._fleet_stepper.remove_pre_step_callback(self._fleet_navigator)
+            self._fleet_navigator = None
+
+    @property
+    def input_pipeline(self):
+        """ The pipeline that merges the commands of every input into the fleet before each physics step
+
+        Returns:
+            InputPipeline: The input pipeline instance
+        """
+        return self._input_pipeline
+
+    def set_input_device(self, device):
+        """ Method that replaces the local input device driving a vehicle (the previous one is destroyed)
+
+        Args:
+            device: The new input device (e.g. a KeyboardInput), or None to stop using one.
+        """
+        if self._input_device is not None:
+            self._input_device.destroy()
+
+        self._input_device = device
+
+    @property
+    def streaming_backend(self):
+        """ The backend that streams the fleet state over the network (None if streaming is disabled)
+
+        Returns:
+            The streaming backend instance
+        """
+        return self._streaming_backend
+
+    def set_streaming_backend(self, backend):
+        """ Method that replaces the backend streaming the fleet state (the previous one is stopped)
+
+        Args:
+            backend: The new streaming backend (e.g. a Ros2StreamingBackend), or None to stop streaming.
+        """
+        if self._streaming_backend is not None:
+            self._streaming_backend.stop()
+
+        self._streaming_backend = backend
+        if backend is not None:
+            backend.start()
+
+    @property
+    def step_timing(self):
+        """ The wall time of the physics steps, of their subscribers and of the frames (see StepTiming.summary)
+
+        Returns:
+            StepTiming: The step timing instance
+        """
+        return self._step_timing
+
+    @property
+    def telemetry(self):
+        """ The telemetry sampled on every physics step (select the vehicles with telemetry.select)
+
+        Returns:
+            FleetTelemetry: The telemetry instance
+        """
+        return self._telemetry
+
+    @property
+    def recorder(self):
+        """ The recorder logging the fleet on every physics step (None if not recording)
+
+        Returns:
+            FleetRecorder: The recorder instance
+        """
+        return self._recorder
+
+    def start_recording(self, path: str = None, metadata: dict = None) -> "FleetRecorder":
+        """ Method that starts logging the state and commands of the fleet on every physics step
+
+        Args:
+            path (str): The path of the log. Defaults to a timestamped file in RECORDINGS_PATH.
+            metadata (dict): Any json-serializable data stored in the log.
+
+        Returns:
+            FleetRecorder: The recorder (stopped by stop_recording)
+        """
+        self.stop_recording()
+
+        if path is None:
+            path = os.path.join(RECORDINGS_PATH, time.strftime("fleet_%Y%m%d_%H%M%S.fklog"))
+
+        metadata = dict(metadata or {})
+        metadata.setdefault("physics_dt", self._world_settings["physics_dt"])
+
+        # Imported here, as the recording is not needed to start the extension
+        from Forklift_Simulator_python.logic.recording.fleet_recorder import FleetRecorder
+
+        self._recorder = FleetRecorder(self._fleet_stepper, self._vehicle_manager, path, RECORDING_CHUNK_STEPS, metadata=metadata)
+        self._recorder.start()
+        return self._recorder
+
+    def stop_recording(self):
+        """ Method that stops the current recording (if any) and finalizes its log
+
+        Returns:
+            str: The path of the log (None if nothing was being recorded)
+        """
+        if self._recorder is None:
+            return None
+
+        recorder, self._recorder = self._recorder, None
+        recorder.stop()
+        carb.log_info("Recorded " + str(recorder.path))
+        return recorder.path
+
+    def replay(self, path: str, start_time: float = 0.0, fast: bool = False, render_interval: int = 0):
+        """ Method that re-drives the fleet (already in the scene) from a recording. By default the replay follows the
+        physics steps of the world while it plays; with fast=True the world is stepped directly, as fast as possible.
+        The world is started if it is not playing (the vehicles can only be moved to their logged state while it plays),
+        and its physics step must be the one the log was recorded with.
+
+        Args:
+            path (str): The path of the log.
+            start_time (float): The simulated time (in seconds) to start from (the vehicles are moved to their logged
+                state at that time). Defaults to 0.0.
+            fast (bool): Whether to step the world as fast as possible until the end of the log. Defaults to False.
+            render_interval (int): With fast=True, render every n steps (0 to never render). Defaults to 0.
+
+        Returns:
+            FleetReplayer | dict: The replayer (to seek or stop it), or with fast=True the replay statistics
+        """
+        if self._world is None:
+            raise RuntimeError("The world must be initialized before replaying a recording")
+
+        self.stop_replay()
+
+        # Imported here, as the replay is not needed to start the extension
+        from Forklift_Simulator_python.logic.recording.fleet_log import FleetLogReader
+        from Forklift_Simulator_python.logic.recording.fleet_recorder import FleetReplayer
+
+        # The logged commands are only reproduced with the physics step they were recorded with
+        log = FleetLogReader(path)
+        logged_dt = log.metadata.get("physics_dt")
+        physics_dt = self._world.get_physics_dt()
+        if logged_dt is not None and not math.isclose(logged_dt, physics_dt, rel_tol=1e-6):
+            log.close()
+            raise ValueError(
+                "The recording {} was made with physics_dt={} but the world steps with physics_dt={} "
+                "(call set_world_settings(physics_dt={}) first)".format(path, logged_dt, physics_dt, logged_dt)
+            )
+
+        # The vehicles are moved to their logged state through the physics views, which only exist while playing
+        if not self._world.is_playing():
+            self._world.play()
+
+        self._replayer = FleetReplayer(log, self._fleet_stepper)
+        self._replayer.seek(time=start_time)
+
+        if not fast:
+            self._replayer.start()
+            return self._replayer
+
+        try:
+            return self._replayer.run(self._step_physics, render_interval)
+        finally:
+            self.stop_replay()
+
+    def stop_replay(self):
+        if self._replayer is not None:
+            self._replayer.stop()
+            self._replayer.log.close()
+            self._replayer = None
+
+    def take_snapshot(self) -> "SceneSnapshot":
+        """ Method that captures the current scene (environment, vehicles and their physics state) in memory
+
+        Returns:
+            SceneSnapshot: The snapshot, to be passed to restore_snapshot
+        """
+        # Imported here, as the snapshots are not needed to start the extension
+        from Forklift_Simulator_python.logic.interface.scene_snapshot import SceneSnapshot
+
+        return SceneSnapshot.capture(self)
+
+    def restore_snapshot(self, snapshot: "SceneSnapshot", restore_stage: bool = False):
+        """ Method that brings the scene back to a snapshot. When the same vehicles are still in the scene only their state
+        is reset (without stopping the simulation), otherwise the stage is rolled back from memory, without clearing it
+        and reloading the environment from disk.
+
+        Args:
+            snapshot (SceneSnapshot): The snapshot returned by take_snapshot.
+            restore_stage (bool): Whether to always roll back the stage (e.g. to undo edits to the environment).
+                Defaults to False.
+        """
+        self._environment_loader.cancel()
+        snapshot.restore(self, restore_stage)
+
     def get_default_environments(self):
         """
         Method that returns a dictionary containing all the default simulation environments and their path
         """
         return SIMULATION_ENVIRONMENTS
     
-    def clear_scene(self):
+    def clear_scene(self, synchronous: bool = False):
         """
         Method that when invoked will clear all vehicles and the simulation environment,
         leaving only an empty world with a physics environment
+
+        Args:
+            synchronous (bool): Whether the physics context is re-created before returning (e.g. in App mode or from the
+                headless runners) rather than in the background, such that the Kit main loop is not blocked. Defaults
+                to False.
         """
 
+        # Stop loading the environment (if it is still being loaded)
+        self._environment_loader.cancel()
+
         # If the physics simulation was running, stop it first
         if self.world is not None:
             self.world.stop()
@@ -122,23 +651,35 @@ class SimInterface:
         clear_stage()
 
         # Remove all the robots that were spawned
-        # self._vehicle_manager.remove_all_vehicles()
+        self._vehicle_manager.remove_all_vehicles()
+        self.remove_fleet_navigator()
+        self._environment_path = None
 
         # Call python's garbage collection
         gc.collect()
 
         # Re-initialize the physics context
-        asyncio.ensure_future(self._world.initialize_simulation_context_async())
+        if synchronous:
+            self._world.initialize_physics()
+        else:
+            asyncio.ensure_future(self._world.initialize_simulation_context_async())
+        self.register_physics_callbacks()
         carb.log_info("Current scene and its vehicles has been deleted")
 
-    async def load_environment_async(self, usd_path: str, force_clear: bool=False):
-        """ Method that loads a given world (specified in the usd_path) into the simulator asynchronously.
+    async def load_environment_async(self, usd_path: str, force_clear: bool=False, on_progress=None):
+        """ Method that loads a given world (specified in the usd_path) into the simulator asynchronously. The environment
+        is fetched and read in the background and its payloads are loaded incrementally, so the Kit main loop keeps running.
+        Calling this method again while an environment is still loading cancels the previous load.
 
         Args:
             usd_path (str): The path where the USD file describing the world is located.
             force_clear (bool): Whether to perform a clear before loading the asset. Defaults to False.
+            on_progress (Callable): Function called with (phase, fraction, elapsed_time) as the load progresses.
         """
 
+        # Cancel the environment that is still being loaded (if any)
+        self._environment_loader.cancel()
+
         # Reset and pause the world simulation (only if force_clear is true)
         # This is done to maximize the support between running in GUI as extension vs app
         if force_clear == True:
@@ -147,22 +688,77 @@ class SimInterface:
 
         # Load the USD asset that will be used for the environment
         try:
-            self.load_asset(usd_path, "/World/layout")
+            await self._environment_loader.load_async(self._world.stage, usd_path, "/World/layout", on_progress)
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
             carb.log_warn("Could not load the desired environment: " + str(e))
+            if on_progress is not None:
+                on_progress("Failed", 0.0, 0.0)
+            return
+
+        # Cook the collision data of the environment now rather than on the first play (a no-op if it is already cooked)
+        if self._cooking_cache is not None:
+            try:
+                await self._cooking_cache.precook_async(
+                    self._world.stage, usd_path, "/World/layout", self._world_settings, playing=self._world.is_playing()
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                carb.log_warn("Could not pre-cook the collision data of the environment: " + str(e))
+
+        # Extract the 2D map of the environment (a no-op if it is already on disk) in the background, such that the Kit
+        # main loop keeps running (from a stage of its own opened on the environment file, as the stage of the world must
+        # not be read outside of the main loop)
+        self.remove_fleet_navigator()
+        self._environment_path = usd_path
+        try:
+            await asyncio.get_event_loop().run_in_executor(
+                None, self._environment_maps.load, environment_key(usd_path), usd_path
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            carb.log_warn("Could not extract the map of the environment: " + str(e))
 
         carb.log_info("A new environment has been loaded successfully")
 
+    def cancel_environment_loading(self):
+        """
+        Method that cancels the environment currently being loaded asynchronously (if any)
+        """
+        self._environment_loader.cancel()
+
     def load_environment(self, usd_path: str, force_clear: bool=False):
-        """Method that loads a given world (specified in the usd_path) into the simulator. If invoked from a python app,
-        this method should have force_clear=False, as the world reset and stop are performed asynchronously by this method, 
-        and when we are operating in App mode, we want everything to run in sync.
+        """Method that loads a given world (specified in the usd_path) into the simulator synchronously. This is the
+        method to use when operating in App mode (e.g. from the headless batch runner), where we want everything to run
+        in sync. From the extension UI, use load_environment_async instead so that the Kit main loop is not blocked.
 
         Args:
             usd_path (str): The path where the USD file describing the world is located.
             force_clear (bool): Whether to perform a clear before loading the asset. Defaults to False.
         """
-        asyncio.ensure_future(self.load_environment_async(usd_path, force_clear))
+
+        # Reset and pause the world simulation (only if force_clear is true)
+        if force_clear == True:
+            self.world.reset()
+            self.world.stop()
+
+        # Load the USD asset that will be used for the environment (errors are propagated to the caller)
+        # (if the environment is warm, its layers are already in memory and only the reference has to be authored)
+        warm_path = self._environment_pool.acquire(usd_path)
+        if warm_path is not None:
+            if self._world.stage.GetPrimAtPath("/World/layout"):
+                raise Exception("A primitive already exists at the specified path")
+            self._world.stage.DefinePrim("/World/layout").GetReferences().AddReference(warm_path)
+        else:
+            self.load_asset(usd_path, "/World/layout")
+
+        # The map (and roadmap) of the environment is only extracted (or read from the disk) when it is first requested
+        self.remove_fleet_navigator()
+        self._environment_path = usd_path
+        carb.log_info("A new environment has been loaded successfully")
 
     def load_nvidia_environment(self, environment_asset: str = "Hospital/hospital.usd"):
         """
@@ -172,14 +768,8 @@ class SimInterface:
             environment_asset (str): The name of the nvidia asset inside the /Isaac/Environments folder. Default to Hospital/hospital.usd.
         """
 
-        # Get the nvidia assets root path
-        nvidia_assets_path = nucleus.get_assets_root_path()
-
-        # Define the environments path inside the NVidia assets
-        environments_path = "/Isaac/Environments"
-
-        # Get the complete usd path
-        usd_path = nvidia_assets_path + environments_path + "/" + environment_asset
+        # Get the complete usd path (the assets root is resolved only once and cached by the asset catalog)
+        usd_path = ASSET_CATALOG.resolve(ISAAC_SIM_ENVIRONMENTS.lstrip("/") + "/" + environment_asset)
 
         # Try to load the asset into the world
         self.load_asset(usd_path, "/World/layout")
@@ -197,6 +787,13 @@ class SimInterface:
         if self._world.stage.GetPrimAtPath(stage_prefix):
             raise Exception("A primitive already exists at the specified path")
 
+        # Load the asset from the local mirror (fetching it and its dependencies only the first time)
+        if self._asset_cache is not None:
+            try:
+                usd_asset = self._asset_cache.localize(usd_asset)
+            except Exception as e:
+                carb.log_warn("Could not mirror " + usd_asset + " into the asset cache, loading it directly: " + str(e))
+
         # Create the stage primitive and load the usd into it
         prim = self._world.stage.DefinePrim(stage_prefix)
         success = prim.GetReferences().AddReference(usd_asset)
@@ -205,9 +802,13 @@ class SimInterface:
             raise Exception("The usd asset" + usd_asset + "is not loaded at stage path " + stage_prefix)
         
     def set_world_settings(self, physics_dt=None, stage_units_in_meters=None, rendering_dt=None):
-        """
-        Set the current world settings to the pre-defined settings. TODO - finish the implementation of this method.
-        For now these new setting will never override the default ones.
+        """ Method that changes the world settings. They are used when the world is created and, if it already exists,
+        applied to it right away (while the simulation runs).
+
+        Args:
+            physics_dt (float): The physics step size (in seconds). None to keep the current one.
+            stage_units_in_meters (float): The stage units (in meters). None to keep the current ones.
+            rendering_dt (float): The rendering period (in seconds). None to keep the current one.
         """
 
         # Set the physics engine update rate
@@ -222,6 +823,147 @@ class SimInterface:
         if rendering_dt is not None:
             self._world_settings["rendering_dt"] = rendering_dt
 
+        self._step_timing.set_rates(physics_dt, rendering_dt)
+
+        if self._world is None:
+            return
+
+        if physics_dt is not None or rendering_dt is not None:
+            self._world.set_simulation_dt(physics_dt=physics_dt, rendering_dt=rendering_dt)
+
+        if stage_units_in_meters is not None:
+            set_stage_units(stage_units_in_meters)
+
+        carb.log_info("Applied the world settings " + str(self._world_settings))
+
+    def run_fast(self, steps: int = None, duration: float = None, render_interval: int = 0, until=None) -> dict:
+        """ Method that steps the physics at physics_dt as fast as the CPU allows (blocking until done), rendering only
+        every render_interval steps or when a frame is requested with request_render. Meant for headless training and
+        data generation runs (the app, and its UI, only update when a frame is rendered).
+
+        Args:
+            steps (int): The number of physics steps.
+            duration (float): The simulated time (in seconds), used if steps is None.
+            render_interval (int): Render every n steps (0 to only render on request). Defaults to 0.
+            until (Callable): Function called after every step, that returns True to stop.
+
+        Returns:
+            dict: The number of steps and rendered frames, the wall-clock and simulated durations, the steps per second
+                and the real time factor
+        """
+        if self._world is None:
+            raise RuntimeError("The world must be initialized before stepping it")
+
+        if not self._world.is_playing():
+            self._world.play()
+
+        self._fast_stepper.physics_dt = self._world.get_physics_dt()
+        self._fast_stepper.render_interval = render_interval
+        stats = self._fast_stepper.run(steps, duration, until)
+
+        carb.log_info(
+            "Stepped {} times ({} frames rendered) at {:.0f} steps/s".format(
+                stats["steps"], stats["rendered_frames"], stats["steps_per_second"]
+            )
+        )
+        return stats
+
+    def request_render(self, callback=None):
+        """ Method that renders a frame on the next step of run_fast (e.g. when a camera sensor needs a new image)
+
+        Args:
+            callback (Callable): Function called (without arguments) once the frame is rendered.
+        """
+        self._fast_stepper.request_render(callback)
+
+    def stop_fast(self):
+        """ Method that stops run_fast after the current step (e.g. from a physics callback)
+        """
+        self._fast_stepper.stop()
+
+    @property
+    def world_settings(self) -> dict:
+        """ The current world settings (physics_dt, stage_units_in_meters and rendering_dt)
+
+        Returns:
+            dict: A copy of the settings
+        """
+        return dict(self._world_settings)
+
+    @property
+    def rate_controller(self):
+        """ The controller adapting the rates to hold a real time factor (None if adaptive rate control is disabled)
+
+        Returns:
+            AdaptiveRateController: The controller instance
+        """
+        return self._rate_controller
+
+    def enable_adaptive_rate(
+        self,
+        target: float = ADAPTIVE_RATE_TARGET,
+        rendering_dt_range=ADAPTIVE_RENDERING_DT_RANGE,
+        physics_dt_range=None,
+    ) -> "AdaptiveRateController":
+        """ Method that starts adjusting the rendering period (and optionally the physics step) to hold a real time
+        factor, e.g. rendering less often when a large fleet makes the physics expensive
+
+        Args:
+            target (float): The real time factor to hold. Defaults to ADAPTIVE_RATE_TARGET.
+            rendering_dt_range (tuple): The minimum and maximum rendering period (in seconds).
+            physics_dt_range (tuple): The minimum and maximum physics step (in seconds), None to keep the physics step.
+
+        Returns:
+            AdaptiveRateController: The controller (its history lists every adjustment)
+        """
+        # Imported here, as the adaptive rate is disabled by default
+        from Forklift_Simulator_python.logic.interface.adaptive_rate import AdaptiveRateController
+
+        self._rate_controller = AdaptiveRateController(
+            self._step_timing, self.set_world_settings, target, rendering_dt_range, physics_dt_range
+        )
+        carb.log_info("Adaptive rate control enabled (target real time factor {:.2f})".format(target))
+        return self._rate_controller
+
+    def disable_adaptive_rate(self, restore: bool = True):
+        """ Method that stops adjusting the rates
+
+        Args:
+            restore (bool): Whether to go back to the default physics step and rendering period. Defaults to True.
+        """
+        self._rate_controller = None
+        if restore:
+            self.set_world_settings(
+                physics_dt=DEFAULT_WORLD_SETTINGS["physics_dt"], rendering_dt=DEFAULT_WORLD_SETTINGS["rendering_dt"]
+            )
+
+    def _fleet_models(self, models=()) -> set:
+        # The models of the fleet (and the given ones), or every model while the fleet is empty
+        models = set(self._fleet_state.models) | set(models)
+        return models or set(ROBOTS)
+
+    def _separation(self, models=()) -> float:
+        # The separation the planner of the fleet keeps (or will keep) between the vehicles
+        if self._fleet_navigator is not None:
+            return self._fleet_navigator.planner.separation
+
+        # Imported here, as the planner is not needed to start the extension
+        from Forklift_Simulator_python.logic.planning.fleet_planner import vehicle_separation
+
+        return vehicle_separation(self._fleet_models(models), ROADMAP_SPACING, PLANNER_TRACKING_MARGIN)
+
+    def _on_app_update(self, event):
+        self._step_timing.on_frame()
+        if self._rate_controller is not None:
+            self._rate_controller.update()
+
+    def _step_physics(self, render: bool):
+        # world.step(render=True) runs an app update, which advances the physics by rendering_dt: step the physics by
+        # physics_dt alone, then render the frame without stepping the physics again
+        self._world.step(render=False)
+        if render:
+            self._world.render()
+
     def __new__(cls):
         """Allocates the memory and creates the actual PegasusInterface object is not instance exists yet. Otherwise,
         returns the existing instance of the PegasusInterface class.
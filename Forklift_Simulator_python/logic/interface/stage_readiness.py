@@ -0,0 +1,132 @@
+"""
+| File: stage_readiness.py
+| Author: Akhilesh Bhat
+| Description: Definition of the StageReadinessMonitor class that detects (on the Kit main thread) when the stage and the
+                 viewport are ready, from the stage events with a bounded fallback poll, and runs a callback at that point
+"""
+
+__all__ = ["StageReadinessMonitor"]
+
+import time
+from typing import Callable, Optional
+
+# Omniverse general API
+import carb
+import omni.usd
+import omni.kit.app
+from pxr import Usd
+
+from omni.kit.viewport.utility import get_active_viewport
+
+
+class StageReadinessMonitor:
+    """
+    Runs a callback once the stage is open and the active viewport (with its perspective camera) exists. Every check is
+    triggered by a stage event (opened/assets loaded) or by the main loop update event, so the Kit APIs are always called
+    from the main thread. The update-event poll is throttled and bounded: after max_wait seconds it gives up, and only the
+    stage events can trigger the callback from then on.
+    """
+
+    # Path of the perspective camera created together with the viewport
+    CAMERA_PATH = "/OmniverseKit_Persp"
+
+    def __init__(self, on_ready: Callable, poll_interval: float = 0.05, max_wait: float = 60.0, start_time: float = None):
+        """
+        Args:
+            on_ready (Callable): Function called (once) with the time in seconds it took until the stage was ready.
+            poll_interval (float): Minimum time (in seconds) between two checks triggered by the main loop. Defaults to 0.05.
+            max_wait (float): Time (in seconds) after which the main loop poll stops. Defaults to 60.
+            start_time (float): The time.perf_counter() value the startup time is measured from. Defaults to now.
+        """
+        self._on_ready = on_ready
+        self._poll_interval = poll_interval
+        self._max_wait = max_wait
+        self._start_time = time.perf_counter() if start_time is None else start_time
+
+        self._last_check = 0.0
+        self._checks = 0
+        self._ready_time: Optional[float] = None
+
+        self._stage_event_sub = None
+        self._update_sub = None
+
+    @property
+    def is_ready(self) -> bool:
+        return self._ready_time is not None
+
+    @property
+    def ready_time(self) -> Optional[float]:
+        """
+        Returns:
+            float: The time (in seconds) from the start of the extension until the stage was ready (None if not ready yet)
+        """
+        return self._ready_time
+
+    def start(self):
+        """
+        Method that starts monitoring the stage. If it is already ready, the callback is called right away.
+        """
+        if self._check():
+            return
+
+        self._stage_event_sub = (
+            omni.usd.get_context()
+            .get_stage_event_stream()
+            .create_subscription_to_pop(self._on_stage_event, name="forklift_simulator_stage_readiness")
+        )
+        self._update_sub = (
+            omni.kit.app.get_app()
+            .get_update_event_stream()
+            .create_subscription_to_pop(self._on_update, name="forklift_simulator_stage_readiness_poll")
+        )
+
+    def stop(self):
+        """
+        Method that stops monitoring the stage (without calling the callback)
+        """
+        self._stage_event_sub = None
+        self._update_sub = None
+
+    def _on_stage_event(self, event):
+        if event.type in (int(omni.usd.StageEventType.OPENED), int(omni.usd.StageEventType.ASSETS_LOADED)):
+            self._check()
+
+    def _on_update(self, event):
+        now = time.perf_counter()
+        if now - self._last_check < self._poll_interval:
+            return
+        self._last_check = now
+
+        if not self._check() and now - self._start_time > self._max_wait:
+            carb.log_warn(
+                "The stage was not ready after " + str(self._max_wait) + "s, waiting for the stage events only"
+            )
+            self._update_sub = None
+
+    def _check(self) -> bool:
+        if self.is_ready:
+            return True
+
+        self._checks += 1
+        if not self._stage_is_ready():
+            return False
+
+        self.stop()
+        self._ready_time = time.perf_counter() - self._start_time
+        carb.log_info(
+            "The stage was ready {:.3f}s after startup ({} checks)".format(self._ready_time, self._checks)
+        )
+        self._on_ready(self._ready_time)
+        return True
+
+    @staticmethod
+    def _stage_is_ready() -> bool:
+        if omni.usd.get_context().get_stage_state() == omni.usd.StageState.CLOSED:
+            return False
+
+        viewport = get_active_viewport()
+        if viewport is None:
+            return False
+
+        stage = viewport.stage
+        return isinstance(stage, Usd.Stage) and stage.GetPrimAtPath(StageReadinessMonitor.CAMERA_PATH).IsValid()
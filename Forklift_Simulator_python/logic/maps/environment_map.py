@@ -0,0 +1,560 @@
+"""
+| File: environment_map.py
+| Author: Akhilesh Bhat
+| Description: Definition of the EnvironmentMap class (the multi-resolution occupancy grid and the spatial index of the
+                 static obstacles of an environment), of its extraction from the USD stage and of the EnvironmentMapCache
+                 that keeps the extracted maps on disk, per environment
+"""
+
+__all__ = ["EnvironmentMap", "EnvironmentMapCache", "extract_environment_map", "environment_key", "environment_slug", "main"]
+
+import os
+import sys
+import json
+import time
+import hashlib
+import logging
+import argparse
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from Forklift_Simulator_python.logic.maps.occupancy_map import OccupancyMap
+from Forklift_Simulator_python.logic.maps.spatial_index import BoxTree
+from Forklift_Simulator_python.global_variables import (
+    ENVIRONMENT_MAP_HEIGHT_RANGE,
+    ENVIRONMENT_MAP_LEVELS,
+    ENVIRONMENT_MAP_RESOLUTION,
+    ENVIRONMENT_MAPS_PATH,
+    SIMULATION_ENVIRONMENTS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Prims whose name contains one of these words are kept as a single obstacle (their parts are not traversed), unless
+# they group other such prims (e.g. an Xform "Racks" holding every rack)
+OBSTACLE_KEYWORDS = ("shelf", "shelv", "rack", "pallet", "wall", "pillar", "column")
+
+
+class EnvironmentMap:
+    """
+    Static geometry of an environment projected on the floor: an occupancy grid (and coarser copies of it, each cell of
+    level k + 1 covering 2 x 2 cells of level k) for constant time point and box queries, and the footprint bounds of the
+    obstacles (shelves, racks, walls, ...) with an R-tree over them, to find which obstacles are near a point or a box.
+    """
+
+    def __init__(self, occupancy: OccupancyMap, boxes=None, names: Sequence[str] = (), kinds: Sequence[str] = (), levels: int = 1, metadata: Optional[Dict] = None):
+        """
+        Args:
+            occupancy (OccupancyMap): The finest occupancy grid of the environment.
+            boxes: An (N, 4) array of [min_x, min_y, max_x, max_y] footprint bounds (in meters) of the obstacles.
+            names (Sequence[str]): The prim path of each obstacle.
+            kinds (Sequence[str]): The kind of each obstacle (the keyword its name matched, or "" for other geometry).
+            levels (int): The number of resolutions of the occupancy grid. Defaults to 1.
+            metadata (dict): Information on how the map was built (saved with it).
+        """
+        self._levels = [occupancy]
+        for _ in range(1, max(int(levels), 1)):
+            self._levels.append(self._levels[-1].coarsen(2))
+
+        self._boxes = np.zeros((0, 4)) if boxes is None else np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        self._names = list(names) if len(names) > 0 else [""] * len(self._boxes)
+        self._kinds = list(kinds) if len(kinds) > 0 else [""] * len(self._boxes)
+        self._tree: Optional[BoxTree] = None
+        self.metadata = dict(metadata or {})
+
+    @property
+    def occupancy(self) -> OccupancyMap:
+        return self._levels[0]
+
+    @property
+    def levels(self) -> List[OccupancyMap]:
+        """
+        Returns:
+            list: The occupancy grids, from the finest to the coarsest
+        """
+        return self._levels
+
+    @property
+    def boxes(self) -> np.ndarray:
+        return self._boxes
+
+    @property
+    def names(self) -> List[str]:
+        return self._names
+
+    @property
+    def kinds(self) -> List[str]:
+        return self._kinds
+
+    @property
+    def tree(self) -> BoxTree:
+        """
+        Returns:
+            BoxTree: The R-tree of the obstacle bounds (built on first use)
+        """
+        if self._tree is None:
+            self._tree = BoxTree(self._boxes)
+        return self._tree
+
+    def is_occupied(self, points, level: int = 0) -> np.ndarray:
+        """
+        Args:
+            points: An (N, 2) (or (N, 3)) array of positions (in meters).
+            level (int): The resolution queried (0 is the finest). Defaults to 0.
+
+        Returns:
+            np.ndarray: An (N,) boolean array, True where the point is in an occupied cell
+        """
+        return self._levels[level].is_occupied(points)
+
+    def box_occupied(self, min_x: float, min_y: float, max_x: float, max_y: float, level: int = 0) -> bool:
+        """
+        Returns:
+            bool: Whether an occupied cell (of the given resolution) overlaps the box
+        """
+        return self._levels[level].box_occupied(min_x, min_y, max_x, max_y)
+
+    def boxes_occupied(self, boxes, level: int = 0) -> np.ndarray:
+        """
+        Args:
+            boxes: An (N, 4) array of [min_x, min_y, max_x, max_y] boxes (in meters).
+            level (int): The resolution queried (0 is the finest). Defaults to 0.
+
+        Returns:
+            np.ndarray: An (N,) boolean array, True where an occupied cell overlaps the box
+        """
+        return self._levels[level].boxes_occupied(boxes)
+
+    def obstacles_in_box(self, min_x: float, min_y: float, max_x: float, max_y: float) -> np.ndarray:
+        """
+        Returns:
+            np.ndarray: The indices of the obstacles whose footprint bounds overlap the box
+        """
+        return self.tree.query_box(min_x, min_y, max_x, max_y)
+
+    def obstacles_at(self, x: float, y: float) -> np.ndarray:
+        """
+        Returns:
+            np.ndarray: The indices of the obstacles whose footprint bounds contain the point (x, y)
+        """
+        return self.tree.query_point(x, y)
+
+    def save(self, path: str):
+        """
+        Method that saves the map into a (compressed) npz file, read back with from_file (or as a plain occupancy map
+        with OccupancyMap.from_file).
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        # Written to a temporary file first, such that a map being saved is never read half written
+        tmp_path = path + ".tmp.npz"
+        occupancy = self.occupancy
+        np.savez_compressed(
+            tmp_path,
+            grid=occupancy.grid,
+            resolution=occupancy.resolution,
+            origin=occupancy.origin,
+            outside_occupied=occupancy.outside_occupied,
+            boxes=self._boxes,
+            names=np.array(self._names, dtype=str),
+            kinds=np.array(self._kinds, dtype=str),
+            levels=len(self._levels),
+            metadata=json.dumps(self.metadata),
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def from_file(cls, path: str) -> "EnvironmentMap":
+        """
+        Method that loads a map saved with save, or any occupancy map OccupancyMap.from_file reads (without obstacles).
+
+        Args:
+            path (str): The path of the map file.
+
+        Returns:
+            EnvironmentMap: The loaded map
+        """
+        if path.endswith(".npz"):
+            with np.load(path) as data:
+                if "boxes" in data:
+                    occupancy = OccupancyMap(data["grid"], float(data["resolution"]), data["origin"], bool(data["outside_occupied"]))
+                    return cls(
+                        occupancy,
+                        data["boxes"],
+                        data["names"].tolist(),
+                        data["kinds"].tolist(),
+                        int(data["levels"]),
+                        json.loads(str(data["metadata"])),
+                    )
+
+        return cls(OccupancyMap.from_file(path))
+
+
+def extract_environment_map(
+    stage,
+    root_path: str = "/World/layout",
+    resolution: float = 0.05,
+    height_range: Tuple[float, float] = (0.05, 2.5),
+    levels: int = 4,
+    padding: float = 1.0,
+    max_coverage: float = 0.5,
+    keywords: Sequence[str] = OBSTACLE_KEYWORDS,
+) -> EnvironmentMap:
+    """
+    Function that projects the static geometry under root_path on the floor. Every visible prim whose name contains one
+    of the keywords becomes one obstacle (its oriented bounding box), unless it is a group of prims that match too (then
+    each of them is an obstacle), and the rest of the geometry contributes one obstacle per mesh. Only the geometry within the height range can block a forklift, so the floor and the ceiling are left out,
+    as are single meshes covering more than max_coverage of the environment (e.g. the shell of the building).
+
+    Args:
+        stage (Usd.Stage): The stage the environment is loaded in.
+        root_path (str): The path of the prim the environment was loaded under. Defaults to "/World/layout".
+        resolution (float): The size (in meters) of the cells of the finest grid. Defaults to 0.05.
+        height_range (tuple): The (min, max) height (in meters) of the geometry that blocks a vehicle. Defaults to
+            (0.05, 2.5).
+        levels (int): The number of resolutions of the grid. Defaults to 4.
+        padding (float): The free margin (in meters) added around the environment. Defaults to 1.0.
+        max_coverage (float): The largest fraction of the floor a single obstacle may cover. Defaults to 0.5.
+        keywords (Sequence[str]): The (lower case) words that make a prim a single obstacle. Defaults to
+            OBSTACLE_KEYWORDS.
+
+    Returns:
+        EnvironmentMap: The map of the environment
+    """
+    from pxr import Usd, UsdGeom
+
+    root = stage.GetPrimAtPath(root_path)
+    if not root:
+        raise ValueError("There is no environment loaded at " + root_path)
+
+    start = time.perf_counter()
+    meters_per_unit = UsdGeom.GetStageMetersPerUnit(stage)
+    if UsdGeom.GetStageUpAxis(stage) != UsdGeom.Tokens.z:
+        logger.warning("The stage is not Z up, the environment map of %s is projected on its XY plane", root_path)
+
+    bbox_cache = UsdGeom.BBoxCache(Usd.TimeCode.Default(), [UsdGeom.Tokens.default_], useExtentsHint=True)
+    extent = bbox_cache.ComputeWorldBound(root).ComputeAlignedRange()
+    if extent.IsEmpty():
+        raise ValueError("The environment at " + root_path + " has no geometry")
+
+    min_x, min_y = extent.GetMin()[0] * meters_per_unit - padding, extent.GetMin()[1] * meters_per_unit - padding
+    max_x, max_y = extent.GetMax()[0] * meters_per_unit + padding, extent.GetMax()[1] * meters_per_unit + padding
+    floor_area = (max_x - min_x) * (max_y - min_y)
+
+    footprints, names, kinds = [], [], []
+    iterator = iter(Usd.PrimRange(root, Usd.TraverseInstanceProxies()))
+    for prim in iterator:
+        if not prim.IsA(UsdGeom.Imageable):
+            iterator.PruneChildren()
+            continue
+        if UsdGeom.Imageable(prim).ComputeVisibility() == UsdGeom.Tokens.invisible:
+            iterator.PruneChildren()
+            continue
+
+        name = prim.GetName().lower()
+        kind = next((keyword for keyword in keywords if keyword in name), "")
+        if kind and not prim.IsA(UsdGeom.Gprim) and _has_keyword_descendant(prim, keywords):
+            # (a group of obstacles, e.g. "Racks" or "Walls": its bounding box would cover the aisles between them)
+            continue
+        if kind:
+            iterator.PruneChildren()
+        elif not prim.IsA(UsdGeom.Gprim):
+            continue
+
+        bound = bbox_cache.ComputeWorldBound(prim)
+        local_range = bound.GetRange()
+        if local_range.IsEmpty():
+            continue
+
+        corners = _box_corners(local_range.GetMin(), local_range.GetMax(), np.array(bound.GetMatrix())) * meters_per_unit
+        if corners[:, 2].max() < height_range[0] or corners[:, 2].min() > height_range[1]:
+            continue
+
+        footprint = _convex_hull(corners[:, :2])
+        if _polygon_area(footprint) > max_coverage * floor_area:
+            logger.info("Skipping %s, it covers most of the environment", prim.GetPath())
+            continue
+
+        footprints.append(footprint)
+        names.append(str(prim.GetPath()))
+        kinds.append(kind)
+
+    shape = (int(np.ceil((max_y - min_y) / resolution)), int(np.ceil((max_x - min_x) / resolution)))
+    grid = np.zeros(shape, dtype=bool)
+    for footprint in footprints:
+        _rasterize(grid, (min_x, min_y), resolution, footprint)
+
+    boxes = np.array([np.concatenate((f.min(axis=0), f.max(axis=0))) for f in footprints]).reshape(-1, 4)
+    metadata = {
+        "root_path": root_path,
+        "resolution": resolution,
+        "height_range": list(height_range),
+        "extract_time": time.perf_counter() - start,
+        "created": time.time(),
+    }
+
+    logger.info(
+        "Extracted %d obstacles of %s into a %dx%d grid in %.2fs", len(boxes), root_path, shape[1], shape[0], metadata["extract_time"]
+    )
+    return EnvironmentMap(OccupancyMap(grid, resolution, (min_x, min_y)), boxes, names, kinds, levels, metadata)
+
+
+class EnvironmentMapCache:
+    """
+    Extracting the map of a large environment takes a few seconds, so each map is extracted once and kept on disk, as
+    <cache_dir>/<environment>.npz (with the environment key in lower case and spaces replaced by underscores), and in
+    memory. A map is extracted again when the asset or the extraction parameters change.
+    """
+
+    def __init__(self, cache_dir: str, resolution: float = 0.05, height_range: Tuple[float, float] = (0.05, 2.5), levels: int = 4, asset_cache=None):
+        """
+        Args:
+            cache_dir (str): The directory where the maps are stored.
+            resolution (float): The size (in meters) of the cells of the finest grid. Defaults to 0.05.
+            height_range (tuple): The (min, max) height (in meters) of the geometry that blocks a vehicle.
+            levels (int): The number of resolutions of the grids. Defaults to 4.
+            asset_cache (AssetCache): The local mirror of the assets, used to detect that an environment changed.
+        """
+        self._cache_dir = cache_dir
+        self._parameters = {"resolution": resolution, "height_range": list(height_range), "levels": levels}
+        self._asset_cache = asset_cache
+        self._maps: Dict[str, EnvironmentMap] = {}
+
+        # Lock for safe multi-threading
+        self._lock = threading.Lock()
+
+    def path(self, environment: str) -> str:
+        """
+        Returns:
+            str: The path of the file of the map of an environment
+        """
+        return os.path.join(self._cache_dir, environment_slug(environment) + ".npz")
+
+    def key(self, usd_path: str) -> str:
+        """
+        Returns:
+            str: The key of the map of an environment (changes when the asset or the extraction parameters do)
+        """
+        asset_hash = self._asset_cache.content_hash(usd_path) if self._asset_cache is not None else None
+        source = json.dumps(dict(self._parameters, asset=asset_hash or usd_path), sort_keys=True)
+        return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+    def get(self, environment: str, stage=None, root_path: str = "/World/layout", usd_path: Optional[str] = None) -> Optional[EnvironmentMap]:
+        """
+        Method that returns the map of an environment, from memory, from the disk or extracted from the stage (and then
+        saved).
+
+        Args:
+            environment (str): The key of the environment (e.g. in SIMULATION_ENVIRONMENTS).
+            stage (Usd.Stage): The stage the environment is loaded in (None to only read the cached maps).
+            root_path (str): The path of the prim the environment was loaded under. Defaults to "/World/layout".
+            usd_path (str): The path or url of the environment (defaults to the environment key).
+
+        Returns:
+            EnvironmentMap: The map of the environment (None if it is not cached and no stage was given)
+        """
+        key = self.key(usd_path or environment)
+
+        with self._lock:
+            environment_map = self._maps.get(environment)
+        if environment_map is not None and environment_map.metadata.get("key") == key:
+            return environment_map
+
+        path = self.path(environment)
+        if os.path.isfile(path):
+            try:
+                environment_map = EnvironmentMap.from_file(path)
+            except (OSError, ValueError) as e:
+                logger.warning("Could not read the environment map %s: %s", path, e)
+                environment_map = None
+
+        if environment_map is None or environment_map.metadata.get("key") != key:
+            if stage is None:
+                return None
+
+            environment_map = extract_environment_map(stage, root_path, **self._extraction_parameters())
+            environment_map.metadata.update(key=key, environment=environment)
+            try:
+                environment_map.save(path)
+            except OSError as e:
+                logger.warning("Could not save the environment map %s: %s", path, e)
+
+        with self._lock:
+            self._maps[environment] = environment_map
+        return environment_map
+
+    def load(self, environment: str, usd_path: str, root_path: Optional[str] = None) -> EnvironmentMap:
+        """
+        Method that returns the map of an environment, from memory, from the disk or extracted from a stage of its own,
+        opened on the USD file of the environment (its local mirror when there is an asset cache). Unlike get, it never
+        reads the stage of the simulation, so it can run in a worker thread.
+
+        Args:
+            environment (str): The key of the environment (e.g. in SIMULATION_ENVIRONMENTS).
+            usd_path (str): The path or url of the environment.
+            root_path (str): The path of the root prim of the environment in its file (defaults to the default prim).
+
+        Returns:
+            EnvironmentMap: The map of the environment
+        """
+        environment_map = self.get(environment, usd_path=usd_path)
+        if environment_map is not None:
+            return environment_map
+
+        from pxr import Usd
+
+        local_path = self._asset_cache.localize(usd_path) if self._asset_cache is not None else usd_path
+        stage = Usd.Stage.Open(local_path)
+        if root_path is None:
+            root_path = str(stage.GetDefaultPrim().GetPath() if stage.GetDefaultPrim() else "/")
+        return self.get(environment, stage, root_path, usd_path=usd_path)
+
+    def invalidate(self, environment: str):
+        """
+        Method that forgets the map of an environment (it is extracted again on its next get)
+        """
+        with self._lock:
+            self._maps.pop(environment, None)
+        try:
+            os.remove(self.path(environment))
+        except OSError:
+            pass
+
+    """
+    ---------------------------------------------------------------------
+    Auxiliary methods
+    ---------------------------------------------------------------------
+    """
+
+    def _extraction_parameters(self) -> Dict:
+        return {
+            "resolution": self._parameters["resolution"],
+            "height_range": tuple(self._parameters["height_range"]),
+            "levels": self._parameters["levels"],
+        }
+
+
+def environment_slug(environment: str) -> str:
+    """
+    Returns:
+        str: The name of the map files of an environment (its key in lower case, with spaces replaced by underscores)
+    """
+    return environment.lower().replace(" ", "_")
+
+
+def environment_key(usd_path: str) -> str:
+    """
+    Args:
+        usd_path (str): The path or url an environment was loaded from.
+
+    Returns:
+        str: The key of the environment in SIMULATION_ENVIRONMENTS (without resolving it), or the file name of the
+            environment without its extension
+    """
+    for name in SIMULATION_ENVIRONMENTS:
+        if usd_path.endswith(SIMULATION_ENVIRONMENTS.unresolved(name)):
+            return name
+
+    return os.path.splitext(os.path.basename(usd_path))[0]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Extract the 2D map of an environment from its USD file (e.g. for the lite backend)")
+    parser.add_argument("usd_path", help="path of the USD file of the environment")
+    parser.add_argument("--environment", default=None, help="key of the environment (defaults to its key in SIMULATION_ENVIRONMENTS)")
+    parser.add_argument("--root", default=None, help="path of the root prim of the environment (defaults to the default prim)")
+    parser.add_argument("--resolution", type=float, default=ENVIRONMENT_MAP_RESOLUTION, help="cell size (in meters) of the finest grid")
+    parser.add_argument("--levels", type=int, default=ENVIRONMENT_MAP_LEVELS, help="number of resolutions of the grid")
+    parser.add_argument("--output", default=ENVIRONMENT_MAPS_PATH, help="folder where the map is written")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    environment = args.environment or environment_key(args.usd_path)
+
+    cache = EnvironmentMapCache(args.output, args.resolution, ENVIRONMENT_MAP_HEIGHT_RANGE, args.levels)
+    cache.invalidate(environment)
+    environment_map = cache.load(environment, args.usd_path, args.root)
+
+    print("{}: {} obstacles, {}x{} cells, written to {}".format(
+        environment, len(environment_map.boxes), environment_map.occupancy.shape[1], environment_map.occupancy.shape[0], cache.path(environment)
+    ))
+    return 0
+
+
+def _has_keyword_descendant(prim, keywords: Sequence[str]) -> bool:
+    # Whether a name under the prim (the prim itself left out) contains one of the keywords
+    from pxr import Usd
+
+    iterator = iter(Usd.PrimRange(prim, Usd.TraverseInstanceProxies()))
+    next(iterator)
+    return any(any(keyword in descendant.GetName().lower() for keyword in keywords) for descendant in iterator)
+
+
+def _box_corners(low, high, matrix: np.ndarray) -> np.ndarray:
+    # The 8 corners of a box in its local frame, transformed by a USD (row vector) matrix
+    xs, ys, zs = np.meshgrid([low[0], high[0]], [low[1], high[1]], [low[2], high[2]], indexing="ij")
+    corners = np.column_stack((xs.ravel(), ys.ravel(), zs.ravel(), np.ones(8)))
+    return (corners @ matrix)[:, :3]
+
+
+def _convex_hull(points: np.ndarray) -> np.ndarray:
+    # Andrew's monotone chain, counter-clockwise (the projection of a box has at most 6 corners)
+    points = np.unique(points, axis=0)
+    if len(points) < 3:
+        return points
+
+    def half(sequence):
+        hull = []
+        for point in sequence:
+            while len(hull) >= 2 and _cross(hull[-2], hull[-1], point) <= 0:
+                hull.pop()
+            hull.append(point)
+        return hull[:-1]
+
+    return np.array(half(points) + half(points[::-1]))
+
+
+def _cross(o, a, b) -> float:
+    return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+
+def _polygon_area(polygon: np.ndarray) -> float:
+    if len(polygon) < 3:
+        return 0.0
+    x, y = polygon[:, 0], polygon[:, 1]
+    return 0.5 * abs(float(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1))))
+
+
+def _rasterize(grid: np.ndarray, origin, resolution: float, polygon: np.ndarray):
+    # Marks the cells touched by a convex (counter-clockwise) polygon: their center is inside, or within half a cell of
+    # each edge, so thin obstacles (e.g. the uprights of a rack) never fall between cell centers
+    low = np.floor((polygon.min(axis=0) - origin) / resolution).astype(np.int64)
+    high = np.floor((polygon.max(axis=0) - origin) / resolution).astype(np.int64)
+    c0, r0 = np.maximum(low, 0)
+    c1, r1 = np.minimum(high, (grid.shape[1] - 1, grid.shape[0] - 1))
+    if c1 < c0 or r1 < r0:
+        return
+
+    xs = origin[0] + (np.arange(c0, c1 + 1) + 0.5) * resolution
+    ys = origin[1] + (np.arange(r0, r1 + 1) + 0.5) * resolution
+    inside = np.ones((len(ys), len(xs)), dtype=bool)
+
+    if len(polygon) >= 3:
+        margin = 0.5 * resolution
+        for start, end in zip(polygon, np.roll(polygon, -1, axis=0)):
+            edge = end - start
+            length = np.hypot(edge[0], edge[1])
+            if length == 0.0:
+                continue
+            # Signed distance of the cell centers to the edge (positive on the inner side)
+            distance = (edge[0] * (ys[:, None] - start[1]) - edge[1] * (xs[None, :] - start[0])) / length
+            inside &= distance >= -margin
+
+    grid[r0 : r1 + 1, c0 : c1 + 1] |= inside
+
+
+if __name__ == "__main__":
+    sys.exit(main())
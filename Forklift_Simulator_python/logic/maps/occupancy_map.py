@@ -0,0 +1,302 @@
+"""
+| File: occupancy_map.py
+| Author: Akhilesh Bhat
+| Description: Definition of the OccupancyMap class, a 2D occupancy grid of a warehouse (loaded from ROS map_server
+                 yaml/pgm files or saved as npz) with vectorized point and box queries
+"""
+
+__all__ = ["OccupancyMap"]
+
+import os
+import math
+import logging
+from typing import Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class OccupancyMap:
+    """
+    2D occupancy grid: cell (row, column) covers [origin_x + column * resolution, origin_x + (column + 1) * resolution) x
+    [origin_y + row * resolution, origin_y + (row + 1) * resolution) of the ground plane, with row 0 at the lowest y.
+    Points outside the grid are free (or occupied, if outside_occupied is set).
+    """
+
+    def __init__(self, grid: np.ndarray, resolution: float, origin=(0.0, 0.0), outside_occupied: bool = False):
+        """
+        Args:
+            grid (np.ndarray): A (rows, columns) array, True (or non-zero) where the cell is occupied.
+            resolution (float): The size (in meters) of a cell.
+            origin (tuple): The [x, y] position (in meters) of the corner of cell (0, 0). Defaults to (0.0, 0.0).
+            outside_occupied (bool): Whether the points outside the grid are occupied. Defaults to False.
+        """
+        self._grid = np.ascontiguousarray(grid, dtype=bool)
+        self._resolution = float(resolution)
+        self._origin = np.asarray(origin[:2], dtype=np.float64)
+        self.outside_occupied = outside_occupied
+
+        # Summed-area table of the grid (computed on the first box query)
+        self._integral: Optional[np.ndarray] = None
+
+    @classmethod
+    def empty(cls) -> "OccupancyMap":
+        """
+        Returns:
+            OccupancyMap: A map where every point is free
+        """
+        return cls(np.zeros((1, 1), dtype=bool), 1.0)
+
+    @property
+    def grid(self) -> np.ndarray:
+        return self._grid
+
+    @property
+    def resolution(self) -> float:
+        return self._resolution
+
+    @property
+    def origin(self) -> np.ndarray:
+        return self._origin
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self._grid.shape
+
+    @property
+    def bounds(self) -> Tuple[float, float, float, float]:
+        """
+        Returns:
+            tuple: The (min_x, min_y, max_x, max_y) extent (in meters) of the grid
+        """
+        rows, columns = self._grid.shape
+        return (
+            float(self._origin[0]),
+            float(self._origin[1]),
+            float(self._origin[0] + columns * self._resolution),
+            float(self._origin[1] + rows * self._resolution),
+        )
+
+    def world_to_cell(self, points) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Args:
+            points: An (N, 2) (or (N, 3)) array of positions (in meters).
+
+        Returns:
+            tuple: The (rows, columns) integer indices of the cells of the points (possibly outside the grid)
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, np.shape(points)[-1])
+        columns = np.floor((points[:, 0] - self._origin[0]) / self._resolution).astype(np.int64)
+        rows = np.floor((points[:, 1] - self._origin[1]) / self._resolution).astype(np.int64)
+        return rows, columns
+
+    def is_occupied(self, points) -> np.ndarray:
+        """
+        Args:
+            points: An (N, 2) (or (N, 3)) array of positions (in meters).
+
+        Returns:
+            np.ndarray: An (N,) boolean array, True where the point is in an occupied cell
+        """
+        rows, columns = self.world_to_cell(points)
+        inside = (rows >= 0) & (rows < self._grid.shape[0]) & (columns >= 0) & (columns < self._grid.shape[1])
+
+        occupied = np.full(len(rows), self.outside_occupied, dtype=bool)
+        occupied[inside] = self._grid[rows[inside], columns[inside]]
+        return occupied
+
+    def count_occupied(self, min_x: float, min_y: float, max_x: float, max_y: float) -> int:
+        """
+        Args:
+            min_x, min_y, max_x, max_y (float): The bounds (in meters) of an axis-aligned box.
+
+        Returns:
+            int: The number of occupied cells overlapping the box (in constant time, from the summed-area table)
+        """
+        # Scalar version of count_occupied_boxes (a single query is dominated by the NumPy call overheads otherwise)
+        integral = self._integral_image()
+        rows, columns = self._grid.shape
+        r0 = min(max(math.floor((min_y - self._origin[1]) / self._resolution), 0), rows)
+        c0 = min(max(math.floor((min_x - self._origin[0]) / self._resolution), 0), columns)
+        r1 = max(min(max(math.floor((max_y - self._origin[1]) / self._resolution) + 1, 0), rows), r0)
+        c1 = max(min(max(math.floor((max_x - self._origin[0]) / self._resolution) + 1, 0), columns), c0)
+        return int(integral[r1, c1] - integral[r0, c1] - integral[r1, c0] + integral[r0, c0])
+
+    def box_occupied(self, min_x: float, min_y: float, max_x: float, max_y: float) -> bool:
+        """
+        Returns:
+            bool: Whether any occupied cell (or the outside of the grid, if outside_occupied) overlaps the box
+        """
+        if self.outside_occupied:
+            bounds = self.bounds
+            if min_x < bounds[0] or min_y < bounds[1] or max_x >= bounds[2] or max_y >= bounds[3]:
+                return True
+        return self.count_occupied(min_x, min_y, max_x, max_y) > 0
+
+    def count_occupied_boxes(self, boxes) -> np.ndarray:
+        """
+        Args:
+            boxes: An (N, 4) array of [min_x, min_y, max_x, max_y] boxes (in meters).
+
+        Returns:
+            np.ndarray: The number of occupied cells overlapping each box
+        """
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        integral = self._integral_image()
+
+        rows, columns = self._grid.shape
+        low_rows, low_columns = self.world_to_cell(boxes[:, :2])
+        high_rows, high_columns = self.world_to_cell(boxes[:, 2:])
+
+        # Cell ranges [low, high] clamped to the grid (empty when the box is entirely outside)
+        r0, c0 = np.clip(low_rows, 0, rows), np.clip(low_columns, 0, columns)
+        r1, c1 = np.clip(high_rows + 1, 0, rows), np.clip(high_columns + 1, 0, columns)
+        r1, c1 = np.maximum(r1, r0), np.maximum(c1, c0)
+        return integral[r1, c1] - integral[r0, c1] - integral[r1, c0] + integral[r0, c0]
+
+    def boxes_occupied(self, boxes) -> np.ndarray:
+        """
+        Args:
+            boxes: An (N, 4) array of [min_x, min_y, max_x, max_y] boxes (in meters).
+
+        Returns:
+            np.ndarray: An (N,) boolean array, True where an occupied cell (or the outside of the grid, if
+                outside_occupied) overlaps the box
+        """
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        occupied = self.count_occupied_boxes(boxes) > 0
+
+        if self.outside_occupied:
+            min_x, min_y, max_x, max_y = self.bounds
+            occupied |= (boxes[:, 0] < min_x) | (boxes[:, 1] < min_y) | (boxes[:, 2] >= max_x) | (boxes[:, 3] >= max_y)
+
+        return occupied
+
+    def coarsen(self, factor: int = 2) -> "OccupancyMap":
+        """
+        Args:
+            factor (int): The number of cells (along each axis) merged into a cell of the new map. Defaults to 2.
+
+        Returns:
+            OccupancyMap: A map with cells factor times larger, occupied if any of the cells they cover is occupied
+        """
+        rows, columns = self._grid.shape
+        padded = np.zeros((-(-rows // factor) * factor, -(-columns // factor) * factor), dtype=bool)
+        padded[:rows, :columns] = self._grid
+
+        grid = padded.reshape(padded.shape[0] // factor, factor, padded.shape[1] // factor, factor).any(axis=(1, 3))
+        return OccupancyMap(grid, self._resolution * factor, self._origin, self.outside_occupied)
+
+    def save(self, path: str):
+        """
+        Method that saves the map into a (compressed) npz file, read back with from_file.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        np.savez_compressed(
+            path,
+            grid=self._grid,
+            resolution=self._resolution,
+            origin=self._origin,
+            outside_occupied=self.outside_occupied,
+        )
+
+    @classmethod
+    def from_file(cls, path: str) -> "OccupancyMap":
+        """
+        Method that loads a map saved with save (.npz), or a ROS map_server map (.yaml, with a pgm or npy image; png
+        images require Pillow).
+
+        Args:
+            path (str): The path of the map file.
+
+        Returns:
+            OccupancyMap: The loaded map
+        """
+        if path.endswith(".npz"):
+            with np.load(path) as data:
+                return cls(data["grid"], float(data["resolution"]), data["origin"], bool(data["outside_occupied"]))
+
+        if path.endswith(".yaml") or path.endswith(".yml"):
+            return cls._from_ros_map(path)
+
+        raise ValueError("Unsupported occupancy map file " + path + ", expected a .npz or .yaml file")
+
+    """
+    ---------------------------------------------------------------------
+    Auxiliary methods
+    ---------------------------------------------------------------------
+    """
+
+    def _integral_image(self) -> np.ndarray:
+        # Summed-area table, with a leading row and column of zeros: integral[r, c] = number of occupied cells in [0, r) x [0, c)
+        if self._integral is None:
+            self._integral = np.zeros((self._grid.shape[0] + 1, self._grid.shape[1] + 1), dtype=np.int64)
+            np.cumsum(np.cumsum(self._grid, axis=0), axis=1, out=self._integral[1:, 1:])
+        return self._integral
+
+    @classmethod
+    def _from_ros_map(cls, path: str) -> "OccupancyMap":
+        # yaml is only imported when a map is loaded (it is slow to import at startup)
+        import yaml
+
+        with open(path) as f:
+            description = yaml.safe_load(f)
+
+        image_path = os.path.join(os.path.dirname(os.path.abspath(path)), description["image"])
+        image = _read_image(image_path).astype(np.float64)
+        if image.ndim == 3:
+            image = image[..., :3].mean(axis=2)
+
+        # map_server convention: occupancy = (255 - value) / 255, unless negated
+        occupancy = image / 255.0 if description.get("negate", 0) else (255.0 - image) / 255.0
+        grid = occupancy > float(description.get("occupied_thresh", 0.65))
+
+        # Row 0 of the image is the top (highest y) of the map
+        origin = description.get("origin", [0.0, 0.0, 0.0])
+        if len(origin) > 2 and origin[2] != 0.0:
+            logger.warning("Ignoring the rotation of the map %s", path)
+
+        return cls(grid[::-1], float(description["resolution"]), origin[:2])
+
+
+def _read_image(path: str) -> np.ndarray:
+    if path.endswith(".npy"):
+        return np.load(path)
+
+    if path.endswith(".pgm"):
+        with open(path, "rb") as f:
+            data = f.read()
+        return _parse_pgm(data)
+
+    try:
+        from PIL import Image
+    except ImportError as e:
+        raise ImportError("Reading " + path + " requires Pillow (only pgm and npy maps are supported without it)") from e
+
+    with Image.open(path) as image:
+        return np.asarray(image)
+
+
+def _parse_pgm(data: bytes) -> np.ndarray:
+    # Binary (P5) pgm: magic, width, height and maximum value separated by whitespace (and comments), then the pixels
+    fields, position = [], 0
+    while len(fields) < 4:
+        while data[position : position + 1].isspace():
+            position += 1
+        if data[position : position + 1] == b"#":
+            position = data.index(b"\n", position) + 1
+            continue
+        end = position
+        while not data[end : end + 1].isspace():
+            end += 1
+        fields.append(data[position:end])
+        position = end
+
+    if fields[0] != b"P5":
+        raise ValueError("Only binary (P5) pgm maps are supported")
+
+    width, height, max_value = int(fields[1]), int(fields[2]), int(fields[3])
+    dtype = np.uint8 if max_value < 256 else np.dtype(">u2")
+    pixels = np.frombuffer(data, dtype=dtype, count=width * height, offset=position + 1).reshape(height, width)
+    return pixels.astype(np.float64) * (255.0 / max_value)
@@ -0,0 +1,159 @@
+"""
+| File: spatial_index.py
+| Author: Akhilesh Bhat
+| Description: Definition of the BoxTree class, a static R-tree (packed with the Sort-Tile-Recursive algorithm) of the
+                 2D bounding boxes of the obstacles of an environment, with point and box queries
+"""
+
+__all__ = ["BoxTree"]
+
+import math
+from typing import Dict, List
+
+import numpy as np
+
+_SIGNS = np.array([1.0, 1.0, -1.0, -1.0])
+
+
+class BoxTree:
+    """
+    Static R-tree of axis-aligned 2D boxes, [min_x, min_y, max_x, max_y] each. The tree is bulk loaded once with the
+    Sort-Tile-Recursive algorithm (boxes sorted into vertical slices by x, then into runs of node_size boxes by y, and
+    the same again for every level of nodes), which gives nodes that barely overlap, so a query only visits the few
+    nodes on its way to the boxes it hits. Every level is kept as flat NumPy arrays: the bounds of its nodes and the
+    [start, end) range of their children in the level below.
+    """
+
+    def __init__(self, boxes, node_size: int = 16):
+        """
+        Args:
+            boxes: An (N, 4) array of [min_x, min_y, max_x, max_y] boxes.
+            node_size (int): The maximum number of children of a node. Defaults to 16.
+        """
+        self._boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        self._node_size = max(int(node_size), 2)
+
+        # Level 0 are the boxes themselves (in packing order), the last level is the root
+        order = BoxTree._pack(self._boxes, self._node_size)
+        self._ids = order
+        self._bounds: List[np.ndarray] = [self._boxes[order]]
+        self._starts: List[np.ndarray] = [np.zeros(0, dtype=np.int64)]
+        self._ends: List[np.ndarray] = [np.zeros(0, dtype=np.int64)]
+
+        while len(self._bounds[-1]) > 1:
+            self._build_level()
+
+        # Bounds stored as [min_x, min_y, -max_x, -max_y], so overlapping a box is a single comparison per level
+        self._keys = [bounds * _SIGNS for bounds in self._bounds]
+
+    @property
+    def boxes(self) -> np.ndarray:
+        return self._boxes
+
+    @property
+    def depth(self) -> int:
+        return len(self._bounds)
+
+    def __len__(self) -> int:
+        return len(self._boxes)
+
+    def query_box(self, min_x: float, min_y: float, max_x: float, max_y: float) -> np.ndarray:
+        """
+        Args:
+            min_x, min_y, max_x, max_y (float): The bounds of the query box.
+
+        Returns:
+            np.ndarray: The (sorted) indices of the boxes that overlap the query box (touching counts as overlapping)
+        """
+        if len(self._boxes) == 0:
+            return np.zeros(0, dtype=np.int64)
+
+        root = self._bounds[-1][0]
+        if root[0] > max_x or root[2] < min_x or root[1] > max_y or root[3] < min_y:
+            return np.zeros(0, dtype=np.int64)
+        if len(self._bounds) == 1:
+            return self._ids.copy()
+
+        query = np.array([max_x, max_y, -min_x, -min_y])
+        hits = []
+        stack = [(len(self._bounds) - 1, 0)]
+        while stack:
+            level, node = stack.pop()
+            start, end = self._starts[level][node], self._ends[level][node]
+            overlap = np.flatnonzero((self._keys[level - 1][start:end] <= query).all(axis=1))
+            if level == 1:
+                hits.append(self._ids[start + overlap])
+            else:
+                stack.extend((level - 1, child) for child in (start + overlap).tolist())
+
+        if not hits:
+            return np.zeros(0, dtype=np.int64)
+        return np.sort(np.concatenate(hits))
+
+    def query_point(self, x: float, y: float) -> np.ndarray:
+        """
+        Returns:
+            np.ndarray: The (sorted) indices of the boxes that contain the point (x, y)
+        """
+        return self.query_box(x, y, x, y)
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """
+        Returns:
+            dict: The arrays the tree is rebuilt from with from_arrays (e.g. to save it along with a map)
+        """
+        return {"boxes": self._boxes, "node_size": np.array(self._node_size)}
+
+    @classmethod
+    def from_arrays(cls, arrays) -> "BoxTree":
+        return cls(arrays["boxes"], int(arrays["node_size"]))
+
+    """
+    ---------------------------------------------------------------------
+    Auxiliary methods
+    ---------------------------------------------------------------------
+    """
+
+    def _build_level(self):
+        # Group the nodes of the current top level into parents (reordering them, so each parent's children are contiguous)
+        children = self._bounds[-1]
+        order = BoxTree._pack(children, self._node_size)
+
+        self._bounds[-1] = children[order]
+        if len(self._bounds) > 1:
+            self._starts[-1] = self._starts[-1][order]
+            self._ends[-1] = self._ends[-1][order]
+        else:
+            self._ids = self._ids[order]
+
+        starts = np.arange(0, len(children), self._node_size, dtype=np.int64)
+        ends = np.minimum(starts + self._node_size, len(children))
+
+        sorted_bounds = self._bounds[-1]
+        bounds = np.column_stack((
+            np.minimum.reduceat(sorted_bounds[:, 0], starts),
+            np.minimum.reduceat(sorted_bounds[:, 1], starts),
+            np.maximum.reduceat(sorted_bounds[:, 2], starts),
+            np.maximum.reduceat(sorted_bounds[:, 3], starts),
+        ))
+
+        self._bounds.append(bounds)
+        self._starts.append(starts)
+        self._ends.append(ends)
+
+    @staticmethod
+    def _pack(boxes: np.ndarray, node_size: int) -> np.ndarray:
+        # Sort-Tile-Recursive order: vertical slices of slice_size boxes (by x center), each sorted by y center
+        count = len(boxes)
+        if count == 0:
+            return np.zeros(0, dtype=np.int64)
+
+        centers = (boxes[:, :2] + boxes[:, 2:]) * 0.5
+        slices = math.ceil(math.sqrt(math.ceil(count / node_size)))
+        slice_size = slices * node_size
+
+        order = np.argsort(centers[:, 0], kind="stable")
+        for start in range(0, count, slice_size):
+            part = order[start : start + slice_size]
+            order[start : start + slice_size] = part[np.argsort(centers[part, 1], kind="stable")]
+        return order
@@ -0,0 +1,420 @@
+"""
+| File: spawn_placer.py
+| Author: Akhilesh Bhat
+| Description: Definition of the SpawnPlacer class, that checks the spawn poses of the vehicles against the environment
+                 map and the vehicles already spawned, and places whole fleets on free, well spaced poses (Poisson-disk
+                 sampling)
+"""
+
+__all__ = ["SpawnPlacer", "fleet_poses"]
+
+import math
+import logging
+from typing import Optional
+
+import numpy as np
+
+from Forklift_Simulator_python.logic.maps.environment_map import EnvironmentMap
+from Forklift_Simulator_python.logic.maps.spatial_index import BoxTree
+from Forklift_Simulator_python.logic.vehicles.vehicle_configs import VehicleConfig
+
+logger = logging.getLogger(__name__)
+
+
+class SpawnPlacer:
+    """
+    Checks [x, y, heading] spawn poses (the middle of the front axle and the yaw, in meters and radians) of a vehicle
+    model: its footprint (a rectangle from the vehicle configuration, grown by the clearance on every side) must not
+    overlap an occupied cell of the environment map nor the footprint of another vehicle. Optionally, the square of half
+    width free_radius around the pose must be free too (e.g. the free half width of a roadmap, such that the vehicles
+    start where a navigator can turn them).
+
+    Checking many poses is vectorized and coarse to fine: the bounds of each footprint are checked against the summed-area
+    table of the map (constant time per pose, and exact for axis-aligned headings), then the bounds of small tiles of the
+    footprints whose bounds hit an obstacle, and only the footprints with a tile on an obstacle are checked cell by cell.
+    The footprints of the other vehicles are indexed with an R-tree, and overlaps are resolved with the separating axis
+    test.
+    """
+
+    # Result of check for each pose
+    VALID = 0
+    OBSTACLE = 1
+    VEHICLE = 2
+
+    # Number of candidates tried around each sample before it is retired (Bridson's k)
+    SAMPLING_ATTEMPTS = 30
+
+    # Size (in meters) of the tiles of the footprint checked before the cells
+    TILE_SIZE = 0.5
+
+    def __init__(self, environment_map: EnvironmentMap, config: VehicleConfig, clearance: float = 0.3, vehicles=None, free_radius: float = 0.0):
+        """
+        Args:
+            environment_map (EnvironmentMap): The map of the environment.
+            config (VehicleConfig): The configuration of the vehicle model (its length, width and front_length).
+            clearance (float): The free margin (in meters) required around the footprint. Defaults to 0.3.
+            vehicles: An (M, 3) array of the [x, y, heading] poses of the vehicles already spawned (assumed to have the
+                same footprint). Defaults to None.
+            free_radius (float): The half width (in meters) of the square around the pose that must be free. Defaults to
+                0.0 (only the footprint is checked).
+        """
+        self._map = environment_map
+        self._clearance = clearance
+        self._free_radius = free_radius
+
+        # Half extents of the (grown) footprint, and offset of its center ahead of the pose
+        self._half_length = 0.5 * config.length + clearance
+        self._half_width = 0.5 * config.width + clearance
+        self._center_offset = config.front_length - 0.5 * config.length
+        self._radius = math.hypot(self._half_length, self._half_width)
+
+        # Centers (in the vehicle frame) and half extents of the tiles of the footprint
+        tiles_x = max(int(math.ceil(2 * self._half_length / SpawnPlacer.TILE_SIZE)), 1)
+        tiles_y = max(int(math.ceil(2 * self._half_width / SpawnPlacer.TILE_SIZE)), 1)
+        self._tile_half_length, self._tile_half_width = self._half_length / tiles_x, self._half_width / tiles_y
+        xs = -self._half_length + (2 * np.arange(tiles_x) + 1) * self._tile_half_length + self._center_offset
+        ys = -self._half_width + (2 * np.arange(tiles_y) + 1) * self._tile_half_width
+        self._tiles = np.stack(np.meshgrid(xs, ys, indexing="ij"), axis=-1).reshape(-1, 2)
+
+        # Points of each tile (relative to its center) checked against the grid, spaced by at most one cell
+        resolution = environment_map.occupancy.resolution
+        xs = np.linspace(-self._tile_half_length, self._tile_half_length, int(math.ceil(2 * self._tile_half_length / resolution)) + 1)
+        ys = np.linspace(-self._tile_half_width, self._tile_half_width, int(math.ceil(2 * self._tile_half_width / resolution)) + 1)
+        self._tile_samples = np.stack(np.meshgrid(xs, ys, indexing="ij"), axis=-1).reshape(-1, 2)
+
+        self._vehicles = np.zeros((0, 3))
+        self._vehicle_tree: Optional[BoxTree] = None
+        self.set_vehicles(np.zeros((0, 3)) if vehicles is None else vehicles)
+
+    @property
+    def spacing(self) -> float:
+        """
+        Returns:
+            float: The distance between the centers of two footprints above which they cannot overlap, whatever their
+                headings (the center is center_offset ahead of the pose)
+        """
+        return 2.0 * self._radius
+
+    @property
+    def vehicles(self) -> np.ndarray:
+        return self._vehicles
+
+    @property
+    def center_offset(self) -> float:
+        """
+        Returns:
+            float: The distance (in meters) from a pose to the center of its footprint, along its heading
+        """
+        return self._center_offset
+
+    def set_vehicles(self, poses):
+        """
+        Method that sets the [x, y, heading] poses of the vehicles already spawned (checked by every query)
+        """
+        self._vehicles = np.asarray(poses, dtype=np.float64).reshape(-1, 3)
+        self._vehicle_tree = BoxTree(self.footprint_bounds(self._vehicles)) if len(self._vehicles) > 0 else None
+
+    def footprint_bounds(self, poses) -> np.ndarray:
+        """
+        Args:
+            poses: An (N, 3) array of [x, y, heading] poses.
+
+        Returns:
+            np.ndarray: The (N, 4) [min_x, min_y, max_x, max_y] bounds of the (grown) footprints
+        """
+        poses = np.asarray(poses, dtype=np.float64).reshape(-1, 3)
+        cos, sin = np.cos(poses[:, 2]), np.sin(poses[:, 2])
+        center_x = poses[:, 0] + self._center_offset * cos
+        center_y = poses[:, 1] + self._center_offset * sin
+        extent_x = self._half_length * np.abs(cos) + self._half_width * np.abs(sin)
+        extent_y = self._half_length * np.abs(sin) + self._half_width * np.abs(cos)
+        return np.column_stack((center_x - extent_x, center_y - extent_y, center_x + extent_x, center_y + extent_y))
+
+    def check(self, poses, check_vehicles: bool = True) -> np.ndarray:
+        """
+        Args:
+            poses: An (N, 3) array of [x, y, heading] poses.
+            check_vehicles (bool): Whether to check the poses against the vehicles already spawned. Defaults to True.
+
+        Returns:
+            np.ndarray: An (N,) array with, for each pose, VALID, OBSTACLE (the footprint overlaps the environment) or
+                VEHICLE (the footprint overlaps another vehicle)
+        """
+        poses = np.asarray(poses, dtype=np.float64).reshape(-1, 3)
+        result = np.full(len(poses), SpawnPlacer.VALID, dtype=np.int8)
+        if len(poses) == 0:
+            return result
+
+        bounds = self.footprint_bounds(poses)
+        suspects = np.flatnonzero(self._map.boxes_occupied(bounds))
+
+        # The bounds of an axis-aligned footprint are the footprint itself
+        if len(suspects) > 0:
+            sin = np.abs(np.sin(2.0 * poses[suspects, 2]))
+            result[suspects[sin < 1e-9]] = SpawnPlacer.OBSTACLE
+            suspects = suspects[sin >= 1e-9]
+        if len(suspects) > 0:
+            result[suspects[self._footprints_occupied(poses[suspects])]] = SpawnPlacer.OBSTACLE
+
+        if self._free_radius > 0.0:
+            squares = np.hstack((poses[:, :2] - self._free_radius, poses[:, :2] + self._free_radius))
+            result[(result == SpawnPlacer.VALID) & self._map.boxes_occupied(squares)] = SpawnPlacer.OBSTACLE
+
+        if check_vehicles and self._vehicle_tree is not None:
+            for index in np.flatnonzero(result == SpawnPlacer.VALID).tolist():
+                neighbors = self._vehicle_tree.query_box(*bounds[index])
+                if len(neighbors) > 0 and self._overlaps(poses[index], self._vehicles[neighbors]).any():
+                    result[index] = SpawnPlacer.VEHICLE
+
+        return result
+
+    def is_valid(self, poses) -> np.ndarray:
+        """
+        Returns:
+            np.ndarray: An (N,) boolean array, True where the pose is free
+        """
+        return self.check(poses) == SpawnPlacer.VALID
+
+    def explain(self, pose) -> Optional[str]:
+        """
+        Args:
+            pose: An [x, y, heading] pose.
+
+        Returns:
+            str: Why the pose is not free (None if it is free)
+        """
+        result = self.check(pose)[0]
+        if result == SpawnPlacer.VEHICLE:
+            return "the vehicle would overlap another vehicle"
+        if result == SpawnPlacer.OBSTACLE:
+            obstacles = self._map.obstacles_in_box(*self.footprint_bounds(pose)[0])
+            names = [self._map.names[i] for i in obstacles.tolist() if self._map.names[i]]
+            if names:
+                return "the vehicle would overlap " + ", ".join(names[:3]) + (" and more" if len(names) > 3 else "")
+            return "the vehicle would overlap the environment"
+        return None
+
+    def nearest_valid(self, pose, max_distance: float = 10.0, step: float = 0.25) -> Optional[np.ndarray]:
+        """
+        Method that finds the free pose (with the same heading) closest to a pose, on a square lattice around it.
+
+        Args:
+            pose: An [x, y, heading] pose.
+            max_distance (float): The largest distance (in meters) searched. Defaults to 10.0.
+            step (float): The spacing (in meters) of the lattice of positions searched. Defaults to 0.25.
+
+        Returns:
+            np.ndarray: The closest free [x, y, heading] pose (the pose itself if it is free), or None if there is none
+        """
+        pose = np.asarray(pose, dtype=np.float64).reshape(3)
+        steps = int(max_distance / step)
+        offsets = np.arange(-steps, steps + 1) * step
+        offsets = np.stack(np.meshgrid(offsets, offsets, indexing="ij"), axis=-1).reshape(-1, 2)
+        distances = np.hypot(offsets[:, 0], offsets[:, 1])
+        order = np.argsort(distances, kind="stable")
+        offsets = offsets[order[distances[order] <= max_distance]]
+
+        # Check the candidates in rings of increasing distance, such that the search stops as soon as possible
+        chunk = 256
+        for start in range(0, len(offsets), chunk):
+            candidates = np.empty((min(chunk, len(offsets) - start), 3))
+            candidates[:, :2] = pose[:2] + offsets[start : start + chunk]
+            candidates[:, 2] = pose[2]
+            valid = np.flatnonzero(self.check(candidates) == SpawnPlacer.VALID)
+            if len(valid) > 0:
+                return candidates[valid[0]]
+        return None
+
+    def sample(self, count: int, region=None, heading: Optional[float] = 0.0, spacing: Optional[float] = None, seed: Optional[int] = None) -> np.ndarray:
+        """
+        Method that places up to count vehicles on free poses, with the centers of their footprints at least spacing apart
+        from each other (and from the vehicles already spawned), with Poisson-disk sampling (Bridson's algorithm): new
+        centers are drawn around the ones already placed, between one and two times the spacing away, and a background
+        grid with cells of spacing / sqrt(2) finds the centers too close to them. With the default spacing, no two
+        footprints returned overlap, whatever their headings.
+
+        Args:
+            count (int): The number of poses.
+            region: The [min_x, min_y, max_x, max_y] area (in meters) where the poses are placed. Defaults to the extent
+                of the map.
+            heading (float): The heading (in radians) of every pose, or None for random headings. Defaults to 0.0.
+            spacing (float): The minimum distance (in meters) between the centers of two footprints. Defaults to the
+                distance above which the footprints cannot overlap (see spacing).
+            seed (int): The seed of the sampling. Defaults to None.
+
+        Returns:
+            np.ndarray: An (M, 3) array of [x, y, heading] poses, with M < count only if the region is full
+        """
+        rng = np.random.default_rng(seed)
+        spacing = self.spacing if spacing is None else spacing
+        min_x, min_y, max_x, max_y = self._region(count, spacing) if region is None else region
+        cell = spacing / math.sqrt(2.0)
+
+        # Background grid: index of the pose in each cell (-1 if empty)
+        columns = int(math.ceil((max_x - min_x) / cell)) + 1
+        rows = int(math.ceil((max_y - min_y) / cell)) + 1
+        grid = np.full((rows, columns), -1, dtype=np.int64)
+
+        # The vehicles already spawned come first (they are kept spaced from, but are not sampled around; if some of them
+        # share a cell, only one is kept in the grid, and the vehicle check of the candidates still prevents overlaps)
+        # (the spacing and the grid apply to the centers of the footprints, the poses are derived from them)
+        fixed = len(self._vehicles)
+        poses = np.empty((fixed + count, 3))
+        poses[:fixed] = self._vehicles
+        centers = np.empty((fixed + count, 2))
+        centers[:fixed] = self._centers(self._vehicles)
+        placed = fixed
+        active = []
+        spacing_squared = spacing * spacing
+
+        rows_of, columns_of = ((centers[:fixed, 1] - min_y) / cell).astype(np.int64), ((centers[:fixed, 0] - min_x) / cell).astype(np.int64)
+        inside = (rows_of >= 0) & (rows_of < rows) & (columns_of >= 0) & (columns_of < columns)
+        grid[rows_of[inside], columns_of[inside]] = np.flatnonzero(inside)
+
+        # The candidates are at most 2 spacings away from their source, so the poses closer than one spacing to any of
+        # them are in the cells at most 3 spacings away from the source
+        reach = int(math.ceil(3.0 * math.sqrt(2.0))) + 1
+
+        def spaced(candidates: np.ndarray, source: Optional[int]) -> np.ndarray:
+            if source is None:
+                neighbors = np.arange(placed)
+            else:
+                row, column = int((centers[source, 1] - min_y) / cell), int((centers[source, 0] - min_x) / cell)
+                neighbors = grid[max(row - reach, 0) : row + reach + 1, max(column - reach, 0) : column + reach + 1]
+                neighbors = neighbors[neighbors >= 0]
+            if len(neighbors) == 0:
+                return candidates
+            dx = candidates[:, 0, None] - centers[neighbors, 0]
+            dy = candidates[:, 1, None] - centers[neighbors, 1]
+            return candidates[(dx * dx + dy * dy >= spacing_squared).all(axis=1)]
+
+        def candidates_around(x: float, y: float, number: int) -> np.ndarray:
+            angles = rng.uniform(0.0, 2.0 * math.pi, number)
+            radii = spacing * np.sqrt(rng.uniform(1.0, 4.0, number))
+            candidates = np.empty((number, 3))
+            candidates[:, 0] = x + radii * np.cos(angles)
+            candidates[:, 1] = y + radii * np.sin(angles)
+            candidates[:, 2] = rng.uniform(-math.pi, math.pi, number) if heading is None else heading
+            return candidates
+
+        seed_failures = 0
+        while placed < fixed + count:
+            if active:
+                source = active[rng.integers(len(active))]
+                candidates = candidates_around(centers[source, 0], centers[source, 1], SpawnPlacer.SAMPLING_ATTEMPTS)
+            else:
+                # Start a new patch (the first one, or one in an area the others could not reach, e.g. behind a wall)
+                candidates = candidates_around(0.0, 0.0, 4 * SpawnPlacer.SAMPLING_ATTEMPTS)
+                candidates[:, 0] = rng.uniform(min_x, max_x, len(candidates))
+                candidates[:, 1] = rng.uniform(min_y, max_y, len(candidates))
+                source = None
+
+            inside = (
+                (candidates[:, 0] >= min_x) & (candidates[:, 0] < max_x) & (candidates[:, 1] >= min_y) & (candidates[:, 1] < max_y)
+            )
+            # (the candidates are footprint centers, moved back to their poses for the check against the map)
+            candidates = spaced(candidates[inside], source)
+            candidates[:, :2] -= self._centers(candidates) - candidates[:, :2]
+            candidates = candidates[self.check(candidates) == SpawnPlacer.VALID] if len(candidates) > 0 else candidates
+
+            # The candidates left are spaced from the centers already placed, but not necessarily from each other
+            accepted = 0
+            for (x, y, yaw), (center_x, center_y) in zip(candidates.tolist(), self._centers(candidates).tolist()):
+                if placed == fixed + count:
+                    break
+                if all(
+                    (center_x - centers[i, 0]) ** 2 + (center_y - centers[i, 1]) ** 2 >= spacing_squared
+                    for i in range(placed - accepted, placed)
+                ):
+                    poses[placed] = x, y, yaw
+                    centers[placed] = center_x, center_y
+                    grid[int((center_y - min_y) / cell), int((center_x - min_x) / cell)] = placed
+                    active.append(placed)
+                    placed += 1
+                    accepted += 1
+                    if source is None:
+                        break
+
+            if source is not None:
+                if accepted == 0:
+                    active.remove(source)
+            elif accepted == 0:
+                seed_failures += 1
+                if seed_failures >= 8:
+                    break
+
+        if placed < fixed + count:
+            logger.warning("Only %d of the %d vehicles fit in the region %s", placed - fixed, count, [min_x, min_y, max_x, max_y])
+        return poses[fixed:placed]
+
+    """
+    ---------------------------------------------------------------------
+    Auxiliary methods
+    ---------------------------------------------------------------------
+    """
+
+    def _centers(self, poses: np.ndarray) -> np.ndarray:
+        # Centers of the footprints of [x, y, heading] poses
+        return poses[:, :2] + self._center_offset * np.column_stack((np.cos(poses[:, 2]), np.sin(poses[:, 2])))
+
+    def _footprints_occupied(self, poses: np.ndarray) -> np.ndarray:
+        # Checks the bounds of the tiles of every footprint against the summed-area table, then the points of the tiles
+        # whose bounds hit an obstacle against the grid
+        cos, sin = np.cos(poses[:, 2])[:, None], np.sin(poses[:, 2])[:, None]
+        center_x = poses[:, 0, None] + cos * self._tiles[:, 0] - sin * self._tiles[:, 1]
+        center_y = poses[:, 1, None] + sin * self._tiles[:, 0] + cos * self._tiles[:, 1]
+        extent_x = np.broadcast_to(self._tile_half_length * np.abs(cos) + self._tile_half_width * np.abs(sin), center_x.shape)
+        extent_y = np.broadcast_to(self._tile_half_length * np.abs(sin) + self._tile_half_width * np.abs(cos), center_y.shape)
+
+        boxes = np.stack((center_x - extent_x, center_y - extent_y, center_x + extent_x, center_y + extent_y), axis=-1)
+        pose_index, tile_index = np.nonzero(self._map.boxes_occupied(boxes.reshape(-1, 4)).reshape(center_x.shape))
+
+        occupied = np.zeros(len(poses), dtype=bool)
+        if len(pose_index) == 0:
+            return occupied
+
+        cos, sin = cos[pose_index], sin[pose_index]
+        samples = self._tile_samples
+        points = np.empty((len(pose_index), len(samples), 2))
+        points[..., 0] = center_x[pose_index, tile_index][:, None] + cos * samples[:, 0] - sin * samples[:, 1]
+        points[..., 1] = center_y[pose_index, tile_index][:, None] + sin * samples[:, 0] + cos * samples[:, 1]
+        hits = self._map.is_occupied(points.reshape(-1, 2)).reshape(len(pose_index), -1).any(axis=1)
+
+        occupied[pose_index[hits]] = True
+        return occupied
+
+    def _overlaps(self, pose: np.ndarray, others: np.ndarray) -> np.ndarray:
+        # Separating axis test between the footprint of a pose and the footprints of others (all the same rectangle)
+        axis_a = np.array([math.cos(pose[2]), math.sin(pose[2])])
+        axes_b = np.column_stack((np.cos(others[:, 2]), np.sin(others[:, 2])))
+        center_a = pose[:2] + self._center_offset * axis_a
+        delta = others[:, :2] + self._center_offset * axes_b - center_a
+
+        separated = np.zeros(len(others), dtype=bool)
+        for axis in (axis_a, np.array([-axis_a[1], axis_a[0]]), axes_b, np.column_stack((-axes_b[:, 1], axes_b[:, 0]))):
+            axis = np.broadcast_to(axis, delta.shape)
+            distance = np.abs((delta * axis).sum(axis=1))
+            extent_a = self._half_length * np.abs(axis @ axis_a) + self._half_width * np.abs(axis[:, 1] * axis_a[0] - axis[:, 0] * axis_a[1])
+            extent_b = self._half_length * np.abs((axis * axes_b).sum(axis=1)) + self._half_width * np.abs(
+                axis[:, 1] * axes_b[:, 0] - axis[:, 0] * axes_b[:, 1]
+            )
+            separated |= distance > extent_a + extent_b
+        return ~separated
+
+    def _region(self, count: int, spacing: float):
+        # The extent of the map, or a square around the origin with room for every vehicle if the map is empty
+        if self._map.occupancy.grid.any():
+            return self._map.occupancy.bounds
+        half_side = 0.5 * spacing * 2.0 * math.ceil(math.sqrt(count))
+        return (-half_side, -half_side, half_side, half_side)
+
+
+def fleet_poses(fleet_state) -> np.ndarray:
+    """
+    Args:
+        fleet_state (FleetState): The state of the fleet.
+
+    Returns:
+        np.ndarray: The (N, 3) [x, y, heading] poses of the vehicles of the fleet
+    """
+    return np.column_stack((fleet_state.positions[:, :2], fleet_state.headings()))
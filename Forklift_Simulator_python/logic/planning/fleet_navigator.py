@@ -0,0 +1,470 @@
+"""
+| File: fleet_navigator.py
+| Author: Akhilesh Bhat
+| Description: Definition of the FleetNavigator class, a pre-step callback of the FleetStepper that drives the vehicles to
+                 their goals along the plans of a FleetPlanner, replanning the whole fleet periodically
+"""
+
+__all__ = ["FleetNavigator"]
+
+import math
+import logging
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from Forklift_Simulator_python.logic.maps.environment_map import EnvironmentMap
+from Forklift_Simulator_python.logic.maps.spawn_placer import SpawnPlacer
+from Forklift_Simulator_python.logic.planning.fleet_planner import FleetPlan, FleetPlanner
+from Forklift_Simulator_python.logic.vehicles.fleet_state import FleetState
+from Forklift_Simulator_python.logic.vehicles.vehicle_configs import vehicle_config
+
+logger = logging.getLogger(__name__)
+
+
+class FleetNavigator:
+    """
+    Drives the vehicles that were given a goal along the paths of a FleetPlanner. The whole fleet is planned in a single
+    call every replan_period seconds of simulated time (and right away when a goal or the composition of the fleet
+    changes), reusing the previous plan where it is still valid. Between two plans, every vehicle follows its path with
+    a pure pursuit controller aimed at where its plan puts it lookahead_time seconds ahead, so it keeps to the schedule
+    that the planner made free of conflicts.
+
+    By default the fleet is planned in a worker thread, from the positions of the vehicles when the plan was requested:
+    the physics steps go on meanwhile, and the plan is swapped in on the first step after it is ready (its schedule
+    starts when it was requested). The distance fields of the goals are computed when the goals are set, not during the
+    steps.
+
+    The vehicles without a goal are not commanded (they are left to the other inputs), but the planner keeps them as
+    obstacles. Meant to be registered with FleetStepper.add_pre_step_callback.
+    """
+
+    # A vehicle commanded to move that stays still (e.g. its rear swung into a rack) for STALL_TIME seconds backs out, in
+    # the opposite direction, at RECOVERY_SPEED (in m/s) for RECOVERY_TIME seconds: straight, or else turning fully to
+    # either side, whichever motion keeps its footprint off the obstacles of the environment map (with RECOVERY_CLEARANCE
+    # meters of margin). A vehicle without such a motion stays where it is until its plan changes
+    STALL_TIME = 0.5
+    RECOVERY_TIME = 1.0
+    RECOVERY_SPEED = 0.5
+    RECOVERY_CLEARANCE = 0.1
+
+    def __init__(
+        self,
+        planner: FleetPlanner,
+        replan_period: float = 1.0,
+        goal_tolerance: float = 0.3,
+        lookahead_time: float = 1.0,
+        asynchronous: bool = True,
+        environment_map: Optional[EnvironmentMap] = None,
+    ):
+        """
+        Args:
+            planner (FleetPlanner): The planner of the environment the vehicles are in.
+            replan_period (float): The period (in seconds of simulated time) at which the fleet is replanned. Defaults
+                to 1.0.
+            goal_tolerance (float): The distance (in meters) to the goal node under which a vehicle stops. Defaults to
+                0.3.
+            lookahead_time (float): How far ahead (in seconds) on its plan a vehicle aims. Defaults to 1.0.
+            asynchronous (bool): Whether the fleet is planned in a worker thread. If False, the plans are computed in the
+                physics step that needs them (which makes the runs deterministic). Defaults to True.
+            environment_map (EnvironmentMap): The map the recovery motions are checked against. Defaults to None (the
+                stalled vehicles back out straight without any check).
+        """
+        self._planner = planner
+        self._environment_map = environment_map
+        self.replan_period = replan_period
+        self.goal_tolerance = goal_tolerance
+        self.lookahead_time = lookahead_time
+        self.asynchronous = asynchronous
+
+        # Goal position and priority of every vehicle (by stage prefix), and the vehicles whose goal was cleared (they
+        # are stopped on the next step)
+        self._goals: Dict[str, np.ndarray] = {}
+        self._priorities: Dict[str, float] = {}
+        self._released: List[str] = []
+        self._goals_changed = False
+
+        # Current plan, the simulated time since it started and the fleet version it was computed for
+        self._plan: Optional[FleetPlan] = None
+        self._plan_elapsed = 0.0
+        self._plan_version = None
+
+        # Plan being computed (its inputs, and its result or error once done), the worker thread computing it and the
+        # simulated time since it was requested
+        self._request: Optional[Dict] = None
+        self._worker: Optional[threading.Thread] = None
+        self._request_elapsed = 0.0
+
+        # Limits of the vehicles, whether they drive backwards, their previous positions and the time they have been
+        # stalled or recovering (per slot), reset when the composition of the fleet changes
+        self._limits = None
+        self._reversing = np.zeros(0, dtype=bool)
+        self._last_positions = np.zeros((0, 2))
+        self._stalled = np.zeros(0)
+        self._recovery = np.zeros(0)
+        self._recovery_steering = np.zeros(0)
+        self._limits_version = None
+
+        # Footprint checkers of the recovery motions, per vehicle model
+        self._checkers: Dict[str, SpawnPlacer] = {}
+
+    @property
+    def planner(self) -> FleetPlanner:
+        return self._planner
+
+    @property
+    def plan(self) -> Optional[FleetPlan]:
+        """
+        Returns:
+            FleetPlan: The plan the fleet is executing (None until the first vehicle was given a goal)
+        """
+        return self._plan
+
+    @property
+    def goals(self) -> Dict[str, np.ndarray]:
+        return dict(self._goals)
+
+    def set_goal(self, stage_prefix: str, goal, state: Optional[FleetState] = None):
+        """
+        Method that sends a vehicle to a position.
+
+        Args:
+            stage_prefix (str): The stage prefix of the vehicle.
+            goal: The [x, y] goal position (in meters).
+            state (FleetState): The fleet, used to give the vehicles sent the farthest the highest priority. Without it
+                the vehicles are prioritized by the distance to their goal at each plan. Defaults to None.
+        """
+        self.set_goals([stage_prefix], [goal], state)
+
+    def set_goals(self, stage_prefixes: List[str], goals, state: Optional[FleetState] = None):
+        """
+        Method that sends several vehicles to positions at once (see set_goal).
+
+        Args:
+            stage_prefixes (List[str]): The stage prefixes of the vehicles.
+            goals: A (V, 2) array of the [x, y] goal positions (in meters).
+            state (FleetState): The fleet, used to set the priorities of the vehicles. Defaults to None.
+        """
+        goals = np.asarray(goals, dtype=np.float64).reshape(-1, 2)
+
+        # The distance fields of the goals are computed now, so the plans do not have to
+        roadmap = self._planner.roadmap
+        if len(roadmap) > 0 and len(goals) > 0:
+            roadmap.prepare(roadmap.nearest_nodes(goals).tolist())
+
+        slots = {stage_prefix: slot for slot, stage_prefix in enumerate(state.stage_prefixes)} if state is not None else {}
+
+        for stage_prefix, goal in zip(stage_prefixes, goals):
+            self._goals[stage_prefix] = goal.copy()
+            if stage_prefix in slots:
+                self._priorities[stage_prefix] = float(np.linalg.norm(state.positions[slots[stage_prefix], :2] - goal))
+            else:
+                self._priorities.pop(stage_prefix, None)
+            if stage_prefix in self._released:
+                self._released.remove(stage_prefix)
+        self._goals_changed = True
+
+    def clear_goals(self, stage_prefixes: Optional[List[str]] = None):
+        """
+        Method that stops vehicles and gives them back to the other inputs.
+
+        Args:
+            stage_prefixes (List[str]): The stage prefixes of the vehicles. None for every vehicle. Defaults to None.
+        """
+        stage_prefixes = list(self._goals) if stage_prefixes is None else stage_prefixes
+        for stage_prefix in stage_prefixes:
+            if self._goals.pop(stage_prefix, None) is not None:
+                self._priorities.pop(stage_prefix, None)
+                self._released.append(stage_prefix)
+        self._goals_changed = True
+
+    def arrived(self, state: FleetState) -> List[str]:
+        """
+        Args:
+            state (FleetState): The fleet.
+
+        Returns:
+            List[str]: The stage prefixes of the vehicles that are at their goal
+        """
+        if self._plan is None or self._plan_version != state.version:
+            return []
+
+        distances = self._goal_distances(state)
+        return [
+            stage_prefix
+            for stage_prefix, distance in zip(state.stage_prefixes, distances.tolist())
+            if stage_prefix in self._goals and distance <= self.goal_tolerance
+        ]
+
+    def reset(self):
+        """
+        Method that forgets every goal and the current plan (e.g. after the environment or the fleet was reset)
+        """
+        self._goals.clear()
+        self._priorities.clear()
+        self._released.clear()
+        self._goals_changed = False
+        self._plan = None
+        self._plan_version = None
+        self._request = None
+        self._worker = None
+
+    def __call__(self, state: FleetState, dt: float):
+        """
+        Method that replans the fleet if needed and sets the commands of the vehicles with a goal.
+
+        Args:
+            state (FleetState): The fleet.
+            dt (float): The physics step size (in seconds).
+        """
+        if self._released:
+            slots = self._slots(state, self._released)
+            state.set_commands(slots, speed=0.0, steering=0.0)
+            self._released.clear()
+
+        if not self._goals:
+            self._plan = None
+            self._request = None
+            return
+
+        self._plan_elapsed += dt
+        self._request_elapsed += dt
+        if self._request is not None and (self._worker is None or not self._worker.is_alive()):
+            self._collect(state)
+
+        if self._request is None and (
+            self._plan is None
+            or self._goals_changed
+            or self._plan_version != state.version
+            or self._plan_elapsed >= self.replan_period
+        ):
+            self._replan(state)
+
+        # (the vehicles with a goal wait for the first plan, or for the plan of the new fleet)
+        if self._plan is None or self._plan_version != state.version:
+            waiting = self._slots(state, list(self._goals))
+            state.set_commands(waiting, speed=0.0)
+            return
+
+        self._track(state, dt)
+
+    """
+    ---------------------------------------------------------------------
+    Auxiliary methods
+    ---------------------------------------------------------------------
+    """
+
+    def _replan(self, state: FleetState):
+        goals = np.full((state.count, 2), np.nan)
+        priorities = np.zeros(state.count)
+        for slot, stage_prefix in enumerate(state.stage_prefixes):
+            if stage_prefix in self._goals:
+                goals[slot] = self._goals[stage_prefix]
+                priorities[slot] = self._priorities.get(stage_prefix, np.nan)
+
+        # The vehicles given a goal without the fleet are prioritized by their current distance to it
+        unset = np.isnan(priorities)
+        priorities[unset] = np.linalg.norm(state.positions[unset, :2] - goals[unset], axis=1)
+
+        # The inputs are copied, as the fleet keeps moving while the plan is computed
+        self._request = {
+            "starts": state.positions[:, :2].copy(),
+            "goals": goals,
+            "priorities": priorities,
+            "previous": self._plan if self._plan_version == state.version else None,
+            "elapsed": self._plan_elapsed,
+            "version": state.version,
+        }
+        self._request_elapsed = 0.0
+        self._goals_changed = False
+
+        if self.asynchronous:
+            self._worker = threading.Thread(target=self._plan_fleet, args=(self._request,), name="FleetPlanner", daemon=True)
+            self._worker.start()
+        else:
+            self._worker = None
+            self._plan_fleet(self._request)
+            self._collect(state)
+
+    def _plan_fleet(self, request: Dict):
+        # (runs in the worker thread: the request is only read by the physics step once the thread is done)
+        try:
+            request["plan"] = self._planner.plan(
+                request["starts"], request["goals"], request["priorities"], request["previous"], request["elapsed"]
+            )
+        except Exception as error:
+            request["error"] = error
+
+    def _collect(self, state: FleetState):
+        request, self._request, self._worker = self._request, None, None
+
+        if "error" in request:
+            logger.warning(f"Could not plan the fleet: {request['error']}")
+            self._plan = None
+            self._released.extend(self._goals)
+            self._goals.clear()
+            self._priorities.clear()
+            return
+
+        # (a plan computed for a previous composition of the fleet is dropped, and a new one is requested)
+        if request["version"] != state.version:
+            return
+
+        self._plan = request["plan"]
+        self._plan_elapsed = self._request_elapsed
+        self._plan_version = request["version"]
+        logger.debug(f"Planned {state.count} vehicles in {self._plan.planning_time * 1000.0:.1f} ms")
+
+    def _track(self, state: FleetState, dt: float):
+        # Pure pursuit of the position of every vehicle on its plan lookahead_time seconds ahead (the kinematic model
+        # turns with a curvature of tan(steering) / wheelbase along its direction of travel, reversed when driving
+        # backwards, and moves at speed * cos(steering))
+        wheelbases, max_steering, max_speeds, max_accelerations, front_lengths, lengths, widths = self._vehicle_limits(state)
+        positions = state.positions[:, :2]
+        headings = state.headings()
+
+        targets = self._plan.positions_at(self._plan_elapsed + self.lookahead_time)
+        offsets = targets - positions
+        distances = np.linalg.norm(offsets, axis=1)
+        alphas = np.arctan2(offsets[:, 1], offsets[:, 0]) - headings
+
+        # A vehicle backs up to a target clearly behind it (instead of turning around in an aisle), and drives forward
+        # again once the target is clearly ahead
+        cosines = np.cos(alphas)
+        reversing = self._reversing
+        reversing[cosines < -0.5] = True
+        reversing[cosines > 0.5] = False
+        directions = np.where(reversing, -1.0, 1.0)
+        alphas = (alphas + np.pi * reversing + np.pi) % (2.0 * np.pi) - np.pi
+
+        curvatures = 2.0 * np.sin(alphas) / np.maximum(distances, 1e-6)
+        steering = np.clip(np.arctan(directions * curvatures * wheelbases), -max_steering, max_steering)
+        forward = np.minimum(distances / self.lookahead_time, max_speeds) * np.maximum(np.cos(alphas), 0.3)
+        speed = directions * np.minimum(forward / np.cos(steering), max_speeds)
+
+        # The vehicles that wait on their plan, are at their goal or have no plan stop
+        stopped = (distances <= self.goal_tolerance) | (self._goal_distances(state) <= self.goal_tolerance)
+        stopped |= self._plan.status != FleetPlanner.PLANNED
+        speed[stopped] = 0.0
+
+        # The vehicles that did not move despite their previous command back out of where they are stuck
+        previous_speeds = state.speed_commands
+        moved = np.linalg.norm(positions - self._last_positions, axis=1)
+        self._last_positions[:] = positions
+        still = (moved < 0.01 * dt) & (np.abs(previous_speeds) > 0.1) & (self._recovery <= 0.0)
+        self._stalled = np.where(still, self._stalled + dt, 0.0)
+
+        stuck = np.flatnonzero(self._stalled >= FleetNavigator.STALL_TIME)
+        self._stalled[stuck] = 0.0
+        for slot in stuck:
+            recovery_steering = self._recovery_motion(state, slot, -np.sign(previous_speeds[slot]) * FleetNavigator.RECOVERY_SPEED)
+            if recovery_steering is not None:
+                self._recovery[slot] = FleetNavigator.RECOVERY_TIME
+                self._recovery_steering[slot] = recovery_steering
+        recovering = (self._recovery > 0.0) & ~stopped
+        speed[recovering] = -np.sign(previous_speeds[recovering]) * FleetNavigator.RECOVERY_SPEED
+        steering[recovering] = self._recovery_steering[recovering]
+        self._recovery[self._recovery > 0.0] -= dt
+
+        # No vehicle drives towards another one that its footprint could touch (e.g. one that fell behind its plan, stuck
+        # against a rack), only clearly away from it with both ends of its footprint (the rear swings out in the turns).
+        # The footprints are close when they could touch before the vehicle stops at its maximum acceleration
+        moving = np.flatnonzero(speed != 0.0)
+        if len(moving) > 0:
+            reaches = np.hypot(np.maximum(front_lengths, lengths - front_lengths), widths / 2.0)
+            braking = state.speeds()[moving] ** 2 / (2.0 * max_accelerations[moving])
+            distances = np.linalg.norm(positions[None] - positions[moving, None], axis=2)
+            close = distances < reaches[moving, None] + reaches[None] + braking[:, None]
+            close[np.arange(len(moving)), moving] = False
+
+            along = np.stack([np.cos(headings[moving]), np.sin(headings[moving])], axis=1)
+            across = np.stack([-along[:, 1], along[:, 0]], axis=1)
+            forward = speed[moving] * np.cos(steering[moving])
+            yaw_rates = speed[moving] * np.sin(steering[moving]) / wheelbases[moving]
+            approaching = np.zeros_like(close)
+            for arms in (front_lengths[moving], front_lengths[moving] - lengths[moving]):
+                ends = positions[moving] + arms[:, None] * along
+                velocities = forward[:, None] * along + (yaw_rates * arms)[:, None] * across
+                offsets = positions[None] - ends[:, None]
+                projections = np.einsum("mvk,mk->mv", offsets, velocities)
+                limits = -0.5 * np.linalg.norm(offsets, axis=2) * np.linalg.norm(velocities, axis=1)[:, None]
+                approaching |= close & (projections > limits)
+            speed[moving[approaching.any(axis=1)]] = 0.0
+
+        commanded = np.flatnonzero(self._plan.status != FleetPlanner.IDLE)
+        state.set_commands(commanded, speed=speed[commanded], steering=steering[commanded])
+
+    def _goal_distances(self, state: FleetState) -> np.ndarray:
+        # Distance of every vehicle to its goal node (infinite for the vehicles without a goal)
+        goals = self._plan.goals
+        distances = np.full(state.count, np.inf)
+        has_goal = goals >= 0
+        distances[has_goal] = np.linalg.norm(
+            state.positions[has_goal, :2] - self._planner.roadmap.positions[goals[has_goal]], axis=1
+        )
+        return distances
+
+    def _vehicle_limits(self, state: FleetState):
+        if self._limits_version != state.version:
+            configs = {model: vehicle_config(model) for model in set(state.models)}
+            self._limits = tuple(
+                np.array([getattr(configs[model], name) for model in state.models], dtype=np.float64)
+                for name in (
+                    "wheelbase",
+                    "max_steering_angle",
+                    "max_speed",
+                    "max_acceleration",
+                    "front_length",
+                    "length",
+                    "width",
+                )
+            )
+            self._reversing = np.zeros(state.count, dtype=bool)
+            self._last_positions = state.positions[:, :2].copy()
+            self._stalled = np.zeros(state.count)
+            self._recovery = np.zeros(state.count)
+            self._recovery_steering = np.zeros(state.count)
+            self._limits_version = state.version
+        return self._limits
+
+    def _recovery_motion(self, state: FleetState, slot: int, speed: float) -> Optional[float]:
+        # Steering of the first recovery motion (straight, then fully to either side) along which the footprint does not
+        # enter an obstacle, None if there is none. The footprint is checked every tenth of the motion, and it may stay
+        # on an obstacle it already touches (it is backing out of it), but not touch a new one
+        if self._environment_map is None:
+            return 0.0
+
+        model = state.models[slot]
+        config = vehicle_config(model)
+        checker = self._checkers.get(model)
+        if checker is None:
+            checker = self._checkers[model] = SpawnPlacer(
+                self._environment_map, config, FleetNavigator.RECOVERY_CLEARANCE
+            )
+
+        x, y = state.positions[slot, :2]
+        heading = state.headings()[slot]
+        times = np.linspace(0.0, FleetNavigator.RECOVERY_TIME, 11)
+        for steering in (0.0, config.max_steering_angle, -config.max_steering_angle):
+            # (the kinematic model: the front axle moves at speed * cos(steering), and turns at speed * sin(steering) /
+            # wheelbase)
+            yaw_rate = speed * math.sin(steering) / config.wheelbase
+            headings = heading + yaw_rate * times
+            if abs(yaw_rate) > 1e-9:
+                radius = speed * math.cos(steering) / yaw_rate
+                xs = x + radius * (np.sin(headings) - math.sin(heading))
+                ys = y - radius * (np.cos(headings) - math.cos(heading))
+            else:
+                xs = x + speed * math.cos(steering) * times * math.cos(heading)
+                ys = y + speed * math.cos(steering) * times * math.sin(heading)
+
+            occupied = checker.check(np.column_stack((xs, ys, headings)), check_vehicles=False) != SpawnPlacer.VALID
+            if not (~occupied[:-1] & occupied[1:]).any() and not occupied[-1]:
+                return steering
+        return None
+
+    @staticmethod
+    def _slots(state: FleetState, stage_prefixes: List[str]) -> np.ndarray:
+        slots = {stage_prefix: slot for slot, stage_prefix in enumerate(state.stage_prefixes)}
+        return np.array([slots[stage_prefix] for stage_prefix in stage_prefixes if stage_prefix in slots], dtype=np.int64)
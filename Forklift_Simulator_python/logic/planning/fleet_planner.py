@@ -0,0 +1,505 @@
+"""
+| File: fleet_planner.py
+| Author: Akhilesh Bhat
+| Description: Definition of the FleetPlanner class, that plans conflict-free paths for a whole fleet over a roadmap in a
+                 single call (prioritized, windowed space-time A* with a reservation table), and of the FleetPlan it returns
+"""
+
+__all__ = ["FleetPlan", "FleetPlanner", "vehicle_separation"]
+
+import math
+import time
+import heapq
+import logging
+from collections import Counter
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from Forklift_Simulator_python.logic.planning.roadmap import Roadmap
+from Forklift_Simulator_python.logic.vehicles.vehicle_configs import footprint_reach
+from Forklift_Simulator_python.global_variables import ROBOTS
+
+logger = logging.getLogger(__name__)
+
+
+def vehicle_separation(models: Iterable[str], spacing: float, margin: float = 1.0) -> float:
+    """
+    Function that computes the separation a FleetPlanner must keep between the reference points of the vehicles so that
+    their footprints stay apart. Two footprints can touch when their reference points are twice the farthest reach of a
+    footprint from its reference point apart, and the plans are only checked at the steps: in between, two vehicles
+    moving (at most a lattice diagonal each) can get closer than at both ends of the step.
+
+    Args:
+        models (Iterable[str]): The vehicle models of the fleet (the keys in ROBOTS).
+        spacing (float): The distance (in meters) between neighbor nodes of the roadmap.
+        margin (float): The extra distance (in meters) kept between the footprints, which covers the tracking error of
+            the vehicles. Defaults to 1.0.
+
+    Returns:
+        float: The separation (in meters)
+    """
+    reach = footprint_reach(models)
+
+    # (the distance between two points moving linearly drops at most by the half of their relative displacement, at most
+    # two lattice diagonals, below the distance at both ends)
+    separation = 2.0 * reach + margin
+    return math.sqrt(separation**2 + 2.0 * spacing**2)
+
+
+class FleetPlan:
+    """
+    Result of FleetPlanner.plan: the roadmap node of every vehicle at every step of the plan (a step lasts step_time
+    seconds, and every path is padded with its last node). The first window steps are free of conflicts between the
+    vehicles, the rest of each path is a shortest path to the goal that ignores the other vehicles.
+    """
+
+    def __init__(self, roadmap: Roadmap, nodes: np.ndarray, goals: np.ndarray, status: np.ndarray, step_time: float, window: int, planning_time: float = 0.0):
+        """
+        Args:
+            roadmap (Roadmap): The roadmap the plan was computed on.
+            nodes (np.ndarray): A (V, K) array of the node of each vehicle at each step.
+            goals (np.ndarray): The (V,) goal node of each vehicle (-1 for the vehicles without a goal).
+            status (np.ndarray): The (V,) FleetPlanner status of each vehicle.
+            step_time (float): The duration (in seconds) of a step.
+            window (int): The number of steps free of conflicts.
+            planning_time (float): The wall time (in seconds) the plan took. Defaults to 0.0.
+        """
+        self._roadmap = roadmap
+        self._nodes = nodes
+        self._goals = goals
+        self._status = status
+        self._step_time = step_time
+        self._window = window
+        self.planning_time = planning_time
+
+    @property
+    def nodes(self) -> np.ndarray:
+        return self._nodes
+
+    @property
+    def goals(self) -> np.ndarray:
+        return self._goals
+
+    @property
+    def status(self) -> np.ndarray:
+        return self._status
+
+    @property
+    def step_time(self) -> float:
+        return self._step_time
+
+    @property
+    def window(self) -> int:
+        return self._window
+
+    @property
+    def steps(self) -> int:
+        return self._nodes.shape[1]
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def waypoints(self, vehicle: int) -> np.ndarray:
+        """
+        Returns:
+            np.ndarray: The (K, 2) [x, y] positions (in meters) of a vehicle at every step, without the repeated ones
+        """
+        nodes = self._nodes[vehicle]
+        keep = np.concatenate(([True], nodes[1:] != nodes[:-1]))
+        return self._roadmap.positions[nodes[keep]]
+
+    def arrival_steps(self) -> np.ndarray:
+        """
+        Returns:
+            np.ndarray: The (V,) step from which each vehicle stays at its goal (-1 if it never gets there)
+        """
+        at_goal = self._nodes == self._goals[:, None]
+        staying = np.flip(np.logical_and.accumulate(np.flip(at_goal, axis=1), axis=1), axis=1)
+        return np.where(staying[:, -1], np.argmax(staying, axis=1), -1)
+
+    def positions_at(self, elapsed: float) -> np.ndarray:
+        """
+        Args:
+            elapsed (float): The time (in seconds) since the start of the plan.
+
+        Returns:
+            np.ndarray: The (V, 2) [x, y] positions (in meters) of the vehicles at that time (linearly interpolated
+                between the steps)
+        """
+        step = min(max(elapsed / self._step_time, 0.0), self._nodes.shape[1] - 1)
+        before = min(int(step), self._nodes.shape[1] - 2) if self._nodes.shape[1] > 1 else 0
+        fraction = step - before
+
+        positions = self._roadmap.positions
+        start = positions[self._nodes[:, before]]
+        if fraction <= 0.0:
+            return start
+        return start + (positions[self._nodes[:, before + 1]] - start) * fraction
+
+
+class FleetPlanner:
+    """
+    Plans the paths of a whole fleet over a roadmap with prioritized planning: the vehicles are planned one after the
+    other (highest priority first), each with a space-time A* search (guided by the roadmap distance to its goal) that
+    avoids the reservations of the vehicles planned before it. On every step a vehicle moves to a neighbor node or waits
+    at its node; being at a node reserves every node closer than the separation for that step, so two vehicles never end
+    a step closer than the separation (which also rules out swapping places or crossing each other). The separation is
+    measured between the reference points of the vehicles (see vehicle_separation to derive it from their footprints).
+    Two vehicles that start closer than the separation (e.g. parked side by side) only have to move apart gradually:
+    by SEPARATION_GROWTH spacings more on every step (one of them usually waits while the other leaves).
+
+    Only the first window steps are planned against the other vehicles (windowed cooperative A*): the rest of each path
+    follows the distance field of its goal, and the fleet is meant to be replanned well before the end of the window.
+    This keeps the searches short. A vehicle that finds no conflict-free plan is fixed at its position (BLOCKED) and the
+    fleet is planned again around it.
+    """
+
+    # Status of each vehicle in a plan
+    PLANNED = 0
+    IDLE = 1
+    UNREACHABLE = 2
+    BLOCKED = 3
+
+    # Number of steps the vehicles not planned yet hold (see plan_nodes)
+    HOLD_STEPS = 1
+
+    # Distance (in roadmap spacings) by which two vehicles that start closer than the separation must move apart on
+    # every step, until they are separated
+    SEPARATION_GROWTH = 0.5
+
+    def __init__(self, roadmap: Roadmap, separation: Optional[float] = None, window: int = 16, step_time: float = 1.0, max_expansions: int = 4000):
+        """
+        Args:
+            roadmap (Roadmap): The roadmap of the environment.
+            separation (float): The minimum distance (in meters) between the nodes of two vehicles at the same step.
+                Defaults to None, the separation of the largest vehicle model in ROBOTS (see vehicle_separation).
+            window (int): The number of steps planned against the other vehicles. Defaults to 16.
+            step_time (float): The duration (in seconds) of a step. Defaults to 1.0.
+            max_expansions (int): The maximum number of states expanded by the search of a vehicle (the best partial
+                plan found is used beyond it). Defaults to 4000.
+        """
+        self._roadmap = roadmap
+        self._separation = vehicle_separation(ROBOTS, roadmap.spacing) if separation is None else separation
+        self._window = max(int(window), 1)
+        self._step_time = step_time
+        self._max_expansions = max_expansions
+
+        # Successors (neighbor, cost) of every node, waiting included (costs as much as a straight move)
+        neighbors, lengths = roadmap.neighbors.tolist(), roadmap.lengths.tolist()
+        wait_cost = roadmap.spacing
+        self._successors: List[List[Tuple[int, float]]] = [
+            [(neighbor, length) for neighbor, length in zip(node_neighbors, node_lengths) if neighbor >= 0] + [(node, wait_cost)]
+            for node, (node_neighbors, node_lengths) in enumerate(zip(neighbors, lengths))
+        ]
+
+        # Nodes reserved by a vehicle at a node (padded with -1)
+        self._neighborhoods = roadmap.neighborhoods(self._separation)
+
+    @property
+    def roadmap(self) -> Roadmap:
+        return self._roadmap
+
+    @property
+    def separation(self) -> float:
+        return self._separation
+
+    @property
+    def window(self) -> int:
+        return self._window
+
+    @property
+    def step_time(self) -> float:
+        return self._step_time
+
+    def plan(self, starts, goals, priorities=None, previous: Optional[FleetPlan] = None, elapsed: float = 0.0) -> FleetPlan:
+        """
+        Method that plans the whole fleet at once.
+
+        Args:
+            starts: A (V, 2) (or (V, 3)) array of the current positions (in meters) of the vehicles.
+            goals: A (V, 2) array of the goal positions (in meters), with NaN rows for the vehicles without a goal (they
+                keep their position and the others drive around them).
+            priorities: The (V,) priorities of the vehicles, the highest planned first. Defaults to the distance to the
+                goal (the farthest vehicles are planned first).
+            previous (FleetPlan): The plan the same vehicles are executing, if any (see plan_nodes).
+            elapsed (float): The time (in seconds) since the start of the previous plan. Defaults to 0.0.
+
+        Returns:
+            FleetPlan: The plan of the fleet
+        """
+        starts = np.asarray(starts, dtype=np.float64).reshape(-1, np.shape(starts)[-1])
+        goals = np.asarray(goals, dtype=np.float64).reshape(-1, 2)
+
+        has_goal = ~np.isnan(goals).any(axis=1)
+        goal_nodes = np.full(len(goals), -1, dtype=np.int64)
+        goal_nodes[has_goal] = self._roadmap.nearest_nodes(goals[has_goal])
+        return self.plan_nodes(
+            self._roadmap.nearest_nodes(starts), goal_nodes, priorities, previous, elapsed, start_positions=starts[:, :2]
+        )
+
+    def plan_nodes(self, starts, goals, priorities=None, previous: Optional[FleetPlan] = None, elapsed: float = 0.0, start_positions=None) -> FleetPlan:
+        """
+        Method that plans the whole fleet at once, from and to roadmap nodes (see plan).
+
+        When replanning while executing a plan, the plan of a vehicle that is on schedule (and has the same goal) is
+        kept as long as it is free of conflicts with the vehicles planned before it, and only the other vehicles are
+        searched again. Until it is planned, a vehicle holds the nodes it is about to go through for the first steps
+        (the next nodes of its previous plan if it is on schedule, else its start node), so the vehicles planned before
+        it leave it a way out.
+
+        Args:
+            starts: The (V,) start nodes of the vehicles.
+            goals: The (V,) goal nodes of the vehicles (-1 for the vehicles without a goal).
+            priorities: The (V,) priorities of the vehicles, the highest planned first. Defaults to the distance to the
+                goal.
+            previous (FleetPlan): The plan the same vehicles are executing, if any. Defaults to None.
+            elapsed (float): The time (in seconds) since the start of the previous plan. Defaults to 0.0.
+            start_positions: The (V, 2) positions (in meters) the start nodes were taken from, if any. The vehicles that
+                start closer than the separation move apart from the closer of their positions and their start nodes.
+                Defaults to None (the start nodes only).
+
+        Returns:
+            FleetPlan: The plan of the fleet
+        """
+        start_time = time.perf_counter()
+        starts = np.asarray(starts, dtype=np.int64).reshape(-1)
+        goals = np.asarray(goals, dtype=np.int64).reshape(-1)
+        count = len(starts)
+        start_positions = self._roadmap.positions[starts] if start_positions is None else np.asarray(start_positions)
+        if len(self._roadmap) == 0:
+            raise ValueError("The roadmap has no node (the environment has no free space for the vehicles)")
+
+        self._roadmap.prepare(goals[goals >= 0].tolist())
+        fields = {goal: self._roadmap.distance_field(goal, as_lists=True) for goal in set(goals[goals >= 0].tolist())}
+
+        status = np.full(count, FleetPlanner.PLANNED, dtype=np.int64)
+        status[goals < 0] = FleetPlanner.IDLE
+        for vehicle in np.flatnonzero(goals >= 0).tolist():
+            if math.isinf(fields[int(goals[vehicle])][0][starts[vehicle]]):
+                status[vehicle] = FleetPlanner.UNREACHABLE
+
+        if priorities is None:
+            priorities = np.array([
+                fields[goal][0][start] if state == FleetPlanner.PLANNED else 0.0
+                for start, goal, state in zip(starts.tolist(), goals.tolist(), status.tolist())
+            ])
+        order = np.argsort(-np.asarray(priorities, dtype=np.float64), kind="stable").tolist()
+        # The plans of the vehicles that are on schedule are kept where they are still free of conflicts
+        continuations, on_schedule = self._continuations(starts, goals, previous, elapsed)
+        holds = continuations[:, : min(FleetPlanner.HOLD_STEPS, self._window) + 1]
+        paths = [path if kept else None for path, kept in zip(continuations.tolist(), on_schedule.tolist())]
+
+        # The vehicles that do not move are planned first (as obstacles), then the others by priority. A vehicle left
+        # without a conflict-free plan is fixed at its start and the fleet is planned again around it, until no vehicle
+        # is blocked (every round fixes at least one more vehicle, and the paths still free are kept between rounds),
+        # so the plans of the others always avoid where the blocked vehicles actually stand
+        fixed = status != FleetPlanner.PLANNED
+        hold_steps = min(FleetPlanner.HOLD_STEPS, self._window)
+        while True:
+            paths, blocked = self._plan_round(starts, start_positions, goals, holds, hold_steps, fields, order, fixed, paths)
+            if not blocked:
+                break
+            fixed[blocked] = True
+
+        # Many of the blocked vehicles were only blocked by a plan that changed in a later round: they are planned once
+        # more against the final plans of the others (the ones still blocked hold their start, which the vehicles
+        # released before them avoided)
+        blocked = np.flatnonzero(fixed & (status == FleetPlanner.PLANNED))
+        if len(blocked) > 0:
+            kept = np.ones(count, dtype=bool)
+            kept[blocked] = False
+            standing = np.repeat(starts[:, None], self._window + 1, axis=1)
+            paths, still_blocked = self._plan_round(
+                starts, start_positions, goals, standing, self._window, fields, order, kept, fixed_paths=paths
+            )
+            status[still_blocked] = FleetPlanner.BLOCKED
+
+        # Only the moving part of the window is kept for the vehicles that stay at their goal, and beyond the window
+        # every path follows the distance field of its goal
+        for vehicle in range(count):
+            goal = int(goals[vehicle])
+            path = paths[vehicle]
+            while len(path) > 1 and path[-1] == goal and path[-2] == goal:
+                path.pop()
+            if status[vehicle] == FleetPlanner.PLANNED and path[-1] != goal:
+                next_nodes = fields[goal][1]
+                while path[-1] != goal:
+                    path.append(next_nodes[path[-1]])
+
+        steps = max(len(path) for path in paths) if paths else 1
+        nodes = np.array([path + [path[-1]] * (steps - len(path)) for path in paths], dtype=np.int64).reshape(count, steps)
+        return FleetPlan(
+            self._roadmap, nodes, goals, status, self._step_time, self._window, time.perf_counter() - start_time
+        )
+
+    """
+    ---------------------------------------------------------------------
+    Auxiliary methods
+    ---------------------------------------------------------------------
+    """
+
+    def _continuations(self, starts: np.ndarray, goals: np.ndarray, previous: Optional[FleetPlan], elapsed: float):
+        # Nodes of the previous plan of every vehicle for the steps 0..window from now, and whether the vehicle is on
+        # schedule (at the node of its previous plan, a step ahead or behind at most) with the same goal
+        window = self._window
+        continuations = np.repeat(starts[:, None], window + 1, axis=1)
+        on_schedule = np.zeros(len(starts), dtype=bool)
+        if previous is None or len(previous) != len(starts):
+            return continuations, on_schedule
+
+        nodes = previous.nodes
+        last = nodes.shape[1] - 1
+        step = int(round(elapsed / previous.step_time))
+        for offset in (0, -1, 1):
+            current = min(max(step + offset, 0), last)
+            matching = np.flatnonzero(~on_schedule & (nodes[:, current] == starts))
+            continuations[matching] = nodes[matching][:, np.minimum(current + np.arange(window + 1), last)]
+            on_schedule[matching] = True
+
+        on_schedule &= (previous.goals == goals) & (previous.status == FleetPlanner.PLANNED)
+        continuations[~on_schedule] = starts[~on_schedule, None]
+        return continuations, on_schedule
+
+    def _plan_round(self, starts: np.ndarray, start_positions: np.ndarray, goals: np.ndarray, holds: np.ndarray, hold_steps: int, fields: dict, order: List[int], fixed: np.ndarray, previous_paths: Optional[List] = None, fixed_paths: Optional[List] = None):
+        # Plans the vehicles that are not fixed, in order, around the fixed ones (at their start, or along fixed_paths)
+        window = self._window
+        node_count = len(self._roadmap)
+        offsets = (np.arange(window + 1, dtype=np.int64) * node_count)[:, None]
+
+        # Reservation table: the number of vehicles reserving each key step * node_count + node (the vehicles not
+        # planned yet reserve their holds for the first hold_steps steps)
+        reserved = Counter()
+        paths: List[Optional[List[int]]] = [None] * len(starts)
+        blocked = []
+
+        positions = self._roadmap.positions
+
+        growth = FleetPlanner.SEPARATION_GROWTH * self._roadmap.spacing * np.arange(window + 1)
+
+        def keys(path: List[int], first: int, last: int, distance: Optional[float] = None) -> List[int]:
+            # (with the distance between two vehicles that start too close, only the nodes closer than that distance
+            # plus the growth of every step are reserved, instead of the nodes closer than the separation)
+            nodes = path[first : last + 1]
+            neighborhoods = self._neighborhoods[nodes]
+            reserved_nodes = neighborhoods >= 0
+            if distance is not None:
+                distances = np.linalg.norm(positions[neighborhoods] - positions[nodes][:, None], axis=2)
+                reserved_nodes &= distances < distance + growth[first : last + 1, None]
+            return (neighborhoods + offsets[first : last + 1])[reserved_nodes].tolist()
+
+        for vehicle, start in enumerate(starts.tolist()):
+            if fixed[vehicle]:
+                paths[vehicle] = fixed_paths[vehicle] if fixed_paths is not None else [start] * (window + 1)
+                reserved.update(keys(paths[vehicle], 1, window))
+            else:
+                reserved.update(keys(holds[vehicle].tolist(), 1, hold_steps))
+
+        # Vehicles closer than the separation at the start only have to move apart gradually (the nodes they reserve for
+        # each other are the ones closer than their distance plus the growth of each step)
+        vehicles_at = {}
+        for vehicle, start in enumerate(starts.tolist()):
+            vehicles_at.setdefault(start, []).append(vehicle)
+
+        for vehicle in order:
+            if fixed[vehicle]:
+                continue
+
+            start, goal = int(starts[vehicle]), int(goals[vehicle])
+            reserved.subtract(keys(holds[vehicle].tolist(), 1, hold_steps))
+
+            start_neighborhood = self._neighborhoods[start]
+            near = [
+                other
+                for node in start_neighborhood[start_neighborhood >= 0].tolist()
+                for other in vehicles_at.get(node, ())
+                if other != vehicle
+            ]
+            near_keys, reduced_keys = [], []
+            for other in near:
+                other_path, last = (paths[other], window) if paths[other] is not None else (holds[other].tolist(), hold_steps)
+                distance = min(
+                    float(np.linalg.norm(positions[start] - positions[starts[other]])),
+                    float(np.linalg.norm(start_positions[vehicle] - start_positions[other])),
+                )
+                near_keys += keys(other_path, 1, last)
+                reduced_keys += keys(other_path, 1, last, distance)
+            reserved.subtract(near_keys)
+            reserved.update(reduced_keys)
+
+            # The path of the previous plan or round is kept if it is still free (a blocked vehicle holds its start, so
+            # the vehicles planned after it avoid where it actually stands)
+            path = previous_paths[vehicle] if previous_paths is not None else None
+            if path is None or any(reserved.get(key) for key in (offsets[1:, 0] + path[1:]).tolist()):
+                path = self._search(start, goal, fields[goal][0], reserved)
+                path += [path[-1]] * (window + 1 - len(path))
+                if any(reserved.get(key) for key in (offsets[1:, 0] + path[1:]).tolist()):
+                    blocked.append(vehicle)
+                    path = [start] * (window + 1)
+            reserved.update(keys(path, 1, window))
+            reserved.subtract(reduced_keys)
+            reserved.update(near_keys)
+            paths[vehicle] = path
+
+        return paths, blocked
+
+    def _search(self, start: int, goal: int, distances: List[float], reserved: Counter) -> List[int]:
+        # Space-time A*: states are (node, step), keyed step * node_count + node, and the search ends at the goal (if it
+        # is free until the end of the window) or at the end of the window
+        window = self._window
+        node_count = len(self._roadmap)
+        successors = self._successors
+
+        def goal_free(step: int) -> bool:
+            return not any(reserved.get(later * node_count + goal) for later in range(step + 1, window + 1))
+
+        # (the heuristic is consistent, so a state is expanded once, with its lowest cost, and the entries of the heap
+        # with a higher cost are skipped)
+        costs = {start: 0.0}
+        parents = {start: -1}
+        heap = [(distances[start], 0, 0.0, start)]
+        best_key, best_distance, best_step = start, distances[start], 0
+        expansions = 0
+
+        # (bound locally, this loop runs for every state)
+        is_reserved, cost_of, push, pop = reserved.get, costs.get, heapq.heappush, heapq.heappop
+        inf = math.inf
+
+        while heap:
+            _, negative_step, cost, node = pop(heap)
+            step = -negative_step
+            key = step * node_count + node
+            if cost > costs[key]:
+                continue
+
+            distance = distances[node]
+            if distance < best_distance or (distance == best_distance and step > best_step):
+                best_key, best_distance, best_step = key, distance, step
+            if step == window or (node == goal and goal_free(step)):
+                best_key = key
+                break
+
+            expansions += 1
+            if expansions > self._max_expansions:
+                break
+
+            base = (step + 1) * node_count
+            next_step = negative_step - 1
+            for neighbor, length in successors[node]:
+                next_key = base + neighbor
+                if is_reserved(next_key):
+                    continue
+                next_cost = cost + length
+                if next_cost < cost_of(next_key, inf):
+                    costs[next_key] = next_cost
+                    parents[next_key] = key
+                    push(heap, (next_cost + distances[neighbor], next_step, next_cost, neighbor))
+
+        # Path to the state reached (the best partial one if the search did not finish)
+        path = []
+        key = best_key
+        while key >= 0:
+            path.append(key % node_count)
+            key = parents[key]
+        path.reverse()
+        return path
@@ -0,0 +1,480 @@
+"""
+| File: roadmap.py
+| Author: Akhilesh Bhat
+| Description: Definition of the Roadmap class, an 8-connected lattice graph of the free floor of an environment (built
+                 from its map) with the distance fields to the goals used by the planners, and of the RoadmapCache that
+                 keeps the roadmaps on disk, per environment
+"""
+
+__all__ = ["Roadmap", "RoadmapCache"]
+
+import os
+import json
+import math
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from Forklift_Simulator_python.logic.maps.environment_map import EnvironmentMap, environment_slug
+
+logger = logging.getLogger(__name__)
+
+# (row, column) offsets of the 8 neighbors of a node (the orthogonal ones first) and the length of the edges, in spacings
+NEIGHBOR_OFFSETS = np.array([[0, 1], [1, 0], [0, -1], [-1, 0], [1, 1], [1, -1], [-1, -1], [-1, 1]], dtype=np.int64)
+NEIGHBOR_LENGTHS = np.array([1.0, 1.0, 1.0, 1.0, math.sqrt(2.0), math.sqrt(2.0), math.sqrt(2.0), math.sqrt(2.0)])
+
+
+class Roadmap:
+    """
+    Lattice graph of the free floor: the lattice point (row, column) is at [origin_x + column * spacing, origin_y + row *
+    spacing] and is a node if the square of half width radius around it is free. A node is connected to each of its 8
+    neighbors if the bounds of the squares of both nodes are free, so a diagonal never cuts the corner of an obstacle.
+    The nodes are numbered in row-major order and the edges are kept as padded (N, 8) arrays of neighbor ids (-1 where
+    there is no edge) and lengths.
+
+    The planners need the distance along the roadmap from every node to their goals: the distance fields are computed
+    with Dijkstra's algorithm (for all the new goals in a single call) and kept in an LRU cache, along with the next node
+    on a shortest path to the goal from every node.
+    """
+
+    # Number of distance fields kept in memory
+    CACHED_FIELDS = 256
+
+    def __init__(self, free: np.ndarray, edges: np.ndarray, spacing: float, origin=(0.0, 0.0), radius: float = 0.0, metadata: Optional[Dict] = None):
+        """
+        Args:
+            free (np.ndarray): A (rows, columns) boolean array, True where the lattice point is a node.
+            edges (np.ndarray): A (rows, columns, 8) boolean array, True where the node is connected to its neighbor at
+                NEIGHBOR_OFFSETS[k] (ignored where either end is not a node).
+            spacing (float): The distance (in meters) between neighbor lattice points.
+            origin (tuple): The [x, y] position (in meters) of the lattice point (0, 0). Defaults to (0.0, 0.0).
+            radius (float): The free half width (in meters) around the nodes and edges. Defaults to 0.0.
+            metadata (dict): Information on how the roadmap was built (saved with it).
+        """
+        self._free = np.ascontiguousarray(free, dtype=bool)
+        self._edges = np.ascontiguousarray(edges, dtype=bool).reshape(self._free.shape + (8,))
+        self._spacing = float(spacing)
+        self._origin = np.asarray(origin[:2], dtype=np.float64)
+        self._radius = float(radius)
+        self.metadata = dict(metadata or {})
+
+        # Node id of every lattice point (-1 where there is none) and lattice coordinates of every node
+        rows, columns = self._free.shape
+        flat = np.flatnonzero(self._free)
+        self._cells = np.full(rows * columns, -1, dtype=np.int64)
+        self._cells[flat] = np.arange(len(flat))
+        self._cells = self._cells.reshape(rows, columns)
+        self._node_rows, self._node_columns = np.divmod(flat, columns)
+        self._positions = self._origin + np.column_stack((self._node_columns, self._node_rows)) * self._spacing
+
+        # Neighbor ids and edge lengths of every node
+        neighbor_rows = self._node_rows[:, None] + NEIGHBOR_OFFSETS[:, 0]
+        neighbor_columns = self._node_columns[:, None] + NEIGHBOR_OFFSETS[:, 1]
+        inside = (neighbor_rows >= 0) & (neighbor_rows < rows) & (neighbor_columns >= 0) & (neighbor_columns < columns)
+        connected = self._edges.reshape(-1, 8)[flat] & inside
+
+        self._neighbors = np.full((len(flat), 8), -1, dtype=np.int64)
+        self._neighbors[connected] = self._cells[neighbor_rows[connected], neighbor_columns[connected]]
+        self._lengths = np.where(self._neighbors >= 0, NEIGHBOR_LENGTHS * self._spacing, np.inf)
+
+        # Built on first use: the sparse adjacency matrix, the k-d tree of the nodes and the distance fields
+        self._graph = None
+        self._kdtree = None
+        self._fields: "OrderedDict[int, Tuple]" = OrderedDict()
+
+        # Lock for safe multi-threading (of the distance field cache)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, environment_map: EnvironmentMap, spacing: float = 1.0, radius: float = 0.9, metadata: Optional[Dict] = None) -> "Roadmap":
+        """
+        Method that builds the roadmap of an environment, with a lattice centered on its map.
+
+        Args:
+            environment_map (EnvironmentMap): The map of the environment.
+            spacing (float): The distance (in meters) between neighbor nodes. Defaults to 1.0.
+            radius (float): The free half width (in meters) required around the nodes and edges (e.g. half the width
+                of the widest vehicle, plus a margin). Defaults to 0.9.
+            metadata (dict): Information saved with the roadmap.
+
+        Returns:
+            Roadmap: The roadmap of the environment
+        """
+        occupancy = environment_map.occupancy
+        min_x, min_y, max_x, max_y = occupancy.bounds
+        columns = max(int(math.floor((max_x - min_x) / spacing)), 1)
+        rows = max(int(math.floor((max_y - min_y) / spacing)), 1)
+        origin = (
+            min_x + 0.5 * ((max_x - min_x) - (columns - 1) * spacing),
+            min_y + 0.5 * ((max_y - min_y) - (rows - 1) * spacing),
+        )
+
+        xs, ys = np.meshgrid(origin[0] + np.arange(columns) * spacing, origin[1] + np.arange(rows) * spacing)
+        centers = np.column_stack((xs.ravel(), ys.ravel()))
+        free = ~occupancy.boxes_occupied(np.hstack((centers - radius, centers + radius))).reshape(rows, columns)
+
+        # An edge is free if the bounds of the squares around both of its nodes are
+        edges = np.zeros((rows, columns, 8), dtype=bool)
+        for k, (d_row, d_column) in enumerate(NEIGHBOR_OFFSETS.tolist()):
+            r0, r1 = max(0, -d_row), rows - max(0, d_row)
+            c0, c1 = max(0, -d_column), columns - max(0, d_column)
+            if r0 >= r1 or c0 >= c1:
+                continue
+
+            candidates = free[r0:r1, c0:c1] & free[r0 + d_row : r1 + d_row, c0 + d_column : c1 + d_column]
+            x, y = xs[r0:r1, c0:c1][candidates], ys[r0:r1, c0:c1][candidates]
+            other_x, other_y = x + d_column * spacing, y + d_row * spacing
+            boxes = np.column_stack((
+                np.minimum(x, other_x) - radius,
+                np.minimum(y, other_y) - radius,
+                np.maximum(x, other_x) + radius,
+                np.maximum(y, other_y) + radius,
+            ))
+            edges[r0:r1, c0:c1, k][candidates] = ~occupancy.boxes_occupied(boxes)
+
+        return cls(free, edges, spacing, origin, radius, metadata)
+
+    @property
+    def spacing(self) -> float:
+        return self._spacing
+
+    @property
+    def origin(self) -> np.ndarray:
+        return self._origin
+
+    @property
+    def radius(self) -> float:
+        return self._radius
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self._free.shape
+
+    @property
+    def positions(self) -> np.ndarray:
+        """
+        Returns:
+            np.ndarray: The (N, 2) [x, y] positions (in meters) of the nodes
+        """
+        return self._positions
+
+    @property
+    def neighbors(self) -> np.ndarray:
+        """
+        Returns:
+            np.ndarray: The (N, 8) ids of the neighbors of every node (-1 where there is no edge)
+        """
+        return self._neighbors
+
+    @property
+    def lengths(self) -> np.ndarray:
+        """
+        Returns:
+            np.ndarray: The (N, 8) lengths (in meters) of the edges of every node (inf where there is no edge)
+        """
+        return self._lengths
+
+    @property
+    def edge_count(self) -> int:
+        return int(np.count_nonzero(self._neighbors >= 0)) // 2
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def nearest_nodes(self, points) -> np.ndarray:
+        """
+        Args:
+            points: An (M, 2) (or (M, 3)) array of positions (in meters).
+
+        Returns:
+            np.ndarray: The (M,) ids of the nodes nearest to the points (-1 if the roadmap has no node)
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, np.shape(points)[-1])[:, :2]
+        if len(self._positions) == 0:
+            return np.full(len(points), -1, dtype=np.int64)
+
+        # Most points are next to a node: the nearest lattice point, else the nearest node (from the k-d tree)
+        rows, columns = self._free.shape
+        lattice = np.rint((points - self._origin) / self._spacing).astype(np.int64)
+        inside = (lattice[:, 0] >= 0) & (lattice[:, 0] < columns) & (lattice[:, 1] >= 0) & (lattice[:, 1] < rows)
+
+        nodes = np.full(len(points), -1, dtype=np.int64)
+        nodes[inside] = self._cells[lattice[inside, 1], lattice[inside, 0]]
+
+        missing = np.flatnonzero(nodes < 0)
+        if len(missing) > 0:
+            nodes[missing] = self._node_tree().query(points[missing])[1]
+        return nodes
+
+    def neighborhoods(self, radius: float) -> np.ndarray:
+        """
+        Args:
+            radius (float): The radius (in meters) of the neighborhoods.
+
+        Returns:
+            np.ndarray: An (N, K) array of the ids of the nodes closer than radius to each node (the node itself
+                first), padded with -1
+        """
+        reach = int(math.ceil(radius / self._spacing))
+        offsets = [(0, 0)] + [
+            (d_row, d_column)
+            for d_row in range(-reach, reach + 1)
+            for d_column in range(-reach, reach + 1)
+            if (d_row, d_column) != (0, 0) and math.hypot(d_row, d_column) * self._spacing < radius
+        ]
+        offsets = np.array(offsets, dtype=np.int64)
+
+        rows, columns = self._free.shape
+        neighbor_rows = self._node_rows[:, None] + offsets[:, 0]
+        neighbor_columns = self._node_columns[:, None] + offsets[:, 1]
+        inside = (neighbor_rows >= 0) & (neighbor_rows < rows) & (neighbor_columns >= 0) & (neighbor_columns < columns)
+
+        neighborhoods = np.full(inside.shape, -1, dtype=np.int64)
+        neighborhoods[inside] = self._cells[neighbor_rows[inside], neighbor_columns[inside]]
+        return neighborhoods
+
+    def distance_field(self, goal: int, as_lists: bool = False) -> Tuple:
+        """
+        Args:
+            goal (int): The id of the goal node.
+            as_lists (bool): Whether to return Python lists (faster to index one element at a time) rather than arrays.
+                Defaults to False.
+
+        Returns:
+            tuple: The distance (in meters, along the roadmap) from every node to the goal (inf if the goal cannot be
+                reached) and the next node on a shortest path to the goal from every node (-1 if it cannot be reached)
+        """
+        goal = int(goal)
+        with self._lock:
+            field = self._fields.get(goal)
+            if field is not None:
+                self._fields.move_to_end(goal)
+
+        if field is None:
+            self.prepare([goal])
+            with self._lock:
+                field = self._fields[goal]
+
+        return (field[2], field[3]) if as_lists else (field[0], field[1])
+
+    def prepare(self, goals):
+        """
+        Method that computes the distance fields of the goals that are not cached yet (with a single call to Dijkstra's
+        algorithm).
+
+        Args:
+            goals: The ids of the goal nodes.
+        """
+        with self._lock:
+            missing = sorted({int(goal) for goal in goals} - set(self._fields))
+        if not missing:
+            return
+
+        # scipy is only imported when distances are first needed (it is slow to import at startup)
+        from scipy.sparse.csgraph import dijkstra
+
+        distances = np.atleast_2d(dijkstra(self._adjacency(), directed=True, indices=missing))
+
+        # Next node: the neighbor minimizing the edge length plus its distance to the goal
+        valid = self._neighbors >= 0
+        neighbors = np.where(valid, self._neighbors, 0)
+        fields = []
+        for goal, distance in zip(missing, distances):
+            through = np.where(valid, self._lengths + distance[neighbors], np.inf)
+            choice = np.argmin(through, axis=1)
+            next_nodes = np.where(np.isfinite(distance), neighbors[np.arange(len(distance)), choice], -1)
+            next_nodes[goal] = goal
+            fields.append((goal, (distance, next_nodes, distance.tolist(), next_nodes.tolist())))
+
+        with self._lock:
+            for goal, field in fields:
+                self._fields[goal] = field
+            while len(self._fields) > max(Roadmap.CACHED_FIELDS, len(missing)):
+                self._fields.popitem(last=False)
+
+    def path(self, start: int, goal: int) -> List[int]:
+        """
+        Returns:
+            list: The ids of the nodes of a shortest path from start to goal (both included), empty if the goal cannot
+                be reached
+        """
+        next_nodes = self.distance_field(goal, as_lists=True)[1]
+        if next_nodes[start] < 0:
+            return []
+
+        nodes = [int(start)]
+        while nodes[-1] != goal:
+            nodes.append(next_nodes[nodes[-1]])
+        return nodes
+
+    def save(self, path: str):
+        """
+        Method that saves the roadmap into a (compressed) npz file, read back with from_file.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        # Written to a temporary file first, such that a roadmap being saved is never read half written
+        tmp_path = path + ".tmp.npz"
+        np.savez_compressed(
+            tmp_path,
+            free=self._free,
+            edges=self._edges,
+            spacing=self._spacing,
+            origin=self._origin,
+            radius=self._radius,
+            metadata=json.dumps(self.metadata),
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def from_file(cls, path: str) -> "Roadmap":
+        with np.load(path) as data:
+            return cls(
+                data["free"],
+                data["edges"],
+                float(data["spacing"]),
+                data["origin"],
+                float(data["radius"]),
+                json.loads(str(data["metadata"])),
+            )
+
+    """
+    ---------------------------------------------------------------------
+    Auxiliary methods
+    ---------------------------------------------------------------------
+    """
+
+    def _adjacency(self):
+        if self._graph is None:
+            from scipy.sparse import csr_matrix
+
+            count = len(self._positions)
+            sources, slots = np.nonzero(self._neighbors >= 0)
+            self._graph = csr_matrix(
+                (self._lengths[sources, slots], (sources, self._neighbors[sources, slots])), shape=(count, count)
+            )
+        return self._graph
+
+    def _node_tree(self):
+        if self._kdtree is None:
+            from scipy.spatial import cKDTree
+
+            self._kdtree = cKDTree(self._positions)
+        return self._kdtree
+
+
+class RoadmapCache:
+    """
+    Building the roadmap of a large environment takes a while, so each roadmap is built once and kept on disk, as
+    <cache_dir>/<environment>.npz (with the environment key in lower case and spaces replaced by underscores), and in
+    memory. A roadmap is built again when the map of the environment or the roadmap parameters change.
+    """
+
+    def __init__(self, cache_dir: str, spacing: float = 1.0, radius: float = 0.9):
+        """
+        Args:
+            cache_dir (str): The directory where the roadmaps are stored.
+            spacing (float): The distance (in meters) between neighbor nodes. Defaults to 1.0.
+            radius (float): The free half width (in meters) required around the nodes and edges. Defaults to 0.9.
+        """
+        self._cache_dir = cache_dir
+        self._parameters = {"spacing": spacing, "radius": radius}
+        self._roadmaps: Dict[str, Roadmap] = {}
+
+        # Lock for safe multi-threading
+        self._lock = threading.Lock()
+
+    def path(self, environment: str) -> str:
+        """
+        Returns:
+            str: The path of the file of the roadmap of an environment
+        """
+        return os.path.join(self._cache_dir, environment_slug(environment) + ".npz")
+
+    def key(self, environment_map: EnvironmentMap, radius: Optional[float] = None) -> str:
+        """
+        Args:
+            environment_map (EnvironmentMap): The map of the environment.
+            radius (float): The free half width (in meters) around the nodes and edges. Defaults to the radius of the
+                cache.
+
+        Returns:
+            str: The key of the roadmap of a map (changes when the occupancy grid or the roadmap parameters do)
+        """
+        occupancy = environment_map.occupancy
+        digest = hashlib.sha256(np.packbits(occupancy.grid).tobytes())
+        digest.update(json.dumps(
+            dict(
+                self._parameters,
+                radius=self._parameters["radius"] if radius is None else float(radius),
+                shape=list(occupancy.shape),
+                resolution=occupancy.resolution,
+                origin=occupancy.origin.tolist(),
+                outside_occupied=occupancy.outside_occupied,
+            ),
+            sort_keys=True,
+        ).encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, environment: Optional[str], environment_map: EnvironmentMap, radius: Optional[float] = None) -> Roadmap:
+        """
+        Method that returns the roadmap of an environment, from memory, from the disk or built from its map (and then
+        saved).
+
+        Args:
+            environment (str): The key of the environment (None to build the roadmap without keeping it on disk).
+            environment_map (EnvironmentMap): The map of the environment.
+            radius (float): The free half width (in meters) around the nodes and edges, e.g. derived from the footprints
+                of the fleet (the roadmap is built again when it changes). Defaults to the radius of the cache.
+
+        Returns:
+            Roadmap: The roadmap of the environment
+        """
+        radius = self._parameters["radius"] if radius is None else float(radius)
+        key = self.key(environment_map, radius)
+        name = environment if environment is not None else ""
+
+        with self._lock:
+            roadmap = self._roadmaps.get(name)
+        if roadmap is not None and roadmap.metadata.get("key") == key:
+            return roadmap
+
+        path = self.path(environment) if environment is not None else None
+        if path is not None and os.path.isfile(path):
+            try:
+                roadmap = Roadmap.from_file(path)
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning("Could not read the roadmap %s: %s", path, e)
+                roadmap = None
+
+        if roadmap is None or roadmap.metadata.get("key") != key:
+            roadmap = Roadmap.build(
+                environment_map,
+                self._parameters["spacing"],
+                radius,
+                metadata={"key": key, "environment": environment},
+            )
+            if path is not None:
+                try:
+                    roadmap.save(path)
+                except OSError as e:
+                    logger.warning("Could not save the roadmap %s: %s", path, e)
+
+        with self._lock:
+            self._roadmaps[name] = roadmap
+        return roadmap
+
+    def invalidate(self, environment: str):
+        """
+        Method that forgets the roadmap of an environment (it is built again on its next get)
+        """
+        with self._lock:
+            self._roadmaps.pop(environment, None)
+        try:
+            os.remove(self.path(environment))
+        except OSError:
+            pass
@@ -0,0 +1,123 @@
+"""
+| File: kinematics_benchmark.py
+| Author: Akhilesh Bhat
+| Description: Benchmark of the vectorized forklift kinematic model: time per step of fleets of increasing size (up to
+                 10k vehicles), and of a look-ahead rollout
+"""
+
+__all__ = ["benchmark_kinematics", "benchmark_rollout", "main"]
+
+import sys
+import json
+import time
+import logging
+import argparse
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from Forklift_Simulator_python.logic.vehicles.forklift_kinematics import ForkliftKinematics
+from Forklift_Simulator_python.logic.vehicles.vehicle_configs import SingleRearWheelForkliftConfig
+
+logger = logging.getLogger(__name__)
+
+
+def benchmark_kinematics(vehicles: int = 10000, steps: int = 1000, dt: float = 1.0 / 60.0, seed: int = 0) -> Dict:
+    """
+    Function that steps a fleet of forklifts with random commands (changed every 100 steps) and measures the wall time.
+
+    Args:
+        vehicles (int): The number of vehicles. Defaults to 10000.
+        steps (int): The number of steps measured. Defaults to 1000.
+        dt (float): The step size (in seconds). Defaults to 1/60.
+        seed (int): The seed of the random commands. Defaults to 0.
+
+    Returns:
+        dict: The number of vehicles and steps, the mean wall time per step (in seconds), the vehicle steps per second
+            and the real time factor
+    """
+    rng = np.random.default_rng(seed)
+    config = SingleRearWheelForkliftConfig()
+
+    model = ForkliftKinematics(capacity=vehicles)
+    model.add_many(config, np.column_stack((rng.uniform(-50, 50, (vehicles, 2)), rng.uniform(-np.pi, np.pi, vehicles))))
+
+    def randomize_commands():
+        model.set_commands(
+            speed=rng.uniform(-config.max_speed, config.max_speed, vehicles),
+            steering=rng.uniform(-config.max_steering_angle, config.max_steering_angle, vehicles),
+            lift=rng.uniform(-config.max_lift_speed, config.max_lift_speed, vehicles),
+            reach=rng.uniform(-config.max_reach_speed, config.max_reach_speed, vehicles),
+        )
+
+    # Warm up (first touches of the arrays, NumPy dispatch caches)
+    randomize_commands()
+    for _ in range(10):
+        model.step(dt)
+
+    elapsed = 0.0
+    for k in range(steps):
+        if k % 100 == 0:
+            randomize_commands()
+        start = time.perf_counter()
+        model.step(dt)
+        elapsed += time.perf_counter() - start
+
+    step_time = elapsed / steps
+    return {
+        "vehicles": vehicles,
+        "steps": steps,
+        "step_time": step_time,
+        "vehicle_steps_per_second": vehicles / step_time,
+        "real_time_factor": dt / step_time,
+    }
+
+
+def benchmark_rollout(vehicles: int = 10000, horizon: int = 120, dt: float = 1.0 / 30.0) -> Dict:
+    """
+    Function that measures a look-ahead rollout of the whole fleet over the given horizon (in steps).
+
+    Returns:
+        dict: The number of vehicles, the horizon and the wall time (in seconds) of the rollout
+    """
+    rng = np.random.default_rng(0)
+    config = SingleRearWheelForkliftConfig()
+
+    model = ForkliftKinematics(capacity=vehicles)
+    model.add_many(config, np.column_stack((rng.uniform(-50, 50, (vehicles, 2)), np.zeros(vehicles))))
+    model.set_commands(speed=config.max_speed, steering=rng.uniform(-0.5, 0.5, vehicles))
+
+    start = time.perf_counter()
+    model.rollout(dt, horizon)
+    return {"vehicles": vehicles, "horizon": horizon, "rollout_time": time.perf_counter() - start}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure the time per step of the vectorized forklift kinematic model")
+    parser.add_argument("--vehicles", type=int, nargs="*", default=[1, 100, 1000, 10000], help="fleet sizes to measure")
+    parser.add_argument("--steps", type=int, default=1000, help="number of steps measured per fleet size")
+    parser.add_argument("--horizon", type=int, default=120, help="number of steps of the measured rollout")
+    parser.add_argument("--output", default=None, help="json file where the results are written")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    results = []
+    print("{:>10}  {:>14}  {:>20}".format("Vehicles", "Step (us)", "Vehicle steps/s"))
+    for vehicles in args.vehicles:
+        result = benchmark_kinematics(vehicles, args.steps)
+        results.append(result)
+        print("{:>10}  {:>14.1f}  {:>20.3e}".format(vehicles, result["step_time"] * 1e6, result["vehicle_steps_per_second"]))
+
+    rollout = benchmark_rollout(max(args.vehicles), args.horizon)
+    print("Rollout of {} vehicles over {} steps: {:.1f} ms".format(rollout["vehicles"], rollout["horizon"], rollout["rollout_time"] * 1e3))
+
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump({"steps": results, "rollout": rollout}, f, indent=2)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+"""
+| File: startup_benchmark.py
+| Author: Akhilesh Bhat
+| Description: Cold start regression benchmark: imports the startup modules of the extension in fresh interpreters,
+                 compares the median import time against a saved baseline and fails if it grew (or if a module that must
+                 be deferred, such as scipy, got imported)
+"""
+
+__all__ = ["measure_cold_start", "check_cold_start", "main"]
+
+import os
+import sys
+import json
+import logging
+import argparse
+import statistics
+import subprocess
+from typing import Dict, List, Optional, Sequence
+
+from Forklift_Simulator_python.logic.profiling.startup_profiler import DEFERRED_MODULES
+
+logger = logging.getLogger(__name__)
+
+# Modules imported when the extension starts that can be imported without a running Kit app
+STARTUP_MODULES = [
+    "Forklift_Simulator_python",
+    "Forklift_Simulator_python.global_variables",
+    "Forklift_Simulator_python.logic.vehicle_manager",
+    "Forklift_Simulator_python.logic.vehicles.fleet_state",
+    "Forklift_Simulator_python.logic.vehicles.vehicle_configs",
+    "Forklift_Simulator_python.logic.assets.asset_cache",
+    "Forklift_Simulator_python.logic.assets.environment_pool",
+]
+
+# Code run in each fresh interpreter
+_CHILD_CODE = """
+import sys, json, time, importlib
+modules, deferred = json.loads(sys.argv[1]), json.loads(sys.argv[2])
+start = time.perf_counter()
+for module in modules:
+    importlib.import_module(module)
+elapsed = time.perf_counter() - start
+print(json.dumps({"time": elapsed, "modules": len(sys.modules), "deferred": [m for m in deferred if m in sys.modules]}))
+"""
+
+
+def measure_cold_start(
+    modules: Sequence[str] = STARTUP_MODULES, deferred: Sequence[str] = DEFERRED_MODULES, repeats: int = 5
+) -> Dict:
+    """
+    Function that imports the given modules in fresh interpreters.
+
+    Args:
+        modules (list): The modules to import. Defaults to STARTUP_MODULES.
+        deferred (list): The modules that must not be imported as a side effect. Defaults to DEFERRED_MODULES.
+        repeats (int): The number of interpreters to start. Defaults to 5.
+
+    Returns:
+        dict: The median and minimum import time (in seconds), the number of loaded modules and the deferred modules
+            that were imported anyway
+    """
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([root] + [p for p in [os.environ.get("PYTHONPATH")] if p]))
+
+    runs = []
+    for _ in range(repeats):
+        output = subprocess.run(
+            [sys.executable, "-c", _CHILD_CODE, json.dumps(list(modules)), json.dumps(list(deferred))],
+            env=env,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+
+    times = [run["time"] for run in runs]
+    return {
+        "median": statistics.median(times),
+        "min": min(times),
+        "modules": runs[-1]["modules"],
+        "deferred_imported": sorted({module for run in runs for module in run["deferred"]}),
+    }
+
+
+def check_cold_start(measurement: Dict, baseline: Optional[Dict], tolerance: float = 0.2, slack: float = 0.02) -> List[str]:
+    """
+    Function that compares a measurement against the baseline.
+
+    Args:
+        measurement (dict): The result of measure_cold_start.
+        baseline (dict): A previous result of measure_cold_start (None to only check the deferred modules).
+        tolerance (float): Allowed relative growth of the median import time. Defaults to 0.2 (20%).
+        slack (float): Allowed absolute growth (in seconds), to absorb noise on very fast imports. Defaults to 0.02.
+
+    Returns:
+        list: The description of every regression found (empty if there is none)
+    """
+    regressions = [
+        "The module " + module + " is imported at startup, it should only be imported on first use"
+        for module in measurement["deferred_imported"]
+    ]
+
+    if baseline is not None:
+        limit = baseline["median"] * (1.0 + tolerance) + slack
+        if measurement["median"] > limit:
+            regressions.append(
+                "Cold start took {:.1f}ms, the baseline is {:.1f}ms (limit {:.1f}ms)".format(
+                    1000.0 * measurement["median"], 1000.0 * baseline["median"], 1000.0 * limit
+                )
+            )
+
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from Forklift_Simulator_python.global_variables import CACHE_PATH
+
+    parser = argparse.ArgumentParser(description="Cold start regression benchmark of the forklift simulator")
+    parser.add_argument("--baseline", default=CACHE_PATH + "/startup_baseline.json", help="json file with the baseline")
+    parser.add_argument("--update", action="store_true", help="save the measurement as the new baseline")
+    parser.add_argument("--repeats", type=int, default=5, help="number of fresh interpreters to start")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative growth of the import time")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    measurement = measure_cold_start(repeats=args.repeats)
+    logger.info(
+        "Cold start: median %.1fms, min %.1fms, %d modules loaded",
+        1000.0 * measurement["median"],
+        1000.0 * measurement["min"],
+        measurement["modules"],
+    )
+
+    if args.update:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(measurement, f, indent=2)
+        logger.info("Saved the baseline to %s", args.baseline)
+        return 0
+
+    baseline = None
+    try:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+    except (OSError, ValueError):
+        logger.warning("No baseline found at %s (run with --update to create one)", args.baseline)
+
+    regressions = check_cold_start(measurement, baseline, args.tolerance)
+    for regression in regressions:
+        logger.error(regression)
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
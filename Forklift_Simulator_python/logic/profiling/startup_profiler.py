@@ -0,0 +1,226 @@
+"""
+| File: startup_profiler.py
+| Author: Akhilesh Bhat
+| Description: Definition of the StartupProfiler that records how long every module takes to import and how long each
+                 phase of the extension startup takes (enabled with FORKLIFT_SIM_PROFILE_STARTUP=1)
+"""
+
+__all__ = ["StartupProfiler", "startup_profiler", "DEFERRED_MODULES"]
+
+# Only the standard library is imported here, as this module is imported before anything else it measures
+import os
+import sys
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from importlib.abc import MetaPathFinder
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Modules that must only be imported on first use (never while the extension starts): heavy dependencies, and the
+# features that are only needed once selected (planning, recording, snapshots, streaming and input devices)
+DEFERRED_MODULES = [
+    "scipy",
+    "yaml",
+    "Forklift_Simulator_python.logic.maps.spawn_placer",
+    "Forklift_Simulator_python.logic.planning.fleet_planner",
+    "Forklift_Simulator_python.logic.planning.fleet_navigator",
+    "Forklift_Simulator_python.logic.interface.scene_snapshot",
+    "Forklift_Simulator_python.logic.interface.adaptive_rate",
+    "Forklift_Simulator_python.logic.recording.fleet_recorder",
+    "Forklift_Simulator_python.logic.streaming.transport",
+    "Forklift_Simulator_python.logic.streaming.ros2_backend",
+    "Forklift_Simulator_python.logic.input.input_devices",
+]
+
+
+class _TimedLoader:
+    """
+    Wraps a module loader such that the execution of the module is timed
+    """
+
+    def __init__(self, loader, profiler: "StartupProfiler"):
+        self._loader = loader
+        self._profiler = profiler
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        with self._profiler._time_import(module.__name__):
+            self._loader.exec_module(module)
+
+
+class _TimingFinder(MetaPathFinder):
+    """
+    Meta path finder that does not find anything by itself: it asks the other finders for the spec of the module and
+    wraps its loader with a _TimedLoader
+    """
+
+    def __init__(self, profiler: "StartupProfiler"):
+        self._profiler = profiler
+        self._resolving = threading.local()
+
+    def find_spec(self, fullname, path, target=None):
+        # Avoid recursing into ourselves while asking the other finders
+        if getattr(self._resolving, "active", False):
+            return None
+
+        self._resolving.active = True
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, "find_spec"):
+                    continue
+                spec = finder.find_spec(fullname, path, target)
+                if spec is not None:
+                    if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                        spec.loader = _TimedLoader(spec.loader, self._profiler)
+                    return spec
+            return None
+        finally:
+            self._resolving.active = False
+
+
+class StartupProfiler:
+    """
+    Records the time spent importing every module (inclusive of the modules it imports, and exclusive of them) and the
+    time spent in each named startup phase. When disabled, phase() is a no-op and no import hook is installed.
+    """
+
+    def __init__(self, enabled: bool = False):
+        """
+        Args:
+            enabled (bool): Whether the timings are recorded. Defaults to False.
+        """
+        self._enabled = enabled
+        self._start = time.perf_counter()
+        self._finder: Optional[_TimingFinder] = None
+
+        # Module name -> [inclusive time, self time] (in seconds)
+        self._imports: Dict[str, List[float]] = {}
+
+        # Stack of the modules being imported (to compute the self times), per thread
+        self._stack = threading.local()
+
+        # List of (phase, start offset, duration) in seconds
+        self._phases: List[tuple] = []
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled
+
+    def enable(self):
+        """
+        Method that starts recording, installing the import hook at the front of sys.meta_path
+        """
+        self._enabled = True
+        if self._finder is None:
+            self._finder = _TimingFinder(self)
+            sys.meta_path.insert(0, self._finder)
+
+    def disable(self):
+        """
+        Method that stops recording (the timings recorded so far are kept)
+        """
+        self._enabled = False
+        if self._finder is not None:
+            sys.meta_path.remove(self._finder)
+            self._finder = None
+
+    @contextmanager
+    def phase(self, name: str):
+        """
+        Context manager that records the time spent in a startup phase.
+
+        Args:
+            name (str): The name of the phase.
+        """
+        if not self._enabled:
+            yield
+            return
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._phases.append((name, start - self._start, time.perf_counter() - start))
+
+    def report(self, top: int = 25) -> Dict:
+        """
+        Args:
+            top (int): The number of slowest imports to include. Defaults to 25.
+
+        Returns:
+            dict: The slowest imports (by self time), the phases, the total time spent importing and the deferred
+                modules that were imported anyway
+        """
+        imports = sorted(self._imports.items(), key=lambda item: -item[1][1])
+        return {
+            "total_import_time": sum(self_time for _, self_time in self._imports.values()),
+            "modules_imported": len(self._imports),
+            "imports": [
+                {"module": name, "inclusive": inclusive, "self": self_time} for name, (inclusive, self_time) in imports[:top]
+            ],
+            "phases": [{"phase": name, "start": start, "duration": duration} for name, start, duration in self._phases],
+            "deferred": [module for module in DEFERRED_MODULES if module in sys.modules],
+        }
+
+    def log_report(self, top: int = 25):
+        """
+        Method that logs the report in a human readable table
+        """
+        report = self.report(top)
+        lines = [
+            "Startup profile: {} modules imported in {:.1f}ms".format(
+                report["modules_imported"], 1000.0 * report["total_import_time"]
+            )
+        ]
+        lines += ["  phase  {:>9.1f}ms  {}".format(1000.0 * phase["duration"], phase["phase"]) for phase in report["phases"]]
+        lines += [
+            "  import {:>9.1f}ms  (inclusive {:.1f}ms)  {}".format(
+                1000.0 * entry["self"], 1000.0 * entry["inclusive"], entry["module"]
+            )
+            for entry in report["imports"]
+        ]
+        logger.info("\n".join(lines))
+
+        if report["deferred"]:
+            logger.warning("Deferred modules imported during the startup: " + ", ".join(report["deferred"]))
+
+    def dump(self, path: str, top: int = 200):
+        """
+        Method that writes the report to a json file
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.report(top), f, indent=2)
+
+    @contextmanager
+    def _time_import(self, name: str):
+        stack = getattr(self._stack, "modules", None)
+        if stack is None:
+            stack = self._stack.modules = []
+
+        # Each entry holds the time spent importing nested modules
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            self._imports[name] = [elapsed, elapsed - nested]
+
+
+# Profiler used by the extension (enabled through the environment, such that it can measure the package import itself)
+startup_profiler = StartupProfiler()
+if os.environ.get("FORKLIFT_SIM_PROFILE_STARTUP", "0") != "0":
+    startup_profiler.enable()
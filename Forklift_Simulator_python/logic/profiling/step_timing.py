@@ -0,0 +1,378 @@
+"""
+| File: step_timing.py
+| Author: Akhilesh Bhat
+| Description: Definition of the LogHistogram and of the StepTiming that measures the wall time of the physics steps,
+                 of each physics step subscriber and of the rendered frames, the real time factor and the dropped frames,
+                 and dumps them periodically to CSV/JSON files
+"""
+
+__all__ = ["LogHistogram", "StepTiming"]
+
+import os
+import csv
+import json
+import math
+import time
+import logging
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class LogHistogram:
+    """
+    Histogram of positive values (durations, ratios) with logarithmically spaced bins, such that the relative precision
+    is the same from microseconds to seconds. Adding a value is O(1) and does not allocate.
+    """
+
+    def __init__(self, low: float = 1e-6, high: float = 10.0, bins_per_decade: int = 20):
+        """
+        Args:
+            low (float): The upper edge of the first bin (smaller values are counted in it). Defaults to 1e-6.
+            high (float): The lower edge of the last bin (larger values are counted in it). Defaults to 10.0.
+            bins_per_decade (int): The number of bins per factor of 10. Defaults to 20.
+        """
+        self._log_low = math.log10(low)
+        self._scale = bins_per_decade
+        self._bins = int(math.ceil((math.log10(high) - self._log_low) * bins_per_decade)) + 2
+        self._edges = np.concatenate(([0.0], 10.0 ** (self._log_low + np.arange(self._bins - 1) / bins_per_decade), [np.inf]))
+        self._counts = np.zeros(self._bins, dtype=np.int64)
+        self.reset()
+
+    @property
+    def edges(self) -> np.ndarray:
+        """
+        Returns:
+            np.ndarray: The edges of the bins (bins + 1 values, from 0 to inf)
+        """
+        return self._edges
+
+    @property
+    def counts(self) -> np.ndarray:
+        return self._counts
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    def reset(self):
+        self._counts[:] = 0
+        self._count = 0
+        self._sum = 0.0
+        self._min = math.inf
+        self._max = 0.0
+        self._last = 0.0
+
+    def add(self, value: float):
+        if value > 0.0:
+            index = int((math.log10(value) - self._log_low) * self._scale) + 1
+            index = 0 if index < 0 else (self._bins - 1 if index >= self._bins else index)
+        else:
+            index = 0
+
+        self._counts[index] += 1
+        self._count += 1
+        self._sum += value
+        self._last = value
+        if value < self._min:
+            self._min = value
+        if value > self._max:
+            self._max = value
+
+    def percentile(self, q: float) -> float:
+        """
+        Args:
+            q (float): The percentile (between 0 and 100).
+
+        Returns:
+            float: The upper edge of the bin holding the percentile (clamped to the largest value seen)
+        """
+        if self._count == 0:
+            return 0.0
+
+        index = int(np.searchsorted(np.cumsum(self._counts), q / 100.0 * self._count, side="left"))
+        return float(min(self._edges[index + 1], self._max))
+
+    def summary(self) -> Dict[str, float]:
+        """
+        Returns:
+            dict: The count, mean, min, max, last value and the 50th, 90th and 99th percentiles
+        """
+        return {
+            "count": self._count,
+            "mean": self._sum / self._count if self._count > 0 else 0.0,
+            "min": self._min if self._count > 0 else 0.0,
+            "max": self._max,
+            "last": self._last,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+        }
+
+
+class StepTiming:
+    """
+    Timing of the simulation loop. on_physics_step must be called at the start of every physics step and on_frame once
+    per app update (rendered frame); the subscribers of the physics step are timed with wrap (or measure). Collects:
+
+    - "physics_step": wall time between two consecutive physics steps (the physics solve, plus the rendering for the
+      first step of each frame)
+    - "frame": wall time between two consecutive frames
+    - "callbacks/<name>": wall time of each subscriber, per call
+    - the real time factor (simulated time / wall time) over windows of a few seconds, and its histogram
+    - the dropped frames: frames that took longer than the rendering period count for the periods they missed
+    """
+
+    def __init__(self, physics_dt: float, rendering_dt: float, window: float = 2.0):
+        """
+        Args:
+            physics_dt (float): The physics step size (in seconds).
+            rendering_dt (float): The rendering period (in seconds).
+            window (float): The length (in seconds of wall time) over which the real time factor is computed.
+                Defaults to 2.0.
+        """
+        self.enabled = True
+        self._physics_dt = physics_dt
+        self._rendering_dt = rendering_dt
+        self._window = window
+
+        self._physics_step = LogHistogram()
+        self._frame = LogHistogram()
+        self._real_time_factor = LogHistogram(low=1e-3, high=1e3)
+        self._callbacks: Dict[str, LogHistogram] = {}
+
+        self._dump_directory = None
+        self._dump_interval = 0.0
+        self._last_dump = 0.0
+        self.reset()
+
+    @property
+    def physics_dt(self) -> float:
+        return self._physics_dt
+
+    @property
+    def rendering_dt(self) -> float:
+        return self._rendering_dt
+
+    @property
+    def real_time_factor(self) -> float:
+        """
+        Returns:
+            float: The real time factor over the last complete window (0 until the first window completes)
+        """
+        return self._current_rtf
+
+    @property
+    def dropped_frames(self) -> int:
+        return self._dropped_frames
+
+    def set_rates(self, physics_dt: float = None, rendering_dt: float = None):
+        """
+        Method that updates the physics step and the rendering period (e.g. when the world settings change)
+        """
+        if physics_dt is not None:
+            self._physics_dt = physics_dt
+        if rendering_dt is not None:
+            self._rendering_dt = rendering_dt
+
+    def reset(self):
+        self._physics_step.reset()
+        self._frame.reset()
+        self._real_time_factor.reset()
+        for histogram in self._callbacks.values():
+            histogram.reset()
+
+        self._last_physics_step = None
+        self._last_frame = None
+        self._dropped_frames = 0
+        self._window_start = None
+        self._window_simulated = 0.0
+        self._current_rtf = 0.0
+
+    def callback_histogram(self, name: str) -> LogHistogram:
+        """
+        Returns:
+            LogHistogram: The histogram of the wall time of a subscriber (created on first use)
+        """
+        histogram = self._callbacks.get(name)
+        if histogram is None:
+            histogram = self._callbacks[name] = LogHistogram()
+        return histogram
+
+    def wrap(self, name: str, callback: Callable) -> Callable:
+        """
+        Args:
+            name (str): The name of the subscriber.
+            callback (Callable): The function to time.
+
+        Returns:
+            Callable: A function with the same arguments that calls callback and records its wall time
+        """
+        histogram = self.callback_histogram(name)
+
+        def timed(*args, **kwargs):
+            if not self.enabled:
+                return callback(*args, **kwargs)
+
+            start = time.perf_counter()
+            try:
+                return callback(*args, **kwargs)
+            finally:
+                histogram.add(time.perf_counter() - start)
+
+        return timed
+
+    @contextmanager
+    def measure(self, name: str):
+        """
+        Context manager that records the wall time of its body as a call of the subscriber name
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self.enabled:
+                self.callback_histogram(name).add(time.perf_counter() - start)
+
+    def on_physics_step(self, dt: float):
+        """
+        Method called at the start of every physics step (e.g. as the first physics callback of the world).
+
+        Args:
+            dt (float): The physics step size (in seconds).
+        """
+        if not self.enabled:
+            return
+
+        now = time.perf_counter()
+        if self._last_physics_step is not None:
+            self._physics_step.add(now - self._last_physics_step)
+        self._last_physics_step = now
+
+        self._window_simulated += dt
+        if self._window_start is None:
+            self._window_start = now
+
+    def on_frame(self, event=None):
+        """
+        Method called once per app update (e.g. from the update event stream).
+        """
+        if not self.enabled:
+            return
+
+        now = time.perf_counter()
+        if self._last_frame is not None:
+            interval = now - self._last_frame
+            self._frame.add(interval)
+
+            # A frame that took n rendering periods missed n - 1 of them (with some tolerance for jitter)
+            if self._rendering_dt > 0 and interval > 1.5 * self._rendering_dt:
+                self._dropped_frames += int(interval / self._rendering_dt + 0.5) - 1
+        self._last_frame = now
+
+        # Close the real time factor window
+        if self._window_start is not None and now - self._window_start >= self._window:
+            self._current_rtf = self._window_simulated / (now - self._window_start)
+            self._real_time_factor.add(self._current_rtf)
+            self._window_start = now
+            self._window_simulated = 0.0
+
+        if self._dump_directory is not None and now - self._last_dump >= self._dump_interval:
+            self._last_dump = now
+            self.dump(self._dump_directory)
+
+    def summary(self) -> Dict:
+        """
+        Returns:
+            dict: The summaries (see LogHistogram.summary) of the physics steps, frames, real time factor and of every
+                subscriber, and the number of dropped frames
+        """
+        return {
+            "physics_dt": self._physics_dt,
+            "rendering_dt": self._rendering_dt,
+            "physics_step": self._physics_step.summary(),
+            "frame": self._frame.summary(),
+            "real_time_factor": dict(self._real_time_factor.summary(), current=self._current_rtf),
+            "dropped_frames": self._dropped_frames,
+            "callbacks": {name: histogram.summary() for name, histogram in self._callbacks.items()},
+        }
+
+    def histograms(self) -> Dict[str, LogHistogram]:
+        """
+        Returns:
+            dict: Every histogram by name ("physics_step", "frame", "real_time_factor" and "callbacks/<name>")
+        """
+        histograms = {"physics_step": self._physics_step, "frame": self._frame, "real_time_factor": self._real_time_factor}
+        histograms.update({"callbacks/" + name: histogram for name, histogram in self._callbacks.items()})
+        return histograms
+
+    def start_periodic_dump(self, directory: str, interval: float = 10.0):
+        """
+        Method that dumps the timings (see dump) every interval seconds, from on_frame.
+
+        Args:
+            directory (str): The folder of the dumps.
+            interval (float): The period (in seconds) of the dumps. Defaults to 10.0.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self._dump_directory = directory
+        self._dump_interval = interval
+        self._last_dump = time.perf_counter()
+
+    def stop_periodic_dump(self):
+        self._dump_directory = None
+
+    def dump(self, directory: str):
+        """
+        Method that writes step_timing.json (the summary and the bins of every histogram, overwritten) and appends one
+        row with the summary to step_timing.csv.
+
+        Args:
+            directory (str): The folder of the dumps.
+        """
+        summary = self.summary()
+        timestamp = time.time()
+
+        report = {
+            "timestamp": timestamp,
+            "summary": summary,
+            "histograms": {
+                name: {"edges": histogram.edges[1:-1].tolist(), "counts": histogram.counts.tolist()}
+                for name, histogram in self.histograms().items()
+            },
+        }
+
+        try:
+            os.makedirs(directory, exist_ok=True)
+            with open(os.path.join(directory, "step_timing.json"), "w") as f:
+                json.dump(report, f)
+
+            row = {"timestamp": timestamp, "dropped_frames": summary["dropped_frames"]}
+            for name, histogram in self.histograms().items():
+                for key, value in histogram.summary().items():
+                    row[name + "." + key] = value
+
+            path = os.path.join(directory, "step_timing.csv")
+            header = _csv_header(path)
+            if header is not None and header != list(row.keys()):
+                # The subscribers changed: start a new file (keeping the previous one)
+                os.replace(path, path + "." + str(int(timestamp)))
+                header = None
+
+            with open(path, "a", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=list(row.keys()))
+                if header is None:
+                    writer.writeheader()
+                writer.writerow(row)
+        except OSError as e:
+            logger.warning("Could not dump the step timing to %s: %s", directory, e)
+
+
+def _csv_header(path: str) -> Optional[list]:
+    if not os.path.exists(path):
+        return None
+    with open(path, newline="") as f:
+        return next(csv.reader(f), None)
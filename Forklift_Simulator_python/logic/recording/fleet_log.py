@@ -0,0 +1,385 @@
+"""
+| File: fleet_log.py
+| Author: Akhilesh Bhat
+| Description: Definition of the FleetLogWriter and FleetLogReader classes that write and read the per-step state and
+                 commands of the fleet as a chunked, columnar (optionally compressed) binary file, read through mmap
+"""
+
+__all__ = ["FleetLogWriter", "FleetLogReader"]
+
+import os
+import json
+import mmap
+import zlib
+import queue
+import bisect
+import struct
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from Forklift_Simulator_python.logic.vehicles.fleet_state import FleetState
+
+logger = logging.getLogger(__name__)
+
+# The file starts with MAGIC and ends with the offset and length of the json footer followed by MAGIC again:
+# MAGIC | chunk 0 | chunk 1 | ... | footer (json) | footer offset (u64) | footer length (u64) | MAGIC
+MAGIC = b"FKLOG\x00\x01\x00"
+_TRAILER = struct.Struct("<QQ8s")
+
+# Columns stored for every step, in addition to the FleetState fields: the simulated time of the step
+_TIME_COLUMN = "time"
+
+
+class FleetLogWriter:
+    """
+    Appends one row per physics step (the simulated time plus every FleetState field of every vehicle) to a log file.
+    Rows are buffered into fixed-size chunks; each column of a full chunk is compressed and written by a background
+    thread, so appending only costs a copy into a preallocated buffer. A new chunk is also started whenever the
+    composition of the fleet changes (each chunk refers to the layout, i.e. the vehicles, it was recorded with).
+    """
+
+    def __init__(self, path: str, chunk_steps: int = 256, compression: str = "zlib", level: int = 1, metadata: Dict = None):
+        """
+        Args:
+            path (str): The path of the log file.
+            chunk_steps (int): The number of steps per chunk. Defaults to 256.
+            compression (str): "zlib", or "none" to store the columns raw (read back without any copy). Defaults to "zlib".
+            level (int): The zlib compression level. Defaults to 1 (fast).
+            metadata (dict): Any json-serializable data stored in the log (scenario, environment, physics_dt, ...).
+        """
+        if compression not in ("zlib", "none"):
+            raise ValueError("Unknown compression " + compression + ", expected 'zlib' or 'none'")
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._path = path
+        self._file = open(path, "wb")
+        self._file.write(MAGIC)
+
+        self._chunk_steps = chunk_steps
+        self._compression = compression
+        self._level = level
+        self._metadata = metadata or {}
+
+        self._layouts: List[Dict] = []
+        self._chunks: List[Dict] = []
+        self._steps = 0
+
+        # Buffer of the chunk being filled, and the layout (fleet version, layout index, vehicle count) it refers to
+        self._buffer: Optional[Dict[str, np.ndarray]] = None
+        self._spare: Optional[Dict[str, np.ndarray]] = None
+        self._filled = 0
+        self._version = None
+        self._layout_index = -1
+        self._count = 0
+
+        # The chunks are compressed and written by a background thread (at most one chunk waiting, to bound memory)
+        self._queue: "queue.Queue" = queue.Queue(maxsize=1)
+        self._returned: "queue.Queue" = queue.Queue()
+        self._error: Optional[Exception] = None
+        self._thread = threading.Thread(target=self._writer_loop, name="fleet-log-writer", daemon=True)
+        self._thread.start()
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    @property
+    def steps(self) -> int:
+        """
+        Returns:
+            int: The number of steps appended so far
+        """
+        return self._steps
+
+    def append(self, time: float, state: FleetState, layout: Callable[[], Dict]):
+        """
+        Method that appends the current state of the fleet.
+
+        Args:
+            time (float): The simulated time of the step (in seconds).
+            state (FleetState): The fleet.
+            layout (Callable): Function returning the layout of the fleet ({"stage_prefixes", "vehicle_ids", "models"}),
+                only called when the composition of the fleet changed since the previous step.
+        """
+        if self._error is not None:
+            raise self._error
+
+        if state.version != self._version or self._buffer is None:
+            self._flush()
+            self._version = state.version
+            self._count = state.count
+            self._layouts.append(layout())
+            self._layout_index = len(self._layouts) - 1
+            self._buffer = self._allocate(self._count)
+            self._spare = None
+
+        row = self._filled
+        self._buffer[_TIME_COLUMN][row] = time
+        for name in FleetState.FIELDS:
+            np.copyto(self._buffer[name][row], getattr(state, name))
+
+        self._filled += 1
+        self._steps += 1
+        if self._filled == self._chunk_steps:
+            self._flush()
+
+    def close(self):
+        """
+        Method that writes the remaining rows and the footer, and closes the file
+        """
+        if self._file is None:
+            return
+
+        self._flush()
+        self._queue.put(None)
+        self._thread.join()
+
+        footer = json.dumps(
+            {
+                "version": 1,
+                "compression": self._compression,
+                "metadata": self._metadata,
+                "columns": self._columns(),
+                "layouts": self._layouts,
+                "chunks": self._chunks,
+                "steps": self._steps,
+            }
+        ).encode("utf-8")
+
+        offset = self._file.tell()
+        self._file.write(footer)
+        self._file.write(_TRAILER.pack(offset, len(footer), MAGIC))
+        self._file.close()
+        self._file = None
+
+        if self._error is not None:
+            raise self._error
+
+        logger.info("Wrote %d steps in %d chunks to %s", self._steps, len(self._chunks), self._path)
+
+    def _columns(self) -> Dict[str, Dict]:
+        columns = {_TIME_COLUMN: {"dtype": "<f8", "shape": []}}
+        for name, shape in FleetState.FIELDS.items():
+            columns[name] = {"dtype": "<f8", "shape": [None] + list(shape)}
+        return columns
+
+    def _allocate(self, count: int) -> Dict[str, np.ndarray]:
+        buffer = {_TIME_COLUMN: np.zeros(self._chunk_steps)}
+        for name, shape in FleetState.FIELDS.items():
+            buffer[name] = np.zeros((self._chunk_steps, count) + shape)
+        return buffer
+
+    def _flush(self):
+        if self._buffer is None or self._filled == 0:
+            return
+
+        first_step = self._steps - self._filled
+        self._queue.put((self._buffer, self._filled, first_step, self._layout_index))
+
+        # Reuse the buffers of a chunk already written (same layout), otherwise allocate new ones
+        try:
+            returned = self._returned.get_nowait()
+        except queue.Empty:
+            returned = None
+        if returned is not None and returned[_TIME_COLUMN].shape == (self._chunk_steps,) and all(
+            returned[name].shape[1] == self._count for name in FleetState.FIELDS
+        ):
+            self._buffer = returned
+        else:
+            self._buffer = self._allocate(self._count)
+        self._filled = 0
+
+    def _writer_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+
+            buffer, filled, first_step, layout_index = item
+            try:
+                blocks = {}
+                for name, array in buffer.items():
+                    data = np.ascontiguousarray(array[:filled]).tobytes()
+                    if self._compression == "zlib":
+                        data = zlib.compress(data, self._level)
+                    blocks[name] = [self._file.tell(), len(data)]
+                    self._file.write(data)
+
+                self._chunks.append(
+                    {
+                        "layout": layout_index,
+                        "first_step": first_step,
+                        "steps": filled,
+                        "first_time": float(buffer[_TIME_COLUMN][0]),
+                        "last_time": float(buffer[_TIME_COLUMN][filled - 1]),
+                        "blocks": blocks,
+                    }
+                )
+            except Exception as e:
+                self._error = e
+
+            self._returned.put(buffer)
+
+
+class FleetLogReader:
+    """
+    Random access to a log written by FleetLogWriter. The file is memory mapped and only the chunks that are accessed
+    are decompressed (a few of them are cached). With compression "none", the columns are views into the mapped file.
+    """
+
+    def __init__(self, path: str, cached_chunks: int = 4):
+        """
+        Args:
+            path (str): The path of the log file.
+            cached_chunks (int): The number of decoded chunks kept in memory. Defaults to 4.
+        """
+        self._path = path
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mmap[: len(MAGIC)] != MAGIC or len(self._mmap) < len(MAGIC) + _TRAILER.size:
+            raise ValueError(path + " is not a fleet log")
+
+        offset, length, magic = _TRAILER.unpack(self._mmap[-_TRAILER.size :])
+        if magic != MAGIC:
+            raise ValueError(path + " is incomplete (the recording was not closed)")
+
+        footer = json.loads(bytes(self._mmap[offset : offset + length]).decode("utf-8"))
+        self._compression = footer["compression"]
+        self._metadata = footer["metadata"]
+        self._columns = footer["columns"]
+        self._layouts = footer["layouts"]
+        self._chunks = footer["chunks"]
+        self._steps = footer["steps"]
+
+        self._first_steps = [chunk["first_step"] for chunk in self._chunks]
+        self._first_times = [chunk["first_time"] for chunk in self._chunks]
+
+        self._cached_chunks = cached_chunks
+        self._cache: "OrderedDict[int, Dict[str, np.ndarray]]" = OrderedDict()
+
+    @property
+    def steps(self) -> int:
+        return self._steps
+
+    @property
+    def metadata(self) -> Dict:
+        return self._metadata
+
+    @property
+    def layouts(self) -> List[Dict]:
+        return self._layouts
+
+    @property
+    def duration(self) -> float:
+        """
+        Returns:
+            float: The simulated time (in seconds) between the first and the last step
+        """
+        if not self._chunks:
+            return 0.0
+        return self._chunks[-1]["last_time"] - self._chunks[0]["first_time"]
+
+    def layout_at(self, step: int) -> Dict:
+        """
+        Returns:
+            dict: The layout ({"stage_prefixes", "vehicle_ids", "models"}) of the fleet at the given step
+        """
+        return self._layouts[self._chunks[self._chunk_index(step)]["layout"]]
+
+    def read_step(self, step: int) -> Dict[str, np.ndarray]:
+        """
+        Args:
+            step (int): The index of the step.
+
+        Returns:
+            dict: A dictionary of column -> value at that step (read-only views, for the fleet columns with one row per
+                vehicle of the layout)
+        """
+        index = self._chunk_index(step)
+        chunk = self._load_chunk(index)
+        row = step - self._chunks[index]["first_step"]
+        return {name: array[row] for name, array in chunk.items()}
+
+    def read_range(self, column: str, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        """
+        Args:
+            column (str): The name of the column ("time" or a FleetState field).
+            start (int): The first step. Defaults to 0.
+            stop (int): The step after the last one. Defaults to the end of the log.
+
+        Returns:
+            np.ndarray: The values of the column over the range of steps (the layout must not change over the range)
+        """
+        stop = self._steps if stop is None else min(stop, self._steps)
+        if start >= stop:
+            raise ValueError("Empty range of steps")
+
+        first, last = self._chunk_index(start), self._chunk_index(stop - 1)
+        if len({self._chunks[i]["layout"] for i in range(first, last + 1)}) > 1 and column != _TIME_COLUMN:
+            raise ValueError("The composition of the fleet changes within the range of steps")
+
+        parts = []
+        for index in range(first, last + 1):
+            chunk = self._chunks[index]
+            begin = max(start - chunk["first_step"], 0)
+            end = min(stop - chunk["first_step"], chunk["steps"])
+            parts.append(self._load_chunk(index)[column][begin:end])
+
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def step_at_time(self, time: float) -> int:
+        """
+        Args:
+            time (float): A simulated time (in seconds).
+
+        Returns:
+            int: The index of the last step recorded at or before that time (0 if the time is before the first step)
+        """
+        if not self._chunks:
+            return 0
+
+        index = max(bisect.bisect_right(self._first_times, time) - 1, 0)
+        times = self._load_chunk(index)[_TIME_COLUMN]
+        row = max(int(np.searchsorted(times, time, side="right")) - 1, 0)
+        return self._chunks[index]["first_step"] + row
+
+    def close(self):
+        self._cache.clear()
+        self._mmap.close()
+        self._file.close()
+
+    def _chunk_index(self, step: int) -> int:
+        if step < 0 or step >= self._steps:
+            raise IndexError("Step " + str(step) + " is out of range (the log has " + str(self._steps) + " steps)")
+        return bisect.bisect_right(self._first_steps, step) - 1
+
+    def _load_chunk(self, index: int) -> Dict[str, np.ndarray]:
+        chunk = self._cache.get(index)
+        if chunk is not None:
+            self._cache.move_to_end(index)
+            return chunk
+
+        info = self._chunks[index]
+        count = len(self._layouts[info["layout"]]["stage_prefixes"])
+
+        chunk = {}
+        for name, (offset, length) in info["blocks"].items():
+            column = self._columns[name]
+            shape = [info["steps"]] + [count if dim is None else dim for dim in column["shape"]]
+            if self._compression == "zlib":
+                data = zlib.decompress(self._mmap[offset : offset + length])
+                array = np.frombuffer(data, dtype=column["dtype"])
+            else:
+                array = np.frombuffer(self._mmap, dtype=column["dtype"], count=length // 8, offset=offset)
+            chunk[name] = array.reshape(shape)
+
+        self._cache[index] = chunk
+        while len(self._cache) > self._cached_chunks:
+            self._cache.popitem(last=False)
+
+        return chunk
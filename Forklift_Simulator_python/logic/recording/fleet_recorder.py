@@ -0,0 +1,273 @@
+"""
+| File: fleet_recorder.py
+| Author: Akhilesh Bhat
+| Description: Definition of the FleetRecorder (logs the fleet state and commands on every physics step) and of the
+                 FleetReplayer (re-drives the fleet from a log, in real time or as fast as possible, with seeking)
+"""
+
+__all__ = ["FleetRecorder", "FleetReplayer"]
+
+import time
+import logging
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+from Forklift_Simulator_python.logic.vehicles.fleet_state import FleetState, FleetStepper
+from Forklift_Simulator_python.logic.recording.fleet_log import FleetLogWriter, FleetLogReader
+
+logger = logging.getLogger(__name__)
+
+# Fields of the FleetState holding the commands (re-driven on replay)
+COMMAND_FIELDS = ("speed_commands", "steering_commands", "fork_commands")
+
+
+class FleetRecorder:
+    """
+    Records the fleet on every physics step. Registered as a FleetStepper pre-step callback after the input pipeline,
+    so that row k of the log holds the state of the fleet before step k and the commands applied at step k: replaying
+    the commands of every row from the state of the first one reproduces the run.
+    """
+
+    def __init__(self, fleet_stepper: FleetStepper, vehicle_manager, path: str, chunk_steps: int = 256, compression: str = "zlib", metadata: Dict = None):
+        """
+        Args:
+            fleet_stepper (FleetStepper): The stepper of the fleet to record.
+            vehicle_manager (VehicleManager): The registry of the vehicles (used to record their ids).
+            path (str): The path of the log file.
+            chunk_steps (int): The number of steps per chunk of the log. Defaults to 256.
+            compression (str): "zlib" or "none". Defaults to "zlib".
+            metadata (dict): Any json-serializable data stored in the log.
+        """
+        self._fleet_stepper = fleet_stepper
+        self._vehicle_manager = vehicle_manager
+        self._path = path
+        self._chunk_steps = chunk_steps
+        self._compression = compression
+        self._metadata = metadata or {}
+
+        self._writer: Optional[FleetLogWriter] = None
+        self._time = 0.0
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    @property
+    def is_recording(self) -> bool:
+        return self._writer is not None
+
+    @property
+    def steps(self) -> int:
+        return self._writer.steps if self._writer is not None else 0
+
+    def start(self):
+        if self._writer is not None:
+            return
+
+        self._time = 0.0
+        self._writer = FleetLogWriter(self._path, self._chunk_steps, self._compression, metadata=self._metadata)
+        self._fleet_stepper.add_pre_step_callback(self._on_physics_step)
+        logger.info("Recording the fleet to %s", self._path)
+
+    def stop(self):
+        """
+        Method that stops recording and finalizes the log (it can only be read once the recorder is stopped)
+        """
+        if self._writer is None:
+            return
+
+        self._fleet_stepper.remove_pre_step_callback(self._on_physics_step)
+        writer, self._writer = self._writer, None
+        writer.close()
+
+    def _on_physics_step(self, state: FleetState, dt: float):
+        self._writer.append(self._time, state, self._layout)
+        self._time += dt
+
+    def _layout(self) -> Dict:
+        return _layout_of(self._fleet_stepper.state, self._vehicle_manager)
+
+
+def _layout_of(state: FleetState, vehicle_manager) -> Dict:
+    vehicle_ids = []
+    for stage_prefix in state.stage_prefixes:
+        try:
+            vehicle_ids.append(vehicle_manager.get_record(stage_prefix).vehicle_id)
+        except (AttributeError, KeyError):
+            vehicle_ids.append(-1)
+
+    return {"stage_prefixes": list(state.stage_prefixes), "vehicle_ids": vehicle_ids, "models": list(state.models)}
+
+
+class FleetReplayer:
+    """
+    Re-drives the fleet from a log written by FleetRecorder: on every physics step the logged commands of the current
+    row are written into the fleet (overriding the input pipeline), and the fleet state is compared with the logged one
+    to measure how far the replay diverged. Vehicles are matched by stage prefix, so the log can be replayed on a fleet
+    with a different slot order. The replay follows the physics steps of the world (real time when the world is
+    playing), or can be run as fast as possible with run().
+    """
+
+    def __init__(self, log, fleet_stepper: FleetStepper, on_finished: Callable = None):
+        """
+        Args:
+            log (str | FleetLogReader): The log (or its path).
+            fleet_stepper (FleetStepper): The stepper of the fleet to drive.
+            on_finished (Callable): Function called (without arguments) on the step after the last row was replayed.
+        """
+        self._log = log if isinstance(log, FleetLogReader) else FleetLogReader(log)
+        self._fleet_stepper = fleet_stepper
+        self._on_finished = on_finished
+
+        self._cursor = 0
+        self._active = False
+        self._finished = False
+        self._max_error = 0.0
+
+        # Mapping between the rows of the current layout of the log and the slots of the fleet (cached per fleet version)
+        self._mapping_key = None
+        self._rows = np.zeros(0, dtype=np.int64)
+        self._slots = np.zeros(0, dtype=np.int64)
+
+    @property
+    def log(self) -> FleetLogReader:
+        return self._log
+
+    @property
+    def cursor(self) -> int:
+        """
+        Returns:
+            int: The index of the next row to replay
+        """
+        return self._cursor
+
+    @property
+    def finished(self) -> bool:
+        return self._finished
+
+    @property
+    def max_position_error(self) -> float:
+        """
+        Returns:
+            float: The largest distance (in meters) between a vehicle and its logged position since the replay started
+        """
+        return self._max_error
+
+    def start(self):
+        if not self._active:
+            self._fleet_stepper.add_pre_step_callback(self._on_physics_step)
+            self._active = True
+
+    def stop(self):
+        if self._active:
+            self._fleet_stepper.remove_pre_step_callback(self._on_physics_step)
+            self._active = False
+
+    def seek(self, step: Optional[int] = None, time: Optional[float] = None, teleport: bool = True):
+        """
+        Method that moves the replay to another row of the log.
+
+        Args:
+            step (int): The index of the row to replay next.
+            time (float): The simulated time to jump to (used if step is None).
+            teleport (bool): Whether to also move the vehicles to the logged state of that row, such that the replay
+                continues from there (the simulation must be playing, see SimInterface.replay). Defaults to True.
+        """
+        if step is None:
+            if time is None:
+                raise ValueError("Either a step or a time is required")
+            step = self._log.step_at_time(time)
+
+        self._cursor = min(max(step, 0), self._log.steps)
+        self._finished = False
+        self._max_error = 0.0
+
+        if teleport and self._cursor < self._log.steps:
+            state = self._fleet_stepper.state
+            row = self._log.read_step(self._cursor)
+            rows, slots = self._mapping(state, self._cursor)
+            for name in FleetState.FIELDS:
+                getattr(state, name)[slots] = row[name][rows]
+            self._fleet_stepper.teleport()
+
+    def run(self, step: Callable, render_interval: int = 0, max_steps: Optional[int] = None) -> Dict:
+        """
+        Method that replays the rest of the log as fast as possible, by stepping the world directly.
+
+        Args:
+            step (Callable): Function called with (render: bool) that advances the world by one physics step (e.g.
+                world.step(render=False), followed by world.render() if render is True).
+            render_interval (int): Render every n steps (0 to never render). Defaults to 0.
+            max_steps (int): The maximum number of steps to replay. Defaults to the end of the log.
+
+        Returns:
+            dict: The number of steps replayed, the wall-clock and simulated durations, the real time factor and the
+                largest position error
+        """
+        self.start()
+        first = self._cursor
+        last = self._log.steps if max_steps is None else min(self._log.steps, first + max_steps)
+
+        start = time.perf_counter()
+        count = 0
+        while self._cursor < last:
+            count += 1
+            step(render_interval > 0 and count % render_interval == 0)
+
+            # Nothing was replayed (e.g. the fleet is empty): stop instead of spinning forever
+            if self._cursor < first + count:
+                break
+        wall_time = time.perf_counter() - start
+
+        replayed = self._cursor - first
+        simulated = 0.0
+        if replayed > 1:
+            times = self._log.read_range("time", first, self._cursor)
+            simulated = float(times[-1] - times[0]) + float(times[-1] - times[-2])
+
+        return {
+            "steps": replayed,
+            "wall_time": wall_time,
+            "simulated_time": simulated,
+            "real_time_factor": simulated / wall_time if wall_time > 0 else 0.0,
+            "max_position_error": self._max_error,
+        }
+
+    def _mapping(self, state: FleetState, step: int):
+        layout = self._log.layout_at(step)
+        key = (id(layout), state.version)
+        if key != self._mapping_key:
+            slot_of = {stage_prefix: slot for slot, stage_prefix in enumerate(state.stage_prefixes)}
+            pairs = [(row, slot_of[prefix]) for row, prefix in enumerate(layout["stage_prefixes"]) if prefix in slot_of]
+            self._rows = np.array([row for row, _ in pairs], dtype=np.int64)
+            self._slots = np.array([slot for _, slot in pairs], dtype=np.int64)
+            self._mapping_key = key
+
+            if len(pairs) < len(layout["stage_prefixes"]):
+                logger.warning(
+                    "%d logged vehicles are not in the scene and are not replayed", len(layout["stage_prefixes"]) - len(pairs)
+                )
+
+        return self._rows, self._slots
+
+    def _on_physics_step(self, state: FleetState, dt: float):
+        if self._cursor >= self._log.steps:
+            if not self._finished:
+                self._finished = True
+                state.set_commands(speed=0.0, fork=0.0)
+                if self._on_finished is not None:
+                    self._on_finished()
+            return
+
+        row = self._log.read_step(self._cursor)
+        rows, slots = self._mapping(state, self._cursor)
+
+        if len(slots) > 0:
+            error = np.linalg.norm(state.positions[slots] - row["positions"][rows], axis=1).max()
+            self._max_error = max(self._max_error, float(error))
+
+        for name in COMMAND_FIELDS:
+            getattr(state, name)[slots] = row[name][rows]
+
+        self._cursor += 1
@@ -0,0 +1,354 @@
+"""
+| File: backends.py
+| Author: Akhilesh Bhat
+| Description: Definition of the WorldBackend interface used by the headless runners, and of its implementations:
+                 IsaacWorldBackend (drives the SimInterface synchronously), LiteWorldBackend (drives the kinematic
+                 LiteSimInterface, no Isaac Sim required) and StubWorldBackend (no simulation at all)
+"""
+
+__all__ = [
+    "WorldBackend",
+    "IsaacWorldBackend",
+    "LiteWorldBackend",
+    "StubWorldBackend",
+    "BACKENDS",
+    "euler_to_quaternion",
+    "create_backend",
+]
+
+import math
+import logging
+from typing import Dict, List
+
+from Forklift_Simulator_python.global_variables import (
+    DEFAULT_WORLD_SETTINGS,
+    ROBOTS,
+    SIMULATION_BACKEND,
+    SIMULATION_ENVIRONMENTS,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def euler_to_quaternion(roll: float, pitch: float, yaw: float) -> List[float]:
+    """
+    Function that converts intrinsic XYZ euler angles (in degrees) into a [qw, qx, qy, qz] quaternion
+    (the convention used by omni.isaac.core). Equivalent to Rotation.from_euler("XYZ", ...) without requiring scipy.
+    """
+    r, p, y = (math.radians(angle) / 2.0 for angle in (roll, pitch, yaw))
+    cr, sr = math.cos(r), math.sin(r)
+    cp, sp = math.cos(p), math.sin(p)
+    cy, sy = math.cos(y), math.sin(y)
+
+    return [
+        cr * cp * cy - sr * sp * sy,
+        sr * cp * cy + cr * sp * sy,
+        cr * sp * cy - sr * cp * sy,
+        cr * cp * sy + sr * sp * cy,
+    ]
+
+
+class WorldBackend:
+    """
+    Interface between the headless runners and the world being simulated. Every method is synchronous.
+    """
+
+    @property
+    def physics_dt(self) -> float:
+        """
+        Returns:
+            float: The time (in seconds) advanced by each call to step
+        """
+        raise NotImplementedError
+
+    def initialize(self):
+        """
+        Method that creates the world (called once, before the first scenario)
+        """
+        raise NotImplementedError
+
+    def seed(self, seed: int):
+        """
+        Method that seeds the randomness of the simulation (called before each scenario). The runners already seed the
+        random and NumPy generators, so only a backend with generators of its own has to override it.
+
+        Args:
+            seed (int): The seed of the scenario.
+        """
+        pass
+
+    def load_environment(self, environment: str):
+        """
+        Args:
+            environment (str): The key of the environment in SIMULATION_ENVIRONMENTS.
+        """
+        raise NotImplementedError
+
+    def spawn_vehicle(self, vehicle_model: str, stage_prefix: str, vehicle_id: int, position: List[float], orientation: List[float]):
+        """
+        Args:
+            vehicle_model (str): The key of the vehicle in ROBOTS.
+            stage_prefix (str): The path of the vehicle in the stage.
+            vehicle_id (int): The id of the vehicle.
+            position (list): The [x, y, z] position of the vehicle (in meters).
+            orientation (list): The [qw, qx, qy, qz] orientation of the vehicle.
+        """
+        raise NotImplementedError
+
+    def reset(self):
+        """
+        Method that resets the simulation (called after the vehicles are spawned and before stepping)
+        """
+        raise NotImplementedError
+
+    def step(self, render: bool = False):
+        """
+        Method that advances the simulation by a single physics step.
+
+        Args:
+            render (bool): Whether the viewport/sensors should be rendered on this step. Defaults to False.
+        """
+        raise NotImplementedError
+
+    def get_vehicle_states(self) -> Dict[str, Dict]:
+        """
+        Returns:
+            dict: A dictionary of stage prefix -> {"position": [x, y, z], "orientation": [qw, qx, qy, qz]}
+        """
+        raise NotImplementedError
+
+    def clear(self):
+        """
+        Method that removes the environment and all the vehicles, leaving an empty world
+        """
+        raise NotImplementedError
+
+    def shutdown(self):
+        """
+        Method that releases every resource held by the backend
+        """
+        pass
+
+
+class IsaacWorldBackend(WorldBackend):
+    """
+    Backend that drives the SimInterface (and its omni.isaac.core World) synchronously, without the extension UI.
+    If no Kit app is running yet, a headless SimulationApp is started when the backend is initialized.
+    """
+
+    def __init__(self, headless: bool = True, app_config: Dict = None):
+        """
+        Args:
+            headless (bool): Whether the SimulationApp should be started without a window. Defaults to True.
+            app_config (dict): Extra configurations forwarded to the SimulationApp.
+        """
+        self._headless = headless
+        self._app_config = app_config or {}
+        self._app = None
+        self._sim_interface = None
+
+    @property
+    def physics_dt(self) -> float:
+        return self._sim_interface.world.get_physics_dt()
+
+    @property
+    def sim_interface(self):
+        """
+        Returns:
+            SimInterface: The simulation interface driven by this backend
+        """
+        return self._sim_interface
+
+    def initialize(self):
+        import sys
+
+        # The SimulationApp must be started before any omni.isaac.core module is imported
+        if "omni.kit.app" not in sys.modules:
+            from omni.isaac.kit import SimulationApp
+
+            self._app = SimulationApp({"headless": self._headless, **self._app_config})
+
+        from Forklift_Simulator_python.logic.interface.simulation_interface import SimInterface
+
+        self._sim_interface = SimInterface()
+        self._sim_interface.initialize_world()
+
+    def load_environment(self, environment: str):
+        self._sim_interface.load_environment(SIMULATION_ENVIRONMENTS[environment])
+
+    def spawn_vehicle(self, vehicle_model: str, stage_prefix: str, vehicle_id: int, position: List[float], orientation: List[float]):
+        from Forklift_Simulator_python.logic.vehicles.vehicle import Vehicle
+
+        # The vehicles take [qx, qy, qz, qw] quaternions (scipy convention)
+        Vehicle(stage_prefix, ROBOTS[vehicle_model], vehicle_id, position, list(orientation[1:]) + [orientation[0]], model=vehicle_model)
+
+    def reset(self):
+        self._sim_interface.world.reset()
+
+    def step(self, render: bool = False):
+        # Step the physics alone (an app update would advance it by rendering_dt), then render if requested
+        self._sim_interface.world.step(render=False)
+        if render:
+            self._sim_interface.world.render()
+
+    def get_vehicle_states(self) -> Dict[str, Dict]:
+        # The fleet state is updated for every vehicle at once on each physics step
+        fleet = self._sim_interface.fleet_state
+        return {
+            stage_prefix: {"position": fleet.positions[slot].tolist(), "orientation": fleet.orientations[slot].tolist()}
+            for slot, stage_prefix in enumerate(fleet.stage_prefixes)
+        }
+
+    def clear(self):
+        # Re-create the physics context synchronously (the UI lets the SimInterface do it asynchronously)
+        self._sim_interface.clear_scene(synchronous=True)
+
+    def shutdown(self):
+        if self._app is not None:
+            self._app.close()
+            self._app = None
+
+
+class LiteWorldBackend(WorldBackend):
+    """
+    Backend that drives a LiteSimInterface: the vehicles follow the NumPy forklift kinematics over the 2D occupancy map
+    of the environment. It runs on any CPU-only machine, a few hundred times faster than real time (300 to 500 times
+    with 1 to 100 vehicles at 20 Hz), which makes it suitable to evaluate planners and controllers on the same scenarios
+    as the physics backend.
+    """
+
+    def __init__(self, world_settings: Dict = None, maps_path: str = None):
+        """
+        Args:
+            world_settings (dict): Overrides of LITE_WORLD_SETTINGS (e.g. {"physics_dt": 0.01}).
+            maps_path (str): The folder of the occupancy maps. Defaults to LITE_MAPS_PATH.
+        """
+        self._world_settings = world_settings
+        self._maps_path = maps_path
+        self._sim_interface = None
+
+    @property
+    def physics_dt(self) -> float:
+        return self._sim_interface.world.get_physics_dt()
+
+    @property
+    def sim_interface(self):
+        """
+        Returns:
+            LiteSimInterface: The simulation interface driven by this backend
+        """
+        return self._sim_interface
+
+    def initialize(self):
+        from Forklift_Simulator_python.logic.interface.lite_interface import LiteSimInterface
+
+        kwargs = {"maps_path": self._maps_path} if self._maps_path is not None else {}
+        self._sim_interface = LiteSimInterface(self._world_settings, **kwargs)
+        self._sim_interface.initialize_world()
+
+    def load_environment(self, environment: str):
+        if environment not in SIMULATION_ENVIRONMENTS:
+            raise KeyError("Unknown environment " + environment)
+        self._sim_interface.load_environment(environment)
+
+    def spawn_vehicle(self, vehicle_model: str, stage_prefix: str, vehicle_id: int, position: List[float], orientation: List[float]):
+        self._sim_interface.spawn_vehicle(vehicle_model, stage_prefix, vehicle_id, position, orientation)
+
+    def reset(self):
+        self._sim_interface.world.reset()
+
+    def step(self, render: bool = False):
+        # Step the physics alone (an app update would advance it by rendering_dt), then render if requested
+        self._sim_interface.world.step(render=False)
+        if render:
+            self._sim_interface.world.render()
+
+    def get_vehicle_states(self) -> Dict[str, Dict]:
+        return self._sim_interface.get_vehicle_states()
+
+    def clear(self):
+        self._sim_interface.clear_scene()
+
+
+class StubWorldBackend(WorldBackend):
+    """
+    Backend that only keeps track of what would have been loaded and spawned. It does not require Isaac Sim,
+    which makes it suitable to test the runners (and the scenario files) on any machine.
+    """
+
+    def __init__(self, physics_dt: float = DEFAULT_WORLD_SETTINGS["physics_dt"]):
+        """
+        Args:
+            physics_dt (float): The time (in seconds) advanced by each step. Defaults to DEFAULT_WORLD_SETTINGS["physics_dt"].
+        """
+        self._physics_dt = physics_dt
+        self._initialized = False
+        self.environment = None
+        self.vehicles: Dict[str, Dict] = {}
+        self.steps = 0
+        self.rendered_frames = 0
+        self.random_seed = None
+
+    @property
+    def physics_dt(self) -> float:
+        return self._physics_dt
+
+    def initialize(self):
+        self._initialized = True
+
+    def seed(self, seed: int):
+        self.random_seed = seed
+
+    def load_environment(self, environment: str):
+        if environment not in SIMULATION_ENVIRONMENTS:
+            raise KeyError("Unknown environment " + environment)
+        if self.environment is not None:
+            raise RuntimeError("An environment is already loaded, clear the world first")
+        self.environment = environment
+
+    def spawn_vehicle(self, vehicle_model: str, stage_prefix: str, vehicle_id: int, position: List[float], orientation: List[float]):
+        if vehicle_model not in ROBOTS:
+            raise KeyError("Unknown vehicle model " + vehicle_model)
+        if stage_prefix in self.vehicles:
+            raise RuntimeError("A primitive already exists at the specified path")
+        self.vehicles[stage_prefix] = {
+            "vehicle_model": vehicle_model,
+            "vehicle_id": vehicle_id,
+            "position": list(position),
+            "orientation": list(orientation),
+        }
+
+    def reset(self):
+        self.steps = 0
+
+    def step(self, render: bool = False):
+        if not self._initialized:
+            raise RuntimeError("The backend must be initialized before stepping")
+        self.steps += 1
+        self.rendered_frames += int(render)
+
+    def get_vehicle_states(self) -> Dict[str, Dict]:
+        return {
+            stage_prefix: {"position": list(vehicle["position"]), "orientation": list(vehicle["orientation"])}
+            for stage_prefix, vehicle in self.vehicles.items()
+        }
+
+    def clear(self):
+        self.environment = None
+        self.vehicles = {}
+        self.steps = 0
+
+
+# World backends by name
+BACKENDS = {"isaac": IsaacWorldBackend, "lite": LiteWorldBackend, "stub": StubWorldBackend}
+
+
+def create_backend(name: str = SIMULATION_BACKEND, **kwargs) -> WorldBackend:
+    """
+    Function that creates a world backend given its name ("isaac", "lite" or "stub"). Defaults to SIMULATION_BACKEND
+    (the FORKLIFT_SIM_BACKEND environment variable).
+    """
+    if name not in BACKENDS:
+        raise ValueError("Unknown world backend " + name + ", expected one of " + str(list(BACKENDS.keys())))
+
+    return BACKENDS[name](**kwargs)
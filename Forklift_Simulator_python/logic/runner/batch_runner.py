@@ -0,0 +1,186 @@
+"""
+| File: batch_runner.py
+| Author: Akhilesh Bhat
+| Description: Definition of the BatchRunner class that runs a list of scenarios headless (without the extension UI),
+                 stepping the world synchronously through a WorldBackend and writing the result of every run to disk
+"""
+
+__all__ = ["BatchRunner"]
+
+import os
+import re
+import sys
+import math
+import time
+import random
+import logging
+import argparse
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from Forklift_Simulator_python.logic.runner.scenario import Scenario, ScenarioResult, load_scenarios
+from Forklift_Simulator_python.logic.runner.backends import BACKENDS, WorldBackend, create_backend, euler_to_quaternion
+from Forklift_Simulator_python.global_variables import SIMULATION_BACKEND
+
+logger = logging.getLogger(__name__)
+
+
+class BatchRunner:
+    """
+    Runs scenarios one after the other on a single WorldBackend. For every scenario the world is cleared,
+    the environment is loaded, the vehicles are spawned and the world is stepped for the scenario duration.
+    """
+
+    def __init__(self, backend: WorldBackend, output_dir: Optional[str] = None, render_interval: int = 0):
+        """
+        Args:
+            backend (WorldBackend): The world backend used to run the scenarios.
+            output_dir (str): Directory where the result of each run is written. Results are not saved if None.
+            render_interval (int): Render every N physics steps (0 disables rendering). Defaults to 0.
+        """
+        self._backend = backend
+        self._output_dir = output_dir
+        self._render_interval = render_interval
+        self._initialized = False
+
+        # Functions invoked after every physics step with (backend, scenario, step_index)
+        self._step_callbacks: List[Callable] = []
+
+    @property
+    def backend(self) -> WorldBackend:
+        return self._backend
+
+    def add_step_callback(self, callback: Callable):
+        """
+        Args:
+            callback (Callable): A function invoked after every physics step with (backend, scenario, step_index).
+        """
+        self._step_callbacks.append(callback)
+
+    def run(self, scenarios: List[Scenario]) -> List[ScenarioResult]:
+        """
+        Method that runs every scenario in order. A failing scenario does not stop the batch.
+
+        Args:
+            scenarios (list): The list of scenarios to run.
+
+        Returns:
+            list: The list of ScenarioResult objects (in the same order as the scenarios)
+        """
+        results = []
+
+        for index, scenario in enumerate(scenarios):
+            result = self.run_scenario(scenario)
+            results.append(result)
+
+            if self._output_dir is not None:
+                result.save(self.result_path(self._output_dir, index, scenario))
+
+            logger.info(
+                "[%d/%d] %s: %s (%.1fx real time)",
+                index + 1, len(scenarios), scenario.name, result.status, result.real_time_factor,
+            )
+
+        return results
+
+    def run_scenario(self, scenario: Scenario) -> ScenarioResult:
+        """
+        Method that runs a single scenario.
+
+        Args:
+            scenario (Scenario): The scenario to run.
+
+        Returns:
+            ScenarioResult: The outcome of the run
+        """
+        start = time.perf_counter()
+        steps = 0
+
+        try:
+            # The backend is initialized by the first scenario (a failure is reported as its result, and retried by the next)
+            if not self._initialized:
+                self._backend.initialize()
+                self._initialized = True
+
+            # Seed every source of randomness, so a scenario runs the same way whatever ran before it
+            random.seed(scenario.seed)
+            np.random.seed(scenario.seed)
+            self._backend.seed(scenario.seed)
+
+            self._backend.clear()
+            self._backend.load_environment(scenario.environment)
+
+            for vehicle_id, pose in enumerate(scenario.spawn_poses):
+                self._backend.spawn_vehicle(
+                    scenario.vehicle_model,
+                    "/World/vehicle_" + str(vehicle_id),
+                    vehicle_id,
+                    pose[:3],
+                    euler_to_quaternion(*pose[3:]),
+                )
+
+            self._backend.reset()
+
+            total_steps = int(math.ceil(scenario.duration / self._backend.physics_dt))
+            for steps in range(1, total_steps + 1):
+                render = self._render_interval > 0 and steps % self._render_interval == 0
+                self._backend.step(render=render)
+
+                for callback in self._step_callbacks:
+                    callback(self._backend, scenario, steps)
+
+            status, error = ScenarioResult.SUCCESS, None
+
+        except Exception as e:
+            logger.exception("Scenario %s failed", scenario.name)
+            status, error = ScenarioResult.FAILED, repr(e)
+
+        # Without an initialized backend there is no world to read the time step or the vehicles from
+        if not self._initialized:
+            return ScenarioResult(scenario, status, wall_time=time.perf_counter() - start, error=error)
+
+        return ScenarioResult(
+            scenario,
+            status,
+            steps=steps,
+            sim_time=steps * self._backend.physics_dt,
+            wall_time=time.perf_counter() - start,
+            vehicle_states=self._backend.get_vehicle_states(),
+            error=error,
+        )
+
+    def shutdown(self):
+        self._backend.shutdown()
+
+    @staticmethod
+    def result_path(output_dir: str, index: int, scenario: Scenario) -> str:
+        """
+        Returns:
+            str: The path of the json file where the result of a scenario is written
+        """
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", scenario.name)
+        return os.path.join(output_dir, "{:06d}_{}.json".format(index, safe_name))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run forklift simulation scenarios headless")
+    parser.add_argument("scenarios", help="yaml or json file with the list of scenarios")
+    parser.add_argument("--output", default="results", help="directory where the result of each run is written")
+    parser.add_argument("--backend", default=SIMULATION_BACKEND, choices=list(BACKENDS.keys()), help="world backend to use")
+    parser.add_argument("--render-interval", type=int, default=0, help="render every N physics steps (0 disables)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    runner = BatchRunner(create_backend(args.backend), args.output, render_interval=args.render_interval)
+    try:
+        results = runner.run(load_scenarios(args.scenarios))
+    finally:
+        runner.shutdown()
+
+    return 0 if all(result.status == ScenarioResult.SUCCESS for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
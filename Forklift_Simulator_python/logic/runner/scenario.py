@@ -0,0 +1,192 @@
+"""
+| File: scenario.py
+| Author: Akhilesh Bhat
+| Description: Definition of the Scenario and ScenarioResult classes that describe a single headless simulation run
+                 and its outcome, and of the helpers to read/write them from yaml or json files
+"""
+
+__all__ = ["Scenario", "ScenarioResult", "load_scenarios"]
+
+import os
+import json
+from typing import Dict, List, Optional
+
+import yaml
+
+
+class Scenario:
+    """
+    Description of a single simulation run: which environment to load, which vehicles to spawn (and where)
+    and for how long the simulation should be stepped.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        environment: str,
+        vehicle_model: str = "SingleRearWheel",
+        spawn_poses: Optional[List[List[float]]] = None,
+        duration: float = 10.0,
+        seed: int = 0,
+        metadata: Optional[Dict] = None,
+    ):
+        """
+        Args:
+            name (str): A unique name for the scenario (used to name the result files).
+            environment (str): The key of the environment in SIMULATION_ENVIRONMENTS.
+            vehicle_model (str): The key of the vehicle in ROBOTS. Defaults to "SingleRearWheel".
+            spawn_poses (list): A list of [x, y, z, roll, pitch, yaw] poses (angles in degrees), one per vehicle.
+            duration (float): The simulated time (in seconds) of the run. Defaults to 10.0.
+            seed (int): Seed for any randomness used during the run. Defaults to 0.
+            metadata (dict): Any extra information that should be forwarded to the results.
+        """
+        self.name = name
+        self.environment = environment
+        self.vehicle_model = vehicle_model
+        self.spawn_poses = [[float(value) for value in pose] for pose in (spawn_poses or [])]
+        self.duration = float(duration)
+        self.seed = int(seed)
+        self.metadata = metadata or {}
+
+        for pose in self.spawn_poses:
+            if len(pose) != 6:
+                raise ValueError("Spawn poses must be [x, y, z, roll, pitch, yaw], got " + str(pose))
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Scenario":
+        return cls(**data)
+
+    def to_dict(self) -> Dict:
+        return {
+            "name": self.name,
+            "environment": self.environment,
+            "vehicle_model": self.vehicle_model,
+            "spawn_poses": self.spawn_poses,
+            "duration": self.duration,
+            "seed": self.seed,
+            "metadata": self.metadata,
+        }
+
+    def __repr__(self) -> str:
+        return "Scenario(" + self.name + ", " + self.environment + ", " + str(len(self.spawn_poses)) + " vehicles)"
+
+
+class ScenarioResult:
+    """
+    Outcome of running a Scenario
+    """
+
+    SUCCESS = "success"
+    FAILED = "failed"
+    TIMEOUT = "timeout"
+
+    def __init__(
+        self,
+        scenario: Scenario,
+        status: str,
+        steps: int = 0,
+        sim_time: float = 0.0,
+        wall_time: float = 0.0,
+        vehicle_states: Optional[Dict] = None,
+        metrics: Optional[Dict] = None,
+        error: Optional[str] = None,
+    ):
+        self.scenario = scenario
+        self.status = status
+        self.steps = steps
+        self.sim_time = sim_time
+        self.wall_time = wall_time
+        self.vehicle_states = vehicle_states or {}
+        self.metrics = metrics or {}
+        self.error = error
+
+    @property
+    def real_time_factor(self) -> float:
+        """
+        Returns:
+            float: The ratio between simulated time and wall time of the run
+        """
+        return self.sim_time / self.wall_time if self.wall_time > 0.0 else 0.0
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "ScenarioResult":
+        return cls(
+            scenario=Scenario.from_dict(data["scenario"]),
+            status=data["status"],
+            steps=data["steps"],
+            sim_time=data["sim_time"],
+            wall_time=data.get("wall_time", 0.0),
+            vehicle_states=data.get("vehicle_states"),
+            metrics=data.get("metrics"),
+            error=data.get("error"),
+        )
+
+    def to_dict(self, timings: bool = True) -> Dict:
+        """
+        Args:
+            timings (bool): Whether to include the wall time and the real time factor, which change from one run of the
+                same scenario to the next. Defaults to True.
+
+        Returns:
+            dict: The result as a json serializable dictionary
+        """
+        data = {
+            "scenario": self.scenario.to_dict(),
+            "status": self.status,
+            "steps": self.steps,
+            "sim_time": self.sim_time,
+            "vehicle_states": self.vehicle_states,
+            "metrics": self.metrics,
+            "error": self.error,
+        }
+        if timings:
+            data.update(self.timings())
+        return data
+
+    def timings(self) -> Dict:
+        """
+        Returns:
+            dict: The wall time and the real time factor of the run
+        """
+        return {"wall_time": self.wall_time, "real_time_factor": self.real_time_factor}
+
+    def save(self, path: str):
+        """
+        Method that writes the result to a json file (atomically, such that partial results are never read).
+
+        Args:
+            path (str): The path of the json file.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
+
+
+def load_scenarios(path: str) -> List[Scenario]:
+    """
+    Function that reads a list of scenarios from a yaml or json file. The file can either contain a list of
+    scenarios or a dictionary with a "scenarios" list, and an optional "defaults" dictionary applied to every scenario.
+
+    Args:
+        path (str): The path of the yaml or json file.
+
+    Returns:
+        list: The list of Scenario objects
+    """
+    with open(path, "r") as f:
+        data = yaml.safe_load(f)
+
+    defaults = {}
+    if isinstance(data, dict):
+        defaults = data.get("defaults", {})
+        data = data.get("scenarios", [])
+
+    scenarios = []
+    for index, entry in enumerate(data):
+        entry = {**defaults, **entry}
+        entry.setdefault("name", "scenario_" + str(index))
+        scenarios.append(Scenario.from_dict(entry))
+
+    return scenarios
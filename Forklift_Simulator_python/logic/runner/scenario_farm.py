@@ -0,0 +1,300 @@
+"""
+| File: scenario_farm.py
+| Author: Akhilesh Bhat
+| Description: Definition of the ScenarioFarm class that runs scenarios on a pool of worker processes (each one owning its
+                 own world), restarts failed or hung workers and merges the results into a single deterministic file
+"""
+
+__all__ = ["ScenarioFarm"]
+
+import os
+import sys
+import json
+import time
+import queue
+import logging
+import argparse
+import collections
+import multiprocessing
+from typing import Callable, Dict, List, Optional
+
+from Forklift_Simulator_python.logic.runner.batch_runner import BatchRunner
+from Forklift_Simulator_python.logic.runner.backends import BACKENDS, create_backend
+from Forklift_Simulator_python.logic.runner.scenario import Scenario, ScenarioResult, load_scenarios
+from Forklift_Simulator_python.global_variables import SIMULATION_BACKEND
+
+logger = logging.getLogger(__name__)
+
+
+def _worker_main(worker_id: int, backend_name: str, backend_kwargs: Dict, render_interval: int, tasks, results):
+    """
+    Entry point of a worker process. Each worker owns its own backend (and therefore its own SimInterface and World),
+    reports when it is ready, runs the scenarios the farm sends to its task queue and streams the results back until it
+    receives None.
+    """
+    runner = BatchRunner(create_backend(backend_name, **backend_kwargs), render_interval=render_interval)
+    results.put(("ready", worker_id, None, None))
+
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+
+            index, scenario_data = task
+            results.put(("started", worker_id, index, None))
+
+            result = runner.run_scenario(Scenario.from_dict(scenario_data))
+            results.put(("finished", worker_id, index, result.to_dict()))
+    finally:
+        runner.shutdown()
+
+
+class ScenarioFarm:
+    """
+    Runs scenarios in parallel on a pool of worker processes. Each scenario is sent to the next idle worker, so faster
+    workers naturally take more work, and the farm always knows which scenario a worker is running. A worker that
+    crashes or exceeds the per-scenario timeout is killed and replaced, and the scenario it was running is retried (up
+    to max_retries) before being reported as failed/timed out.
+    """
+
+    # Names of the files (inside the output directory) with the merged results of every scenario, and with their timings
+    MERGED_RESULTS_FILE = "results.json"
+    MERGED_TIMINGS_FILE = "timings.json"
+
+    def __init__(
+        self,
+        backend: str = SIMULATION_BACKEND,
+        backend_kwargs: Optional[Dict] = None,
+        num_workers: Optional[int] = None,
+        scenario_timeout: float = 600.0,
+        max_retries: int = 1,
+        output_dir: Optional[str] = None,
+        render_interval: int = 0,
+    ):
+        """
+        Args:
+            backend (str): The name of the world backend each worker creates ("isaac", "lite" or "stub"). Defaults to
+                SIMULATION_BACKEND.
+            backend_kwargs (dict): Extra arguments forwarded to the backend constructor.
+            num_workers (int): The number of worker processes. Defaults to the number of cpu cores.
+            scenario_timeout (float): Maximum wall time (in seconds) of a single scenario. Defaults to 600.0.
+            max_retries (int): Number of times a crashed or timed out scenario is retried. Defaults to 1.
+            output_dir (str): Directory where the result of each run and the merged results are written.
+            render_interval (int): Render every N physics steps (0 disables rendering). Defaults to 0.
+        """
+        self._backend = backend
+        self._backend_kwargs = backend_kwargs or {}
+        self._num_workers = num_workers or os.cpu_count() or 1
+        self._scenario_timeout = scenario_timeout
+        self._max_retries = max_retries
+        self._output_dir = output_dir
+        self._render_interval = render_interval
+
+        # Every worker starts from a fresh interpreter (Isaac Sim does not support being forked)
+        self._context = multiprocessing.get_context("spawn")
+
+    def run(self, scenarios: List[Scenario], on_result: Optional[Callable] = None) -> List[ScenarioResult]:
+        """
+        Method that runs every scenario on the worker pool.
+
+        Args:
+            scenarios (list): The list of scenarios to run.
+            on_result (Callable): Optional function invoked with (index, ScenarioResult) as soon as each result arrives.
+
+        Returns:
+            list: The list of ScenarioResult objects (in the same order as the scenarios)
+        """
+        results_queue = self._context.Queue()
+        pending = collections.deque(range(len(scenarios)))
+
+        results: Dict[int, ScenarioResult] = {}
+        attempts = [0] * len(scenarios)
+
+        # worker id -> (process, task queue), and worker id -> [scenario index, start time] of the scenario sent to it
+        # (the start time is None until the worker starts it)
+        workers: Dict[int, tuple] = {}
+        running: Dict[int, list] = {}
+        ready = set()
+        next_worker_id = 0
+        startup_failures = 0
+
+        for _ in range(min(self._num_workers, len(scenarios))):
+            workers[next_worker_id] = self._start_worker(next_worker_id, results_queue)
+            next_worker_id += 1
+
+        try:
+            while len(results) < len(scenarios):
+
+                # Send the next scenarios to the idle workers
+                for worker_id in sorted(ready - set(running)):
+                    if not pending:
+                        break
+                    index = pending.popleft()
+                    attempts[index] += 1
+                    running[worker_id] = [index, None]
+                    workers[worker_id][1].put((index, scenarios[index].to_dict()))
+
+                # Consume every message that is available (waiting a bit if there is none). The messages of a worker
+                # that was already replaced are ignored, except its results
+                try:
+                    message = results_queue.get(timeout=0.5)
+                except queue.Empty:
+                    message = None
+
+                while message is not None:
+                    kind, worker_id, index, data = message
+                    if kind == "ready" and worker_id in workers:
+                        ready.add(worker_id)
+                    elif kind == "started" and worker_id in running and running[worker_id][0] == index:
+                        running[worker_id][1] = time.monotonic()
+                    elif kind == "finished":
+                        if worker_id in running and running[worker_id][0] == index:
+                            del running[worker_id]
+                        if index not in results:
+                            self._store_result(results, index, ScenarioResult.from_dict(data), on_result)
+                        if index in pending:
+                            pending.remove(index)
+                    try:
+                        message = results_queue.get_nowait()
+                    except queue.Empty:
+                        message = None
+
+                # Replace the workers that crashed or are stuck in a scenario
+                now = time.monotonic()
+                for worker_id, (process, tasks) in list(workers.items()):
+                    started = running[worker_id][1] if worker_id in running else None
+                    timed_out = started is not None and now - started > self._scenario_timeout
+                    if process.is_alive() and not timed_out:
+                        continue
+
+                    if process.is_alive():
+                        process.kill()
+                    process.join()
+                    del workers[worker_id]
+                    ready.discard(worker_id)
+
+                    if worker_id in running:
+                        index, _ = running.pop(worker_id)
+                        status = ScenarioResult.TIMEOUT if timed_out else ScenarioResult.FAILED
+                        logger.warning("Worker %d %s on scenario %s", worker_id, status, scenarios[index].name)
+
+                        if index in results:
+                            logger.debug("Scenario %s already has a result", scenarios[index].name)
+                        elif attempts[index] <= self._max_retries:
+                            pending.appendleft(index)
+                        else:
+                            error = "worker " + ("timed out" if timed_out else "exited with code " + str(process.exitcode))
+                            self._store_result(results, index, ScenarioResult(scenarios[index], status, error=error), on_result)
+                    else:
+                        # The worker died without running anything (e.g. the backend could not be created)
+                        startup_failures += 1
+                        if startup_failures > 3 * self._num_workers:
+                            raise RuntimeError("The workers keep exiting before running any scenario")
+
+                    if len(results) < len(scenarios):
+                        workers[next_worker_id] = self._start_worker(next_worker_id, results_queue)
+                        next_worker_id += 1
+        finally:
+            self._stop_workers(workers)
+
+        ordered = [results[index] for index in range(len(scenarios))]
+        if self._output_dir is not None:
+            self.write_merged_results(
+                ordered,
+                os.path.join(self._output_dir, ScenarioFarm.MERGED_RESULTS_FILE),
+                os.path.join(self._output_dir, ScenarioFarm.MERGED_TIMINGS_FILE),
+            )
+
+        return ordered
+
+    @staticmethod
+    def write_merged_results(results: List[ScenarioResult], path: str, timings_path: Optional[str] = None):
+        """
+        Method that writes every result into a single json file. The results are ordered by their scenario index, the
+        keys are sorted and the wall times are left out, so the file only depends on the scenarios and their outcome
+        (not on the worker scheduling or the load of the machine). The timings go to a separate file.
+
+        Args:
+            results (list): The list of ScenarioResult objects, in scenario order.
+            path (str): The path of the merged json file.
+            timings_path (str): The path of the json file with the timings of every scenario (None to skip it).
+        """
+        ScenarioFarm._write_json([result.to_dict(timings=False) for result in results], path)
+
+        if timings_path is not None:
+            timings = [dict(result.timings(), name=result.scenario.name) for result in results]
+            ScenarioFarm._write_json(timings, timings_path)
+
+    """
+    ---------------------------------------------------------------------
+    Auxiliary methods
+    ---------------------------------------------------------------------
+    """
+
+    @staticmethod
+    def _write_json(data, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
+
+    def _start_worker(self, worker_id: int, results_queue) -> tuple:
+        # Every worker has its own task queue, so the farm knows which scenario it was given
+        tasks = self._context.Queue()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(worker_id, self._backend, self._backend_kwargs, self._render_interval, tasks, results_queue),
+            name="ScenarioFarmWorker-" + str(worker_id),
+            daemon=True,
+        )
+        process.start()
+        return process, tasks
+
+    def _stop_workers(self, workers: Dict[int, tuple]):
+        for _, tasks in workers.values():
+            tasks.put(None)
+
+        for process, _ in workers.values():
+            process.join(timeout=30.0)
+            if process.is_alive():
+                process.kill()
+                process.join()
+
+    def _store_result(self, results: Dict[int, ScenarioResult], index: int, result: ScenarioResult, on_result):
+        results[index] = result
+
+        if self._output_dir is not None:
+            result.save(BatchRunner.result_path(self._output_dir, index, result.scenario))
+
+        if on_result is not None:
+            on_result(index, result)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run forklift simulation scenarios on a pool of worker processes")
+    parser.add_argument("scenarios", help="yaml or json file with the list of scenarios")
+    parser.add_argument("--output", default="results", help="directory where the results are written")
+    parser.add_argument("--backend", default=SIMULATION_BACKEND, choices=list(BACKENDS.keys()), help="world backend to use")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes (defaults to cpu count)")
+    parser.add_argument("--timeout", type=float, default=600.0, help="maximum wall time of a single scenario")
+    parser.add_argument("--retries", type=int, default=1, help="retries of a crashed or timed out scenario")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    farm = ScenarioFarm(
+        args.backend,
+        num_workers=args.workers,
+        scenario_timeout=args.timeout,
+        max_retries=args.retries,
+        output_dir=args.output,
+    )
+    results = farm.run(load_scenarios(args.scenarios))
+
+    return 0 if all(result.status == ScenarioResult.SUCCESS for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
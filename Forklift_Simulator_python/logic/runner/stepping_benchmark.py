@@ -0,0 +1,138 @@
+"""
+| File: stepping_benchmark.py
+| Author: Akhilesh Bhat
+| Description: Benchmark that loads every simulation environment and reports how many physics steps per second the
+                 fast stepping mode reaches, without rendering and with rendering every N steps
+"""
+
+__all__ = ["benchmark_environment", "run_benchmark", "format_results", "main"]
+
+import sys
+import json
+import logging
+import argparse
+from typing import Dict, List, Optional, Sequence
+
+from Forklift_Simulator_python.global_variables import DEFAULT_WORLD_SETTINGS, SIMULATION_BACKEND, SIMULATION_ENVIRONMENTS
+from Forklift_Simulator_python.logic.interface.fast_stepping import FastStepper
+from Forklift_Simulator_python.logic.runner.backends import BACKENDS, WorldBackend, create_backend
+
+logger = logging.getLogger(__name__)
+
+# Render every N steps in the "rendering" runs by default: one frame per rendering_dt of simulated time
+DEFAULT_RENDER_INTERVAL = max(1, round(DEFAULT_WORLD_SETTINGS["rendering_dt"] / DEFAULT_WORLD_SETTINGS["physics_dt"]))
+
+
+def benchmark_environment(
+    backend: WorldBackend, environment: str, steps: int = 2000, render_interval: int = DEFAULT_RENDER_INTERVAL, warmup: int = 100
+) -> List[Dict]:
+    """
+    Function that loads an environment and measures the fast stepping mode without rendering and with rendering.
+
+    Args:
+        backend (WorldBackend): The (initialized) world backend.
+        environment (str): The key of the environment in SIMULATION_ENVIRONMENTS.
+        steps (int): The number of steps measured per run. Defaults to 2000.
+        render_interval (int): Render every n steps in the run with rendering. Defaults to DEFAULT_RENDER_INTERVAL.
+        warmup (int): The number of steps run (and rendered) before measuring. Defaults to 100.
+
+    Returns:
+        list: One result per run ({"environment", "render_interval", "steps", "steps_per_second", ...})
+    """
+    backend.clear()
+    backend.load_environment(environment)
+    backend.reset()
+
+    stepper = FastStepper(backend.step, backend.physics_dt)
+
+    # Let the physics and the renderer settle (shader compilation, first contacts, etc.)
+    stepper.render_interval = 1
+    stepper.run(warmup)
+
+    results = []
+    for interval in (0, render_interval):
+        stepper.render_interval = interval
+        stats = stepper.run(steps)
+        results.append(dict(stats, environment=environment, render_interval=interval))
+        logger.info(
+            "%s: %.0f steps/s (real time factor %.1f) %s",
+            environment,
+            stats["steps_per_second"],
+            stats["real_time_factor"],
+            "without rendering" if interval == 0 else "rendering every " + str(interval) + " steps",
+        )
+
+    return results
+
+
+def run_benchmark(
+    backend: WorldBackend,
+    environments: Optional[Sequence[str]] = None,
+    steps: int = 2000,
+    render_interval: int = DEFAULT_RENDER_INTERVAL,
+    warmup: int = 100,
+) -> List[Dict]:
+    """
+    Function that benchmarks several environments (all of SIMULATION_ENVIRONMENTS by default). An environment that fails
+    to load is reported with an error instead of stopping the benchmark.
+    """
+    backend.initialize()
+
+    results = []
+    for environment in environments if environments is not None else list(SIMULATION_ENVIRONMENTS.keys()):
+        try:
+            results.extend(benchmark_environment(backend, environment, steps, render_interval, warmup))
+        except Exception as e:
+            logger.exception("Could not benchmark %s", environment)
+            results.append({"environment": environment, "error": repr(e)})
+
+    return results
+
+
+def format_results(results: List[Dict]) -> str:
+    """
+    Returns:
+        str: A table with the steps per second of every environment, without and with rendering
+    """
+    rows = {}
+    for result in results:
+        row = rows.setdefault(result["environment"], ["-", "-"])
+        if "error" in result:
+            row[:] = ["error", "error"]
+        else:
+            row[0 if result["render_interval"] == 0 else 1] = "{:.0f}".format(result["steps_per_second"])
+
+    width = max([len("Environment")] + [len(environment) for environment in rows])
+    lines = ["{:<{w}}  {:>12}  {:>12}".format("Environment", "No render", "Render", w=width)]
+    lines += ["{:<{w}}  {:>12}  {:>12}".format(environment, *row, w=width) for environment, row in rows.items()]
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure the physics steps per second of every simulation environment")
+    parser.add_argument("--backend", default=SIMULATION_BACKEND, choices=list(BACKENDS.keys()), help="world backend to use")
+    parser.add_argument("--environments", nargs="*", default=None, help="environments to benchmark (default: all)")
+    parser.add_argument("--steps", type=int, default=2000, help="number of steps measured per run")
+    parser.add_argument("--render-interval", type=int, default=DEFAULT_RENDER_INTERVAL, help="render every N steps in the rendering run")
+    parser.add_argument("--warmup", type=int, default=100, help="number of steps run before measuring")
+    parser.add_argument("--output", default=None, help="json file where the results are written")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    backend = create_backend(args.backend)
+    try:
+        results = run_benchmark(backend, args.environments, args.steps, args.render_interval, args.warmup)
+    finally:
+        backend.shutdown()
+
+    print(format_results(results))
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    return 0 if all("error" not in result for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,376 @@
+"""
+| File: ros2_backend.py
+| Author: Akhilesh Bhat
+| Description: Definition of the Ros2StreamingBackend class that publishes the odometry, fork joint state and TF of the
+                 whole fleet at a fixed rate (from a publisher thread, decoupled from the physics step) and applies the
+                 cmd_vel and fork commands it receives
+"""
+
+__all__ = ["Ros2StreamingBackend"]
+
+import math
+import logging
+import threading
+from typing import List, Optional
+
+import numpy as np
+
+from Forklift_Simulator_python.global_variables import STREAMING_NAMESPACE, STREAMING_PUBLISH_RATE
+from Forklift_Simulator_python.logic.vehicles.fleet_state import FleetState
+from Forklift_Simulator_python.logic.vehicles.vehicle_configs import vehicle_config
+
+logger = logging.getLogger(__name__)
+
+
+def _rotate_to_body(orientations: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+    """
+    Rotates a batch of world frame vectors into the body frames given by [qw, qx, qy, qz] quaternions
+    """
+    w = orientations[:, :1]
+    u = -orientations[:, 1:]
+    t = 2.0 * np.cross(u, vectors)
+    return vectors + w * t + np.cross(u, t)
+
+
+class _FleetSample:
+    """
+    Preallocated copy of the part of the fleet state that is published, plus the layout of the fleet it belongs to
+    """
+
+    def __init__(self):
+        self.capacity = 0
+        self.count = 0
+        self.stamp = 0.0
+        self.version = None
+        self.vehicle_ids: List[int] = []
+        self.models: List[str] = []
+        self._allocate(64)
+
+    def _allocate(self, capacity: int):
+        self.capacity = capacity
+        self.positions = np.zeros((capacity, 3))
+        self.orientations = np.zeros((capacity, 4))
+        self.linear_velocities = np.zeros((capacity, 3))
+        self.angular_velocities = np.zeros((capacity, 3))
+        self.fork_heights = np.zeros(capacity)
+
+    def copy_from(self, state: FleetState, stamp: float, layout: tuple):
+        if state.count > self.capacity:
+            self._allocate(max(state.count, 2 * self.capacity))
+
+        count = state.count
+        np.copyto(self.positions[:count], state.positions)
+        np.copyto(self.orientations[:count], state.orientations)
+        np.copyto(self.linear_velocities[:count], state.linear_velocities)
+        np.copyto(self.angular_velocities[:count], state.angular_velocities)
+        np.copyto(self.fork_heights[:count], state.fork_heights)
+
+        self.count = count
+        self.stamp = stamp
+        self.version, self.vehicle_ids, self.models = layout
+
+
+class Ros2StreamingBackend:
+    """
+    Streams the fleet over ROS 2 (or any other Transport). On each physics step, only a pre-step callback runs: at the
+    publish rate, it copies the fleet state into a preallocated sample (triple buffered, so neither side ever waits for
+    the other). A publisher thread turns the samples into preallocated messages:
+
+    - /<namespace>_<id>/odom (nav_msgs/Odometry, twist in the body frame)
+    - /<namespace>_<id>/joint_states (sensor_msgs/JointState of the fork lift joint)
+    - /tf (a single tf2_msgs/TFMessage with the transform of every vehicle)
+
+    and receives /<namespace>_<id>/cmd_vel (geometry_msgs/Twist: forward speed and yaw rate) and
+    /<namespace>_<id>/fork_cmd (std_msgs/Float64: fork lift velocity), which are written to a source of the InputPipeline.
+    """
+
+    def __init__(
+        self,
+        fleet_stepper,
+        vehicle_manager,
+        input_pipeline,
+        transport,
+        rate: float = STREAMING_PUBLISH_RATE,
+        namespace: str = STREAMING_NAMESPACE,
+        frame_id: str = "world",
+        command_timeout: float = 0.5,
+    ):
+        """
+        Args:
+            fleet_stepper (FleetStepper): The stepper of the fleet (the backend registers a pre-step callback in it).
+            vehicle_manager (VehicleManager): The registry of the vehicles (to map the slots to the vehicle ids).
+            input_pipeline (InputPipeline): The pipeline the commands received are written to.
+            transport (Transport): The middleware used to publish and subscribe.
+            rate (float): The rate (in Hz, of simulated time) at which the state is published. Defaults to STREAMING_PUBLISH_RATE.
+            namespace (str): The prefix of the namespace of every vehicle. Defaults to STREAMING_NAMESPACE.
+            frame_id (str): The fixed frame of the odometry and TF. Defaults to "world".
+            command_timeout (float): Time (in seconds) without commands after which the vehicles commanded over the
+                network are stopped. Defaults to 0.5.
+        """
+        self._fleet_stepper = fleet_stepper
+        self._vehicle_manager = vehicle_manager
+        self._input_pipeline = input_pipeline
+        self._transport = transport
+        self._command_timeout = command_timeout
+        self._period = 1.0 / rate
+        self._namespace = namespace
+        self._frame_id = frame_id
+
+        # Simulated time and time of the next publication
+        self._sim_time = 0.0
+        self._next_publish = 0.0
+
+        # Layout (fleet version, vehicle ids, models) cached by the physics side
+        self._layout: tuple = (None, [], [])
+
+        # Triple buffer of samples: the physics step writes one, the publisher thread reads another, and the third holds
+        # the most recent complete sample (exchanged under a lock held for a couple of assignments only)
+        self._samples = [_FleetSample(), _FleetSample(), _FleetSample()]
+        self._write, self._ready, self._read = 0, 1, 2
+        self._ready_is_new = False
+        self._swap_lock = threading.Lock()
+        self._sample_event = threading.Event()
+
+        # Source of the input pipeline the commands received are written to (created when streaming starts)
+        self._command_source = None
+
+        # Publishers, subscriptions and preallocated messages (owned by the publisher thread)
+        self._published_version = None
+        self._handles = []
+        self._odometry = []
+        self._joint_states = []
+        self._tf_publisher = None
+        self._tf_message = None
+
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self._published_samples = 0
+
+    @property
+    def is_running(self) -> bool:
+        return self._running
+
+    @property
+    def published_samples(self) -> int:
+        """
+        Returns:
+            int: The number of fleet samples published so far
+        """
+        return self._published_samples
+
+    def start(self):
+        """
+        Method that starts streaming (registers the pre-step callback and starts the publisher thread)
+        """
+        if self._running:
+            return
+
+        self._running = True
+        self._command_source = self._input_pipeline.add_source("ros2", timeout=self._command_timeout)
+        self._thread = threading.Thread(target=self._publisher_loop, name="ros2-streaming", daemon=True)
+        self._thread.start()
+        self._fleet_stepper.add_pre_step_callback(self._on_physics_step)
+
+        logger.info("Streaming the fleet state at %.1fHz", 1.0 / self._period)
+
+    def stop(self):
+        """
+        Method that stops streaming and releases the publishers and subscriptions
+        """
+        if not self._running:
+            return
+
+        self._fleet_stepper.remove_pre_step_callback(self._on_physics_step)
+        self._running = False
+        self._sample_event.set()
+        self._thread.join()
+        self._thread = None
+
+        self._destroy_handles()
+        self._transport.shutdown()
+
+        self._input_pipeline.remove_source(self._command_source)
+        self._command_source = None
+
+    """
+    Physics side (runs on every physics step, must never block)
+    """
+
+    def _on_physics_step(self, state: FleetState, dt: float):
+        self._sim_time += dt
+
+        if self._sim_time + 1e-9 < self._next_publish:
+            return
+        self._next_publish = max(self._next_publish + self._period, self._sim_time)
+
+        if self._layout[0] != state.version:
+            records = self._vehicle_manager.records
+            self._layout = (state.version, [record.vehicle_id for record in records], list(state.models))
+
+        self._samples[self._write].copy_from(state, self._sim_time, self._layout)
+        with self._swap_lock:
+            self._write, self._ready = self._ready, self._write
+            self._ready_is_new = True
+        self._sample_event.set()
+
+    """
+    Publisher thread
+    """
+
+    def _publisher_loop(self):
+        # Incoming commands are processed at least every 10ms, even when there is nothing to publish
+        poll_interval = min(self._period, 0.01)
+
+        while self._running:
+            self._transport.spin_once(0.0)
+
+            if not self._sample_event.wait(poll_interval):
+                continue
+            self._sample_event.clear()
+
+            with self._swap_lock:
+                if not self._ready_is_new:
+                    continue
+                self._read, self._ready = self._ready, self._read
+                self._ready_is_new = False
+
+            sample = self._samples[self._read]
+            try:
+                if sample.version != self._published_version:
+                    self._rebuild(sample)
+                self._publish(sample)
+            except Exception as e:
+                logger.error("Could not publish the fleet state: %s", e)
+
+    def _rebuild(self, sample: _FleetSample):
+        self._destroy_handles()
+
+        transport = self._transport
+        count = len(sample.vehicle_ids)
+
+        self._tf_publisher = transport.create_publisher("/tf", "tf")
+        self._tf_message = transport.new_message("tf")
+        transforms = []
+
+        for vehicle_id, model in zip(sample.vehicle_ids, sample.models):
+            prefix = "/" + self._namespace + "_" + str(vehicle_id)
+            child_frame = self._namespace + "_" + str(vehicle_id) + "/base_link"
+            config = vehicle_config(model)
+
+            odometry = transport.new_message("odometry")
+            odometry.header.frame_id = self._frame_id
+            odometry.child_frame_id = child_frame
+
+            joint_state = transport.new_message("joint_state")
+            joint_state.name = [config.lift_joint or "lift_joint"]
+            joint_state.position = [0.0]
+
+            transform = transport.new_message("transform")
+            transform.header.frame_id = self._frame_id
+            transform.child_frame_id = child_frame
+            transforms.append(transform)
+
+            self._odometry.append((transport.create_publisher(prefix + "/odom", "odometry"), odometry))
+            self._joint_states.append((transport.create_publisher(prefix + "/joint_states", "joint_state"), joint_state))
+
+            self._handles.append(
+                transport.create_subscription(
+                    prefix + "/cmd_vel", "twist", lambda msg, id=vehicle_id, config=config: self._on_cmd_vel(id, config, msg)
+                )
+            )
+            self._handles.append(
+                transport.create_subscription(prefix + "/fork_cmd", "float64", lambda msg, id=vehicle_id: self._on_fork_cmd(id, msg))
+            )
+
+        self._tf_message.transforms = transforms
+        self._published_version = sample.version
+
+        logger.info("Streaming backend rebuilt the publishers of %d vehicles", count)
+
+    def _publish(self, sample: _FleetSample):
+        count = sample.count
+        if count != len(self._odometry):
+            return
+
+        seconds = int(sample.stamp)
+        nanoseconds = int((sample.stamp - seconds) * 1e9)
+
+        # Convert the whole fleet at once (the messages need python floats)
+        positions = sample.positions[:count].tolist()
+        orientations = sample.orientations[:count]
+        quaternions = orientations.tolist()
+        linear = _rotate_to_body(orientations, sample.linear_velocities[:count]).tolist()
+        angular = _rotate_to_body(orientations, sample.angular_velocities[:count]).tolist()
+        fork_heights = sample.fork_heights[:count].tolist()
+
+        for slot in range(count):
+            (x, y, z), (qw, qx, qy, qz) = positions[slot], quaternions[slot]
+
+            publisher, odometry = self._odometry[slot]
+            odometry.header.stamp.sec, odometry.header.stamp.nanosec = seconds, nanoseconds
+            pose = odometry.pose.pose
+            pose.position.x, pose.position.y, pose.position.z = x, y, z
+            pose.orientation.w, pose.orientation.x, pose.orientation.y, pose.orientation.z = qw, qx, qy, qz
+            twist = odometry.twist.twist
+            twist.linear.x, twist.linear.y, twist.linear.z = linear[slot]
+            twist.angular.x, twist.angular.y, twist.angular.z = angular[slot]
+            self._transport.publish(publisher, odometry)
+
+            publisher, joint_state = self._joint_states[slot]
+            joint_state.header.stamp.sec, joint_state.header.stamp.nanosec = seconds, nanoseconds
+            joint_state.position[0] = fork_heights[slot]
+            self._transport.publish(publisher, joint_state)
+
+            transform = self._tf_message.transforms[slot]
+            transform.header.stamp.sec, transform.header.stamp.nanosec = seconds, nanoseconds
+            translation, rotation = transform.transform.translation, transform.transform.rotation
+            translation.x, translation.y, translation.z = x, y, z
+            rotation.w, rotation.x, rotation.y, rotation.z = qw, qx, qy, qz
+
+        self._transport.publish(self._tf_publisher, self._tf_message)
+        self._published_samples += 1
+
+    def _on_cmd_vel(self, vehicle_id: int, config, message):
+        slot = self._input_pipeline.slot_of(vehicle_id)
+        if slot is None:
+            return
+
+        speed, yaw_rate = message.linear.x, message.angular.z
+
+        # Steering angle of the rear wheel that produces the requested yaw rate at the requested forward speed (the
+        # vehicle turns at yaw_rate = wheel_speed * sin(steering) / wheelbase and moves forward at wheel_speed *
+        # cos(steering), so tan(steering) = wheelbase * yaw_rate / speed, whose sign flips when reversing). Turning in
+        # place takes the largest steering angle
+        if speed != 0.0:
+            steering = math.atan(config.wheelbase * yaw_rate / speed)
+        else:
+            steering = math.copysign(0.5 * math.pi, yaw_rate) if yaw_rate != 0.0 else 0.0
+        steering = max(-config.max_steering_angle, min(config.max_steering_angle, steering))
+
+        # The speed command is the speed of the drive wheel
+        if speed != 0.0:
+            wheel_speed = speed / math.cos(steering)
+        else:
+            wheel_speed = config.wheelbase * yaw_rate / math.sin(steering) if steering != 0.0 else 0.0
+
+        self._command_source.write(slot, speed=wheel_speed, steering=steering)
+
+    def _on_fork_cmd(self, vehicle_id: int, message):
+        slot = self._input_pipeline.slot_of(vehicle_id)
+        if slot is None:
+            return
+
+        self._command_source.write(slot, fork=message.data)
+
+    def _destroy_handles(self):
+        for handle in self._handles:
+            self._transport.destroy(handle)
+        for publisher, _ in self._odometry + self._joint_states:
+            self._transport.destroy(publisher)
+        if self._tf_publisher is not None:
+            self._transport.destroy(self._tf_publisher)
+
+        self._handles = []
+        self._odometry = []
+        self._joint_states = []
+        self._tf_publisher = None
@@ -0,0 +1,229 @@
+"""
+| File: transport.py
+| Author: Akhilesh Bhat
+| Description: Definition of the Transport interface used by the streaming backends, and of its implementations:
+                 Ros2Transport (rclpy) and InProcessTransport (local stand-in that delivers messages without copying them)
+"""
+
+__all__ = ["Transport", "Ros2Transport", "InProcessTransport"]
+
+import threading
+from types import SimpleNamespace
+from typing import Callable, Dict, List
+
+
+class Transport:
+    """
+    Interface between a streaming backend and the middleware. Messages are created once by the transport (such that the
+    backend can preallocate them and only update their fields) and follow the layout of the ROS 2 messages.
+
+    The supported message kinds are "odometry" (nav_msgs/Odometry), "joint_state" (sensor_msgs/JointState), "tf"
+    (tf2_msgs/TFMessage), "transform" (geometry_msgs/TransformStamped), "twist" (geometry_msgs/Twist) and "float64"
+    (std_msgs/Float64).
+    """
+
+    def new_message(self, kind: str):
+        """
+        Args:
+            kind (str): The kind of message.
+
+        Returns:
+            A new message of the given kind
+        """
+        raise NotImplementedError
+
+    def create_publisher(self, topic: str, kind: str):
+        """
+        Args:
+            topic (str): The name of the topic.
+            kind (str): The kind of message published on the topic.
+
+        Returns:
+            A handle to pass to publish
+        """
+        raise NotImplementedError
+
+    def publish(self, publisher, message):
+        raise NotImplementedError
+
+    def create_subscription(self, topic: str, kind: str, callback: Callable):
+        """
+        Args:
+            topic (str): The name of the topic.
+            kind (str): The kind of message received on the topic.
+            callback (Callable): Function called with every message received.
+
+        Returns:
+            A handle to pass to destroy
+        """
+        raise NotImplementedError
+
+    def destroy(self, handle):
+        """
+        Method that removes a publisher or a subscription
+        """
+        raise NotImplementedError
+
+    def spin_once(self, timeout: float = 0.0):
+        """
+        Method that processes the messages received so far (invoking the subscription callbacks)
+        """
+        pass
+
+    def shutdown(self):
+        pass
+
+
+class Ros2Transport(Transport):
+    """
+    Transport on top of rclpy. The rclpy module is only imported when the transport is created (it is only available
+    when the ROS 2 bridge is sourced).
+    """
+
+    _MESSAGE_TYPES = {
+        "odometry": ("nav_msgs.msg", "Odometry"),
+        "joint_state": ("sensor_msgs.msg", "JointState"),
+        "tf": ("tf2_msgs.msg", "TFMessage"),
+        "transform": ("geometry_msgs.msg", "TransformStamped"),
+        "twist": ("geometry_msgs.msg", "Twist"),
+        "float64": ("std_msgs.msg", "Float64"),
+    }
+
+    def __init__(self, node_name: str = "forklift_simulator", queue_size: int = 10):
+        """
+        Args:
+            node_name (str): The name of the ROS 2 node. Defaults to "forklift_simulator".
+            queue_size (int): The depth of the publisher and subscription queues. Defaults to 10.
+        """
+        import importlib
+
+        import rclpy
+
+        self._rclpy = rclpy
+        if not rclpy.ok():
+            rclpy.init()
+
+        self._node = rclpy.create_node(node_name)
+        self._queue_size = queue_size
+        self._types = {
+            kind: getattr(importlib.import_module(module), name) for kind, (module, name) in Ros2Transport._MESSAGE_TYPES.items()
+        }
+
+    def new_message(self, kind: str):
+        return self._types[kind]()
+
+    def create_publisher(self, topic: str, kind: str):
+        return self._node.create_publisher(self._types[kind], topic, self._queue_size)
+
+    def publish(self, publisher, message):
+        publisher.publish(message)
+
+    def create_subscription(self, topic: str, kind: str, callback: Callable):
+        return self._node.create_subscription(self._types[kind], topic, callback, self._queue_size)
+
+    def destroy(self, handle):
+        if hasattr(handle, "publish"):
+            self._node.destroy_publisher(handle)
+        else:
+            self._node.destroy_subscription(handle)
+
+    def spin_once(self, timeout: float = 0.0):
+        self._rclpy.spin_once(self._node, timeout_sec=timeout)
+
+    def shutdown(self):
+        self._node.destroy_node()
+
+
+def _vector3():
+    return SimpleNamespace(x=0.0, y=0.0, z=0.0)
+
+
+def _quaternion():
+    return SimpleNamespace(x=0.0, y=0.0, z=0.0, w=1.0)
+
+
+def _header():
+    return SimpleNamespace(stamp=SimpleNamespace(sec=0, nanosec=0), frame_id="")
+
+
+class InProcessTransport(Transport):
+    """
+    Local stand-in for the middleware: messages are plain objects with the same layout as the ROS 2 messages, and
+    publishing delivers the message object itself (no copy, no serialization) to every subscription of the topic, from
+    the thread that publishes it. Subscribers must therefore not hold on to the messages they receive.
+
+    It also counts the messages and keeps the last one published on every topic, which allows the backends to be tested
+    without ROS 2.
+    """
+
+    _FACTORIES = {
+        "odometry": lambda: SimpleNamespace(
+            header=_header(),
+            child_frame_id="",
+            pose=SimpleNamespace(pose=SimpleNamespace(position=_vector3(), orientation=_quaternion()), covariance=[0.0] * 36),
+            twist=SimpleNamespace(twist=SimpleNamespace(linear=_vector3(), angular=_vector3()), covariance=[0.0] * 36),
+        ),
+        "joint_state": lambda: SimpleNamespace(header=_header(), name=[], position=[], velocity=[], effort=[]),
+        "tf": lambda: SimpleNamespace(transforms=[]),
+        "transform": lambda: SimpleNamespace(
+            header=_header(), child_frame_id="", transform=SimpleNamespace(translation=_vector3(), rotation=_quaternion())
+        ),
+        "twist": lambda: SimpleNamespace(linear=_vector3(), angular=_vector3()),
+        "float64": lambda: SimpleNamespace(data=0.0),
+    }
+
+    def __init__(self):
+        self._subscriptions: Dict[str, List[Callable]] = {}
+        self._counts: Dict[str, int] = {}
+        self._last_messages: Dict[str, object] = {}
+
+        # Lock for safe multi-threading (the subscriptions may change while another thread publishes)
+        self._lock = threading.Lock()
+
+    def new_message(self, kind: str):
+        return InProcessTransport._FACTORIES[kind]()
+
+    def create_publisher(self, topic: str, kind: str):
+        return topic
+
+    def publish(self, publisher, message):
+        with self._lock:
+            self._counts[publisher] = self._counts.get(publisher, 0) + 1
+            self._last_messages[publisher] = message
+            callbacks = list(self._subscriptions.get(publisher, []))
+
+        for callback in callbacks:
+            callback(message)
+
+    def create_subscription(self, topic: str, kind: str, callback: Callable):
+        with self._lock:
+            self._subscriptions.setdefault(topic, []).append(callback)
+        return (topic, callback)
+
+    def destroy(self, handle):
+        if isinstance(handle, tuple):
+            topic, callback = handle
+            with self._lock:
+                self._subscriptions[topic].remove(callback)
+
+    def message_count(self, topic: str) -> int:
+        """
+        Returns:
+            int: The number of messages published on the topic
+        """
+        return self._counts.get(topic, 0)
+
+    def last_message(self, topic: str):
+        """
+        Returns:
+            The last message published on the topic (None if there is none). Preallocated messages are reused by the
+            publishers, so its content may change after the next publication.
+        """
+        return self._last_messages.get(topic)
+
+    def topics(self) -> List[str]:
+        """
+        Returns:
+            list: Every topic a message was published on
+        """
+        return list(self._counts.keys())
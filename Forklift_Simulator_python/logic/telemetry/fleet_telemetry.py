@@ -0,0 +1,339 @@
+"""
+| File: fleet_telemetry.py
+| Author: Akhilesh Bhat
+| Description: Definition of the DecimatedRingBuffer (fixed-size NumPy rings holding a signal at several min/max
+                 decimated resolutions) and of the FleetTelemetry that fills one with the fork height and speed of a few
+                 selected vehicles and the physics step time, on every physics step
+"""
+
+__all__ = ["DecimatedRingBuffer", "FleetTelemetry"]
+
+import time
+import logging
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from Forklift_Simulator_python.logic.vehicles.fleet_state import FleetState
+
+logger = logging.getLogger(__name__)
+
+
+class DecimatedRingBuffer:
+    """
+    Keeps a multi-channel signal in a fixed amount of memory. Level 0 is a ring of the raw samples; every level l > 0 is
+    a ring of the min and max of consecutive buckets of factor**l raw samples, filled as the samples are appended. With
+    the defaults (2048 samples per level, factor 8, 5 levels) the last 8 seconds of a 250 Hz signal are kept at full
+    resolution and the last 9 hours as min/max envelopes, in 16 bytes per channel plus 8 bytes (the time) per entry of
+    each level: about 1.5 MB for the 9 channels of FleetTelemetry.
+
+    Appending costs O(levels) small vectorized operations. Reading returns at most a requested number of min/max pairs,
+    from the finest level that covers the requested duration.
+    """
+
+    def __init__(self, channels: int, capacity: int = 2048, factor: int = 8, levels: int = 5):
+        """
+        Args:
+            channels (int): The number of values per sample.
+            capacity (int): The number of entries of each level. Defaults to 2048.
+            factor (int): The number of entries of a level merged into one entry of the next. Defaults to 8.
+            levels (int): The number of levels. Defaults to 5.
+        """
+        self._channels = channels
+        self._capacity = capacity
+        self._factor = factor
+        self._levels = levels
+
+        # Per level: time of the first sample of each entry, min and max of each entry, and number of entries written
+        self._times = np.zeros((levels, capacity))
+        self._mins = np.full((levels, capacity, channels), np.nan)
+        self._maxs = np.full((levels, capacity, channels), np.nan)
+        self._written = np.zeros(levels, dtype=np.int64)
+
+        # Per level above 0: bucket being accumulated (start time, running min/max and number of entries merged)
+        self._pending_time = np.zeros(levels)
+        self._pending_min = np.full((levels, channels), np.inf)
+        self._pending_max = np.full((levels, channels), -np.inf)
+        self._pending_count = np.zeros(levels, dtype=np.int64)
+
+    @property
+    def channels(self) -> int:
+        return self._channels
+
+    @property
+    def samples(self) -> int:
+        """
+        Returns:
+            int: The number of samples appended since the buffer was created or cleared
+        """
+        return int(self._written[0])
+
+    def clear(self):
+        self._mins.fill(np.nan)
+        self._maxs.fill(np.nan)
+        self._written[:] = 0
+        self._pending_min.fill(np.inf)
+        self._pending_max.fill(-np.inf)
+        self._pending_count[:] = 0
+
+    def append(self, t: float, values: np.ndarray):
+        """
+        Method that appends a sample.
+
+        Args:
+            t (float): The time of the sample (in seconds, increasing).
+            values (np.ndarray): The value of every channel (NaN for missing values).
+        """
+        index = self._written[0] % self._capacity
+        self._times[0, index] = t
+        self._mins[0, index] = values
+        self._maxs[0, index] = values
+        self._written[0] += 1
+
+        # Propagate to the coarser levels: every level accumulates the entries of the previous one
+        low, high = values, values
+        for level in range(1, self._levels):
+            if self._pending_count[level] == 0:
+                self._pending_time[level] = t
+            np.fmin(self._pending_min[level], low, out=self._pending_min[level])
+            np.fmax(self._pending_max[level], high, out=self._pending_max[level])
+            self._pending_count[level] += 1
+
+            if self._pending_count[level] < self._factor:
+                return
+
+            index = self._written[level] % self._capacity
+            self._times[level, index] = self._pending_time[level]
+            self._mins[level, index] = self._pending_min[level]
+            self._maxs[level, index] = self._pending_max[level]
+            self._written[level] += 1
+
+            # Channels without any value in the bucket stay missing
+            empty = np.isinf(self._pending_min[level])
+            self._mins[level, index, empty] = np.nan
+            self._maxs[level, index, empty] = np.nan
+
+            low, high = self._mins[level, index], self._maxs[level, index]
+            t = self._pending_time[level]
+            self._pending_min[level].fill(np.inf)
+            self._pending_max[level].fill(-np.inf)
+            self._pending_count[level] = 0
+
+    def window(self, duration: float, points: int = 512) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Args:
+            duration (float): The length (in seconds) of the window, ending at the last sample.
+            points (int): The maximum number of entries returned. Defaults to 512.
+
+        Returns:
+            tuple: The times (points,), mins (points, channels) and maxs (points, channels) of the window, oldest first.
+                On a coarse level, the last entry merges the samples of the buckets still being accumulated.
+        """
+        if self._written[0] == 0:
+            empty = np.zeros((0, self._channels))
+            return np.zeros(0), empty, empty
+
+        latest = self._times[0, (self._written[0] - 1) % self._capacity]
+
+        # Finest level whose oldest entry is older than the window, or else the level that reaches the furthest back
+        # (the partial bucket is included, such that a coarse level also covers the latest samples)
+        best = None
+        for level in range(self._levels):
+            times, mins, maxs = self._ordered(level)
+            if level > 0:
+                times, mins, maxs = self._with_pending(level, times, mins, maxs)
+            if len(times) == 0:
+                continue
+            if times[0] <= latest - duration:
+                best = (times, mins, maxs)
+                break
+            if best is None or times[0] < best[0][0]:
+                best = (times, mins, maxs)
+        times, mins, maxs = best
+
+        start = int(np.searchsorted(times, latest - duration, side="left"))
+        times, mins, maxs = times[start:], mins[start:], maxs[start:]
+
+        # Merge consecutive entries until at most points remain (dropping the oldest ones that do not fill a bucket)
+        if len(times) > points:
+            bucket = -(-len(times) // points)
+            offset = len(times) % bucket
+            times = times[offset::bucket]
+            mins = np.fmin.reduce(mins[offset:].reshape(-1, bucket, self._channels), axis=1)
+            maxs = np.fmax.reduce(maxs[offset:].reshape(-1, bucket, self._channels), axis=1)
+
+        return times, mins, maxs
+
+    def envelope(self, duration: float, channel: int, points: int = 512) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Args:
+            duration (float): The length (in seconds) of the window, ending at the last sample.
+            channel (int): The index of the channel.
+            points (int): The maximum number of min/max pairs. Defaults to 512.
+
+        Returns:
+            tuple: x and y arrays of a line going through the min and max of each entry (2 * points values at most),
+                such that a decimated signal keeps its peaks when plotted
+        """
+        times, mins, maxs = self.window(duration, points)
+        x = np.repeat(times, 2)
+        y = np.empty(2 * len(times))
+        y[0::2] = mins[:, channel]
+        y[1::2] = maxs[:, channel]
+        return x, y
+
+    def _with_pending(self, level: int, times: np.ndarray, mins: np.ndarray, maxs: np.ndarray):
+        # The samples appended after the last entry of the level are in the pending buckets of this level and of every
+        # finer one: merge them into one partial entry
+        counts = self._pending_count[1 : level + 1]
+        if not counts.any():
+            return times, mins, maxs
+
+        active = 1 + np.flatnonzero(counts)
+        low = np.fmin.reduce(self._pending_min[active], axis=0)
+        high = np.fmax.reduce(self._pending_max[active], axis=0)
+
+        # Channels without any value in the pending buckets stay missing
+        empty = np.isinf(low)
+        low[empty] = np.nan
+        high[empty] = np.nan
+
+        times = np.append(times, self._pending_time[active].min())
+        return times, np.vstack((mins, low)), np.vstack((maxs, high))
+
+    def _ordered(self, level: int):
+        written = int(self._written[level])
+        count = min(written, self._capacity)
+        order = np.arange(written - count, written) % self._capacity
+        return self._times[level, order], self._mins[level, order], self._maxs[level, order]
+
+
+class FleetTelemetry:
+    """
+    Samples the fork height and the speed of up to max_vehicles selected vehicles, and the wall-clock time between two
+    physics steps, into a DecimatedRingBuffer. Meant to be registered as a FleetStepper pre-step callback: a step costs
+    one fancy-index read and one append, whatever the length of the history. The channels of the buffer are
+    [step time, fork height of each selected vehicle, speed of each selected vehicle].
+    """
+
+    def __init__(self, vehicle_manager, max_vehicles: int = 4, capacity: int = 2048, factor: int = 8, levels: int = 5):
+        """
+        Args:
+            vehicle_manager (VehicleManager): The registry of the vehicles (used to find the slot of a vehicle id).
+            max_vehicles (int): The maximum number of vehicles sampled. Defaults to 4.
+            capacity (int): The number of entries per level of the ring buffer. Defaults to 2048.
+            factor (int): The decimation factor between two levels. Defaults to 8.
+            levels (int): The number of levels. Defaults to 5.
+        """
+        self._vehicle_manager = vehicle_manager
+        self._max_vehicles = max_vehicles
+        self._buffer = DecimatedRingBuffer(1 + 2 * max_vehicles, capacity, factor, levels)
+
+        self._vehicle_ids: List[int] = []
+        self._slots_version = None
+        self._slots = np.zeros(0, dtype=np.int64)
+        self._columns = np.zeros(0, dtype=np.int64)
+
+        self._sample = np.full(self._buffer.channels, np.nan)
+        self._time = 0.0
+        self._last_step = None
+        self.enabled = True
+
+    @property
+    def buffer(self) -> DecimatedRingBuffer:
+        return self._buffer
+
+    @property
+    def vehicle_ids(self) -> List[int]:
+        return list(self._vehicle_ids)
+
+    def select(self, vehicle_ids: Sequence[int]):
+        """
+        Method that selects the vehicles to sample (the history is cleared).
+
+        Args:
+            vehicle_ids (list): The ids of the vehicles (only the first max_vehicles are kept).
+        """
+        self._vehicle_ids = [int(vehicle_id) for vehicle_id in vehicle_ids][: self._max_vehicles]
+        self._slots_version = None
+        self._buffer.clear()
+        self._time = 0.0
+        self._last_step = None
+
+    def channel(self, signal: str, vehicle_id: int = None) -> int:
+        """
+        Args:
+            signal (str): "step_time", "fork_height" or "speed".
+            vehicle_id (int): The id of the vehicle (for the fork height and speed).
+
+        Returns:
+            int: The index of the channel of the buffer holding that signal
+        """
+        if signal == "step_time":
+            return 0
+
+        index = self._vehicle_ids.index(vehicle_id)
+        if signal == "fork_height":
+            return 1 + index
+        if signal == "speed":
+            return 1 + self._max_vehicles + index
+        raise ValueError("Unknown signal " + signal)
+
+    def plot_data(self, signal: str, duration: float, points: int = 512) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+        """
+        Args:
+            signal (str): "step_time", "fork_height" or "speed".
+            duration (float): The length (in seconds) of the window, ending at the last sample.
+            points (int): The maximum number of min/max pairs per line. Defaults to 512.
+
+        Returns:
+            dict: A dictionary of vehicle id (None for the step time) -> (x, y) min/max envelope of the signal
+        """
+        if signal == "step_time":
+            return {None: self._buffer.envelope(duration, 0, points)}
+        return {
+            vehicle_id: self._buffer.envelope(duration, self.channel(signal, vehicle_id), points)
+            for vehicle_id in self._vehicle_ids
+        }
+
+    def on_physics_step(self, state: FleetState, dt: float):
+        """
+        Method that appends one sample (FleetStepper pre-step callback).
+        """
+        if not self.enabled:
+            return
+
+        now = time.perf_counter()
+        step_time = now - self._last_step if self._last_step is not None else dt
+        self._last_step = now
+
+        if self._slots_version != state.version:
+            self._update_slots(state)
+
+        sample = self._sample
+        sample[0] = step_time
+        if len(self._slots) > 0:
+            sample[1 + self._columns] = state.fork_heights[self._slots]
+
+            # Forward speed along the heading, computed for the sampled vehicles only
+            w, x, y, z = state.orientations[self._slots].T
+            heading = np.arctan2(2.0 * (w * z + x * y), 1.0 - 2.0 * (y * y + z * z))
+            velocities = state.linear_velocities[self._slots]
+            sample[1 + self._max_vehicles + self._columns] = velocities[:, 0] * np.cos(heading) + velocities[:, 1] * np.sin(heading)
+
+        self._buffer.append(self._time, sample)
+        self._time += dt
+
+    def _update_slots(self, state: FleetState):
+        slots, columns = [], []
+        for column, vehicle_id in enumerate(self._vehicle_ids):
+            try:
+                slots.append(self._vehicle_manager.get_record_by_id(vehicle_id).slot)
+                columns.append(column)
+            except (AttributeError, KeyError):
+                pass
+
+        self._slots = np.array(slots, dtype=np.int64)
+        self._columns = np.array(columns, dtype=np.int64)
+        self._sample[1:] = np.nan
+        self._slots_version = state.version
@@ -0,0 +1,260 @@
+"""
+| File: vehicle_manager.py
+| Author: Akhilesh Bhat
+| Description: Definition of the VehicleManager class (a singleton) that keeps an indexed registry of every vehicle
+                 spawned in the simulation
+"""
+
+__all__ = ["VehicleManager", "VehicleRecord"]
+
+import logging
+from threading import Lock
+from typing import Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class VehicleRecord:
+    """
+    Compact record of a single vehicle in the registry. The slot is the dense index of the vehicle in the registry
+    (always in [0, number of vehicles)), which allows per-vehicle data to be kept in contiguous arrays.
+    """
+
+    __slots__ = ("stage_prefix", "vehicle_id", "model", "slot", "vehicle")
+
+    def __init__(self, stage_prefix: str, vehicle_id: int, model: str, slot: int, vehicle):
+        self.stage_prefix = stage_prefix
+        self.vehicle_id = vehicle_id
+        self.model = model
+        self.slot = slot
+        self.vehicle = vehicle
+
+    def __repr__(self) -> str:
+        return "VehicleRecord({}, id={}, model={}, slot={})".format(
+            self.stage_prefix, self.vehicle_id, self.model, self.slot
+        )
+
+
+class VehicleManager:
+    """
+    VehicleManager is a singleton class (there is only one object instance at any given time) that keeps track of
+    every vehicle spawned in the world. Vehicles are indexed by stage prefix and by vehicle id, and every lookup,
+    insertion and removal is O(1), so it can be used from the physics step with hundreds of vehicles in the scene.
+    """
+
+    # The object instance of the Vehicle Manager
+    _instance = None
+    _is_initialized = False
+
+    # Lock for safe multi-threading
+    _lock: Lock = Lock()
+
+    def __init__(self):
+        """
+        Initialize the VehicleManager singleton object (only runs once at a time)
+        """
+
+        # If we already have an instance of the VehicleManager, do not overwrite it
+        if VehicleManager._is_initialized:
+            return
+
+        logger.info("Initializing the Vehicle Manager")
+        VehicleManager._is_initialized = True
+
+        # Registry of the vehicles: dense list of records plus the two indexes into it
+        self._records: List[VehicleRecord] = []
+        self._by_stage_prefix: Dict[str, VehicleRecord] = {}
+        self._by_id: Dict[int, VehicleRecord] = {}
+
+        # Plain dictionary of stage prefix -> vehicle object (kept in sync with the registry)
+        self._vehicles: Dict[str, object] = {}
+
+        # Functions called with (record, removed) whenever a vehicle is added or removed
+        self._listeners = []
+
+    @property
+    def vehicles(self) -> Dict[str, object]:
+        """
+        Returns:
+            dict: A dictionary of stage prefix -> vehicle object with every vehicle currently in the simulation
+        """
+        return self._vehicles
+
+    @property
+    def records(self) -> List[VehicleRecord]:
+        """
+        Returns:
+            list: The dense list of vehicle records (the position of each record in the list is its slot)
+        """
+        return self._records
+
+    def add_vehicle(self, stage_prefix: str, vehicle, vehicle_id: Optional[int] = None, model: str = "") -> VehicleRecord:
+        """
+        Method that adds a vehicle to the registry.
+
+        Args:
+            stage_prefix (str): The path of the vehicle in the stage.
+            vehicle: The vehicle object.
+            vehicle_id (int): The id of the vehicle. Defaults to the first unused id.
+            model (str): The name of the vehicle model (the key in ROBOTS). Defaults to "".
+
+        Returns:
+            VehicleRecord: The record of the vehicle in the registry
+        """
+        with VehicleManager._lock:
+            self._check_available(stage_prefix, vehicle_id)
+
+            if vehicle_id is None:
+                vehicle_id = self._next_vehicle_id()
+
+            record = VehicleRecord(stage_prefix, vehicle_id, model, len(self._records), vehicle)
+            self._records.append(record)
+            self._by_stage_prefix[stage_prefix] = record
+            self._by_id[vehicle_id] = record
+            self._vehicles[stage_prefix] = vehicle
+
+        for listener in self._listeners:
+            listener(record, False)
+
+        return record
+
+    def check_available(self, stage_prefix: str, vehicle_id: Optional[int] = None):
+        """
+        Method that checks that a vehicle can be added with the given stage prefix and id (e.g. before loading its asset
+        into the stage, such that a rejected vehicle does not leave its prim behind).
+
+        Args:
+            stage_prefix (str): The path of the vehicle in the stage.
+            vehicle_id (int): The id of the vehicle. Defaults to None (the first unused id).
+
+        Raises:
+            ValueError: If a vehicle already exists with the stage prefix or the id
+        """
+        with VehicleManager._lock:
+            self._check_available(stage_prefix, vehicle_id)
+
+    def remove_vehicle(self, stage_prefix: str) -> VehicleRecord:
+        """
+        Method that removes a vehicle from the registry. The last record is moved into the slot of the removed vehicle,
+        such that the slots stay dense.
+
+        Args:
+            stage_prefix (str): The path of the vehicle in the stage.
+
+        Returns:
+            VehicleRecord: The record of the removed vehicle
+        """
+        with VehicleManager._lock:
+            record = self._by_stage_prefix.pop(stage_prefix)
+            del self._by_id[record.vehicle_id]
+            del self._vehicles[stage_prefix]
+
+            last = self._records.pop()
+            if last is not record:
+                last.slot = record.slot
+                self._records[record.slot] = last
+
+        for listener in self._listeners:
+            listener(record, True)
+
+        return record
+
+    def remove_all_vehicles(self):
+        """
+        Method that removes every vehicle from the registry at once (without touching the slots one by one).
+        """
+        with VehicleManager._lock:
+            records = self._records
+            self._records = []
+            self._by_stage_prefix = {}
+            self._by_id = {}
+            self._vehicles = {}
+
+        for record in records:
+            if hasattr(record.vehicle, "destroy"):
+                record.vehicle.destroy()
+
+        for listener in self._listeners:
+            listener(None, True)
+
+        logger.info("Removed %d vehicles from the Vehicle Manager", len(records))
+
+    def get_vehicle(self, stage_prefix: str):
+        """
+        Args:
+            stage_prefix (str): The path of the vehicle in the stage.
+
+        Returns:
+            The vehicle object spawned with the given stage prefix
+        """
+        return self._by_stage_prefix[stage_prefix].vehicle
+
+    def get_vehicle_by_id(self, vehicle_id: int):
+        """
+        Args:
+            vehicle_id (int): The id of the vehicle.
+
+        Returns:
+            The vehicle object with the given id
+        """
+        return self._by_id[vehicle_id].vehicle
+
+    def get_record(self, stage_prefix: str) -> VehicleRecord:
+        return self._by_stage_prefix[stage_prefix]
+
+    def get_record_by_id(self, vehicle_id: int) -> VehicleRecord:
+        return self._by_id[vehicle_id]
+
+    def add_listener(self, listener):
+        """
+        Args:
+            listener (Callable): Function called with (record, removed) when a vehicle is added or removed. When all
+                the vehicles are removed at once, it is called a single time with (None, True).
+        """
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        self._listeners.remove(listener)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __contains__(self, stage_prefix: str) -> bool:
+        return stage_prefix in self._by_stage_prefix
+
+    def __iter__(self) -> Iterator[VehicleRecord]:
+        return iter(self._records)
+
+    def _check_available(self, stage_prefix: str, vehicle_id: Optional[int]):
+        if stage_prefix in self._by_stage_prefix:
+            raise ValueError("A vehicle already exists with the stage prefix " + stage_prefix)
+
+        if vehicle_id is not None and vehicle_id in self._by_id:
+            raise ValueError("A vehicle already exists with the id " + str(vehicle_id))
+
+    def _next_vehicle_id(self) -> int:
+        vehicle_id = len(self._records)
+        while vehicle_id in self._by_id:
+            vehicle_id += 1
+        return vehicle_id
+
+    def __new__(cls):
+        """Allocates the memory and creates the actual VehicleManager object is not instance exists yet. Otherwise,
+        returns the existing instance of the VehicleManager class.
+
+        Returns:
+            VehicleManager: the single instance of the VehicleManager class
+        """
+
+        # Use a lock in here to make sure we do not have a race condition
+        # when using multi-threading and creating the first instance of the vehicle manager
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = object.__new__(cls)
+
+        return VehicleManager._instance
+
+    def __del__(self):
+        """Destructor for the object. Destroys the only existing instance of this class."""
+        VehicleManager._instance = None
+        VehicleManager._is_initialized = False
@@ -0,0 +1,116 @@
+"""
+| File: articulation_fleet_view.py
+| Author: Akhilesh Bhat
+| Description: Definition of the ArticulationFleetView class that reads and writes the state of a group of vehicles
+                 (of the same model) through a single omni.isaac.core ArticulationView
+"""
+
+__all__ = ["ArticulationFleetView", "articulation_fleet_view_factory"]
+
+from typing import List
+
+import numpy as np
+
+import carb
+from omni.isaac.core.articulations import ArticulationView
+
+from Forklift_Simulator_python.logic.vehicles.fleet_state import FleetState
+from Forklift_Simulator_python.logic.vehicles.vehicle_configs import VehicleConfig, vehicle_config
+
+
+class ArticulationFleetView:
+    """
+    Batched access to every vehicle of a given model. Poses, velocities and joint states are read, and joint targets
+    are written, with one tensor API call each for the whole group instead of per-prim USD calls.
+    """
+
+    def __init__(self, stage_prefixes: List[str], config: VehicleConfig):
+        """
+        Args:
+            stage_prefixes (list): The paths of the vehicles in the stage (in slot order).
+            config (VehicleConfig): The configuration of the vehicle model (joint names and wheel radius).
+        """
+        self._config = config
+        self._view = ArticulationView(
+            prim_paths_expr=stage_prefixes, name="fleet_" + config.model, reset_xform_properties=False
+        )
+        self._view.initialize()
+
+        # Resolve the indices of the controlled joints (joints missing from the asset are ignored)
+        dof_names = list(self._view.dof_names or [])
+        self._drive_dofs = np.array([dof_names.index(j) for j in config.drive_joints if j in dof_names], dtype=np.int32)
+        self._steering_dofs = np.array([dof_names.index(j) for j in config.steering_joints if j in dof_names], dtype=np.int32)
+        self._lift_dofs = np.array([dof_names.index(config.lift_joint)] if config.lift_joint in dof_names else [], dtype=np.int32)
+
+        if len(self._drive_dofs) == 0:
+            carb.log_warn("No drive joints found for the vehicle model " + config.model + ", commands are ignored")
+
+    def is_valid(self) -> bool:
+        """
+        Returns:
+            bool: False if the physics handles of the view were invalidated (e.g. the simulation was stopped)
+        """
+        return self._view.is_physics_handle_valid()
+
+    def apply_commands(self, state: FleetState, slots):
+        arrays_count = self._view.count
+
+        if len(self._drive_dofs) > 0:
+            wheel_velocities = np.repeat(
+                (state.speed_commands[slots] / self._config.wheel_radius)[:, None], len(self._drive_dofs), axis=1
+            )
+            self._view.set_joint_velocity_targets(wheel_velocities, joint_indices=self._drive_dofs)
+
+        if len(self._steering_dofs) > 0:
+            steering = np.repeat(state.steering_commands[slots][:, None], len(self._steering_dofs), axis=1)
+            self._view.set_joint_position_targets(steering, joint_indices=self._steering_dofs)
+
+        if len(self._lift_dofs) > 0:
+            self._view.set_joint_velocity_targets(
+                state.fork_commands[slots].reshape(arrays_count, 1), joint_indices=self._lift_dofs
+            )
+
+    def read_state(self, state: FleetState, slots):
+        positions, orientations = self._view.get_world_poses()
+        velocities = self._view.get_velocities()
+
+        state.positions[slots] = positions
+        state.orientations[slots] = orientations
+        state.linear_velocities[slots] = velocities[:, :3]
+        state.angular_velocities[slots] = velocities[:, 3:]
+
+        if len(self._lift_dofs) > 0:
+            state.fork_heights[slots] = self._view.get_joint_positions(joint_indices=self._lift_dofs)[:, 0]
+
+    def capture(self) -> dict:
+        """
+        Returns:
+            dict: A copy of the full physics state of the group (root poses and velocities, joint positions and velocities)
+        """
+        positions, orientations = self._view.get_world_poses()
+        return {
+            "positions": np.array(positions),
+            "orientations": np.array(orientations),
+            "velocities": np.array(self._view.get_velocities()),
+            "joint_positions": np.array(self._view.get_joint_positions()),
+            "joint_velocities": np.array(self._view.get_joint_velocities()),
+        }
+
+    def restore(self, physics_state: dict):
+        """
+        Method that teleports every vehicle of the group back to a state returned by capture (the joint states are
+        optional, e.g. to only set the root poses and velocities)
+        """
+        self._view.set_world_poses(physics_state["positions"], physics_state["orientations"])
+        self._view.set_velocities(physics_state["velocities"])
+        if "joint_positions" in physics_state:
+            self._view.set_joint_positions(physics_state["joint_positions"])
+        if "joint_velocities" in physics_state:
+            self._view.set_joint_velocities(physics_state["joint_velocities"])
+
+
+def articulation_fleet_view_factory(model: str, stage_prefixes: List[str]) -> ArticulationFleetView:
+    """
+    View factory for the FleetStepper that creates an ArticulationFleetView with the default config of the model
+    """
+    return ArticulationFleetView(stage_prefixes, vehicle_config(model))
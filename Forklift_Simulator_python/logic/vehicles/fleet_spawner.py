@@ -0,0 +1,226 @@
+"""
+| File: fleet_spawner.py
+| Author: Akhilesh Bhat
+| Description: Definition of the FleetSpawner class that spawns many vehicles at once, authoring all of their prims as
+                 references (with instanceable meshes) inside a single Sdf change block
+"""
+
+__all__ = ["FleetSpawner", "author_fleet_prims", "euler_to_quaternions", "instanceable_paths"]
+
+from typing import List, Optional, Sequence
+
+import numpy as np
+from pxr import Gf, Sdf, Usd, Vt
+
+import carb
+
+from Forklift_Simulator_python.logic.vehicles.vehicle import Vehicle
+from Forklift_Simulator_python.logic.vehicles.vehicle_configs import vehicle_config
+from Forklift_Simulator_python.logic.interface.simulation_interface import SimInterface
+
+
+def euler_to_quaternions(euler_angles) -> np.ndarray:
+    """
+    Function that converts a batch of intrinsic XYZ euler angles (in degrees) into [qw, qx, qy, qz] quaternions.
+
+    Args:
+        euler_angles: An (N, 3) array of [roll, pitch, yaw] angles in degrees.
+
+    Returns:
+        np.ndarray: An (N, 4) array of quaternions
+    """
+    # scipy is only imported when the first fleet is spawned (it is slow to import at startup)
+    from scipy.spatial.transform import Rotation
+
+    quaternions = Rotation.from_euler("XYZ", np.asarray(euler_angles, dtype=float).reshape(-1, 3), degrees=True).as_quat()
+
+    # scipy returns [qx, qy, qz, qw] quaternions
+    return np.roll(quaternions, 1, axis=1)
+
+
+def instanceable_paths(usd_path: str, names: Sequence[str]) -> List[str]:
+    """
+    Function that finds the prims of a vehicle asset that can be shared between the vehicles of a fleet.
+
+    Args:
+        usd_path (str): The path of the USD file describing the vehicle.
+        names (list): The names of the prims to share (e.g. "visuals" and "collisions").
+
+    Returns:
+        list: The paths of the first prims with one of the names (their descendants are not searched), relative to the
+            default prim of the asset
+    """
+    if not names:
+        return []
+
+    stage = Usd.Stage.Open(usd_path)
+    root = stage.GetDefaultPrim() if stage is not None else None
+    if not root:
+        carb.log_warn("Could not find the default prim of " + usd_path + ", its meshes are not instanced")
+        return []
+
+    paths = []
+    iterator = iter(Usd.PrimRange(root))
+    for prim in iterator:
+        if prim.GetName() in names and prim != root:
+            paths.append(str(prim.GetPath().MakeRelativePath(root.GetPath())))
+            iterator.PruneChildren()
+    return paths
+
+
+def author_fleet_prims(
+    layer: Sdf.Layer,
+    stage_prefixes: Sequence[str],
+    usd_path: str,
+    positions: np.ndarray,
+    orientations: np.ndarray,
+    instanceable: Sequence[str] = (),
+):
+    """
+    Function that authors the prims of a fleet directly in a layer, inside a single Sdf change block (so the stage
+    is only recomposed once, no matter how many vehicles are spawned).
+
+    Args:
+        layer (Sdf.Layer): The layer where the prims are authored (usually the edit target of the stage).
+        stage_prefixes (list): The paths of the vehicles in the stage.
+        usd_path (str): The path of the USD file describing the vehicle.
+        positions (np.ndarray): An (N, 3) array of positions (in meters).
+        orientations (np.ndarray): An (N, 4) array of [qw, qx, qy, qz] quaternions.
+        instanceable (list): The paths (relative to a vehicle, see instanceable_paths) of the subtrees the vehicles
+            share through USD instancing. The vehicle prim itself is not instanceable, so its articulation can be
+            driven. USD only instances the subtrees that have a composition arc of their own (e.g. the meshes referenced
+            from a separate file, as in the instanceable assets of Isaac Sim). Defaults to (), no instancing.
+    """
+    xform_op_order = Vt.TokenArray(["xformOp:translate", "xformOp:orient"])
+    reference = Sdf.Reference(usd_path)
+
+    with Sdf.ChangeBlock():
+
+        # Make sure every ancestor is defined (prims created as "over" would be skipped by the stage traversals)
+        ancestors = {prefix for path in stage_prefixes for prefix in Sdf.Path(path).GetParentPath().GetPrefixes()}
+        for ancestor in sorted(ancestors):
+            spec = Sdf.CreatePrimInLayer(layer, ancestor)
+            if spec.specifier == Sdf.SpecifierOver and not spec.typeName:
+                spec.specifier = Sdf.SpecifierDef
+                spec.typeName = "Xform"
+
+        for stage_prefix, position, orientation in zip(stage_prefixes, positions, orientations):
+            spec = Sdf.CreatePrimInLayer(layer, stage_prefix)
+            spec.specifier = Sdf.SpecifierDef
+            spec.typeName = "Xform"
+            spec.referenceList.Prepend(reference)
+            for path in instanceable:
+                Sdf.CreatePrimInLayer(layer, spec.path.AppendPath(path)).instanceable = True
+
+            translate = Sdf.AttributeSpec(spec, "xformOp:translate", Sdf.ValueTypeNames.Double3)
+            translate.default = Gf.Vec3d(*position.tolist())
+
+            orient = Sdf.AttributeSpec(spec, "xformOp:orient", Sdf.ValueTypeNames.Quatd)
+            orient.default = Gf.Quatd(*orientation.tolist())
+
+            op_order = Sdf.AttributeSpec(
+                spec, "xformOpOrder", Sdf.ValueTypeNames.TokenArray, variability=Sdf.VariabilityUniform
+            )
+            op_order.default = xform_op_order
+
+
+class FleetSpawner:
+    """
+    Spawns fleets of vehicles of a given model. The USD asset is loaded once (and its meshes are shared by every vehicle
+    through instancing), all the prims are authored in one change block, and the vehicles are registered in the VehicleManager
+    with their initial poses written to the FleetState in a single batched operation.
+    """
+
+    def __init__(self):
+        self._sim_interface = SimInterface()
+
+    def spawn(
+        self,
+        model: str,
+        positions,
+        euler_angles=None,
+        orientations=None,
+        stage_prefix: Optional[str] = None,
+        vehicle_ids: Optional[Sequence[int]] = None,
+    ) -> List[Vehicle]:
+        """
+        Method that spawns one vehicle per pose.
+
+        Args:
+            model (str): The name of the vehicle model (the key in ROBOTS).
+            positions: An (N, 3) array of positions (in meters).
+            euler_angles: An (N, 3) array of intrinsic XYZ [roll, pitch, yaw] angles (in degrees).
+            orientations: An (N, 4) array of [qw, qx, qy, qz] quaternions (used instead of euler_angles).
+            stage_prefix (str): The prefix of the vehicle paths (the vehicle id is appended to it).
+                Defaults to "/World/fleet/<model>".
+            vehicle_ids (list): The ids of the vehicles. Defaults to consecutive ids after the highest id in use.
+
+        Returns:
+            list: The spawned vehicles
+        """
+        positions = np.asarray(positions, dtype=float).reshape(-1, 3)
+        count = len(positions)
+
+        if orientations is not None:
+            orientations = np.asarray(orientations, dtype=float).reshape(-1, 4)
+        elif euler_angles is not None:
+            orientations = euler_to_quaternions(euler_angles)
+        else:
+            orientations = np.tile([1.0, 0.0, 0.0, 0.0], (count, 1))
+
+        if len(orientations) != count:
+            raise ValueError("Got " + str(count) + " positions but " + str(len(orientations)) + " orientations")
+
+        vehicle_manager = self._sim_interface.vehicle_manager
+        if vehicle_ids is None:
+            first_id = max((record.vehicle_id for record in vehicle_manager.records), default=-1) + 1
+            vehicle_ids = range(first_id, first_id + count)
+        vehicle_ids = list(vehicle_ids)
+
+        if len(vehicle_ids) != count:
+            raise ValueError("Got " + str(count) + " positions but " + str(len(vehicle_ids)) + " vehicle ids")
+        if len(set(vehicle_ids)) != count:
+            raise ValueError("The vehicle ids of a fleet must be unique")
+
+        stage_prefix = stage_prefix or "/World/fleet/" + model.lower()
+        stage_prefixes = [stage_prefix + "_" + str(vehicle_id) for vehicle_id in vehicle_ids]
+
+        # Check every stage prefix and id before authoring anything, such that a rejected fleet leaves no prim behind
+        stage = self._sim_interface.world.stage
+        for path, vehicle_id in zip(stage_prefixes, vehicle_ids):
+            vehicle_manager.check_available(path, vehicle_id)
+            if stage.GetPrimAtPath(path):
+                raise Exception("A primitive already exists at the path " + path)
+
+        # Resolve (and mirror into the local asset cache) the vehicle asset only once for the whole fleet
+        config = vehicle_config(model)
+        usd_path = config.usd_path
+        if self._sim_interface.asset_cache is not None:
+            try:
+                usd_path = self._sim_interface.asset_cache.localize(usd_path)
+            except Exception as e:
+                carb.log_warn("Could not mirror " + usd_path + " into the asset cache, loading it directly: " + str(e))
+
+        author_fleet_prims(
+            stage.GetEditTarget().GetLayer(),
+            stage_prefixes,
+            usd_path,
+            positions,
+            orientations,
+            instanceable_paths(usd_path, config.instanceable_prims),
+        )
+
+        # Register the vehicles, without loading their assets again
+        vehicles = [
+            Vehicle(path, usd_path, vehicle_id, model=model, spawn=False)
+            for path, vehicle_id in zip(stage_prefixes, vehicle_ids)
+        ]
+
+        # Initialize the fleet state with the spawn poses (until the first physics step reads them back)
+        slots = np.array([vehicle.record.slot for vehicle in vehicles], dtype=np.int64)
+        fleet_state = self._sim_interface.fleet_state
+        fleet_state.positions[slots] = positions
+        fleet_state.orientations[slots] = orientations
+
+        carb.log_info("Spawned a fleet of " + str(count) + " " + model + " vehicles")
+        return vehicles
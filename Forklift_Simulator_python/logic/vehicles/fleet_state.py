@@ -0,0 +1,384 @@
+"""
+| File: fleet_state.py
+| Author: Akhilesh Bhat
+| Description: Definition of the FleetState class that keeps the state and commands of every vehicle in contiguous
+                 NumPy arrays (indexed by the VehicleManager slots) and of the FleetStepper that updates the whole
+                 fleet with a single batched read/write per physics step
+"""
+
+__all__ = ["FleetState", "FleetStepper"]
+
+import logging
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class FleetState:
+    """
+    State and commands of every vehicle in the simulation, stored in contiguous arrays. Row i of every array holds the
+    data of the vehicle in slot i of the VehicleManager. The arrays are over-allocated and grow geometrically, so adding
+    vehicles is amortized O(1), and removing one moves the last row into the freed slot (mirroring the registry).
+    """
+
+    # Name and per-vehicle shape of every array (orientations are [qw, qx, qy, qz] quaternions)
+    FIELDS = {
+        "positions": (3,),
+        "orientations": (4,),
+        "linear_velocities": (3,),
+        "angular_velocities": (3,),
+        "fork_heights": (),
+        "speed_commands": (),
+        "steering_commands": (),
+        "fork_commands": (),
+    }
+
+    def __init__(self, capacity: int = 64):
+        """
+        Args:
+            capacity (int): The number of vehicles to allocate space for upfront. Defaults to 64.
+        """
+        self._count = 0
+        self._capacity = max(1, capacity)
+        self._arrays: Dict[str, np.ndarray] = {
+            name: np.zeros((self._capacity,) + shape, dtype=np.float64) for name, shape in FleetState.FIELDS.items()
+        }
+        self._arrays["orientations"][:, 0] = 1.0
+
+        # Stage prefix and model of the vehicle in each slot
+        self._stage_prefixes: List[str] = []
+        self._models: List[str] = []
+
+        # Incremented every time vehicles are added or removed (used to know when batched views must be rebuilt)
+        self._version = 0
+
+    @property
+    def count(self) -> int:
+        """
+        Returns:
+            int: The number of vehicles in the fleet
+        """
+        return self._count
+
+    @property
+    def version(self) -> int:
+        """
+        Returns:
+            int: A counter that changes every time the composition of the fleet changes
+        """
+        return self._version
+
+    @property
+    def stage_prefixes(self) -> List[str]:
+        return self._stage_prefixes
+
+    @property
+    def models(self) -> List[str]:
+        return self._models
+
+    @property
+    def positions(self) -> np.ndarray:
+        return self._arrays["positions"][: self._count]
+
+    @property
+    def orientations(self) -> np.ndarray:
+        return self._arrays["orientations"][: self._count]
+
+    @property
+    def linear_velocities(self) -> np.ndarray:
+        return self._arrays["linear_velocities"][: self._count]
+
+    @property
+    def angular_velocities(self) -> np.ndarray:
+        return self._arrays["angular_velocities"][: self._count]
+
+    @property
+    def fork_heights(self) -> np.ndarray:
+        return self._arrays["fork_heights"][: self._count]
+
+    @property
+    def speed_commands(self) -> np.ndarray:
+        return self._arrays["speed_commands"][: self._count]
+
+    @property
+    def steering_commands(self) -> np.ndarray:
+        return self._arrays["steering_commands"][: self._count]
+
+    @property
+    def fork_commands(self) -> np.ndarray:
+        return self._arrays["fork_commands"][: self._count]
+
+    def headings(self) -> np.ndarray:
+        """
+        Returns:
+            np.ndarray: The yaw angle (in radians) of every vehicle, computed from the orientations
+        """
+        w, x, y, z = self.orientations.T
+        return np.arctan2(2.0 * (w * z + x * y), 1.0 - 2.0 * (y * y + z * z))
+
+    def speeds(self) -> np.ndarray:
+        """
+        Returns:
+            np.ndarray: The signed forward speed (in m/s) of every vehicle, along its heading
+        """
+        heading = self.headings()
+        return self.linear_velocities[:, 0] * np.cos(heading) + self.linear_velocities[:, 1] * np.sin(heading)
+
+    def set_commands(self, slots=None, speed=None, steering=None, fork=None):
+        """
+        Method that sets the commands of several vehicles at once.
+
+        Args:
+            slots: The slots of the vehicles to command (array, slice or None for the whole fleet).
+            speed: The forward speed commands (in m/s).
+            steering: The steering angle commands (in radians).
+            fork: The fork lift velocity commands (in m/s).
+        """
+        slots = slice(0, self._count) if slots is None else slots
+
+        if speed is not None:
+            self._arrays["speed_commands"][slots] = speed
+        if steering is not None:
+            self._arrays["steering_commands"][slots] = steering
+        if fork is not None:
+            self._arrays["fork_commands"][slots] = fork
+
+    def add(self, stage_prefix: str, model: str = "", position=None, orientation=None) -> int:
+        """
+        Method that appends a vehicle to the fleet.
+
+        Returns:
+            int: The slot of the new vehicle
+        """
+        if self._count == self._capacity:
+            self._grow(2 * self._capacity)
+
+        slot = self._count
+        for name, array in self._arrays.items():
+            array[slot] = 0.0
+        self._arrays["orientations"][slot, 0] = 1.0
+
+        if position is not None:
+            self._arrays["positions"][slot] = position
+        if orientation is not None:
+            self._arrays["orientations"][slot] = orientation
+
+        self._stage_prefixes.append(stage_prefix)
+        self._models.append(model)
+        self._count += 1
+        self._version += 1
+
+        return slot
+
+    def remove(self, slot: int):
+        """
+        Method that removes the vehicle in the given slot, moving the last vehicle into it.
+        """
+        last = self._count - 1
+        if slot != last:
+            for array in self._arrays.values():
+                array[slot] = array[last]
+            self._stage_prefixes[slot] = self._stage_prefixes[last]
+            self._models[slot] = self._models[last]
+
+        self._stage_prefixes.pop()
+        self._models.pop()
+        self._count -= 1
+        self._version += 1
+
+    def clear(self):
+        """
+        Method that removes every vehicle from the fleet (the allocated memory is kept).
+        """
+        self._count = 0
+        self._stage_prefixes = []
+        self._models = []
+        self._version += 1
+
+    def bind(self, vehicle_manager):
+        """
+        Method that keeps the fleet in sync with the VehicleManager registry (slot i of the fleet is always
+        the vehicle in slot i of the registry).
+
+        Args:
+            vehicle_manager (VehicleManager): The vehicle manager to follow.
+        """
+        self.clear()
+        for record in vehicle_manager.records:
+            self.add(record.stage_prefix, record.model)
+
+        vehicle_manager.add_listener(self._on_registry_changed)
+
+    def groups(self) -> Dict[str, np.ndarray]:
+        """
+        Returns:
+            dict: A dictionary of vehicle model -> array with the slots of the vehicles of that model
+        """
+        models = np.asarray(self._models)
+        return {model: np.flatnonzero(models == model) for model in dict.fromkeys(self._models)}
+
+    def _on_registry_changed(self, record, removed: bool):
+        if record is None:
+            self.clear()
+        elif removed:
+            self.remove(record.slot)
+        else:
+            self.add(record.stage_prefix, record.model)
+
+    def _grow(self, capacity: int):
+        for name, array in self._arrays.items():
+            grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+            grown[: self._count] = array[: self._count]
+            self._arrays[name] = grown
+        self._capacity = capacity
+
+
+class FleetStepper:
+    """
+    Applies the commands and reads back the state of the whole fleet once per physics step. The actual simulator access
+    is done through batched views (one per vehicle model), created by the view factory and rebuilt only when the
+    composition of the fleet changes (or a view reports it is no longer valid, e.g. after the physics was restarted).
+    A view must implement apply_commands(state, slots), read_state(state, slots) and is_valid(), and optionally capture()
+    and restore(physics_state) to support scene snapshots.
+    """
+
+    def __init__(self, state: FleetState, view_factory: Callable):
+        """
+        Args:
+            state (FleetState): The fleet state to update.
+            view_factory (Callable): Function called with (model, stage_prefixes) that returns a batched view.
+        """
+        self._state = state
+        self._view_factory = view_factory
+        self._views: List[tuple] = []
+        self._views_version: Optional[int] = None
+
+        # Functions called with (state, dt) before the commands are applied (controllers, input pipelines, etc.)
+        self._pre_step_callbacks: List[Callable] = []
+
+        # StepTiming that records the wall time of every callback and of the batched view reads/writes (None to disable)
+        self.timing = None
+
+    @property
+    def state(self) -> FleetState:
+        return self._state
+
+    def add_pre_step_callback(self, callback: Callable):
+        """
+        Args:
+            callback (Callable): Function called with (state, dt) before the commands are applied on every step.
+        """
+        self._pre_step_callbacks.append(callback)
+
+    def remove_pre_step_callback(self, callback: Callable):
+        self._pre_step_callbacks.remove(callback)
+
+    def invalidate(self):
+        """
+        Method that forces the batched views to be rebuilt on the next step (e.g. after the physics scene was reset)
+        """
+        self._views_version = None
+
+    def step(self, dt: float):
+        """
+        Method that updates the whole fleet. Meant to be registered as a physics callback.
+
+        Args:
+            dt (float): The physics step size (in seconds).
+        """
+        if self._state.count == 0:
+            return
+
+        if self.timing is not None and self.timing.enabled:
+            self._timed_step(dt)
+            return
+
+        for callback in self._pre_step_callbacks:
+            callback(self._state, dt)
+
+        self._update_views()
+
+        for view, slots in self._views:
+            view.apply_commands(self._state, slots)
+
+        for view, slots in self._views:
+            view.read_state(self._state, slots)
+
+    def _timed_step(self, dt: float):
+        timing = self.timing
+        for callback in self._pre_step_callbacks:
+            with timing.measure(getattr(callback, "__qualname__", type(callback).__name__)):
+                callback(self._state, dt)
+
+        with timing.measure("FleetStepper.apply_commands"):
+            self._update_views()
+            for view, slots in self._views:
+                view.apply_commands(self._state, slots)
+
+        with timing.measure("FleetStepper.read_state"):
+            for view, slots in self._views:
+                view.read_state(self._state, slots)
+
+    def capture_physics_state(self) -> List:
+        """
+        Returns:
+            list: The full physics state of every batched view (in view order)
+        """
+        if self._state.count == 0:
+            return []
+
+        self._update_views()
+        return [view.capture() for view, _ in self._views]
+
+    def restore_physics_state(self, physics_state: List):
+        """
+        Method that restores the state returned by capture_physics_state. The composition of the fleet must not have
+        changed in the meantime.
+        """
+        if self._state.count == 0:
+            return
+
+        self._update_views()
+        if len(physics_state) != len(self._views):
+            raise ValueError("The physics state does not match the current fleet composition")
+
+        for (view, _), view_state in zip(self._views, physics_state):
+            view.restore(view_state)
+
+    def teleport(self):
+        """
+        Method that moves every vehicle to the pose and velocity currently stored in the fleet state (e.g. after the
+        state was overwritten to jump in a replay)
+        """
+        if self._state.count == 0:
+            return
+
+        self._update_views()
+        for view, slots in self._views:
+            view.restore(
+                {
+                    "positions": self._state.positions[slots],
+                    "orientations": self._state.orientations[slots],
+                    "velocities": np.hstack((self._state.linear_velocities[slots], self._state.angular_velocities[slots])),
+                }
+            )
+
+    def _update_views(self):
+        if self._views_version != self._state.version or not all(view.is_valid() for view, _ in self._views):
+            self._rebuild_views()
+
+    def _rebuild_views(self):
+        self._views = []
+        for model, slots in self._state.groups().items():
+            stage_prefixes = [self._state.stage_prefixes[slot] for slot in slots]
+
+            # With a single model in the fleet, use a slice so that reads/writes are views instead of fancy-index copies
+            if len(slots) == self._state.count:
+                slots = slice(0, self._state.count)
+
+            self._views.append((self._view_factory(model, stage_prefixes), slots))
+
+        self._views_version = self._state.version
+        logger.info("Rebuilt %d batched fleet views for %d vehicles", len(self._views), self._state.count)
@@ -0,0 +1,408 @@
+"""
+| File: forklift_kinematics.py
+| Author: Akhilesh Bhat
+| Description: Definition of the ForkliftKinematics class, a vectorized kinematic model of N forklifts with a steered and
+                 driven rear wheel and a lift/reach/shift/tilt fork carriage, that runs without Isaac Sim (for look-ahead
+                 and as a surrogate simulator)
+"""
+
+__all__ = ["ForkliftKinematics"]
+
+import copy
+import math
+from typing import Callable, Optional
+
+import numpy as np
+
+from Forklift_Simulator_python.logic.vehicles.vehicle_configs import VehicleConfig
+
+
+class ForkliftKinematics:
+    """
+    Kinematic model of a fleet of forklifts, stored (like the FleetState) as contiguous arrays with one row per vehicle.
+    Every step advances all the vehicles at once with a handful of NumPy operations:
+
+    - the steering angle of the rear wheel moves towards its command at a bounded rate, within +-max_steering_angle
+    - the speed of the rear (drive) wheel moves towards its command with a bounded acceleration, within +-max_speed
+      (+-max_lifted_speed while the forks are above lifted_height)
+    - the reference point (the middle of the fixed front axle) moves at speed * cos(steering) along the heading, and the
+      heading turns at speed * sin(steering) / wheelbase (a positive steering angle turns left when driving forward, as
+      the cmd_vel conversion of the streaming backend assumes)
+    - each fork axis (lift, reach, shift, tilt) moves at its commanded velocity, bounded by its maximum speed, and stops
+      at the limits of its range
+
+    The commands are the same as the FleetState ones (drive wheel speed, steering angle and fork lift velocity), plus the
+    reach, shift and tilt velocities. Headings are in radians, in [-pi, pi).
+    """
+
+    # Per-vehicle state, commands and parameters (one float64 scalar per vehicle each). The values of the fork axes are
+    # stored in consecutive rows, such that the four axes are updated with a single operation
+    AXES = ("lift", "reach", "shift", "tilt")
+    STATE_FIELDS = ("x", "y", "heading", "speed", "steering") + AXES
+    COMMAND_FIELDS = ("speed_command", "steering_command") + tuple(axis + "_command" for axis in AXES)
+    PARAMETER_FIELDS = (
+        ("wheelbase", "max_steering_angle", "max_steering_rate", "max_speed", "max_acceleration")
+        + ("lifted_height", "max_lifted_speed")
+        + tuple(axis + "_min" for axis in AXES)
+        + tuple(axis + "_max" for axis in AXES)
+        + tuple("max_" + axis + "_speed" for axis in AXES)
+    )
+    FIELDS = STATE_FIELDS + COMMAND_FIELDS + PARAMETER_FIELDS
+    INDEX = {name: index for index, name in enumerate(FIELDS)}
+
+    def __init__(self, capacity: int = 64):
+        """
+        Args:
+            capacity (int): The number of vehicles to allocate space for upfront. Defaults to 64.
+        """
+        self._count = 0
+        self._capacity = max(1, capacity)
+
+        # Row f holds field f (see FIELDS) of every vehicle
+        self._data = np.zeros((len(ForkliftKinematics.FIELDS), self._capacity), dtype=np.float64)
+        self._scratch = np.empty((12, self._capacity), dtype=np.float64)
+
+    @property
+    def count(self) -> int:
+        """
+        Returns:
+            int: The number of vehicles in the model
+        """
+        return self._count
+
+    def __getattr__(self, name: str) -> np.ndarray:
+        # Every state, command and parameter is exposed as a view of its first count rows (e.g. model.heading)
+        index = ForkliftKinematics.INDEX.get(name)
+        if index is None or "_data" not in self.__dict__:
+            raise AttributeError(name)
+        return self._data[index, : self._count]
+
+    def add(self, config: VehicleConfig, x: float = 0.0, y: float = 0.0, heading: float = 0.0) -> int:
+        """
+        Method that appends a vehicle (at rest, with its forks at the lower end of their ranges) to the model.
+
+        Args:
+            config (VehicleConfig): The configuration with the geometry and limits of the vehicle.
+            x (float): The x position (in meters) of the reference point.
+            y (float): The y position (in meters) of the reference point.
+            heading (float): The heading (in radians).
+
+        Returns:
+            int: The slot of the new vehicle
+        """
+        if self._count == self._capacity:
+            self._grow(2 * self._capacity)
+
+        slot = self._count
+        self._data[:, slot] = 0.0
+        self._count += 1
+
+        self.set_parameters(config, slot)
+        self._data[_X : _HEADING + 1, slot] = x, y, heading
+        self._data[_AXES, slot] = self._data[_AXES_MIN, slot]
+
+        return slot
+
+    def add_many(self, config: VehicleConfig, poses) -> np.ndarray:
+        """
+        Method that appends several vehicles of the same configuration at once.
+
+        Args:
+            config (VehicleConfig): The configuration of the vehicles.
+            poses: Array of shape (n, 3) with the [x, y, heading] of every vehicle.
+
+        Returns:
+            np.ndarray: The slots of the new vehicles
+        """
+        poses = np.asarray(poses, dtype=np.float64).reshape(-1, 3)
+        start, count = self._count, len(poses)
+
+        capacity = self._capacity
+        while capacity < start + count:
+            capacity *= 2
+        if capacity != self._capacity:
+            self._grow(capacity)
+
+        slots = slice(start, start + count)
+        self._data[:, slots] = 0.0
+        self._count += count
+
+        self.set_parameters(config, slots)
+        self._data[_X : _HEADING + 1, slots] = poses.T
+        self._data[_AXES, slots] = self._data[_AXES_MIN, slots]
+
+        return np.arange(start, start + count)
+
+    def remove(self, slot: int):
+        """
+        Method that removes the vehicle in the given slot, moving the last vehicle into it (as the FleetState does).
+        """
+        last = self._count - 1
+        if slot != last:
+            self._data[:, slot] = self._data[:, last]
+        self._count -= 1
+
+    def clear(self):
+        """
+        Method that removes every vehicle from the model (the allocated memory is kept).
+        """
+        self._count = 0
+
+    def set_parameters(self, config: VehicleConfig, slots=None):
+        """
+        Method that sets the geometry and limits of several vehicles from a vehicle configuration.
+
+        Args:
+            config (VehicleConfig): The configuration of the vehicles.
+            slots: The slots of the vehicles (array, slice or None for every vehicle).
+        """
+        slots = slice(0, self._count) if slots is None else slots
+        index = ForkliftKinematics.INDEX
+
+        for name in ForkliftKinematics.PARAMETER_FIELDS[:7]:
+            self._data[index[name], slots] = getattr(config, name)
+
+        for axis in ForkliftKinematics.AXES:
+            low, high = getattr(config, axis + "_range")
+            self._data[index[axis + "_min"], slots] = low
+            self._data[index[axis + "_max"], slots] = max(low, high)
+            self._data[index["max_" + axis + "_speed"], slots] = getattr(config, "max_" + axis + "_speed")
+
+    def set_commands(self, slots=None, speed=None, steering=None, lift=None, reach=None, shift=None, tilt=None):
+        """
+        Method that sets the commands of several vehicles at once (the commands are kept until changed).
+
+        Args:
+            slots: The slots of the vehicles to command (array, slice or None for every vehicle).
+            speed: The drive wheel speed commands (in m/s).
+            steering: The steering angle commands (in radians).
+            lift: The lift velocity commands (in m/s).
+            reach: The reach velocity commands (in m/s).
+            shift: The side shift velocity commands (in m/s).
+            tilt: The tilt velocity commands (in rad/s).
+        """
+        slots = slice(0, self._count) if slots is None else slots
+
+        for name, value in (
+            ("speed", speed),
+            ("steering", steering),
+            ("lift", lift),
+            ("reach", reach),
+            ("shift", shift),
+            ("tilt", tilt),
+        ):
+            if value is not None:
+                self._data[ForkliftKinematics.INDEX[name + "_command"], slots] = value
+
+    def axis_velocities(self, axis: str, targets, dt: float) -> np.ndarray:
+        """
+        Args:
+            axis (str): The fork axis ("lift", "reach", "shift" or "tilt").
+            targets: The target positions of the axis, for every vehicle.
+            dt (float): The step size (in seconds) the velocities will be applied for.
+
+        Returns:
+            np.ndarray: The velocity commands that move the axis towards the targets as fast as possible without
+                overshooting them (e.g. to drive the forks to the values of the fork manipulation fields)
+        """
+        targets = np.clip(targets, getattr(self, axis + "_min"), getattr(self, axis + "_max"))
+        max_speed = getattr(self, "max_" + axis + "_speed")
+        return np.clip((targets - getattr(self, axis)) / dt, -max_speed, max_speed)
+
+    def step(self, dt: float):
+        """
+        Method that advances every vehicle by dt seconds with its current commands.
+
+        Args:
+            dt (float): The step size (in seconds).
+        """
+        n = self._count
+        if n == 0:
+            return
+        d = self._data[:, :n]
+
+        # Every intermediate result is written into the scratch rows (allocating temporaries dominates with large fleets)
+        t = self._scratch[:, :n]
+        a, b, c, e, axes_delta, axes_bound = t[0], t[1], t[2], t[3], t[4:8], t[8:12]
+
+        # Steering: rate-limited towards the (bounded) command
+        steering = d[_STEERING]
+        _clip(d[_STEERING_COMMAND], d[_MAX_STEERING_ANGLE], b, a)
+        b -= steering
+        np.multiply(d[_MAX_STEERING_RATE], dt, out=c)
+        _clip(b, c, b, a)
+        steering += b
+
+        # Drive wheel speed: acceleration-limited towards the command, with a lower limit while the forks are raised
+        speed = d[_SPEED]
+        np.copyto(c, d[_MAX_SPEED])
+        np.copyto(c, d[_MAX_LIFTED_SPEED], where=d[_LIFT] > d[_LIFTED_HEIGHT])
+        _clip(d[_SPEED_COMMAND], c, b, a)
+        b -= speed
+        np.multiply(d[_MAX_ACCELERATION], dt, out=c)
+        _clip(b, c, b, a)
+        speed += b
+
+        # Tricycle kinematics around the fixed axle (midpoint integration of the heading)
+        heading = d[_HEADING]
+        np.cos(steering, out=a)
+        a *= speed
+        a *= dt
+        np.sin(steering, out=b)
+        b *= speed
+        b /= d[_WHEELBASE]
+        b *= dt
+        np.multiply(b, 0.5, out=c)
+        c += heading
+        np.cos(c, out=e)
+        e *= a
+        d[_X] += e
+        np.sin(c, out=e)
+        e *= a
+        d[_Y] += e
+        heading += b
+        heading[heading >= math.pi] -= 2.0 * math.pi
+        heading[heading < -math.pi] += 2.0 * math.pi
+
+        # Fork axes (all four at once): bounded velocity, stopping at the ends of their ranges
+        axes = d[_AXES]
+        _clip(d[_AXES_COMMAND], d[_AXES_MAX_SPEED], axes_delta, axes_bound)
+        axes_delta *= dt
+        axes += axes_delta
+        np.maximum(axes, d[_AXES_MIN], out=axes)
+        np.minimum(axes, d[_AXES_MAX], out=axes)
+
+    def rollout(self, dt: float, steps: int, controller: Optional[Callable] = None) -> np.ndarray:
+        """
+        Method that predicts the motion of every vehicle over the next steps, on a copy of the model (the model itself is
+        not changed).
+
+        Args:
+            dt (float): The step size (in seconds).
+            steps (int): The number of steps.
+            controller (Callable): Function called with (model, step) before each step to update the commands of the copy
+                (None to keep the current commands).
+
+        Returns:
+            np.ndarray: Array of shape (steps, count, 3) with the [x, y, heading] of every vehicle after each step
+        """
+        model = self.copy()
+        n = self._count
+        trajectory = np.empty((steps, n, 3), dtype=np.float64)
+
+        for k in range(steps):
+            if controller is not None:
+                controller(model, k)
+            model.step(dt)
+            trajectory[k] = model._data[_X : _HEADING + 1, :n].T
+
+        return trajectory
+
+    def copy(self) -> "ForkliftKinematics":
+        """
+        Returns:
+            ForkliftKinematics: An independent copy of the model (state, commands and parameters)
+        """
+        model = copy.copy(self)
+        model._data = self._data.copy()
+        model._scratch = np.empty_like(self._scratch)
+        return model
+
+    def capture(self, rows=None) -> np.ndarray:
+        """
+        Args:
+            rows: The slots of the vehicles (array, slice or None for every vehicle).
+
+        Returns:
+            np.ndarray: A (fields, vehicles) copy of the state, commands and parameters of the vehicles (see FIELDS)
+        """
+        return self._data[:, slice(0, self._count) if rows is None else rows].copy()
+
+    def restore(self, values: np.ndarray, rows=None):
+        """
+        Method that restores the values returned by capture (for the same vehicles).
+        """
+        self._data[:, slice(0, self._count) if rows is None else rows] = values
+
+    def read_fleet(self, state, slots=None, rows=None):
+        """
+        Method that sets the pose, speed and lift height of the vehicles from a FleetState (e.g. to look ahead from the
+        current state of the simulation). Vehicle rows[i] of the model is the vehicle in slots[i] of the fleet.
+
+        Args:
+            state (FleetState): The fleet state.
+            slots: The slots of the vehicles in the fleet (array, slice or None for the first count vehicles).
+            rows: The slots of the vehicles in the model (array, slice or None for every vehicle).
+        """
+        rows = slice(0, self._count) if rows is None else rows
+        slots = slice(0, self._count) if slots is None else slots
+        d = self._data
+
+        d[_X, rows] = state.positions[slots, 0]
+        d[_Y, rows] = state.positions[slots, 1]
+        d[_HEADING, rows] = state.headings()[slots]
+        d[_LIFT, rows] = state.fork_heights[slots]
+
+        # The drive wheel speed that produces the forward speed of the fixed axle with the current steering angle
+        d[_SPEED, rows] = state.speeds()[slots] / np.maximum(np.cos(d[_STEERING, rows]), 1e-3)
+
+    def write_fleet(self, state, slots=None, rows=None):
+        """
+        Method that writes the pose, velocities and lift height of the vehicles into a FleetState (e.g. to use the model
+        as a surrogate simulator). Vehicle rows[i] of the model is the vehicle in slots[i] of the fleet.
+
+        Args:
+            state (FleetState): The fleet state.
+            slots: The slots of the vehicles in the fleet (array, slice or None for the first count vehicles).
+            rows: The slots of the vehicles in the model (array, slice or None for every vehicle).
+        """
+        rows = slice(0, self._count) if rows is None else rows
+        slots = slice(0, self._count) if slots is None else slots
+        d = self._data[:, rows]
+
+        heading = d[_HEADING]
+        forward = d[_SPEED] * np.cos(d[_STEERING])
+        half = 0.5 * heading
+
+        # Written column by column (into views of the fleet arrays when the slots are a slice)
+        positions, orientations = state.positions, state.orientations
+        linear_velocities, angular_velocities = state.linear_velocities, state.angular_velocities
+        positions[slots, 0] = d[_X]
+        positions[slots, 1] = d[_Y]
+        orientations[slots, 0] = np.cos(half)
+        orientations[slots, 1:3] = 0.0
+        orientations[slots, 3] = np.sin(half)
+        linear_velocities[slots, 0] = forward * np.cos(heading)
+        linear_velocities[slots, 1] = forward * np.sin(heading)
+        linear_velocities[slots, 2] = 0.0
+        angular_velocities[slots, 0:2] = 0.0
+        angular_velocities[slots, 2] = d[_SPEED] * np.sin(d[_STEERING]) / d[_WHEELBASE]
+        state.fork_heights[slots] = d[_LIFT]
+
+    def _grow(self, capacity: int):
+        grown = np.zeros((self._data.shape[0], capacity), dtype=self._data.dtype)
+        grown[:, : self._count] = self._data[:, : self._count]
+        self._data = grown
+        self._scratch = np.empty((self._scratch.shape[0], capacity), dtype=self._scratch.dtype)
+        self._capacity = capacity
+
+
+def _clip(values: np.ndarray, bound: np.ndarray, out: np.ndarray, scratch: np.ndarray):
+    # out = clip(values, -bound, bound), without allocating
+    np.negative(bound, out=scratch)
+    np.maximum(values, scratch, out=out)
+    np.minimum(out, bound, out=out)
+
+
+# Rows of the fields used by step (the fork axes as slices of four consecutive rows)
+_INDEX = ForkliftKinematics.INDEX
+_X, _Y, _HEADING, _SPEED, _STEERING, _LIFT = (_INDEX[name] for name in ("x", "y", "heading", "speed", "steering", "lift"))
+_SPEED_COMMAND, _STEERING_COMMAND = _INDEX["speed_command"], _INDEX["steering_command"]
+_WHEELBASE, _MAX_STEERING_ANGLE, _MAX_STEERING_RATE = _INDEX["wheelbase"], _INDEX["max_steering_angle"], _INDEX["max_steering_rate"]
+_MAX_SPEED, _MAX_ACCELERATION = _INDEX["max_speed"], _INDEX["max_acceleration"]
+_LIFTED_HEIGHT, _MAX_LIFTED_SPEED = _INDEX["lifted_height"], _INDEX["max_lifted_speed"]
+_AXES = slice(_INDEX["lift"], _INDEX["lift"] + 4)
+_AXES_COMMAND = slice(_INDEX["lift_command"], _INDEX["lift_command"] + 4)
+_AXES_MIN = slice(_INDEX["lift_min"], _INDEX["lift_min"] + 4)
+_AXES_MAX = slice(_INDEX["lift_max"], _INDEX["lift_max"] + 4)
+_AXES_MAX_SPEED = slice(_INDEX["max_lift_speed"], _INDEX["max_lift_speed"] + 4)
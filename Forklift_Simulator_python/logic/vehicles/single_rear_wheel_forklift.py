@@ -0,0 +1,48 @@
+"""
+| File: single_rear_wheel_forklift.py
+| Author: Akhilesh Bhat
+| Description: Definition of the SingleRearWheelForklift class, a forklift with a single steered and driven rear wheel
+"""
+
+__all__ = ["SingleRearWheelForklift"]
+
+from Forklift_Simulator_python.logic.vehicles.vehicle import Vehicle
+from Forklift_Simulator_python.logic.vehicles.vehicle_configs import SingleRearWheelForkliftConfig
+
+
+class SingleRearWheelForklift(Vehicle):
+    def __init__(
+        self,
+        stage_prefix: str = "/World/mono_forklift",
+        usd_path: str = None,
+        vehicle_id: int = None,
+        init_pose=[0.0, 0.0, 0.1],
+        init_orientation=[0.0, 0.0, 0.0, 1.0],
+        config: SingleRearWheelForkliftConfig = None,
+    ):
+        """
+        Args:
+            stage_prefix (str): The path of the forklift in the stage. Defaults to "/World/mono_forklift".
+            usd_path (str): The path of the USD file describing the forklift. Defaults to the path in the config.
+            vehicle_id (int): The id of the forklift. Defaults to the first unused id.
+            init_pose (list): The initial [x, y, z] position of the forklift (in meters).
+            init_orientation (list): The initial [qx, qy, qz, qw] orientation of the forklift.
+            config (SingleRearWheelForkliftConfig): The configuration of the forklift. Defaults to a new default
+                configuration.
+        """
+        if config is None:
+            config = SingleRearWheelForkliftConfig()
+        self._config = config
+
+        super().__init__(
+            stage_prefix,
+            usd_path if usd_path is not None else config.usd_path,
+            vehicle_id,
+            init_pose,
+            init_orientation,
+            model=config.model,
+        )
+
+    @property
+    def config(self) -> SingleRearWheelForkliftConfig:
+        return self._config
@@ -0,0 +1,117 @@
+"""
+| File: vehicle.py
+| Author: Akhilesh Bhat
+| Description: Definition of the Vehicle class, the base class of every vehicle spawned in the simulation world
+"""
+
+__all__ = ["Vehicle"]
+
+import numpy as np
+
+# Omniverse/Isaac API
+import carb
+from omni.isaac.core.prims import XFormPrim
+from omni.isaac.core.utils.prims import delete_prim, is_prim_path_valid
+
+from Forklift_Simulator_python.logic.vehicle_manager import VehicleManager
+from Forklift_Simulator_python.logic.interface.simulation_interface import SimInterface
+
+
+class Vehicle:
+    """
+    Base class of the vehicles. Spawning a vehicle loads its USD asset into the stage, places it at the initial pose
+    and registers it in the VehicleManager.
+    """
+
+    def __init__(
+        self,
+        stage_prefix: str,
+        usd_path: str,
+        vehicle_id: int = None,
+        init_pose=[0.0, 0.0, 0.0],
+        init_orientation=[0.0, 0.0, 0.0, 1.0],
+        model: str = "",
+        spawn: bool = True,
+    ):
+        """
+        Args:
+            stage_prefix (str): The path of the vehicle in the stage.
+            usd_path (str): The path of the USD file describing the vehicle.
+            vehicle_id (int): The id of the vehicle. Defaults to the first unused id.
+            init_pose (list): The initial [x, y, z] position of the vehicle (in meters).
+            init_orientation (list): The initial [qx, qy, qz, qw] orientation of the vehicle (scipy convention).
+            model (str): The name of the vehicle model (the key in ROBOTS). Defaults to "".
+            spawn (bool): Whether to load the asset into the stage. Set to False when the prim was already authored
+                (e.g. by the FleetSpawner), in which case the initial pose is not applied either. Defaults to True.
+        """
+
+        self._sim_interface = SimInterface()
+        self._stage_prefix = stage_prefix
+        self._usd_path = usd_path
+
+        # The XFormPrim wrapper is only created when needed (it is not required to step the fleet)
+        self._prim = None
+
+        # Check the stage prefix and the id before touching the stage, such that a rejected vehicle leaves no prim behind
+        VehicleManager().check_available(stage_prefix, vehicle_id)
+
+        if spawn:
+            # Load the vehicle asset into the stage
+            self._sim_interface.load_asset(usd_path, stage_prefix)
+
+            # Place the vehicle at its initial pose (omni.isaac.core uses [qw, qx, qy, qz] quaternions)
+            self.prim.set_world_pose(
+                np.asarray(init_pose, dtype=float), np.roll(np.asarray(init_orientation, dtype=float), 1)
+            )
+
+        # Register the vehicle in the vehicle manager
+        self._record = VehicleManager().add_vehicle(stage_prefix, self, vehicle_id, model)
+
+        carb.log_info("Spawned vehicle " + stage_prefix + " with id " + str(self._record.vehicle_id))
+
+    @property
+    def stage_prefix(self) -> str:
+        return self._stage_prefix
+
+    @property
+    def vehicle_id(self) -> int:
+        return self._record.vehicle_id
+
+    @property
+    def record(self):
+        """
+        Returns:
+            VehicleRecord: The record of this vehicle in the VehicleManager
+        """
+        return self._record
+
+    @property
+    def prim(self) -> XFormPrim:
+        if self._prim is None:
+            self._prim = XFormPrim(self._stage_prefix)
+        return self._prim
+
+    def get_world_pose(self):
+        """
+        Returns:
+            tuple: The [x, y, z] position and [qw, qx, qy, qz] orientation of the vehicle
+        """
+        return self.prim.get_world_pose()
+
+    def destroy(self):
+        """
+        Method called by the VehicleManager when the vehicle is removed from the simulation
+        """
+        self._prim = None
+
+    def delete(self):
+        """
+        Method that removes the vehicle from the stage and from the VehicleManager
+        """
+        if self._stage_prefix in VehicleManager():
+            VehicleManager().remove_vehicle(self._stage_prefix)
+
+        if is_prim_path_valid(self._stage_prefix):
+            delete_prim(self._stage_prefix)
+
+        self.destroy()
@@ -0,0 +1,149 @@
+"""
+| File: vehicle_configs.py
+| Author: Akhilesh Bhat
+| Description: Definition of the configuration classes of the vehicles that can be spawned by the extension
+"""
+
+__all__ = ["VehicleConfig", "SingleRearWheelForkliftConfig", "vehicle_config", "footprint_reach"]
+
+import math
+from typing import Iterable
+
+from Forklift_Simulator_python.global_variables import ROBOTS
+
+
+class VehicleConfig:
+    """
+    Base configuration of a vehicle
+    """
+
+    def __init__(self):
+
+        # The name of the vehicle model (the key in ROBOTS)
+        self.model = ""
+
+        # The path of the USD file describing the vehicle (None to use the path in ROBOTS)
+        self.usd_file = None
+
+        # Names of the joints driven by the fleet controller (None if the vehicle does not have such joint)
+        self.drive_joints = []
+        self.steering_joints = []
+        self.lift_joint = None
+
+        # Radius (in meters) of the driven wheels, used to convert speed commands into wheel velocities
+        self.wheel_radius = 0.1
+
+        # Distance (in meters) between the front axle and the steered wheel, and maximum steering angle (in radians),
+        # used to convert velocity commands (forward speed and yaw rate) into steering commands
+        self.wheelbase = 1.0
+        self.max_steering_angle = 0.6
+
+        # Footprint of the vehicle on the floor (in meters): its length and width, and how far its front (e.g. the tips of
+        # the forks) is ahead of the middle of the front axle, used to check that the spawn poses are free
+        self.length = 2.0
+        self.width = 1.0
+        self.front_length = 0.5
+
+        # Limits of the drive (in m/s and m/s^2) and of the steering rate (in rad/s), used by the kinematic model
+        self.max_speed = 2.0
+        self.max_acceleration = 1.0
+        self.max_steering_rate = 1.5
+
+        # Travel speed limit (in m/s) when the forks are raised above lifted_height (in meters)
+        self.lifted_height = 0.5
+        self.max_lifted_speed = 0.5
+
+        # Ranges (min, max) of the fork axes and their maximum speeds: lift and reach/shift in meters and m/s, tilt in
+        # radians and rad/s (an axis with an empty range is fixed)
+        self.lift_range = (0.0, 2.0)
+        self.max_lift_speed = 0.3
+        self.reach_range = (0.0, 0.0)
+        self.max_reach_speed = 0.2
+        self.shift_range = (0.0, 0.0)
+        self.max_shift_speed = 0.1
+        self.tilt_range = (0.0, 0.0)
+        self.max_tilt_speed = 0.1
+
+        # Names of the prims (e.g. the visual and collision mesh subtrees of the links) that the vehicles of a fleet share
+        # through instancing. The articulation itself is never instanceable, as its joints are driven per vehicle
+        self.instanceable_prims = ["visuals", "collisions"]
+
+    @property
+    def usd_path(self) -> str:
+        return self.usd_file if self.usd_file is not None else ROBOTS[self.model]
+
+
+class SingleRearWheelForkliftConfig(VehicleConfig):
+    """
+    Configuration of the forklift with a single (steered and driven) rear wheel
+    """
+
+    def __init__(self):
+        super().__init__()
+
+        self.model = "SingleRearWheel"
+
+        # Path of the usd file is only resolved (through the asset catalog) when the vehicle is spawned
+        self.usd_file = None
+
+        # Joints of the forklift_b asset
+        self.drive_joints = ["back_wheel_drive"]
+        self.steering_joints = ["back_wheel_swivel"]
+        self.lift_joint = "lift_joint"
+        self.wheel_radius = 0.18
+        self.wheelbase = 1.4
+        self.max_steering_angle = 1.4
+        self.length = 3.0
+        self.width = 1.2
+        self.front_length = 1.2
+
+        # Limits of the drive and of the forks
+        self.max_speed = 2.5
+        self.max_acceleration = 0.8
+        self.max_steering_rate = 1.2
+        self.lifted_height = 0.5
+        self.max_lifted_speed = 0.6
+        self.lift_range = (0.0, 3.0)
+        self.max_lift_speed = 0.4
+        self.reach_range = (0.0, 0.6)
+        self.max_reach_speed = 0.2
+        self.shift_range = (-0.1, 0.1)
+        self.max_shift_speed = 0.1
+        self.tilt_range = (-0.05, 0.1)
+        self.max_tilt_speed = 0.05
+
+
+def vehicle_config(model: str) -> VehicleConfig:
+    """
+    Function that returns the default configuration of a vehicle model.
+
+    Args:
+        model (str): The name of the vehicle model (the key in ROBOTS).
+
+    Returns:
+        VehicleConfig: The configuration of the vehicle
+    """
+    if model == "SingleRearWheel":
+        return SingleRearWheelForkliftConfig()
+
+    config = VehicleConfig()
+    config.model = model
+    return config
+
+
+def footprint_reach(models: Iterable[str]) -> float:
+    """
+    Function that returns how far the footprint of a vehicle reaches from its reference point (the middle of the front
+    axle), whatever its heading: the largest distance from the reference point to a corner of the footprint.
+
+    Args:
+        models (Iterable[str]): The vehicle models (the keys in ROBOTS).
+
+    Returns:
+        float: The largest reach (in meters) among the models
+    """
+    reach = 0.0
+    for model in models:
+        config = vehicle_config(model)
+        reach = max(reach, math.hypot(max(config.front_length, config.length - config.front_length), config.width / 2.0))
+    return reach
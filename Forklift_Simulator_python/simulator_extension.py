@@ -7,12 +7,11 @@
 __all__ = ["SimulatorExtension"]
 
 import gc
+import time
 import asyncio
 from functools import partial
-from threading import Timer 
 
 # Omniverse general API
-import pxr 
 import carb 
 import omni.ext
 import omni.usd
@@ -20,11 +19,11 @@ import omni.kit.ui
 import omni.kit.app
 import omni.ui as ui
 
-from omni.kit.viewport.utility import get_active_viewport
-
 # Extension files and API
-from .global_variables import WINDOW_TITLE, MENU_PATH
+from .global_variables import WINDOW_TITLE, MENU_PATH, ENVIRONMENT_PREWARM_COUNT, CACHE_PATH
+from .logic.profiling.startup_profiler import startup_profiler
 from .logic.interface.simulation_interface import SimInterface 
+from .logic.interface.stage_readiness import StageReadinessMonitor
 
 # Setting up the UI for the extension's widget
 from .ui.sim_ui_window import WidgetWindow
@@ -37,6 +36,10 @@ class SimulatorExtension(omni.ext.IExt):
 
         carb.log_info("Simulator is starting")
 
+        # Used to measure how long it takes until the world is initialized
+        self._startup_time = time.perf_counter()
+        self.startup_time = None
+
         # Save the extension id
         self._ext_id = ext_id
 
@@ -44,35 +47,59 @@ class SimulatorExtension(omni.ext.IExt):
         self.ui_backend = None
         self.ui_window = None
 
-        self._sim_interface = SimInterface()
+        with startup_profiler.phase("Create the simulation interface"):
+            self._sim_interface = SimInterface()
 
         # Check if we have a stage loaded (when using autoload feature, it might not be ready yet)
         # This is a limitation of the simulator, and we are doing this to ensure that the extension
         # does not crash when using the GUI with autoload feature.
         # If autoload was not enabled, and we are enabling the extension from the Extension widget,
-        # then we will always have a state open, and the auxiliary timer will never run.
+        # then we will always have a state open, and the world is initialized right away. Otherwise, the readiness
+        # monitor initializes it (on the main thread) as soon as the stage and the viewport are ready.
+        self._stage_readiness = None
         if omni.usd.get_context().get_stage_state() != omni.usd.StageState.CLOSED:
-            self._sim_interface.initialize_world()
+            self._on_stage_ready(time.perf_counter() - self._startup_time)
         else:
             self.autoload_helper()
 
+        # Open the most used environments in the background, such that loading them from the UI is instant
+        if ENVIRONMENT_PREWARM_COUNT > 0:
+            self._sim_interface.prewarm_environments()
+
         ui.Workspace.set_show_window_fn(WINDOW_TITLE, partial(self.show_window, None))
 
         # Add the extension to the editor menu inside Isaac Sim
-        editor_menu = omni.kit.ui.get_editor_menu()
-        if editor_menu:
-            self._menu = editor_menu.add_item(MENU_PATH, self.show_window, toggle=True, value=True)
+        with startup_profiler.phase("Add the editor menu"):
+            editor_menu = omni.kit.ui.get_editor_menu()
+            if editor_menu:
+                self._menu = editor_menu.add_item(MENU_PATH, self.show_window, toggle=True, value=True)
 
         # Show the window
-        ui.Workspace.show_window(WINDOW_TITLE, show=True)
+        with startup_profiler.phase("Show the window"):
+            ui.Workspace.show_window(WINDOW_TITLE, show=True)
         
     def autoload_helper(self):
+        """
+        Method that waits (without blocking or spawning threads) for the stage and the viewport to be ready before the
+        world is initialized
+        """
+        self._stage_readiness = StageReadinessMonitor(self._on_stage_ready, start_time=self._startup_time)
+        self._stage_readiness.start()
 
-        # Check if we already have a viewport and a camera of interest
-        if get_active_viewport() != None and type(get_active_viewport().stage) == pxr.Usd.Stage and str(get_active_viewport().stage.GetPrimAtPath("/OmniverseKit_Persp")) != "invalid null prim":
+    def _on_stage_ready(self, elapsed_time: float):
+        """
+        Method invoked once the stage is ready, with the time (in seconds) elapsed since the extension started
+        """
+        with startup_profiler.phase("Initialize the world"):
             self._sim_interface.initialize_world()
-        else:
-            Timer(0.1, self.autoload_helper).start()
+
+        self.startup_time = time.perf_counter() - self._startup_time
+        carb.log_info("The world was initialized {:.3f}s after the extension started".format(self.startup_time))
+
+        # The startup is over, report where the time went (only when profiling is enabled)
+        if startup_profiler.enabled:
+            startup_profiler.log_report()
+            startup_profiler.dump(CACHE_PATH + "/startup_profile.json")
 
     def show_window(self, menu, show):
         """
@@ -128,6 +155,20 @@ class SimulatorExtension(omni.ext.IExt):
         if self.ui_backend:
             self.ui_backend = None
 
+        # Stop waiting for the stage (if it never became ready)
+        if self._stage_readiness is not None:
+            self._stage_readiness.stop()
+            self._stage_readiness = None
+
+        # Stop pre-warming the environments (if it is still running)
+        self._sim_interface.environment_pool.cancel()
+
+        # Stop streaming the fleet state, release the input devices and finalize the recording (if any)
+        self._sim_interface.set_streaming_backend(None)
+        self._sim_interface.set_input_device(None)
+        self._sim_interface.stop_replay()
+        self._sim_interface.stop_recording()
+
         # De-register the function that shows the window from the isaac sim ui
         ui.Workspace.set_show_window_fn(WINDOW_TITLE, None)
 
@@ -7,10 +7,12 @@
 __all__ = ["WidgetWindow"]
 
 # External packages
+import time
 import numpy as np 
 
 # Omniverse general API
 import carb
+import omni.kit.app
 import omni.ui as ui
 from omni.ui import color as cl 
 
@@ -26,6 +28,10 @@ class WidgetWindow(ui.Window):
     WINDOW_WIDTH = 300
     WINDOW_HEIGHT = 850
 
+    # Period (in seconds) at which the performance panel is refreshed, and number of physics step subscribers listed
+    PERFORMANCE_REFRESH_PERIOD = 0.5
+    PERFORMANCE_CALLBACKS = 5
+
     BUTTON_SELECTED_STYLE = {
         "Button": {
             "background_color": 0xFF5555AA,
@@ -67,11 +73,23 @@ class WidgetWindow(ui.Window):
         # Auxiliary attributes for getting the transforms of the vehicle from the UI
         self._vehicle_transform_models = []
 
+        # Widgets that show the progress of the environment being loaded
+        self._load_progress_bar = None
+        self._load_status_label = None
+
+        # Labels of the performance panel, refreshed from the app update loop
+        self._performance_labels = {}
+        self._performance_sub = None
+        self._last_performance_update = 0.0
+
         # Build the actual window UI
         self._build_window()
 
     def destroy(self):
 
+        # Stop refreshing the performance panel
+        self._performance_sub = None
+
         # Clear the world and the stage correctly
         self._backend.on_clear_scene()
 
@@ -92,6 +110,10 @@ class WidgetWindow(ui.Window):
 
                 # Create a frame for selecting which robot to load
                 self._robot_selection_frame()
+                ui.Spacer(height=5)
+
+                # Create a frame with the timing of the physics steps and of the frames
+                self._performance_frame()
                 ui.Spacer()
 
     def _scene_selection_frame(self):
@@ -137,6 +159,13 @@ class WidgetWindow(ui.Window):
                             style=WidgetWindow.BUTTON_BASE_STYLE,
                         )
 
+                # Progress of the environment being loaded
+                with ui.HStack():
+                    ui.Label("Load Progress", width=WidgetWindow.LABEL_PADDING, height=10.0)
+                    self._load_progress_bar = ui.ProgressBar(height=20)
+
+                self._load_status_label = ui.Label("", height=10.0)
+
     def _robot_selection_frame(self):
         """
         Method that implements a frame that allows the user to choose which robot that is 
@@ -210,7 +239,7 @@ class WidgetWindow(ui.Window):
                             "ROS",
                             height=WidgetWindow.BUTTON_HEIGHT,
                             style=WidgetWindow.BUTTON_BASE_STYLE,
-                            enabled=False,
+                            enabled=True,
                         )
 
                         keyboard_button = ui.Button(
@@ -218,14 +247,13 @@ class WidgetWindow(ui.Window):
                             height=WidgetWindow.BUTTON_HEIGHT,
                             style=WidgetWindow.BUTTON_BASE_STYLE,
                             enabled=True,
-                            visible=False
                         )
 
                         joystick_button = ui.Button(
                             "Joystick",
                             height=WidgetWindow.BUTTON_HEIGHT,
                             style=WidgetWindow.BUTTON_BASE_STYLE,
-                            enabled=False
+                            enabled=True
                         )
 
                         ros_button.set_clicked_fn(lambda: handle_ros_keyboard_joystick_switch(self, ros_button, keyboard_button, joystick_button, "ros"))
@@ -317,6 +345,71 @@ class WidgetWindow(ui.Window):
                 
                     self._backend.set_mode_field(mode_dropdown_menu.model)
 
+    def _performance_frame(self):
+        """
+        Method that implements a frame with the wall time of the physics steps, of the frames and of the physics step
+        subscribers, the real time factor and the number of dropped frames
+        """
+
+        with ui.CollapsableFrame("Performance", collapsed=True):
+            with ui.VStack(height=0, spacing=5, name="frame_v_stack"):
+                ui.Spacer(height=WidgetWindow.GENERAL_SPACING)
+
+                for key, title in [
+                    ("physics_step", "Physics Step"),
+                    ("frame", "Frame"),
+                    ("real_time_factor", "Real Time Factor"),
+                    ("dropped_frames", "Dropped Frames"),
+                ]:
+                    with ui.HStack():
+                        ui.Label(title, width=WidgetWindow.LABEL_PADDING, height=10.0)
+                        self._performance_labels[key] = ui.Label("-", height=10.0)
+
+                ui.Label("Step Subscribers (mean / p99)", height=10.0)
+                self._performance_labels["callbacks"] = ui.Label("-", height=10.0, word_wrap=True)
+
+        self._performance_sub = (
+            omni.kit.app.get_app().get_update_event_stream().create_subscription_to_pop(self._on_performance_update)
+        )
+
+    def _on_performance_update(self, event):
+        now = time.perf_counter()
+        if now - self._last_performance_update < WidgetWindow.PERFORMANCE_REFRESH_PERIOD:
+            return
+        self._last_performance_update = now
+
+        summary = self._backend.get_step_timing_summary()
+
+        def milliseconds(timing: dict) -> str:
+            return "{:.2f} ms (p99 {:.2f} ms)".format(1000.0 * timing["p50"], 1000.0 * timing["p99"])
+
+        self._performance_labels["physics_step"].text = milliseconds(summary["physics_step"]) + " / {:.2f} ms".format(
+            1000.0 * summary["physics_dt"]
+        )
+        self._performance_labels["frame"].text = milliseconds(summary["frame"]) + " / {:.2f} ms".format(
+            1000.0 * summary["rendering_dt"]
+        )
+        self._performance_labels["real_time_factor"].text = "{:.2f} (min {:.2f})".format(
+            summary["real_time_factor"]["current"], summary["real_time_factor"]["min"]
+        )
+        self._performance_labels["dropped_frames"].text = str(summary["dropped_frames"])
+
+        # Slowest subscribers first
+        callbacks = sorted(summary["callbacks"].items(), key=lambda item: item[1]["mean"], reverse=True)
+        self._performance_labels["callbacks"].text = "\n".join(
+            "{}: {:.3f} / {:.3f} ms".format(name, 1000.0 * timing["mean"], 1000.0 * timing["p99"])
+            for name, timing in callbacks[: WidgetWindow.PERFORMANCE_CALLBACKS]
+            if timing["count"] > 0
+        ) or "-"
+
+    def set_load_progress(self, phase: str, fraction: float, elapsed_time: float):
+        """
+        Method that updates the progress bar (and status) of the environment being loaded
+        """
+        if self._load_progress_bar is not None:
+            self._load_progress_bar.model.set_value(fraction)
+            self._load_status_label.text = "{} ({:.1f}s)".format(phase, elapsed_time)
+
     def get_selected_vehicle_attitude(self):
         # Extract the vehicle desired position and orientation for spawning
         if len(self._vehicle_transform_models) == 6:
@@ -328,6 +421,14 @@ class WidgetWindow(ui.Window):
             return vehicle_pos, vehicle_orientation
         
         return None, None
+
+    def set_selected_vehicle_attitude(self, position, euler_angles):
+        """
+        Method that sets the position and orientation (in degrees) shown in the transform fields
+        """
+        if len(self._vehicle_transform_models) == 6:
+            for model, value in zip(self._vehicle_transform_models, list(position) + list(euler_angles)):
+                model.set_value(float(value))
     
     def _action_graph_components_frame(self):
         """
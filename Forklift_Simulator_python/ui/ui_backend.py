@@ -7,8 +7,8 @@
 
 # External packages
 import os
+import math
 import asyncio
-from scipy.spatial.transform import Rotation
 
 # Omniverse extensions
 import carb
@@ -19,9 +19,8 @@ from Forklift_Simulator_python.global_variables import ROBOTS, SIMULATION_ENVIRO
 from Forklift_Simulator_python.logic.interface.simulation_interface import SimInterface
 
 # Vehicle Manager to spawn vehicles
-# from Forklift_Simulator_python.logic.vehicle_manager import VehicleManager
-# from Forklift_Simulator_python.logic.vehicles.single_rear_wheel_forklift import SingleRearWheelForklift
-# from Forklift_Simulator_python.logic.vehicles.vehicle_configs import SingleRearWheelForkliftConfig
+from Forklift_Simulator_python.logic.vehicle_manager import VehicleManager
+from Forklift_Simulator_python.logic.vehicles.single_rear_wheel_forklift import SingleRearWheelForklift
 
 class UIBackend:
     """
@@ -46,7 +45,7 @@ class UIBackend:
         self._vehicle_names = list(ROBOTS.keys())
 
         # Get an instance of the vehicle manager
-        # self._vehicle_manager = VehicleManager()
+        self._vehicle_manager = VehicleManager()
 
         # Selected value for the the id of the vehicle
         self._vehicle_id_field: ui.AbstractValueModel = None
@@ -59,6 +58,12 @@ class UIBackend:
     def set_window_bind(self, window):
         self._window = window
 
+    def get_step_timing_summary(self) -> dict:
+        """
+        Method that returns the summary of the physics step and frame timings (see StepTiming.summary)
+        """
+        return self._sim_interface.step_timing.summary()
+
     def set_scene_dropdown(self, scene_dropdown_model: ui.AbstractItemModel):
         self._scene_dropdown = scene_dropdown_model
 
@@ -71,6 +76,48 @@ class UIBackend:
     def set_mode_field(self, mode_dropdown_model: ui.AbstractItemModel):
         self._mode_field = mode_dropdown_model
 
+    def set_streaming_backend(self, backend: str = "ros"):
+        """
+        Method invoked when a control input backend is selected in the widget window
+
+        Args:
+            backend (str): The name of the selected backend ("ros", "keyboard" or "joystick").
+        """
+        # Only one control input backend is active at a time
+        self._sim_interface.set_streaming_backend(None)
+        self._sim_interface.set_input_device(None)
+
+        # The keyboard and gamepad drive the vehicle with the id selected in the window
+        vehicle_id = self._vehicle_id_field.get_value_as_int() if self._vehicle_id_field is not None else 0
+
+        # Imported here, as the backends are only needed once one is selected (not to start the extension)
+        from Forklift_Simulator_python.logic.streaming.transport import Ros2Transport
+        from Forklift_Simulator_python.logic.streaming.ros2_backend import Ros2StreamingBackend
+        from Forklift_Simulator_python.logic.input.input_devices import GamepadInput, KeyboardInput
+
+        if backend == "ros":
+            # rclpy is only available when the ROS 2 bridge is sourced, so it is only imported when selected
+            try:
+                transport = Ros2Transport()
+            except ImportError as e:
+                carb.log_error("Could not start the ROS 2 streaming backend (is ROS 2 sourced?): " + str(e))
+                return
+
+            self._sim_interface.set_streaming_backend(
+                Ros2StreamingBackend(
+                    self._sim_interface.fleet_stepper, self._vehicle_manager, self._sim_interface.input_pipeline, transport
+                )
+            )
+            carb.log_info("Streaming the fleet over ROS 2")
+
+        elif backend == "keyboard":
+            self._sim_interface.set_input_device(KeyboardInput(self._sim_interface.input_pipeline, vehicle_id))
+            carb.log_info("Driving the vehicle " + str(vehicle_id) + " with the keyboard")
+
+        elif backend == "joystick":
+            self._sim_interface.set_input_device(GamepadInput(self._sim_interface.input_pipeline, vehicle_id))
+            carb.log_info("Driving the vehicle " + str(vehicle_id) + " with the gamepad")
+
     """
     ---------------------------------------------------------------------
     Callbacks to handle user interaction with the extension widget window
@@ -91,8 +138,24 @@ class UIBackend:
             # Get the name of the selected world
             selected_world = self._scene_names[environment_index]
 
-            # Try to spawn the selected world
-            asyncio.ensure_future(self._sim_interface.load_environment_async(SIMULATION_ENVIRONMENTS[selected_world], force_clear=True))
+            async def async_load_environment():
+
+                # Resolving the asset may query Nucleus, which must not block the UI
+                usd_path = await SIMULATION_ENVIRONMENTS.resolve_async(selected_world)
+
+                # Try to spawn the selected world (selecting another scene while loading cancels the previous one)
+                await self._sim_interface.load_environment_async(
+                    usd_path, force_clear=True, on_progress=self._on_load_progress
+                )
+
+            asyncio.ensure_future(async_load_environment())
+
+    def _on_load_progress(self, phase: str, fraction: float, elapsed_time: float):
+        """
+        Method invoked while an environment is being loaded, to report the progress in the widget window
+        """
+        if self._window is not None:
+            self._window.set_load_progress(phase, fraction, elapsed_time)
 
     def on_clear_scene(self):
         """
@@ -122,24 +185,50 @@ class UIBackend:
                 # Get the name of the selected vehicle
                 selected_robot = self._vehicle_names[vehicle_index]
 
+                # Resolve the asset without blocking the UI (the spawn below then finds it in the catalog cache)
+                usd_path = await ROBOTS.resolve_async(selected_robot)
+
                 # Get the id of the selected vehicle
                 self._vehicle_id = self._vehicle_id_field.get_value_as_int()
 
                 # Get the desired position and orientation of the vehicle from the UI transform
                 pos, euler_angles = self._window.get_selected_vehicle_attitude()
 
+                # A vehicle spawned inside a shelf (or another vehicle) makes the physics explode, so it is moved to the
+                # closest free position instead (and the transform fields are updated)
+                placer = self._sim_interface.spawn_placer(selected_robot)
+                pose = [pos[0], pos[1], math.radians(euler_angles[2])]
+                reason = placer.explain(pose)
+                if reason is not None:
+                    free_pose = placer.nearest_valid(pose)
+                    if free_pose is None:
+                        carb.log_error("Could not spawn the robot at the requested position, " + reason)
+                        return
+
+                    pos = pos.copy()
+                    pos[:2] = free_pose[:2]
+                    self._window.set_selected_vehicle_attitude(pos, euler_angles)
+                    carb.log_warn("Spawning the robot at ({:.2f}, {:.2f}) instead, {}".format(pos[0], pos[1], reason))
+
                 if selected_robot == "SingleRearWheel":
-                    
+
+                    # scipy is only imported when the first vehicle is spawned (it is slow to import at startup)
+                    from scipy.spatial.transform import Rotation
+
                     SingleRearWheelForklift(
                         stage_prefix="/World/mono_forklift",
-                        usd_path=ROBOTS[selected_robot],
+                        usd_path=usd_path,
                         vehicle_id=self._vehicle_id,
                         init_pose=pos,
                         init_orientation=Rotation.from_euler("XYZ", euler_angles, degrees=True).as_quat(),
                         # sim_mode=True,
                     )
 
-                #TODO: Launch the selected vehicle
+                else:
+                    # The other forklift models are spawned through the fleet API (as a fleet of a single vehicle)
+                    self._sim_interface.spawn_fleet(
+                        selected_robot, [pos], euler_angles=[euler_angles], vehicle_ids=[self._vehicle_id]
+                    )
 
                 carb.log_info("Spawned the robot: " + selected_robot + " using the Simulator UI")
 
@@ -8,8 +8,11 @@
 #
 
 import os
+import time
 from typing import List
 
+import numpy as np
+import omni.kit.app
 import omni.ui as ui
 from omni.isaac.ui.element_wrappers import (
     Button,
@@ -26,6 +29,9 @@ from omni.isaac.ui.element_wrappers import (
 )
 from omni.isaac.ui.ui_utils import get_style
 
+from Forklift_Simulator_python.logic.interface.simulation_interface import SimInterface
+from Forklift_Simulator_python.global_variables import TELEMETRY_MAX_VEHICLES, TELEMETRY_UI_RATE, TELEMETRY_WINDOW
+
 
 class UIBuilder:
     def __init__(self):
@@ -35,6 +41,10 @@ class UIBuilder:
         # UI elements created using a UIElementWrapper from omni.isaac.ui.element_wrappers
         self.wrapped_ui_elements = []
 
+        # Live telemetry plots and the subscription to the app update loop that refreshes them
+        self._telemetry_plots = {}
+        self._plot_update_sub = None
+
     ###################################################################################
     #           The Functions Below Are Called Automatically By extension.py
     ###################################################################################
@@ -81,6 +91,9 @@ class UIBuilder:
         for ui_elem in self.wrapped_ui_elements:
             ui_elem.cleanup()
 
+        # Stop refreshing the telemetry plots
+        self._plot_update_sub = None
+
     def build_ui(self):
         """
         Build a custom UI tool to run your extension.
@@ -98,7 +111,7 @@ class UIBuilder:
         # Create a UI frame with different selection widgets
         self._create_selection_widgets_frame()
 
-        # Create a UI frame with different plotting tools
+        # Create a UI frame with the live telemetry plots
         self._create_plotting_frame()
 
     def _create_status_report_frame(self):
@@ -216,34 +229,81 @@ class UIBuilder:
                 self.wrapped_ui_elements.append(color_picker)
 
     def _create_plotting_frame(self):
-        self._plotting_frame = CollapsableFrame("Plotting Tools", collapsed=False)
+        self._plotting_frame = CollapsableFrame("Telemetry", collapsed=False)
+
+        # Names of the vehicle lines, in the order of the ids typed in the vehicle field
+        vehicle_legends = ["Vehicle " + str(i + 1) for i in range(TELEMETRY_MAX_VEHICLES)]
+        empty = [np.zeros(2) for _ in range(TELEMETRY_MAX_VEHICLES)]
 
         with self._plotting_frame:
             with ui.VStack(style=get_style(), spacing=5, height=0):
-                import numpy as np
-
-                x = np.arange(-1, 6.01, 0.01)
-                y = np.sin((x - 0.5) * np.pi)
-                plot = XYPlot(
-                    "XY Plot",
-                    tooltip="Press mouse over the plot for data label",
-                    x_data=[x[:300], x[100:400], x[200:]],
-                    y_data=[y[:300], y[100:400], y[200:]],
-                    x_min=None,  # Use default behavior to fit plotted data to entire frame
-                    x_max=None,
-                    y_min=-1.5,
-                    y_max=1.5,
-                    x_label="X [rad]",
-                    y_label="Y",
-                    plot_height=10,
-                    legends=["Line 1", "Line 2", "Line 3"],
-                    show_legend=True,
-                    plot_colors=[
-                        [255, 0, 0],
-                        [0, 255, 0],
-                        [0, 100, 200],
-                    ],  # List of [r,g,b] values; not necessary to specify
+                vehicles_field = StringField(
+                    "Vehicle Ids",
+                    default_value=", ".join(str(i) for i in SimInterface().telemetry.vehicle_ids),
+                    tooltip="Comma separated ids of the vehicles to plot (at most {})".format(TELEMETRY_MAX_VEHICLES),
+                    read_only=False,
+                    multiline_okay=False,
+                    on_value_changed_fn=self._on_telemetry_vehicles_changed_fn,
                 )
+                self.wrapped_ui_elements.append(vehicles_field)
+
+                self._telemetry_plots = {
+                    "fork_height": XYPlot(
+                        "Fork Height",
+                        tooltip="Min/max envelope of the fork height of the selected vehicles",
+                        x_data=empty,
+                        y_data=empty,
+                        x_label="Time [s]",
+                        y_label="Height [m]",
+                        plot_height=10,
+                        legends=vehicle_legends,
+                        show_legend=True,
+                    ),
+                    "speed": XYPlot(
+                        "Speed",
+                        tooltip="Min/max envelope of the forward speed of the selected vehicles",
+                        x_data=empty,
+                        y_data=empty,
+                        x_label="Time [s]",
+                        y_label="Speed [m/s]",
+                        plot_height=10,
+                        legends=vehicle_legends,
+                        show_legend=True,
+                    ),
+                    "step_time": XYPlot(
+                        "Step Time",
+                        tooltip="Min/max envelope of the wall-clock time between two physics steps",
+                        x_data=[np.zeros(2)],
+                        y_data=[np.zeros(2)],
+                        x_label="Time [s]",
+                        y_label="Step [ms]",
+                        plot_height=10,
+                    ),
+                }
+
+        # The plots are refreshed from the app update loop, at the UI rate (the physics step only writes the ring buffer)
+        self._last_plot_update = 0.0
+        self._plot_update_sub = (
+            omni.kit.app.get_app().get_update_event_stream().create_subscription_to_pop(self._on_plot_update)
+        )
+
+    def _on_plot_update(self, event):
+        now = time.perf_counter()
+        if now - self._last_plot_update < 1.0 / TELEMETRY_UI_RATE:
+            return
+        self._last_plot_update = now
+
+        telemetry = SimInterface().telemetry
+        if telemetry.buffer.samples == 0:
+            return
+
+        for signal, plot in self._telemetry_plots.items():
+            lines = list(telemetry.plot_data(signal, TELEMETRY_WINDOW).values())
+            if signal == "step_time":
+                lines = [(x, 1000.0 * y) for x, y in lines]
+            elif not lines:
+                continue
+            plot.set_data([x for x, _ in lines], [np.nan_to_num(y) for _, y in lines])
 
     ######################################################################################
     # Functions Below This Point Are Callback Functions Attached to UI Element Wrappers
@@ -281,6 +341,16 @@ class UIBuilder:
         status = f"{item} was selected from DropDown"
         self._status_report_field.set_text(status)
 
+    def _on_telemetry_vehicles_changed_fn(self, new_value: str):
+        try:
+            vehicle_ids = [int(token) for token in new_value.replace(",", " ").split()]
+        except ValueError:
+            self._status_report_field.set_text(f"Invalid vehicle ids: {new_value}")
+            return
+
+        SimInterface().telemetry.select(vehicle_ids)
+        self._status_report_field.set_text(f"Plotting the telemetry of vehicles {vehicle_ids[:TELEMETRY_MAX_VEHICLES]}")
+
     def _on_color_picked(self, color: List[float]):
         formatted_color = [float("%0.2f" % i) for i in color]
         status = f"RGBA Color {formatted_color} was picked in the ColorPicker"
@@ -0,0 +1,102 @@
+"""
+| File: test_batch_runner.py
+| Author: Akhilesh Bhat
+| Description: Tests of the BatchRunner on the StubWorldBackend (scenario runs, failures and the result files)
+"""
+
+import json
+import os
+
+import pytest
+
+from Forklift_Simulator_python.logic.runner.backends import StubWorldBackend
+from Forklift_Simulator_python.logic.runner.batch_runner import BatchRunner
+from Forklift_Simulator_python.logic.runner.scenario import Scenario, ScenarioResult
+
+
+def _scenarios():
+    return [
+        Scenario("two forklifts", "Default Environment", spawn_poses=[[0, 0, 0, 0, 0, 0], [5, 0, 0, 0, 0, 90]], duration=0.5, seed=3),
+        Scenario("unknown environment", "Nowhere", spawn_poses=[[0, 0, 0, 0, 0, 0]], duration=0.5),
+        Scenario("empty", "Default Environment", duration=0.25, seed=7),
+    ]
+
+
+def _read_results(output_dir: str):
+    results = []
+    for name in sorted(os.listdir(output_dir)):
+        with open(os.path.join(output_dir, name)) as f:
+            results.append((name, json.load(f)))
+    return results
+
+
+def test_writes_one_result_file_per_scenario(tmp_path):
+    backend = StubWorldBackend(physics_dt=0.01)
+    results = BatchRunner(backend, output_dir=str(tmp_path)).run(_scenarios())
+
+    files = _read_results(str(tmp_path))
+    assert [name for name, _ in files] == ["000000_two_forklifts.json", "000001_unknown_environment.json", "000002_empty.json"]
+
+    # The files hold the same results as the ones returned, and can be read back
+    for result, (_, data) in zip(results, files):
+        assert data == json.loads(json.dumps(result.to_dict()))
+        assert ScenarioResult.from_dict(data).to_dict(timings=False) == result.to_dict(timings=False)
+
+    first = files[0][1]
+    assert first["status"] == ScenarioResult.SUCCESS
+    assert first["steps"] == 50
+    assert first["sim_time"] == pytest.approx(0.5)
+    assert first["scenario"]["seed"] == 3
+    assert sorted(first["vehicle_states"]) == ["/World/vehicle_0", "/World/vehicle_1"]
+    assert first["vehicle_states"]["/World/vehicle_1"]["position"] == [5.0, 0.0, 0.0]
+
+
+def test_failed_scenario_does_not_stop_the_batch(tmp_path):
+    backend = StubWorldBackend(physics_dt=0.01)
+    results = BatchRunner(backend, output_dir=str(tmp_path)).run(_scenarios())
+
+    assert [result.status for result in results] == [ScenarioResult.SUCCESS, ScenarioResult.FAILED, ScenarioResult.SUCCESS]
+    assert "Nowhere" in results[1].error
+    assert results[1].steps == 0
+
+    # The world is cleared before each scenario, so the last one only has its own (zero) vehicles
+    assert results[2].steps == 25
+    assert results[2].vehicle_states == {}
+
+
+def test_seeds_the_backend_with_the_scenario_seed():
+    seeds = []
+
+    class SeedRecordingBackend(StubWorldBackend):
+        def seed(self, seed: int):
+            seeds.append(seed)
+
+    BatchRunner(SeedRecordingBackend()).run(_scenarios())
+    assert seeds == [3, 0, 7]
+
+
+def test_renders_every_render_interval_steps():
+    backend = StubWorldBackend(physics_dt=0.01)
+    BatchRunner(backend, render_interval=10).run([Scenario("render", "Default Environment", duration=0.5)])
+
+    assert backend.steps == 50
+    assert backend.rendered_frames == 5
+
+
+def test_failed_initialization_is_a_failed_result(tmp_path):
+    attempts = []
+
+    class FlakyBackend(StubWorldBackend):
+        def initialize(self):
+            attempts.append(len(attempts))
+            if len(attempts) == 1:
+                raise RuntimeError("no GPU")
+            super().initialize()
+
+    results = BatchRunner(FlakyBackend(), output_dir=str(tmp_path)).run(_scenarios()[:1] * 2)
+
+    # The first scenario reports the failure, the second one initializes the backend again and runs
+    assert [result.status for result in results] == [ScenarioResult.FAILED, ScenarioResult.SUCCESS]
+    assert "no GPU" in results[0].error
+    assert len(attempts) == 2
+    assert len(_read_results(str(tmp_path))) == 2
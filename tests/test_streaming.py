@@ -0,0 +1,146 @@
+"""
+| File: test_streaming.py
+| Author: Akhilesh Bhat
+| Description: Tests of the Ros2StreamingBackend over the InProcessTransport (publication of the fleet state and
+                 conversion of the cmd_vel and fork_cmd commands)
+"""
+
+import math
+import time
+
+import numpy as np
+import pytest
+
+from Forklift_Simulator_python.logic.input.command_buffer import InputPipeline
+from Forklift_Simulator_python.logic.streaming.ros2_backend import Ros2StreamingBackend
+from Forklift_Simulator_python.logic.streaming.transport import InProcessTransport
+from Forklift_Simulator_python.logic.vehicle_manager import VehicleManager
+from Forklift_Simulator_python.logic.vehicles.fleet_state import FleetState, FleetStepper
+from Forklift_Simulator_python.logic.vehicles.vehicle_configs import vehicle_config
+
+PHYSICS_DT = 0.01
+
+
+class _NullView:
+    # Batched view that leaves the fleet state as the test sets it
+
+    def is_valid(self):
+        return True
+
+    def apply_commands(self, state, slots):
+        pass
+
+    def read_state(self, state, slots):
+        pass
+
+
+class _Fleet:
+    # A fleet of forklifts streamed by a backend over an in-process transport
+
+    def __init__(self, count: int = 2):
+        self.vehicle_manager = VehicleManager()
+        self.state = FleetState()
+        self.state.bind(self.vehicle_manager)
+        self.stepper = FleetStepper(self.state, lambda model, stage_prefixes: _NullView())
+        self.pipeline = InputPipeline(self.state, self.vehicle_manager)
+        self.stepper.add_pre_step_callback(self.pipeline.apply)
+
+        for vehicle_id in range(count):
+            self.vehicle_manager.add_vehicle("/World/forklift_" + str(vehicle_id), object(), vehicle_id, "SingleRearWheel")
+
+        self.transport = InProcessTransport()
+        self.backend = Ros2StreamingBackend(self.stepper, self.vehicle_manager, self.pipeline, self.transport, rate=50.0)
+
+    def close(self):
+        # The vehicle manager is a singleton, so the next test must find it empty
+        self.backend.stop()
+        self.vehicle_manager.remove_all_vehicles()
+        self.vehicle_manager.remove_listener(self.state._on_registry_changed)
+
+    def step_until(self, condition, timeout: float = 5.0):
+        # The messages are published from the thread of the backend, so the fleet is stepped until they show up
+        deadline = time.monotonic() + timeout
+        while not condition():
+            if time.monotonic() > deadline:
+                raise TimeoutError("The streaming backend did not publish in time")
+            self.stepper.step(PHYSICS_DT)
+            time.sleep(0.001)
+
+
+@pytest.fixture
+def fleet():
+    fleet = _Fleet()
+    fleet.backend.start()
+    yield fleet
+    fleet.close()
+
+
+def test_publishes_the_fleet_state(fleet):
+    # Forklift 1 at (1, 2, 0), facing +Y and moving forward at 1 m/s, with its forks 0.4 m up
+    yaw = 0.5 * math.pi
+    fleet.state.positions[1] = [1.0, 2.0, 0.0]
+    fleet.state.orientations[1] = [math.cos(yaw / 2.0), 0.0, 0.0, math.sin(yaw / 2.0)]
+    fleet.state.linear_velocities[1] = [0.0, 1.0, 0.0]
+    fleet.state.fork_heights[1] = 0.4
+
+    fleet.step_until(lambda: fleet.backend.published_samples >= 3)
+
+    assert {"/tf", "/forklift_0/odom", "/forklift_1/odom", "/forklift_1/joint_states"} <= set(fleet.transport.topics())
+
+    odometry = fleet.transport.last_message("/forklift_1/odom")
+    assert odometry.child_frame_id == "forklift_1/base_link"
+    position = odometry.pose.pose.position
+    assert (position.x, position.y, position.z) == pytest.approx((1.0, 2.0, 0.0))
+
+    # The twist is in the body frame: the vehicle moves along its own x axis
+    linear = odometry.twist.twist.linear
+    assert (linear.x, linear.y) == pytest.approx((1.0, 0.0), abs=1e-9)
+
+    assert fleet.transport.last_message("/forklift_1/joint_states").position == pytest.approx([0.4])
+    assert len(fleet.transport.last_message("/tf").transforms) == 2
+
+
+@pytest.mark.parametrize("speed, yaw_rate", [(2.0, 0.5), (2.0, -0.3), (-2.0, 0.5), (-1.0, -0.2), (1.5, 0.0)])
+def test_converts_cmd_vel_to_steering(fleet, speed, yaw_rate):
+    fleet.step_until(lambda: fleet.backend.published_samples >= 1)
+
+    command = fleet.transport.new_message("twist")
+    command.linear.x, command.angular.z = speed, yaw_rate
+    fleet.transport.publish("/forklift_1/cmd_vel", command)
+    fleet.stepper.step(PHYSICS_DT)
+
+    # The rear wheel moves the forklift forward at wheel_speed * cos(steering) and turns it at
+    # wheel_speed * sin(steering) / wheelbase, whichever way it drives
+    config = vehicle_config("SingleRearWheel")
+    wheel_speed, steering = fleet.state.speed_commands[1], fleet.state.steering_commands[1]
+    assert wheel_speed * math.cos(steering) == pytest.approx(speed)
+    assert wheel_speed * math.sin(steering) / config.wheelbase == pytest.approx(yaw_rate)
+
+    # The other forklift is not commanded
+    assert fleet.state.speed_commands[0] == 0.0
+
+
+def test_limits_the_steering_angle(fleet):
+    fleet.step_until(lambda: fleet.backend.published_samples >= 1)
+
+    # Turning in place is out of reach of the forklift: the wheel is turned as far as it goes
+    command = fleet.transport.new_message("twist")
+    command.linear.x, command.angular.z = 0.0, 0.5
+    fleet.transport.publish("/forklift_0/cmd_vel", command)
+    fleet.stepper.step(PHYSICS_DT)
+
+    config = vehicle_config("SingleRearWheel")
+    assert fleet.state.steering_commands[0] == pytest.approx(config.max_steering_angle)
+    assert np.sign(fleet.state.speed_commands[0]) == 1.0
+
+
+def test_applies_fork_cmd(fleet):
+    fleet.step_until(lambda: fleet.backend.published_samples >= 1)
+
+    command = fleet.transport.new_message("float64")
+    command.data = -0.3
+    fleet.transport.publish("/forklift_0/fork_cmd", command)
+    fleet.stepper.step(PHYSICS_DT)
+
+    assert fleet.state.fork_commands[0] == pytest.approx(-0.3)
+    assert fleet.state.fork_commands[1] == 0.0